@@ -0,0 +1,228 @@
+"""
+Benchmark local de carga y latencia de los endpoints calientes.
+
+Levanta la app FastAPI en el mismo proceso (httpx + ASGITransport, sin red)
+contra SQLite o un PostgreSQL local, siembra una empresa con datagen.py con
+los volúmenes pedidos y ejecuta cada escenario con N requests concurrentes.
+Imprime (o guarda) un JSON con p50/p95/p99 y throughput por escenario para
+comparar corridas en el tiempo.
+
+    python benchmark.py --productos 5000 --ventas 20000 --concurrencia 20 --salida bench.json
+    python benchmark.py --database-url postgresql://localhost/luzbrill_bench --escenarios productos,ventas
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent
+
+
+def percentil(ordenados, p):
+    """Percentil por rango más cercano sobre una lista ya ordenada"""
+    if not ordenados:
+        return None
+    indice = max(0, math.ceil(p / 100 * len(ordenados)) - 1)
+    return ordenados[min(indice, len(ordenados) - 1)]
+
+
+def resumir(latencias, errores, duracion):
+    ordenadas = sorted(latencias)
+
+    def ms(valor):
+        return round(valor * 1000, 2) if valor is not None else None
+
+    return {
+        'requests': len(latencias),
+        'errores': errores,
+        'p50_ms': ms(percentil(ordenadas, 50)),
+        'p95_ms': ms(percentil(ordenadas, 95)),
+        'p99_ms': ms(percentil(ordenadas, 99)),
+        'max_ms': ms(ordenadas[-1] if ordenadas else None),
+        'throughput_rps': round(len(latencias) / duracion, 2) if duracion > 0 else None,
+    }
+
+
+# ==================== ESCENARIOS ====================
+
+# Escenarios que consumen ventas en borrador; cada uno recibe su propia parte
+CONFIRMACIONES = ('confirmar_venta', 'confirmar_venta_lote')
+
+
+def repartir_borradores(borradores, nombres):
+    """nombre -> ids de borradores, sin repetir entre escenarios"""
+    return {nombre: borradores[k::len(nombres)] for k, nombre in enumerate(nombres)}
+
+
+def escenarios(datos, rng, borradores=None):
+    """nombre -> (función i -> (método, url, params), cantidad máxima de requests o None)"""
+    empresa_id = datos['id']
+    borradores = borradores or {}
+    directos = borradores.get('confirmar_venta', datos['borradores'])
+    en_lote = borradores.get('confirmar_venta_lote', datos['borradores'])
+    hoy = datetime.now(timezone.utc).date()
+    desde = (hoy - timedelta(days=30)).isoformat()
+
+    return {
+        'productos': (lambda i: ('GET', '/api/productos', {'empresa_id': empresa_id}), None),
+        'producto_por_codigo': (
+            lambda i: ('GET', f"/api/productos/codigo/{rng.choice(datos['codigos'])}", None), None
+        ),
+        'ventas': (lambda i: ('GET', '/api/ventas', {'empresa_id': empresa_id}), None),
+        'confirmar_venta': (
+            lambda i: ('POST', f"/api/ventas/{directos[i]}/confirmar", None), len(directos)
+        ),
+        # Mismo endpoint con CONFIRMACION_EN_LOTE activado (ver ejecutar)
+        'confirmar_venta_lote': (
+            lambda i: ('POST', f"/api/ventas/{en_lote[i]}/confirmar", None), len(en_lote)
+        ),
+        'dashboard': (lambda i: ('GET', '/api/dashboard/stats', {'empresa_id': empresa_id}), None),
+        'reporte_ventas': (lambda i: ('GET', '/api/reportes/ventas', {
+            'empresa_id': empresa_id, 'fecha_desde': desde, 'fecha_hasta': hoy.isoformat()
+        }), None),
+        'reporte_stock': (lambda i: ('GET', '/api/reportes/stock', {'empresa_id': empresa_id}), None),
+    }
+
+
+async def correr_escenario(cliente, generar, total, concurrencia):
+    latencias = []
+    errores = 0
+    pendientes = iter(range(total))
+
+    async def trabajador():
+        nonlocal errores
+        for i in pendientes:
+            metodo, url, params = generar(i)
+            inicio = time.perf_counter()
+            try:
+                response = await cliente.request(metodo, url, params=params)
+                fallo = response.status_code >= 400
+            except Exception:
+                fallo = True
+            latencias.append(time.perf_counter() - inicio)
+            errores += fallo
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(trabajador() for _ in range(concurrencia)))
+    return resumir(latencias, errores, time.perf_counter() - inicio)
+
+
+async def ejecutar(args):
+    """Siembra y corre los escenarios con la app y la base ya configuradas en el entorno"""
+    import httpx
+    import datagen
+    import server
+    from database import engine, init_db
+
+    await init_db()
+    rng = random.Random(args.semilla)
+
+    confirmaciones = [nombre for nombre in args.escenarios if nombre in CONFIRMACIONES]
+    inicio = time.perf_counter()
+    volumenes = datagen.Volumenes(
+        productos=args.productos, clientes=args.clientes, ventas=args.ventas, almacenes=args.almacenes,
+        borradores=args.requests * len(confirmaciones),
+        proveedores=5, funcionarios=5, meses=3
+    )
+    datos = (await datagen.generar(engine, volumenes, args.semilla))['empresas'][0]
+    siembra = time.perf_counter() - inicio
+
+    disponibles = escenarios(datos, rng, repartir_borradores(datos['borradores'], confirmaciones))
+    resultados = {}
+    en_lote_previo = server.CONFIRMACION_EN_LOTE
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://benchmark', timeout=None) as cliente:
+        for nombre in args.escenarios:
+            generar, maximo = disponibles[nombre]
+            if maximo is None:
+                # Calentamiento fuera de la medición (planes, caches, pool)
+                await correr_escenario(cliente, generar, args.calentamiento, 1)
+            total = args.requests if maximo is None else min(args.requests, maximo)
+            if nombre in CONFIRMACIONES:
+                server.CONFIRMACION_EN_LOTE = nombre == 'confirmar_venta_lote'
+            try:
+                resultados[nombre] = await correr_escenario(cliente, generar, total, args.concurrencia)
+            finally:
+                server.CONFIRMACION_EN_LOTE = en_lote_previo
+            logging.getLogger('benchmark').info(f"{nombre}: {resultados[nombre]}")
+    await server.confirmador.detener()
+
+    return {
+        'fecha': datetime.now(timezone.utc).isoformat(),
+        'base_de_datos': engine.dialect.name,
+        'python': platform.python_version(),
+        'semilla': args.semilla,
+        'volumenes': {
+            'productos': args.productos, 'clientes': args.clientes,
+            'ventas': args.ventas, 'almacenes': args.almacenes,
+        },
+        'concurrencia': args.concurrencia,
+        'requests_por_escenario': args.requests,
+        'siembra_segundos': round(siembra, 2),
+        'escenarios': resultados,
+    }
+
+
+def construir_parser():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--database-url', help='Base a usar (por defecto un SQLite temporal nuevo)')
+    parser.add_argument('--productos', type=int, default=2000)
+    parser.add_argument('--clientes', type=int, default=500)
+    parser.add_argument('--ventas', type=int, default=5000)
+    parser.add_argument('--almacenes', type=int, default=2)
+    parser.add_argument('--requests', type=int, default=200, help='Requests medidos por escenario')
+    parser.add_argument('--concurrencia', type=int, default=10)
+    parser.add_argument('--calentamiento', type=int, default=5)
+    parser.add_argument('--semilla', type=int, default=1)
+    parser.add_argument(
+        '--escenarios', type=lambda v: [e.strip() for e in v.split(',') if e.strip()],
+        default=['productos', 'producto_por_codigo', 'ventas', 'confirmar_venta', 'confirmar_venta_lote',
+                 'dashboard', 'reporte_ventas', 'reporte_stock'],
+        help='Lista separada por comas'
+    )
+    parser.add_argument('--salida', help='Archivo JSON de resultados (por defecto stdout)')
+    parser.add_argument('--verbose', action='store_true', help='Mantener los logs de la app')
+    return parser
+
+
+def main(argv=None):
+    args = construir_parser().parse_args(argv)
+
+    # La configuración de la base se lee al importar database.py
+    os.environ['DATABASE_URL'] = args.database_url or (
+        f"sqlite+aiosqlite:///{Path(tempfile.mkdtemp(prefix='luzbrill-bench-')) / 'bench.db'}"
+    )
+    os.environ.pop('READ_DATABASE_URL', None)
+    sys.path.insert(0, str(ROOT_DIR))
+
+    logging.basicConfig(level=logging.INFO)
+    if not args.verbose:
+        logging.getLogger('server').setLevel(logging.ERROR)
+
+    async def _principal():
+        from database import dispose_engines
+
+        try:
+            return await ejecutar(args)
+        finally:
+            await dispose_engines()
+
+    resultado = asyncio.run(_principal())
+    texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+    if args.salida:
+        Path(args.salida).write_text(texto + '\n', encoding='utf-8')
+    else:
+        print(texto)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""
+Conciliación de StockActual contra el ledger de movimientos.
+
+POST /api/stock sobrescribe `cantidad` sin registrar movimiento, así que con
+el tiempo StockActual se aparta de SUM(movimientos_stock.cantidad). La
+conciliación arma en una sola pasada agrupada el total del ledger y el stock
+actual por (producto, almacén), devuelve solo las diferencias en streaming y,
+si se pide, inserta en lotes movimientos AJUSTE que llevan el ledger a lo que
+dice StockActual (el conteo físico manda).
+
+    python conciliacion_stock.py --empresa-id 1             # reporte CSV por stdout
+    python conciliacion_stock.py --empresa-id 1 --corregir  # además inserta los AJUSTE
+"""
+import argparse
+import asyncio
+import csv
+import logging
+import os
+import sys
+from pathlib import Path
+
+from sqlalchemy import select, insert, func, literal, union_all
+
+ROOT_DIR = Path(__file__).parent
+logger = logging.getLogger(__name__)
+
+TAMANO_LOTE = 1000
+REFERENCIA_AJUSTE = 'conciliacion'
+
+
+def consulta_diferencias(empresa_id: int, almacen_id: int = None):
+    """(producto_id, almacen_id, ledger, actual) donde el ledger no coincide con StockActual"""
+    from models import MovimientoStock, StockActual, Producto
+
+    filtros_mov = [Producto.empresa_id == empresa_id]
+    filtros_stock = [Producto.empresa_id == empresa_id]
+    if almacen_id:
+        filtros_mov.append(MovimientoStock.almacen_id == almacen_id)
+        filtros_stock.append(StockActual.almacen_id == almacen_id)
+
+    filas = union_all(
+        select(
+            MovimientoStock.producto_id, MovimientoStock.almacen_id,
+            MovimientoStock.cantidad.label('ledger'), literal(0).label('actual')
+        )
+        .join(Producto, MovimientoStock.producto_id == Producto.id)
+        .where(*filtros_mov),
+        select(
+            StockActual.producto_id, StockActual.almacen_id,
+            literal(0), func.coalesce(StockActual.cantidad, 0)
+        )
+        .join(Producto, StockActual.producto_id == Producto.id)
+        .where(*filtros_stock),
+    ).subquery()
+    ledger = func.sum(filas.c.ledger)
+    actual = func.sum(filas.c.actual)
+    return (
+        select(filas.c.producto_id, filas.c.almacen_id, ledger.label('ledger'), actual.label('actual'))
+        .group_by(filas.c.producto_id, filas.c.almacen_id)
+        .having(ledger != actual)
+        .order_by(filas.c.producto_id, filas.c.almacen_id)
+    )
+
+
+async def conciliar(session, empresa_id: int, almacen_id: int = None, corregir: bool = False,
+                    tamano_lote: int = TAMANO_LOTE):
+    """Genera un dict por diferencia; con `corregir` inserta los AJUSTE en lotes
+
+    La lectura va por un cursor en streaming, así la memoria no depende del
+    tamaño del catálogo. Los AJUSTE se insertan por lotes en la misma
+    transacción y se confirman todos juntos al final.
+    """
+    from models import MovimientoStock, TipoMovimientoStock
+
+    lote = []
+
+    async def insertar_lote():
+        await session.execute(insert(MovimientoStock), [
+            {
+                'producto_id': d['producto_id'], 'almacen_id': d['almacen_id'],
+                'tipo': TipoMovimientoStock.AJUSTE, 'cantidad': d['diferencia'],
+                'referencia_tipo': REFERENCIA_AJUSTE,
+            }
+            for d in lote
+        ])
+        lote.clear()
+
+    resultado = await session.stream(
+        consulta_diferencias(empresa_id, almacen_id).execution_options(yield_per=tamano_lote)
+    )
+    async for producto_id, alm_id, ledger, actual in resultado:
+        diferencia = {
+            'producto_id': producto_id,
+            'almacen_id': alm_id,
+            'ledger': int(ledger),
+            'actual': int(actual),
+            'diferencia': int(actual) - int(ledger),
+        }
+        yield diferencia
+        if corregir:
+            lote.append(diferencia)
+            if len(lote) >= tamano_lote:
+                await insertar_lote()
+    if corregir:
+        if lote:
+            await insertar_lote()
+        await session.commit()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Conciliación de StockActual contra movimientos_stock')
+    parser.add_argument('--empresa-id', type=int, required=True)
+    parser.add_argument('--almacen-id', type=int)
+    parser.add_argument('--corregir', action='store_true', help='Insertar movimientos AJUSTE por cada diferencia')
+    parser.add_argument('--database-url', help='Base destino (por defecto DATABASE_URL o .env)')
+    args = parser.parse_args(argv)
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    sys.path.insert(0, str(ROOT_DIR))
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s', stream=sys.stderr)
+
+    from database import async_session_maker, dispose_engines
+
+    async def _principal():
+        writer = csv.writer(sys.stdout)
+        writer.writerow(['producto_id', 'almacen_id', 'ledger', 'actual', 'diferencia'])
+        total = 0
+        try:
+            async with async_session_maker() as session:
+                async for d in conciliar(session, args.empresa_id, args.almacen_id, args.corregir):
+                    writer.writerow(d.values())
+                    total += 1
+        finally:
+            await dispose_engines()
+        logger.info(f"{total} diferencias{' corregidas' if args.corregir else ''}")
+
+    asyncio.run(_principal())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""
+Confirmación de ventas en lote (opcional, CONFIRMACION_EN_LOTE=true).
+
+En el camino directo cada POST /ventas/{id}/confirmar abre su transacción y
+compite con las demás por las mismas filas de stock_actual y clientes; bajo
+carga eso son esperas de locks y un commit por venta. En modo en lote cada
+empresa tiene una cola y un worker en proceso: el worker toma lo acumulado
+(hasta TAMANO_MAXIMO), aplica cada venta en orden de llegada dentro de un
+SAVEPOINT propio y confirma todo con un solo commit. Si una venta falla solo
+se deshace su savepoint y esa petición recibe el error; las demás siguen.
+
+Las colas viven en el proceso: con varios workers de uvicorn cada uno agrupa
+lo suyo y la base sigue siendo la que serializa entre procesos.
+"""
+import asyncio
+import logging
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+TAMANO_MAXIMO = 50
+
+
+class ConfirmadorVentas:
+    """Una cola y un worker por empresa
+
+    `aplicar(session, venta_id)` hace la confirmación sin commit y devuelve la
+    venta; `al_confirmar(venta)` corre después del commit (métricas).
+    """
+
+    def __init__(self, session_maker, aplicar, al_confirmar=None, tamano_maximo: int = TAMANO_MAXIMO):
+        self.session_maker = session_maker
+        self.aplicar = aplicar
+        self.al_confirmar = al_confirmar
+        self.tamano_maximo = tamano_maximo
+        self.colas = {}
+        self.workers = {}
+
+    async def confirmar(self, empresa_id: int, venta_id: int):
+        """Encola la venta y espera a que el worker de la empresa la confirme"""
+        cola = self.colas.get(empresa_id)
+        if cola is None:
+            cola = self.colas[empresa_id] = asyncio.Queue()
+        worker = self.workers.get(empresa_id)
+        if worker is None or worker.done():
+            self.workers[empresa_id] = asyncio.create_task(self._trabajar(cola))
+        futuro = asyncio.get_running_loop().create_future()
+        await cola.put((venta_id, futuro))
+        return await futuro
+
+    async def detener(self):
+        for worker in self.workers.values():
+            worker.cancel()
+        await asyncio.gather(*self.workers.values(), return_exceptions=True)
+        self.workers.clear()
+        for cola in self.colas.values():
+            while not cola.empty():
+                _, futuro = cola.get_nowait()
+                if not futuro.done():
+                    futuro.cancel()
+        self.colas.clear()
+
+    async def _trabajar(self, cola: asyncio.Queue):
+        while True:
+            lote = [await cola.get()]
+            while len(lote) < self.tamano_maximo and not cola.empty():
+                lote.append(cola.get_nowait())
+            try:
+                await self._procesar(lote)
+            except asyncio.CancelledError:
+                for _, futuro in lote:
+                    if not futuro.done():
+                        futuro.cancel()
+                raise
+            except Exception as e:
+                logger.exception("Error confirmando lote de ventas")
+                for _, futuro in lote:
+                    self._fallar(futuro, e)
+
+    async def _procesar(self, lote):
+        """Un SAVEPOINT por venta y un commit para todo el lote"""
+        confirmadas = []
+        async with self.session_maker() as session:
+            for venta_id, futuro in lote:
+                if futuro.cancelled():
+                    continue
+                try:
+                    async with session.begin_nested():
+                        venta = await self.aplicar(session, venta_id)
+                except Exception as e:
+                    self._fallar(futuro, e)
+                    continue
+                confirmadas.append((venta, futuro))
+            try:
+                await session.commit()
+            except Exception:
+                # El commit del lote falló: cada venta vuelve a intentarse sola
+                logger.exception(f"Commit de lote fallido ({len(confirmadas)} ventas), reintento individual")
+                await session.rollback()
+                await self._procesar_individual(confirmadas)
+                return
+        if confirmadas:
+            metrics.CONFIRMACION_LOTE.observe(len(confirmadas))
+        for venta, futuro in confirmadas:
+            self._resolver(venta, futuro)
+
+    async def _procesar_individual(self, confirmadas):
+        for venta_previa, futuro in confirmadas:
+            async with self.session_maker() as session:
+                try:
+                    venta = await self.aplicar(session, venta_previa.id)
+                    await session.commit()
+                except Exception as e:
+                    await session.rollback()
+                    self._fallar(futuro, e)
+                    continue
+            metrics.CONFIRMACION_LOTE.observe(1)
+            self._resolver(venta, futuro)
+
+    def _fallar(self, futuro, error):
+        if not futuro.done():
+            futuro.set_exception(error)
+
+    def _resolver(self, venta, futuro):
+        if self.al_confirmar:
+            self.al_confirmar(venta)
+        if not futuro.done():
+            futuro.set_result(venta)
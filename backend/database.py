@@ -1,4 +1,5 @@
 import os
+import asyncio
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
 from dotenv import load_dotenv
@@ -7,34 +8,77 @@ from pathlib import Path
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+def normalizar_url(url):
+    """Convierte URLs postgres:// de Render al driver async"""
+    if url.startswith('postgres://'):
+        return url.replace('postgres://', 'postgresql+asyncpg://', 1)
+    if url.startswith('postgresql://'):
+        return url.replace('postgresql://', 'postgresql+asyncpg://', 1)
+    return url
+
 # Database URL - support both PostgreSQL and SQLite for development
 DATABASE_URL = os.environ.get('DATABASE_URL')
 
 if DATABASE_URL:
     # PostgreSQL async URL
-    if DATABASE_URL.startswith('postgres://'):
-        DATABASE_URL = DATABASE_URL.replace('postgres://', 'postgresql+asyncpg://', 1)
-    elif DATABASE_URL.startswith('postgresql://'):
-        DATABASE_URL = DATABASE_URL.replace('postgresql://', 'postgresql+asyncpg://', 1)
+    DATABASE_URL = normalizar_url(DATABASE_URL)
 else:
     # Default to SQLite for local development
     DATABASE_URL = "sqlite+aiosqlite:///./luzbrill.db"
 
+# Optional read replica for listings and reports. Without it reads use the primary.
+READ_DATABASE_URL = os.environ.get('READ_DATABASE_URL')
+if READ_DATABASE_URL:
+    READ_DATABASE_URL = normalizar_url(READ_DATABASE_URL)
+
+# Migraciones al arrancar: por defecto solo con SQLite (desarrollo). En producción
+# `alembic upgrade head` corre antes de uvicorn (ver Procfile / render.yaml).
+MIGRATE_ON_STARTUP = os.environ.get(
+    'MIGRATE_ON_STARTUP', 'true' if DATABASE_URL.startswith('sqlite') else 'false'
+).lower() in ('1', 'true', 'yes')
+
 engine = create_async_engine(
     DATABASE_URL,
     echo=False,
     future=True
 )
 
+if READ_DATABASE_URL and READ_DATABASE_URL != DATABASE_URL:
+    read_engine = create_async_engine(
+        READ_DATABASE_URL,
+        echo=False,
+        future=True
+    )
+else:
+    read_engine = engine
+
 async_session_maker = async_sessionmaker(
     engine,
     class_=AsyncSession,
     expire_on_commit=False
 )
 
+if read_engine is engine:
+    async_read_session_maker = async_session_maker
+else:
+    async_read_session_maker = async_sessionmaker(
+        read_engine,
+        class_=AsyncSession,
+        expire_on_commit=False,
+        autoflush=False
+    )
+
 class Base(DeclarativeBase):
     pass
 
+def insert_dialecto(modelo, bind):
+    """INSERT con ON CONFLICT del dialecto (PostgreSQL y SQLite lo soportan)"""
+    if bind.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(modelo)
+
 async def get_db():
     async with async_session_maker() as session:
         try:
@@ -42,6 +86,42 @@ async def get_db():
         finally:
             await session.close()
 
+async def get_read_db():
+    """Sesión de solo lectura: réplica si está configurada, si no el primario"""
+    async with async_read_session_maker() as session:
+        try:
+            yield session
+        finally:
+            await session.close()
+
+def configuracion_alembic(url=None):
+    from alembic.config import Config
+
+    config = Config(str(ROOT_DIR / 'alembic.ini'))
+    config.attributes['configurar_logging'] = False
+    if url:
+        config.attributes['url'] = url
+    return config
+
+def migrar_esquema(revision='head', url=None):
+    """Aplica las migraciones de Alembic (bloqueante: usa su propio event loop)"""
+    from alembic import command
+
+    command.upgrade(configuracion_alembic(url), revision)
+
+def reiniciar_esquema(url=None):
+    """Baja todas las migraciones y las vuelve a aplicar: borra todos los datos (bloqueante)"""
+    from alembic import command
+
+    config = configuracion_alembic(url)
+    command.downgrade(config, 'base')
+    command.upgrade(config, 'head')
+
 async def init_db():
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    """Lleva el esquema a la última migración; con la base al día solo lee alembic_version"""
+    await asyncio.to_thread(migrar_esquema)
+
+async def dispose_engines():
+    await engine.dispose()
+    if read_engine is not engine:
+        await read_engine.dispose()
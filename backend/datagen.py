@@ -0,0 +1,585 @@
+"""
+Generador de datos sintéticos a escala de producción.
+
+Carga empresas completas (catálogo, stock en varios almacenes, ventas con
+ítems y movimientos, créditos con pagos parciales, deudas a proveedores,
+entregas e historial de sueldos) con inserts masivos: `COPY` en PostgreSQL
+(asyncpg) y `insert()` executemany de Core en el resto. Con la misma semilla
+y la misma --fecha-fin el resultado es idéntico.
+
+El libro de movimientos es consistente con StockActual: el stock de cada
+(producto, almacén) es la suma de sus movimientos.
+
+    python datagen.py --empresas 2 --productos 50000 --ventas 1000000 --semilla 42
+    python datagen.py --database-url postgresql://localhost/luzbrill_perf --fecha-fin 2026-06-30
+"""
+import argparse
+import asyncio
+import calendar
+import enum
+import logging
+import os
+import random
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass, asdict
+from datetime import datetime, date, timezone, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent
+
+logger = logging.getLogger('datagen')
+
+CHUNK_VENTAS = 10000
+PASSWORD_ADMIN = 'admin123'
+
+CATEGORIAS = ['Pinturas', 'Herramientas', 'Materiales', 'Accesorios', 'Electricidad', 'Plomería',
+              'Ferretería', 'Jardín', 'Iluminación', 'Adhesivos']
+MARCAS = ['Alba', 'Sherwin Williams', 'Sinteplast', 'Tersuave', '3M', 'Tigre', 'Stanley', 'Bosch',
+          'Philips', 'Loctite', 'Tramontina', 'Makita']
+NOMBRES = ['Juan', 'María', 'Carlos', 'Ana', 'Luis', 'Rosa', 'Pedro', 'Lucía', 'Jorge', 'Carmen',
+           'Miguel', 'Elena', 'Diego', 'Sofía', 'Raúl', 'Laura']
+APELLIDOS = ['González', 'Benítez', 'Martínez', 'López', 'Giménez', 'Vera', 'Ramírez', 'Duarte',
+             'Acosta', 'Ortiz', 'Rojas', 'Báez', 'Cabrera', 'Franco']
+CARGOS = ['Vendedor', 'Cajero', 'Repartidor', 'Depósito', 'Administración']
+PESOS_TIPO_PAGO = {'EFECTIVO': 50, 'TARJETA': 20, 'TRANSFERENCIA': 15, 'CHEQUE': 5, 'CREDITO': 10}
+
+
+@dataclass
+class Volumenes:
+    """Totales a generar; los volúmenes se reparten entre las empresas"""
+    empresas: int = 1
+    productos: int = 50000
+    clientes: int = 10000
+    ventas: int = 1000000
+    borradores: int = 0
+    almacenes: int = 3
+    proveedores: int = 50
+    funcionarios: int = 40
+    vehiculos: int = 3
+    meses: int = 24
+
+
+def repartir(total, partes):
+    """Divide `total` en `partes` enteros que suman exactamente `total`"""
+    base, resto = divmod(total, partes)
+    return [base + (1 if i < resto else 0) for i in range(partes)]
+
+
+def _valor_copy(valor):
+    return valor.name if isinstance(valor, enum.Enum) else valor
+
+
+class Escritor:
+    """Inserta filas por tabla: COPY con asyncpg, executemany con el resto de drivers"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.usar_copy = conn.dialect.name == 'postgresql' and conn.dialect.driver == 'asyncpg'
+        self.filas = Counter()
+
+    async def escribir(self, tabla, filas):
+        from sqlalchemy import insert
+
+        if not filas:
+            return
+        if self.usar_copy:
+            columnas = list(filas[0])
+            raw = await self.conn.get_raw_connection()
+            await raw.driver_connection.copy_records_to_table(
+                tabla.name,
+                records=[tuple(_valor_copy(f[c]) for c in columnas) for f in filas],
+                columns=columnas
+            )
+        else:
+            await self.conn.execute(insert(tabla), filas)
+        self.filas[tabla.name] += len(filas)
+
+    async def ajustar_secuencias(self, tablas):
+        """Con ids explícitos, PostgreSQL no avanza las secuencias SERIAL"""
+        from sqlalchemy import text
+
+        if self.conn.dialect.name != 'postgresql':
+            return
+        for tabla in tablas:
+            if 'id' in tabla.c and tabla.c.id.autoincrement:
+                await self.conn.execute(text(
+                    f"SELECT setval(pg_get_serial_sequence('{tabla.name}', 'id'), "
+                    f"(SELECT COALESCE(MAX(id), 1) FROM {tabla.name}))"
+                ))
+
+
+class Generador:
+    def __init__(self, escritor, volumenes, semilla, fecha_fin):
+        import models
+        import saldo_credito
+
+        self.m = models
+        self.saldo_credito = saldo_credito
+        self.escritor = escritor
+        self.vol = volumenes
+        self.rng = random.Random(semilla)
+        self.fin = datetime.combine(fecha_fin, datetime.min.time(), tzinfo=timezone.utc) + timedelta(hours=20)
+        self.inicio = self.fin - timedelta(days=30 * volumenes.meses)
+        self.ids = {}
+        self.password_hash = None
+
+    def tabla(self, modelo):
+        return modelo.__table__
+
+    async def _preparar_ids(self):
+        from sqlalchemy import select, func
+
+        for tabla in self.m.Base.metadata.sorted_tables:
+            if 'id' in tabla.c and tabla.c.id.autoincrement:
+                maximo = (await self.escritor.conn.execute(select(func.max(tabla.c.id)))).scalar()
+                self.ids[tabla.name] = (maximo or 0) + 1
+
+    def _nuevos_ids(self, modelo, cantidad):
+        nombre = modelo.__tablename__
+        primero = self.ids[nombre]
+        self.ids[nombre] += cantidad
+        return list(range(primero, primero + cantidad))
+
+    def _fecha_aleatoria(self, desde=None, hasta=None):
+        desde = desde or self.inicio
+        hasta = hasta or self.fin
+        return desde + timedelta(seconds=self.rng.randrange(max(1, int((hasta - desde).total_seconds()))))
+
+    async def _commit(self):
+        await self.escritor.conn.commit()
+
+    async def generar(self):
+        await self._preparar_ids()
+        if self.password_hash is None:
+            import bcrypt
+            self.password_hash = bcrypt.hashpw(PASSWORD_ADMIN.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+
+        empresas = []
+        partes = {campo: repartir(getattr(self.vol, campo), self.vol.empresas)
+                  for campo in ('productos', 'clientes', 'ventas', 'borradores')}
+        for n in range(self.vol.empresas):
+            empresas.append(await self._generar_empresa(
+                n, partes['productos'][n], partes['clientes'][n], partes['ventas'][n], partes['borradores'][n]
+            ))
+        await self.escritor.ajustar_secuencias(self.m.Base.metadata.sorted_tables)
+        await self._commit()
+        return empresas
+
+    async def _generar_empresa(self, n, productos, clientes, ventas, borradores):
+        m, rng, escribir = self.m, self.rng, self.escritor.escribir
+        [empresa_id] = self._nuevos_ids(m.Empresa, 1)
+        await escribir(self.tabla(m.Empresa), [{
+            'id': empresa_id, 'nombre': f'Empresa Sintética {n + 1}', 'ruc': f'DG{empresa_id}-{n + 1}',
+            'direccion': 'Asunción, Paraguay', 'email': f'contacto{empresa_id}@datagen.luzbrill.com',
+            'estado': True, 'creado_en': self.inicio
+        }])
+
+        # Usuarios: un admin con credenciales conocidas y vendedores
+        usuario_ids = self._nuevos_ids(m.Usuario, 6)
+        await escribir(self.tabla(m.Usuario), [{
+            'id': u, 'empresa_id': empresa_id,
+            'email': f'admin{empresa_id}@datagen.luzbrill.com' if i == 0 else f'vendedor{u}@datagen.luzbrill.com',
+            'password_hash': self.password_hash, 'nombre': 'Administrador' if i == 0 else rng.choice(NOMBRES),
+            'apellido': rng.choice(APELLIDOS), 'activo': True, 'creado_en': self.inicio
+        } for i, u in enumerate(usuario_ids)])
+        await self._generar_rol_admin(empresa_id, usuario_ids[0])
+
+        almacen_ids = self._nuevos_ids(m.Almacen, self.vol.almacenes)
+        await escribir(self.tabla(m.Almacen), [
+            {'id': a, 'empresa_id': empresa_id, 'nombre': 'Depósito Principal' if i == 0 else f'Sucursal {i}'}
+            for i, a in enumerate(almacen_ids)
+        ])
+        categoria_ids = self._nuevos_ids(m.Categoria, len(CATEGORIAS))
+        await escribir(self.tabla(m.Categoria), [
+            {'id': c, 'empresa_id': empresa_id, 'nombre': nombre} for c, nombre in zip(categoria_ids, CATEGORIAS)
+        ])
+        marca_ids = self._nuevos_ids(m.Marca, len(MARCAS))
+        await escribir(self.tabla(m.Marca), [
+            {'id': c, 'empresa_id': empresa_id, 'nombre': nombre} for c, nombre in zip(marca_ids, MARCAS)
+        ])
+
+        catalogo = await self._generar_catalogo(empresa_id, productos, categoria_ids, marca_ids)
+        await self._generar_proveedores(empresa_id, catalogo)
+        cliente_ids, con_credito = await self._generar_clientes(empresa_id, clientes)
+        vehiculo_ids = await self._generar_vehiculos(empresa_id)
+        await self._commit()
+
+        stock = await self._generar_stock_inicial(catalogo, almacen_ids)
+        await self._commit()
+        borrador_ids = await self._generar_ventas(
+            empresa_id, ventas, borradores, catalogo, stock, cliente_ids, con_credito, usuario_ids, vehiculo_ids
+        )
+        await self._generar_stock_actual(stock)
+        await self.saldo_credito.recalcular_credito_usado(self.escritor.conn, empresa_id)
+        await self._generar_sueldos(empresa_id)
+        await self._commit()
+        logger.info(f"Empresa {empresa_id}: {productos} productos, {ventas} ventas")
+
+        return {
+            'id': empresa_id,
+            'admin_email': f'admin{empresa_id}@datagen.luzbrill.com',
+            'almacenes': almacen_ids,
+            'codigos': [p['codigo_barra'] for p in catalogo],
+            'borradores': borrador_ids,
+        }
+
+    async def _generar_rol_admin(self, empresa_id, usuario_id):
+        from sqlalchemy import select
+
+        m = self.m
+        [rol_id] = self._nuevos_ids(m.Rol, 1)
+        await self.escritor.escribir(self.tabla(m.Rol), [
+            {'id': rol_id, 'empresa_id': empresa_id, 'nombre': 'ADMIN', 'descripcion': 'Rol ADMIN'}
+        ])
+        permisos = (await self.escritor.conn.execute(select(m.Permiso.id).order_by(m.Permiso.id))).scalars().all()
+        await self.escritor.escribir(self.tabla(m.RolPermiso), [{'rol_id': rol_id, 'permiso_id': p} for p in permisos])
+        await self.escritor.escribir(self.tabla(m.UsuarioRol), [{'usuario_id': usuario_id, 'rol_id': rol_id}])
+
+    async def _generar_catalogo(self, empresa_id, cantidad, categoria_ids, marca_ids):
+        rng = self.rng
+        hoy = self.fin.date()
+        catalogo = []
+        for i, p in enumerate(self._nuevos_ids(self.m.Producto, cantidad)):
+            catalogo.append({
+                'id': p, 'empresa_id': empresa_id,
+                'categoria_id': rng.choice(categoria_ids), 'marca_id': rng.choice(marca_ids),
+                'nombre': f'{rng.choice(CATEGORIAS)} {rng.choice(MARCAS)} #{i + 1}',
+                'codigo_barra': f'{empresa_id:04d}{i + 1:09d}',
+                'precio_venta': Decimal(rng.randrange(2000, 800000, 500)),
+                'fecha_vencimiento': hoy + timedelta(days=rng.randrange(-30, 720)) if rng.random() < 0.2 else None,
+                'activo': rng.random() > 0.02,
+            })
+        for i in range(0, len(catalogo), CHUNK_VENTAS):
+            await self.escritor.escribir(self.tabla(self.m.Producto), catalogo[i:i + CHUNK_VENTAS])
+        return catalogo
+
+    async def _generar_proveedores(self, empresa_id, catalogo):
+        m, rng = self.m, self.rng
+        proveedor_ids = self._nuevos_ids(m.Proveedor, self.vol.proveedores)
+        await self.escritor.escribir(self.tabla(m.Proveedor), [{
+            'id': p, 'empresa_id': empresa_id, 'nombre': f'Proveedor {rng.choice(MARCAS)} {i + 1}',
+            'ruc': f'{rng.randrange(10**6, 10**7)}-{rng.randrange(10)}', 'estado': True, 'creado_en': self.inicio
+        } for i, p in enumerate(proveedor_ids)])
+
+        ids = self._nuevos_ids(m.ProveedorProducto, len(catalogo))
+        filas = [{
+            'id': i, 'proveedor_id': rng.choice(proveedor_ids), 'producto_id': p['id'],
+            'costo': (p['precio_venta'] * Decimal(rng.randrange(55, 80)) / 100).quantize(Decimal('1'))
+        } for i, p in zip(ids, catalogo)]
+        for i in range(0, len(filas), CHUNK_VENTAS):
+            await self.escritor.escribir(self.tabla(m.ProveedorProducto), filas[i:i + CHUNK_VENTAS])
+
+        # Una factura de compra por proveedor y mes; las de los últimos 2 meses quedan pendientes
+        deudas = []
+        for proveedor_id in proveedor_ids:
+            for mes in range(self.vol.meses):
+                emision = (self.inicio + timedelta(days=30 * mes + rng.randrange(30))).date()
+                pendiente = mes >= self.vol.meses - 2 or rng.random() < 0.03
+                deudas.append({
+                    'proveedor_id': proveedor_id, 'monto': Decimal(rng.randrange(500000, 50000000, 1000)),
+                    'descripcion': f'Factura de compra {mes + 1}', 'fecha_emision': emision,
+                    'fecha_limite': emision + timedelta(days=rng.choice((30, 60, 90))),
+                    'fecha_pago': None if pendiente else emision + timedelta(days=rng.randrange(5, 60)),
+                    'pagado': not pendiente,
+                    'creado_en': datetime.combine(emision, datetime.min.time(), tzinfo=timezone.utc),
+                })
+        for deuda, i in zip(deudas, self._nuevos_ids(m.DeudaProveedor, len(deudas))):
+            deuda['id'] = i
+        await self.escritor.escribir(self.tabla(m.DeudaProveedor), deudas)
+
+    async def _generar_clientes(self, empresa_id, cantidad):
+        rng = self.rng
+        filas = []
+        con_credito = []
+        ids = self._nuevos_ids(self.m.Cliente, max(cantidad, 1))
+        for i, c in enumerate(ids):
+            credito = i > 0 and rng.random() < 0.3
+            if credito:
+                con_credito.append(c)
+            filas.append({
+                'id': c, 'empresa_id': empresa_id,
+                'nombre': 'Cliente' if i == 0 else rng.choice(NOMBRES),
+                'apellido': 'Ocasional' if i == 0 else rng.choice(APELLIDOS),
+                'ruc': '00000000-0' if i == 0 else f'{rng.randrange(10**6, 10**7)}-{rng.randrange(10)}',
+                'acepta_cheque': rng.random() < 0.2,
+                'descuento_porcentaje': Decimal(rng.choice((0, 0, 0, 5, 10))),
+                'limite_credito': Decimal(rng.randrange(1, 50) * 1000000) if credito else Decimal('0'),
+                'estado': True, 'creado_en': self._fecha_aleatoria(),
+            })
+        for i in range(0, len(filas), CHUNK_VENTAS):
+            await self.escritor.escribir(self.tabla(self.m.Cliente), filas[i:i + CHUNK_VENTAS])
+        return ids, con_credito or ids[:1]
+
+    async def _generar_vehiculos(self, empresa_id):
+        m, rng = self.m, self.rng
+        ids = self._nuevos_ids(m.Vehiculo, self.vol.vehiculos)
+        await self.escritor.escribir(self.tabla(m.Vehiculo), [{
+            'id': v, 'empresa_id': empresa_id, 'tipo': rng.choice(list(m.TipoVehiculo)),
+            'chapa': f'{chr(65 + rng.randrange(26))}{chr(65 + rng.randrange(26))}{chr(65 + rng.randrange(26))} {rng.randrange(100, 999)}',
+            'vencimiento_habilitacion': self.fin.date() + timedelta(days=rng.randrange(-30, 365)),
+            'vencimiento_cedula_verde': self.fin.date() + timedelta(days=rng.randrange(-30, 365)),
+        } for v in ids])
+        return ids
+
+    async def _generar_stock_inicial(self, catalogo, almacen_ids):
+        """Inventario inicial como ENTRADAs al comienzo del período; devuelve el stock en memoria"""
+        m, rng = self.m, self.rng
+        stock = {}
+        movimientos = []
+        for p in catalogo:
+            almacenes = [a for a in almacen_ids if rng.random() < 0.7] or [almacen_ids[0]]
+            for a in almacenes:
+                cantidad = rng.randrange(20, 300)
+                stock[(p['id'], a)] = cantidad
+                movimientos.append({
+                    'producto_id': p['id'], 'almacen_id': a, 'tipo': m.TipoMovimientoStock.ENTRADA,
+                    'cantidad': cantidad, 'referencia_tipo': 'inventario_inicial', 'referencia_id': None,
+                    'creado_en': self.inicio,
+                })
+        await self._escribir_movimientos(movimientos)
+        return stock
+
+    async def _escribir_movimientos(self, movimientos):
+        for mov, i in zip(movimientos, self._nuevos_ids(self.m.MovimientoStock, len(movimientos))):
+            mov['id'] = i
+        for i in range(0, len(movimientos), CHUNK_VENTAS * 2):
+            await self.escritor.escribir(self.tabla(self.m.MovimientoStock), movimientos[i:i + CHUNK_VENTAS * 2])
+
+    async def _generar_ventas(self, empresa_id, ventas, borradores, catalogo, stock, cliente_ids, con_credito,
+                              usuario_ids, vehiculo_ids):
+        """Ventas en orden cronológico, en lotes de CHUNK_VENTAS por transacción"""
+        m, rng = self.m, self.rng
+        tipos_pago = list(PESOS_TIPO_PAGO)
+        pesos = list(PESOS_TIPO_PAGO.values())
+        almacenes_de = {}
+        for (p, a) in stock:
+            almacenes_de.setdefault(p, []).append(a)
+        paso = (self.fin - self.inicio) / max(ventas, 1)
+        borrador_ids = []
+
+        total = ventas + borradores
+        for inicio_lote in range(0, total, CHUNK_VENTAS):
+            n_lote = min(CHUNK_VENTAS, total - inicio_lote)
+            venta_ids = self._nuevos_ids(m.Venta, n_lote)
+            filas_ventas, filas_items, movimientos, creditos, pagos, entregas = [], [], [], [], [], []
+            for offset, venta_id in enumerate(venta_ids):
+                n = inicio_lote + offset
+                confirmada = n < ventas
+                creado_en = self.inicio + paso * n + timedelta(seconds=rng.randrange(60)) if confirmada else self.fin
+                tipo_pago = m.TipoPago[rng.choices(tipos_pago, pesos)[0]]
+                cliente_id = rng.choice(con_credito if tipo_pago == m.TipoPago.CREDITO else cliente_ids)
+                total_venta = Decimal('0')
+
+                for _ in range(rng.choice((1, 1, 2, 2, 3, 4))):
+                    # Popularidad sesgada: pocos productos concentran la mayoría de las ventas
+                    producto = catalogo[int(len(catalogo) * rng.random() ** 3)]
+                    cantidad = rng.choice((1, 1, 1, 2, 2, 3, 5))
+                    item_total = producto['precio_venta'] * cantidad
+                    total_venta += item_total
+                    filas_items.append({
+                        'venta_id': venta_id, 'producto_id': producto['id'], 'cantidad': cantidad,
+                        'precio_unitario': producto['precio_venta'], 'total': item_total,
+                    })
+                    if confirmada:
+                        movimientos.extend(self._descontar(stock, almacenes_de, producto['id'], cantidad,
+                                                           venta_id, creado_en))
+
+                filas_ventas.append({
+                    'id': venta_id, 'empresa_id': empresa_id, 'cliente_id': cliente_id,
+                    'usuario_id': rng.choice(usuario_ids), 'total': total_venta,
+                    'iva': (total_venta / 11).quantize(Decimal('0.01')), 'descuento': Decimal('0'),
+                    'tipo_pago': tipo_pago, 'es_delivery': bool(vehiculo_ids) and rng.random() < 0.1,
+                    'estado': m.EstadoVenta.CONFIRMADA if confirmada else m.EstadoVenta.BORRADOR,
+                    'creado_en': creado_en,
+                })
+                if not confirmada:
+                    borrador_ids.append(venta_id)
+                    continue
+                if tipo_pago == m.TipoPago.CREDITO:
+                    creditos.append(self._credito(venta_id, cliente_id, total_venta, creado_en, pagos))
+                if filas_ventas[-1]['es_delivery']:
+                    reciente = self.fin - creado_en < timedelta(days=2)
+                    entregas.append({
+                        'venta_id': venta_id, 'vehiculo_id': rng.choice(vehiculo_ids),
+                        'responsable_usuario_id': rng.choice(usuario_ids),
+                        'fecha_entrega': creado_en + timedelta(hours=rng.randrange(2, 48)),
+                        'estado': m.EstadoEntrega.PENDIENTE if reciente else m.EstadoEntrega.ENTREGADO,
+                    })
+
+            for filas, modelo in ((filas_items, m.VentaItem), (creditos, m.CreditoCliente),
+                                  (pagos, m.PagoCredito), (entregas, m.Entrega)):
+                ids = self._nuevos_ids(modelo, len(filas))
+                for fila, i in zip(filas, ids):
+                    fila['id'] = i
+            for pago in pagos:
+                pago['credito_id'] = pago.pop('credito')['id']
+            await self.escritor.escribir(self.tabla(m.Venta), filas_ventas)
+            await self.escritor.escribir(self.tabla(m.VentaItem), filas_items)
+            await self._escribir_movimientos(movimientos)
+            await self.escritor.escribir(self.tabla(m.CreditoCliente), creditos)
+            await self.escritor.escribir(self.tabla(m.PagoCredito), pagos)
+            await self.escritor.escribir(self.tabla(m.Entrega), entregas)
+            await self._commit()
+            logger.info(f"Empresa {empresa_id}: {inicio_lote + n_lote}/{total} ventas")
+        return borrador_ids
+
+    def _descontar(self, stock, almacenes_de, producto_id, cantidad, venta_id, creado_en):
+        """SALIDA desde el almacén con stock; si no alcanza, una compra de reposición antes"""
+        m, rng = self.m, self.rng
+        almacenes = almacenes_de[producto_id]
+        almacen_id = next((a for a in almacenes if stock[(producto_id, a)] >= cantidad), None)
+        movimientos = []
+        if almacen_id is None:
+            almacen_id = almacenes[0]
+            reposicion = cantidad + rng.randrange(50, 300)
+            stock[(producto_id, almacen_id)] += reposicion
+            movimientos.append({
+                'producto_id': producto_id, 'almacen_id': almacen_id, 'tipo': m.TipoMovimientoStock.ENTRADA,
+                'cantidad': reposicion, 'referencia_tipo': 'compra', 'referencia_id': None,
+                'creado_en': creado_en - timedelta(hours=1),
+            })
+        stock[(producto_id, almacen_id)] -= cantidad
+        movimientos.append({
+            'producto_id': producto_id, 'almacen_id': almacen_id, 'tipo': m.TipoMovimientoStock.SALIDA,
+            'cantidad': -cantidad, 'referencia_tipo': 'venta', 'referencia_id': venta_id, 'creado_en': creado_en,
+        })
+        return movimientos
+
+    def _credito(self, venta_id, cliente_id, total, creado_en, pagos):
+        """Crédito de la venta con 0 a 3 pagos parciales; los más viejos suelen estar saldados"""
+        rng = self.rng
+        credito = {
+            'cliente_id': cliente_id, 'venta_id': venta_id, 'monto_original': total,
+            'descripcion': f'Venta #{venta_id}', 'fecha_venta': creado_en.date(), 'creado_en': creado_en,
+        }
+        antiguedad = (self.fin - creado_en).days
+        pendiente = total
+        fecha = creado_en
+        for _ in range(rng.randrange(4) if antiguedad > 15 else 0):
+            if pendiente <= 0:
+                break
+            saldar = antiguedad > 90 and rng.random() < 0.8
+            monto = pendiente if saldar else min(pendiente, (total * Decimal(rng.randrange(10, 60)) / 100).quantize(Decimal('1')))
+            fecha = fecha + timedelta(days=rng.randrange(5, 30))
+            if fecha >= self.fin:
+                break
+            pagos.append({'credito': credito, 'monto': monto, 'fecha_pago': fecha, 'observacion': None})
+            pendiente -= monto
+        credito['monto_pendiente'] = pendiente
+        credito['pagado'] = pendiente <= 0
+        return credito
+
+    async def _generar_stock_actual(self, stock):
+        m, rng = self.m, self.rng
+        claves = list(stock)
+        filas = [{
+            'id': i, 'producto_id': p, 'almacen_id': a, 'cantidad': stock[(p, a)],
+            'alerta_minima': rng.choice((None, None, 5, 10, 20)),
+        } for i, (p, a) in zip(self._nuevos_ids(m.StockActual, len(claves)), claves)]
+        for i in range(0, len(filas), CHUNK_VENTAS * 2):
+            await self.escritor.escribir(self.tabla(m.StockActual), filas[i:i + CHUNK_VENTAS * 2])
+
+    async def _generar_sueldos(self, empresa_id):
+        """Funcionarios con adelantos mensuales y un ciclo por mes cerrado (el último, sin pagar)"""
+        m, rng = self.m, self.rng
+        funcionario_ids = self._nuevos_ids(m.Funcionario, self.vol.funcionarios)
+        salarios = {f: Decimal(rng.randrange(2700000, 9000000, 50000)) for f in funcionario_ids}
+        await self.escritor.escribir(self.tabla(m.Funcionario), [{
+            'id': f, 'empresa_id': empresa_id, 'nombre': rng.choice(NOMBRES), 'apellido': rng.choice(APELLIDOS),
+            'cedula': str(rng.randrange(1000000, 7000000)), 'cargo': rng.choice(CARGOS),
+            'salario_base': salarios[f], 'ips': (salarios[f] * Decimal('0.09')).quantize(Decimal('1')),
+            'activo': rng.random() > 0.05,
+        } for f in funcionario_ids])
+
+        adelantos, ciclos = [], []
+        anio, mes = self.inicio.year, self.inicio.month
+        fin_mes_actual = (self.fin.year, self.fin.month)
+        while (anio, mes) <= fin_mes_actual:
+            primer_dia = date(anio, mes, 1)
+            ultimo_dia = date(anio, mes, calendar.monthrange(anio, mes)[1])
+            cerrado = (anio, mes) < fin_mes_actual
+            for f in funcionario_ids:
+                descuentos = Decimal('0')
+                for _ in range(rng.choice((0, 0, 1, 1, 2))):
+                    dia = rng.randrange(1, ultimo_dia.day + 1)
+                    momento = datetime(anio, mes, dia, 10, tzinfo=timezone.utc)
+                    if momento > self.fin:
+                        continue
+                    monto = Decimal(rng.randrange(100000, 1000000, 50000))
+                    descuentos += monto
+                    adelantos.append({'funcionario_id': f, 'monto': monto, 'creado_en': momento})
+                if cerrado:
+                    ultimo = (anio, mes) == self._mes_anterior(*fin_mes_actual)
+                    ciclos.append({
+                        'funcionario_id': f, 'periodo': f'{anio}-{mes:02d}',
+                        'fecha_inicio': primer_dia, 'fecha_fin': ultimo_dia,
+                        'salario_base': salarios[f], 'descuentos': descuentos,
+                        'salario_neto': salarios[f] - descuentos, 'pagado': not ultimo,
+                        'fecha_pago': None if ultimo else datetime.combine(ultimo_dia, datetime.min.time(), tzinfo=timezone.utc),
+                    })
+            anio, mes = (anio + 1, 1) if mes == 12 else (anio, mes + 1)
+
+        for filas, modelo in ((adelantos, m.AdelantoSalario), (ciclos, m.CicloSalario)):
+            for fila, i in zip(filas, self._nuevos_ids(modelo, len(filas))):
+                fila['id'] = i
+            await self.escritor.escribir(self.tabla(modelo), filas)
+
+    @staticmethod
+    def _mes_anterior(anio, mes):
+        return (anio - 1, 12) if mes == 1 else (anio, mes - 1)
+
+
+async def generar(engine, volumenes, semilla=42, fecha_fin=None):
+    """Genera los datos en `engine` (esquema ya migrado); devuelve un resumen por empresa"""
+    async with engine.connect() as conn:
+        escritor = Escritor(conn)
+        generador = Generador(escritor, volumenes, semilla, fecha_fin or date.today())
+        empresas = await generador.generar()
+    return {'empresas': empresas, 'filas': dict(escritor.filas)}
+
+
+def construir_parser():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--database-url', help='Base destino (por defecto DATABASE_URL o .env)')
+    defecto = Volumenes()
+    for campo, valor in asdict(defecto).items():
+        parser.add_argument(f"--{campo}", type=int, default=valor)
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--fecha-fin', type=date.fromisoformat, help='Último día de datos (por defecto hoy)')
+    parser.add_argument('--sin-migrar', action='store_true', help='No correr `alembic upgrade head` antes')
+    return parser
+
+
+def main(argv=None):
+    args = construir_parser().parse_args(argv)
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    sys.path.insert(0, str(ROOT_DIR))
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+
+    from database import engine, init_db, dispose_engines
+
+    volumenes = Volumenes(**{campo: getattr(args, campo) for campo in asdict(Volumenes())})
+
+    async def _principal():
+        try:
+            if not args.sin_migrar:
+                await init_db()
+            return await generar(engine, volumenes, args.semilla, args.fecha_fin)
+        finally:
+            await dispose_engines()
+
+    inicio = time.perf_counter()
+    resultado = asyncio.run(_principal())
+    for empresa in resultado['empresas']:
+        logger.info(f"Empresa {empresa['id']}: login {empresa['admin_email']} / {PASSWORD_ADMIN}")
+    for tabla, filas in sorted(resultado['filas'].items()):
+        logger.info(f"  {tabla}: {filas} filas")
+    logger.info(f"Listo en {time.perf_counter() - inicio:.1f} s")
+
+
+if __name__ == '__main__':
+    main()
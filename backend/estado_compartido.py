@@ -0,0 +1,150 @@
+"""
+Estado compartido entre workers (reemplaza a los dicts globales del proceso).
+
+Con `uvicorn --workers N` o varias instancias en Render, un dict global como
+el de la cotización manual queda distinto en cada proceso. Acá cada valor es
+un dict JSON guardado en la tabla estado_compartido con un número de versión
+que sube en cada escritura. Cada worker cachea lo que lee y lo invalida:
+
+- sondeando las versiones (una consulta chica cada INTERVALO_SONDEO segundos);
+- en PostgreSQL, además, con LISTEN/NOTIFY: cada escritura notifica la clave
+  y los demás workers la descartan al instante.
+
+`EstadoEnMemoria` tiene la misma interfaz sin base (tests, un solo proceso).
+ESTADO_COMPARTIDO=memoria lo selecciona; por defecto se usa la base.
+"""
+import copy
+import json
+import logging
+import os
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import select, func
+
+from database import insert_dialecto
+from models import EstadoCompartido
+
+logger = logging.getLogger(__name__)
+
+CANAL = 'estado_compartido'
+INTERVALO_SONDEO = float(os.environ.get('ESTADO_COMPARTIDO_SONDEO', '2'))
+# Con NOTIFY el sondeo queda solo como respaldo por si se pierde la conexión
+INTERVALO_SONDEO_CON_NOTIFY = 30.0
+
+
+class EstadoEnMemoria:
+    """Valores por clave en el proceso; las lecturas devuelven copias"""
+
+    def __init__(self):
+        self._valores = {}
+
+    async def iniciar(self):
+        pass
+
+    async def detener(self):
+        pass
+
+    async def obtener(self, clave: str, defecto=None):
+        valor = self._valores.get(clave)
+        return copy.deepcopy(valor) if valor is not None else defecto
+
+    async def guardar(self, clave: str, valor: dict):
+        self._valores[clave] = copy.deepcopy(valor)
+
+    async def actualizar(self, clave: str, **cambios):
+        """Mezcla `cambios` sobre el valor actual y lo guarda; devuelve el resultado"""
+        valor = {**(await self.obtener(clave, {})), **cambios}
+        await self.guardar(clave, valor)
+        return valor
+
+
+class EstadoEnBase(EstadoEnMemoria):
+    """Tabla estado_compartido con cache local invalidada por versión (y NOTIFY en PostgreSQL)"""
+
+    def __init__(self, session_maker, engine=None, intervalo_sondeo: float = INTERVALO_SONDEO):
+        super().__init__()
+        self.session_maker = session_maker
+        self.engine = engine
+        self.intervalo_sondeo = intervalo_sondeo
+        self._versiones = {}
+        self._ultimo_sondeo = 0.0
+        self._escucha = None
+
+    async def iniciar(self):
+        if self.engine is None or self.engine.dialect.name != 'postgresql':
+            return
+        try:
+            self._escucha = await self.engine.connect()
+            crudo = await self._escucha.get_raw_connection()
+            await crudo.driver_connection.add_listener(CANAL, self._notificado)
+            self.intervalo_sondeo = max(self.intervalo_sondeo, INTERVALO_SONDEO_CON_NOTIFY)
+            logger.info("Estado compartido: escuchando NOTIFY")
+        except Exception as e:
+            logger.warning(f"Estado compartido sin LISTEN, solo sondeo: {e}")
+            await self.detener()
+
+    async def detener(self):
+        if self._escucha is not None:
+            await self._escucha.close()
+            self._escucha = None
+
+    def _notificado(self, conexion, pid, canal, clave):
+        self._descartar(clave)
+
+    def _descartar(self, clave):
+        self._valores.pop(clave, None)
+        self._versiones.pop(clave, None)
+
+    async def _sondear(self, db):
+        if time.monotonic() - self._ultimo_sondeo < self.intervalo_sondeo:
+            return
+        self._ultimo_sondeo = time.monotonic()
+        versiones = dict((await db.execute(select(EstadoCompartido.clave, EstadoCompartido.version))).all())
+        for clave in list(self._versiones):
+            if versiones.get(clave) != self._versiones[clave]:
+                self._descartar(clave)
+
+    async def obtener(self, clave: str, defecto=None):
+        async with self.session_maker() as db:
+            await self._sondear(db)
+            if clave not in self._versiones:
+                fila = (await db.execute(
+                    select(EstadoCompartido.version, EstadoCompartido.valor).where(EstadoCompartido.clave == clave)
+                )).first()
+                self._versiones[clave] = fila.version if fila else None
+                if fila:
+                    self._valores[clave] = json.loads(fila.valor)
+        return await super().obtener(clave, defecto)
+
+    async def guardar(self, clave: str, valor: dict):
+        texto = json.dumps(valor, default=str)
+        async with self.session_maker() as db:
+            insert = insert_dialecto(EstadoCompartido, db.bind)
+            stmt = insert.values(clave=clave, valor=texto, version=1, actualizado_en=datetime.now(timezone.utc))
+            version = (await db.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=['clave'],
+                    set_={
+                        'valor': stmt.excluded.valor,
+                        'version': EstadoCompartido.version + 1,
+                        'actualizado_en': stmt.excluded.actualizado_en,
+                    }
+                ).returning(EstadoCompartido.version)
+            )).scalar_one()
+            if db.bind.dialect.name == 'postgresql':
+                await db.execute(select(func.pg_notify(CANAL, clave)))
+            await db.commit()
+        self._valores[clave] = json.loads(texto)
+        self._versiones[clave] = version
+
+    async def actualizar(self, clave: str, **cambios):
+        # Se relee de la base para no mezclar sobre una copia vieja del cache
+        self._descartar(clave)
+        return await super().actualizar(clave, **cambios)
+
+
+def crear(session_maker, engine=None):
+    if os.environ.get('ESTADO_COMPARTIDO', 'base').lower() == 'memoria':
+        return EstadoEnMemoria()
+    return EstadoEnBase(session_maker, engine)
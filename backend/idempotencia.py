@@ -0,0 +1,108 @@
+"""
+Idempotency-Key para los endpoints que modifican datos.
+
+Los POS con Wi-Fi inestable reintentan POST /api/ventas y /confirmar: sin
+esto cada reintento crea otro borrador o repite trabajo. Si el request trae
+el header `Idempotency-Key`, la primera ejecución reserva la clave (fila con
+estado_http NULL) y al terminar guarda estado, content-type y cuerpo de la
+respuesta. Un reintento con la misma clave, método y ruta recibe la respuesta
+guardada sin volver a ejecutar el endpoint. Las claves se separan por ámbito
+(usuario del token, o si no la empresa del request): dos tenants que usen la
+misma clave no se pisan.
+
+- Misma clave con otro cuerpo: 422 (la clave se reutilizó por error).
+- Misma clave mientras la primera sigue en curso: 409, el cliente reintenta.
+  La reserva dura IDEMPOTENCIA_EN_CURSO_SEGUNDOS (60): si el worker se cae o
+  se redeploya a mitad del request, pasado ese plazo el reintento la toma.
+- Respuestas 5xx no se guardan: la clave se libera y el reintento ejecuta.
+- Las claves vencen a las IDEMPOTENCIA_TTL_HORAS (24 por defecto); la tarea
+  programada purgar_idempotencia las borra.
+"""
+import hashlib
+import os
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select, delete, update
+
+from database import insert_dialecto
+from models import ClaveIdempotencia
+
+HEADER = 'Idempotency-Key'
+METODOS = ('POST', 'PUT', 'PATCH', 'DELETE')
+TTL = timedelta(hours=float(os.environ.get('IDEMPOTENCIA_TTL_HORAS', '24')))
+EN_CURSO = timedelta(seconds=float(os.environ.get('IDEMPOTENCIA_EN_CURSO_SEGUNDOS', '60')))
+LARGO_MAXIMO_CLAVE = 255
+# Respuestas más grandes no se guardan (reportes en streaming); la clave se libera
+CUERPO_MAXIMO = 1024 * 1024
+
+
+def huella(metodo: str, ruta: str, query: str, cuerpo: bytes) -> str:
+    return hashlib.sha256(b'\n'.join([metodo.encode(), ruta.encode(), query.encode(), cuerpo])).hexdigest()
+
+
+def ambito(usuario_id=None, empresa_id=None) -> str:
+    """Espacio de claves: el usuario autenticado, si no la empresa, si no el global ('')"""
+    if usuario_id is not None:
+        return f"usuario:{usuario_id}"
+    if empresa_id is not None:
+        return f"empresa:{empresa_id}"
+    return ''
+
+
+def _filtro(ambito_clave, clave, metodo, ruta):
+    return (ClaveIdempotencia.ambito == ambito_clave, ClaveIdempotencia.clave == clave,
+            ClaveIdempotencia.metodo == metodo, ClaveIdempotencia.ruta == ruta)
+
+
+async def reservar(db, ambito_clave: str, clave: str, metodo: str, ruta: str, huella_request: str):
+    """None si la clave quedó reservada para esta ejecución; si no, la fila existente"""
+    ahora = datetime.now(timezone.utc)
+    filtro = _filtro(ambito_clave, clave, metodo, ruta)
+    await db.execute(delete(ClaveIdempotencia).where(*filtro, ClaveIdempotencia.expira_en < ahora))
+    reservada = (await db.execute(
+        insert_dialecto(ClaveIdempotencia, db.bind).values(
+            ambito=ambito_clave, clave=clave, metodo=metodo, ruta=ruta, huella=huella_request,
+            en_curso_hasta=ahora + EN_CURSO, expira_en=ahora + TTL
+        )
+        .on_conflict_do_nothing(index_elements=['ambito', 'clave', 'metodo', 'ruta'])
+        .returning(ClaveIdempotencia.id)
+    )).scalar()
+    if reservada is None:
+        # Reserva abandonada (worker caído a mitad del request): se toma si el mismo request reintenta
+        reservada = (await db.execute(
+            update(ClaveIdempotencia)
+            .where(
+                *filtro,
+                ClaveIdempotencia.estado_http.is_(None),
+                ClaveIdempotencia.huella == huella_request,
+                ClaveIdempotencia.en_curso_hasta < ahora
+            )
+            .values(en_curso_hasta=ahora + EN_CURSO, expira_en=ahora + TTL)
+            .returning(ClaveIdempotencia.id)
+        )).scalar()
+    existente = None
+    if reservada is None:
+        existente = (await db.execute(select(ClaveIdempotencia).where(*filtro))).scalar_one_or_none()
+    await db.commit()
+    return existente
+
+
+async def guardar(db, ambito_clave: str, clave: str, metodo: str, ruta: str,
+                  estado_http: int, content_type: str, cuerpo: bytes):
+    await db.execute(
+        update(ClaveIdempotencia).where(*_filtro(ambito_clave, clave, metodo, ruta))
+        .values(estado_http=estado_http, content_type=content_type, cuerpo=cuerpo, en_curso_hasta=None)
+    )
+    await db.commit()
+
+
+async def liberar(db, ambito_clave: str, clave: str, metodo: str, ruta: str):
+    await db.execute(delete(ClaveIdempotencia).where(*_filtro(ambito_clave, clave, metodo, ruta)))
+    await db.commit()
+
+
+async def purgar_vencidas(db) -> int:
+    result = await db.execute(delete(ClaveIdempotencia).where(ClaveIdempotencia.expira_en < datetime.now(timezone.utc)))
+    await db.commit()
+    return result.rowcount
+
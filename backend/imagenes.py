@@ -0,0 +1,128 @@
+"""
+Imágenes de productos: validación, derivados y nombres por contenido.
+
+El upload se lee por partes con tope de tamaño (IMAGEN_MAX_MB, 5 por
+defecto) y el trabajo pesado (decodificar, redimensionar, escribir a disco)
+corre en un pool de hilos para no bloquear el event loop; Pillow suelta el
+GIL al decodificar y redimensionar. El formato se valida con Pillow, no con
+la extensión ni el content-type que manda el cliente.
+
+Por cada imagen se guardan tres archivos con el mismo hash de contenido:
+  {hash}.{ext}        principal, como mucho LADO_MAXIMO px de lado
+  {hash}-media.{ext}  para fichas y el POS
+  {hash}-mini.{ext}   para listados
+Como el nombre depende del contenido nunca se sobrescribe un archivo con otro
+distinto, así que /uploads los sirve con Cache-Control inmutable de un año.
+Subir dos veces la misma imagen reutiliza los archivos.
+"""
+import asyncio
+import hashlib
+import os
+import re
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import Path
+
+from fastapi.staticfiles import StaticFiles
+from PIL import Image, ImageOps
+
+from variantes_imagen import VARIANTES, url_variante  # noqa: F401 - reexportados
+
+TAMANO_MAXIMO = int(float(os.environ.get('IMAGEN_MAX_MB', '5')) * 1024 * 1024)
+PIXELES_MAXIMOS = 40_000_000
+LADO_MAXIMO = 1600
+FORMATOS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp'}
+BLOQUE = 64 * 1024
+CACHE_INMUTABLE = 'public, max-age=31536000, immutable'
+NOMBRE_CON_HASH = re.compile(r'(^|/)[0-9a-f]{32}(-[a-z]+)?\.[a-z]+$')
+
+_pool = None
+
+
+class ImagenInvalida(Exception):
+    def __init__(self, detalle: str, status_code: int = 400):
+        super().__init__(detalle)
+        self.detalle = detalle
+        self.status_code = status_code
+
+
+async def leer(archivo, maximo: int = None) -> bytes:
+    """Lee el UploadFile por bloques; corta con 413 apenas pasa el máximo"""
+    maximo = maximo or TAMANO_MAXIMO
+    if archivo.size is not None and archivo.size > maximo:
+        raise ImagenInvalida(f"La imagen supera {maximo // (1024 * 1024)} MB", 413)
+    partes, total = [], 0
+    while bloque := await archivo.read(BLOQUE):
+        total += len(bloque)
+        if total > maximo:
+            raise ImagenInvalida(f"La imagen supera {maximo // (1024 * 1024)} MB", 413)
+        partes.append(bloque)
+    return b''.join(partes)
+
+
+def _redimensionada(imagen: Image.Image, lado: int) -> Image.Image:
+    copia = imagen.copy()
+    copia.thumbnail((lado, lado), Image.Resampling.LANCZOS)
+    return copia
+
+
+def _escribir(imagen: Image.Image, formato: str, destino: Path):
+    if destino.exists():
+        return
+    if formato == 'JPEG' and imagen.mode not in ('RGB', 'L'):
+        imagen = imagen.convert('RGB')
+    temporal = destino.with_name(f".{destino.name}.{uuid.uuid4().hex}.tmp")
+    imagen.save(temporal, formato, optimize=True, **({'quality': 85} if formato != 'PNG' else {}))
+    os.replace(temporal, destino)
+
+
+def procesar(contenido: bytes, directorio: Path) -> dict:
+    """Valida y guarda principal y derivados; devuelve {'principal': nombre, 'media': ..., 'mini': ...}"""
+    try:
+        with Image.open(BytesIO(contenido)) as imagen:
+            formato = imagen.format
+            if formato not in FORMATOS:
+                raise ImagenInvalida("Formato de imagen no soportado (JPEG, PNG o WEBP)", 415)
+            if imagen.width * imagen.height > PIXELES_MAXIMOS:
+                raise ImagenInvalida("La imagen tiene demasiados píxeles", 413)
+            imagen = ImageOps.exif_transpose(imagen)
+            imagen.load()
+    except ImagenInvalida:
+        raise
+    except (OSError, SyntaxError, ValueError, Image.DecompressionBombError):
+        raise ImagenInvalida("El archivo no es una imagen válida", 415)
+
+    base = hashlib.sha256(contenido).hexdigest()[:32]
+    ext = FORMATOS[formato]
+    nombres = {'principal': f"{base}.{ext}"}
+    _escribir(_redimensionada(imagen, LADO_MAXIMO), formato, directorio / nombres['principal'])
+    for variante, lado in VARIANTES.items():
+        nombres[variante] = f"{base}-{variante}.{ext}"
+        _escribir(_redimensionada(imagen, lado), formato, directorio / nombres[variante])
+    return nombres
+
+
+def _ejecutor() -> ThreadPoolExecutor:
+    """Pool de hilos para procesar(); se crea con el primer upload"""
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=int(os.environ.get('IMAGENES_WORKERS', '2')),
+                                   thread_name_prefix='imagenes')
+    return _pool
+
+
+async def guardar(archivo, directorio: Path) -> dict:
+    """Lee el upload y lo procesa en el pool; devuelve los nombres de procesar()"""
+    contenido = await leer(archivo)
+    return await asyncio.get_running_loop().run_in_executor(_ejecutor(), procesar, contenido, directorio)
+
+
+class ArchivosEstaticos(StaticFiles):
+    """StaticFiles que marca como inmutables los archivos con hash de contenido en el nombre"""
+
+    async def get_response(self, path: str, scope):
+        response = await super().get_response(path, scope)
+        if response.status_code in (200, 304) and NOMBRE_CON_HASH.search(path):
+            response.headers['Cache-Control'] = CACHE_INMUTABLE
+        return response
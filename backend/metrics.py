@@ -0,0 +1,219 @@
+"""
+Métricas en formato de exposición de Prometheus, en proceso.
+
+Contadores, gauges e histogramas mínimos (sin dependencias externas) que
+server.py publica en GET /metrics. Los valores son por proceso: con varios
+workers, Prometheus debe scrapear cada instancia.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _formatear_labels(nombres, valores, extra=None):
+    pares = list(zip(nombres, valores))
+    if extra:
+        pares.append(extra)
+    if not pares:
+        return ''
+    return '{' + ','.join(f'{k}="{_escapar(v)}"' for k, v in pares) + '}'
+
+
+def _formatear_numero(valor):
+    if valor == float('inf'):
+        return '+Inf'
+    if float(valor).is_integer():
+        return str(int(valor))
+    return repr(float(valor))
+
+
+class _Metrica:
+    tipo = None
+
+    def __init__(self, nombre, descripcion, labels=()):
+        self.nombre = nombre
+        self.descripcion = descripcion
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._valores = {}
+
+    def _clave(self, labels):
+        if set(labels) != set(self.labels):
+            raise ValueError(f"{self.nombre}: se esperaban labels {self.labels}, recibidos {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labels)
+
+    def muestras(self):
+        with self._lock:
+            return [(self.nombre, _formatear_labels(self.labels, k), v) for k, v in sorted(self._valores.items())]
+
+    def exponer(self):
+        lineas = [f"# HELP {self.nombre} {self.descripcion}", f"# TYPE {self.nombre} {self.tipo}"]
+        for nombre, labels, valor in self.muestras():
+            lineas.append(f"{nombre}{labels} {_formatear_numero(valor)}")
+        return lineas
+
+
+class Counter(_Metrica):
+    tipo = 'counter'
+
+    def inc(self, cantidad=1, **labels):
+        clave = self._clave(labels)
+        with self._lock:
+            self._valores[clave] = self._valores.get(clave, 0) + cantidad
+
+
+class Gauge(_Metrica):
+    tipo = 'gauge'
+
+    def __init__(self, nombre, descripcion, labels=(), funcion=None):
+        """`funcion` (opcional) devuelve {tupla_de_labels: valor} en cada scrape"""
+        super().__init__(nombre, descripcion, labels)
+        self._funcion = funcion
+
+    def set(self, valor, **labels):
+        clave = self._clave(labels)
+        with self._lock:
+            self._valores[clave] = valor
+
+    def inc(self, cantidad=1, **labels):
+        clave = self._clave(labels)
+        with self._lock:
+            self._valores[clave] = self._valores.get(clave, 0) + cantidad
+
+    def dec(self, cantidad=1, **labels):
+        self.inc(-cantidad, **labels)
+
+    def muestras(self):
+        if self._funcion is not None:
+            with self._lock:
+                self._valores = {tuple(str(v) for v in k): valor for k, valor in self._funcion().items()}
+        return super().muestras()
+
+
+class Histogram(_Metrica):
+    tipo = 'histogram'
+
+    def __init__(self, nombre, descripcion, labels=(), buckets=BUCKETS_LATENCIA):
+        super().__init__(nombre, descripcion, labels)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, valor, **labels):
+        clave = self._clave(labels)
+        with self._lock:
+            serie = self._valores.get(clave)
+            if serie is None:
+                serie = self._valores[clave] = {'buckets': [0] * len(self.buckets), 'suma': 0.0, 'cuenta': 0}
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    serie['buckets'][i] += 1
+                    break
+            serie['suma'] += valor
+            serie['cuenta'] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - inicio, **labels)
+
+    def muestras(self):
+        muestras = []
+        with self._lock:
+            for clave, serie in sorted(self._valores.items()):
+                acumulado = 0
+                for limite, cuenta in zip(self.buckets, serie['buckets']):
+                    acumulado += cuenta
+                    labels = _formatear_labels(self.labels, clave, ('le', _formatear_numero(limite)))
+                    muestras.append((f"{self.nombre}_bucket", labels, acumulado))
+                labels = _formatear_labels(self.labels, clave)
+                muestras.append((f"{self.nombre}_sum", labels, serie['suma']))
+                muestras.append((f"{self.nombre}_count", labels, serie['cuenta']))
+        return muestras
+
+
+class Registro:
+    def __init__(self):
+        self._metricas = {}
+
+    def registrar(self, metrica):
+        if metrica.nombre in self._metricas:
+            raise ValueError(f"Métrica duplicada: {metrica.nombre}")
+        self._metricas[metrica.nombre] = metrica
+        return metrica
+
+    def counter(self, *args, **kwargs):
+        return self.registrar(Counter(*args, **kwargs))
+
+    def gauge(self, *args, **kwargs):
+        return self.registrar(Gauge(*args, **kwargs))
+
+    def histogram(self, *args, **kwargs):
+        return self.registrar(Histogram(*args, **kwargs))
+
+    def exponer(self):
+        lineas = []
+        for metrica in self._metricas.values():
+            lineas.extend(metrica.exponer())
+        return '\n'.join(lineas) + '\n'
+
+
+REGISTRO = Registro()
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# ==================== API ====================
+HTTP_REQUESTS = REGISTRO.counter(
+    'http_requests_total', 'Requests HTTP atendidos', ('method', 'route', 'status')
+)
+HTTP_LATENCIA = REGISTRO.histogram(
+    'http_request_duration_seconds', 'Latencia de requests HTTP por ruta', ('method', 'route')
+)
+HTTP_EN_CURSO = REGISTRO.gauge(
+    'http_requests_in_flight', 'Requests HTTP en curso'
+)
+
+# ==================== NEGOCIO ====================
+PDF_RENDER = REGISTRO.histogram(
+    'pdf_render_duration_seconds', 'Duración de generación de reportes PDF', ('reporte',)
+)
+STOCK_CONFLICTOS = REGISTRO.counter(
+    'stock_allocation_conflicts_total', 'Ítems confirmados sin stock suficiente para asignar la cantidad completa'
+)
+COTIZACION_FETCH = REGISTRO.histogram(
+    'exchange_rate_fetch_duration_seconds', 'Latencia de la API externa de cotizaciones', ('resultado',)
+)
+VENTAS_CONFIRMADAS = REGISTRO.counter(
+    'ventas_confirmadas_total', 'Ventas confirmadas', ('tipo_pago',)
+)
+VENTAS_CONFIRMADAS_MONTO = REGISTRO.counter(
+    'ventas_confirmadas_monto_total', 'Monto de ventas confirmadas (Gs)', ('tipo_pago',)
+)
+CONFIRMACION_LOTE = REGISTRO.histogram(
+    'ventas_confirmacion_lote_tamano', 'Ventas confirmadas por transacción en el modo en lote',
+    buckets=(1, 2, 5, 10, 20, 50, 100)
+)
+
+
+def registrar_pools(engines):
+    """Gauge de uso de los pools de conexiones ({nombre: engine async}), leído en cada scrape"""
+    def _leer():
+        valores = {}
+        for nombre, engine in engines.items():
+            pool = engine.sync_engine.pool
+            for estado, metodo in (('checked_out', 'checkedout'), ('checked_in', 'checkedin'),
+                                   ('overflow', 'overflow'), ('size', 'size')):
+                if hasattr(pool, metodo):
+                    valores[(nombre, estado)] = getattr(pool, metodo)()
+        return valores
+
+    return REGISTRO.gauge(
+        'db_pool_connections', 'Conexiones de los pools de base de datos',
+        ('engine', 'estado'), funcion=_leer
+    )
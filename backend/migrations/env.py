@@ -0,0 +1,87 @@
+import asyncio
+import sys
+from logging.config import fileConfig
+from pathlib import Path
+
+from sqlalchemy import pool, inspect
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from alembic import context
+from alembic.script import ScriptDirectory
+
+# Permite `alembic` desde cualquier directorio y el import de migrations.* en las revisiones
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from database import DATABASE_URL, Base
+import models  # noqa: F401 - registra las tablas en Base.metadata
+
+config = context.config
+
+if config.config_file_name is not None and config.attributes.get('configurar_logging', True):
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+target_metadata = Base.metadata
+
+# Revisión equivalente al esquema que creaba `create_all` antes de Alembic
+REVISION_BASE = "0001"
+
+
+def obtener_url():
+    return config.attributes.get('url') or config.get_main_option("sqlalchemy.url") or DATABASE_URL
+
+
+def adoptar_esquema_existente(connection: Connection) -> None:
+    """Bases creadas con create_all (sin alembic_version) se marcan en la revisión base"""
+    inspector = inspect(connection)
+    if inspector.has_table('alembic_version') or not inspector.has_table('empresas'):
+        return
+    script = ScriptDirectory.from_config(config)
+    context.get_context().stamp(script, REVISION_BASE)
+
+
+def run_migrations_offline() -> None:
+    context.configure(
+        url=obtener_url(),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+        render_as_batch=True,
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def do_run_migrations(connection: Connection) -> None:
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        # SQLite no soporta ALTER de constraints: se recrea la tabla en modo batch
+        render_as_batch=connection.dialect.name == 'sqlite',
+    )
+
+    with context.begin_transaction():
+        adoptar_esquema_existente(connection)
+        context.run_migrations()
+
+
+async def run_async_migrations() -> None:
+    connectable = create_async_engine(obtener_url(), poolclass=pool.NullPool)
+
+    async with connectable.connect() as connection:
+        await connection.run_sync(do_run_migrations)
+
+    await connectable.dispose()
+
+
+def run_migrations_online() -> None:
+    asyncio.run(run_async_migrations())
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
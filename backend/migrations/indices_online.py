@@ -0,0 +1,44 @@
+"""
+Operaciones de índices sin bloquear escrituras.
+
+En PostgreSQL los índices se crean con CREATE INDEX CONCURRENTLY, que no
+puede correr dentro de una transacción: cada operación usa un
+autocommit_block. En SQLite (desarrollo) se usan las operaciones normales.
+"""
+from alembic import op
+
+
+def es_postgresql():
+    return op.get_bind().dialect.name == 'postgresql'
+
+
+def crear_indice(nombre, tabla, columnas, unique=False):
+    if es_postgresql():
+        with op.get_context().autocommit_block():
+            op.create_index(nombre, tabla, columnas, unique=unique,
+                            postgresql_concurrently=True, if_not_exists=True)
+    else:
+        op.create_index(nombre, tabla, columnas, unique=unique)
+
+
+def eliminar_indice(nombre, tabla):
+    if es_postgresql():
+        with op.get_context().autocommit_block():
+            op.drop_index(nombre, table_name=tabla, postgresql_concurrently=True, if_exists=True)
+    else:
+        op.drop_index(nombre, table_name=tabla)
+
+
+def crear_unique_constraint(nombre, tabla, columnas):
+    """En PostgreSQL construye el índice único en línea y luego lo adopta como constraint"""
+    if es_postgresql():
+        crear_indice(nombre, tabla, columnas, unique=True)
+        op.execute(f'ALTER TABLE {tabla} ADD CONSTRAINT {nombre} UNIQUE USING INDEX {nombre}')
+    else:
+        with op.batch_alter_table(tabla) as batch_op:
+            batch_op.create_unique_constraint(nombre, columnas)
+
+
+def eliminar_unique_constraint(nombre, tabla):
+    with op.batch_alter_table(tabla) as batch_op:
+        batch_op.drop_constraint(nombre, type_='unique')
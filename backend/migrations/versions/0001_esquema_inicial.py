@@ -0,0 +1,471 @@
+"""esquema inicial (equivalente al create_all previo a Alembic)
+
+Revision ID: 0001
+Revises: 
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('empresas',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('nombre', sa.String(length=255), nullable=False),
+    sa.Column('ruc', sa.String(length=50), nullable=False),
+    sa.Column('direccion', sa.String(length=500), nullable=True),
+    sa.Column('telefono', sa.String(length=50), nullable=True),
+    sa.Column('email', sa.String(length=255), nullable=True),
+    sa.Column('estado', sa.Boolean(), nullable=True),
+    sa.Column('creado_en', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('actualizado_en', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('ruc')
+    )
+    op.create_index(op.f('ix_empresas_id'), 'empresas', ['id'], unique=False)
+
+    op.create_table('permisos',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('clave', sa.String(length=100), nullable=False),
+    sa.Column('descripcion', sa.String(length=500), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('clave')
+    )
+    op.create_index(op.f('ix_permisos_id'), 'permisos', ['id'], unique=False)
+
+    op.create_table('almacenes',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('empresa_id', sa.Integer(), nullable=False),
+    sa.Column('nombre', sa.String(length=255), nullable=False),
+    sa.Column('ubicacion', sa.String(length=500), nullable=True),
+    sa.ForeignKeyConstraint(['empresa_id'], ['empresas.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_almacenes_id'), 'almacenes', ['id'], unique=False)
+
+    op.create_table('categorias',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('empresa_id', sa.Integer(), nullable=False),
+    sa.Column('nombre', sa.String(length=255), nullable=False),
+    sa.ForeignKeyConstraint(['empresa_id'], ['empresas.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_categorias_id'), 'categorias', ['id'], unique=False)
+
+    op.create_table('clientes',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('empresa_id', sa.Integer(), nullable=False),
+    sa.Column('nombre', sa.String(length=255), nullable=False),
+    sa.Column('apellido', sa.String(length=255), nullable=True),
+    sa.Column('ruc', sa.String(length=50), nullable=True),
+    sa.Column('cedula', sa.String(length=50), nullable=True),
+    sa.Column('direccion', sa.String(length=500), nullable=True),
+    sa.Column('telefono', sa.String(length=50), nullable=True),
+    sa.Column('email', sa.String(length=255), nullable=True),
+    sa.Column('acepta_cheque', sa.Boolean(), nullable=True),
+    sa.Column('descuento_porcentaje', sa.Numeric(precision=5, scale=2), nullable=True),
+    sa.Column('limite_credito', sa.Numeric(precision=15, scale=2), nullable=True),
+    sa.Column('estado', sa.Boolean(), nullable=True),
+    sa.Column('creado_en', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['empresa_id'], ['empresas.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_clientes_id'), 'clientes', ['id'], unique=False)
+
+    op.create_table('funcionarios',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('empresa_id', sa.Integer(), nullable=False),
+    sa.Column('nombre', sa.String(length=255), nullable=False),
+    sa.Column('apellido', sa.String(length=255), nullable=True),
+    sa.Column('cedula', sa.String(length=50), nullable=True),
+    sa.Column('cargo', sa.String(length=255), nullable=True),
+    sa.Column('salario_base', sa.Numeric(precision=15, scale=2), nullable=True),
+    sa.Column('ips', sa.Numeric(precision=15, scale=2), nullable=True),
+    sa.Column('fecha_nacimiento', sa.Date(), nullable=True),
+    sa.Column('activo', sa.Boolean(), nullable=True),
+    sa.ForeignKeyConstraint(['empresa_id'], ['empresas.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_funcionarios_id'), 'funcionarios', ['id'], unique=False)
+
+    op.create_table('marcas',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('empresa_id', sa.Integer(), nullable=False),
+    sa.Column('nombre', sa.String(length=255), nullable=False),
+    sa.ForeignKeyConstraint(['empresa_id'], ['empresas.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_marcas_id'), 'marcas', ['id'], unique=False)
+
+    op.create_table('materias_laboratorio',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('empresa_id', sa.Integer(), nullable=False),
+    sa.Column('nombre', sa.String(length=255), nullable=False),
+    sa.Column('descripcion', sa.Text(), nullable=True),
+    sa.Column('codigo_barra', sa.String(length=100), nullable=True),
+    sa.Column('precio', sa.Numeric(precision=15, scale=2), nullable=False),
+    sa.Column('estado', sa.Enum('DISPONIBLE', 'VENDIDO', name='estadomateria'), nullable=True),
+    sa.Column('creado_en', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['empresa_id'], ['empresas.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('codigo_barra')
+    )
+    op.create_index(op.f('ix_materias_laboratorio_id'), 'materias_laboratorio', ['id'], unique=False)
+
+    op.create_table('proveedores',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('empresa_id', sa.Integer(), nullable=False),
+    sa.Column('nombre', sa.String(length=255), nullable=False),
+    sa.Column('ruc', sa.String(length=50), nullable=True),
+    sa.Column('direccion', sa.String(length=500), nullable=True),
+    sa.Column('telefono', sa.String(length=50), nullable=True),
+    sa.Column('email', sa.String(length=255), nullable=True),
+    sa.Column('estado', sa.Boolean(), nullable=True),
+    sa.Column('creado_en', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['empresa_id'], ['empresas.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_proveedores_id'), 'proveedores', ['id'], unique=False)
+
+    op.create_table('roles',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('empresa_id', sa.Integer(), nullable=False),
+    sa.Column('nombre', sa.String(length=100), nullable=False),
+    sa.Column('descripcion', sa.String(length=500), nullable=True),
+    sa.ForeignKeyConstraint(['empresa_id'], ['empresas.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_roles_id'), 'roles', ['id'], unique=False)
+
+    op.create_table('usuarios',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('empresa_id', sa.Integer(), nullable=False),
+    sa.Column('email', sa.String(length=255), nullable=False),
+    sa.Column('password_hash', sa.String(length=255), nullable=False),
+    sa.Column('nombre', sa.String(length=255), nullable=False),
+    sa.Column('apellido', sa.String(length=255), nullable=True),
+    sa.Column('telefono', sa.String(length=50), nullable=True),
+    sa.Column('activo', sa.Boolean(), nullable=True),
+    sa.Column('creado_en', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('actualizado_en', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['empresa_id'], ['empresas.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('email')
+    )
+    op.create_index(op.f('ix_usuarios_id'), 'usuarios', ['id'], unique=False)
+
+    op.create_table('vehiculos',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('empresa_id', sa.Integer(), nullable=False),
+    sa.Column('tipo', sa.Enum('MOTO', 'AUTOMOVIL', 'CAMIONETA', name='tipovehiculo'), nullable=False),
+    sa.Column('chapa', sa.String(length=20), nullable=False),
+    sa.Column('vencimiento_habilitacion', sa.Date(), nullable=True),
+    sa.Column('vencimiento_cedula_verde', sa.Date(), nullable=True),
+    sa.ForeignKeyConstraint(['empresa_id'], ['empresas.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_vehiculos_id'), 'vehiculos', ['id'], unique=False)
+
+    op.create_table('adelantos_salario',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('funcionario_id', sa.Integer(), nullable=False),
+    sa.Column('monto', sa.Numeric(precision=15, scale=2), nullable=False),
+    sa.Column('creado_en', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['funcionario_id'], ['funcionarios.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_adelantos_salario_id'), 'adelantos_salario', ['id'], unique=False)
+
+    op.create_table('ciclos_salario',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('funcionario_id', sa.Integer(), nullable=False),
+    sa.Column('periodo', sa.String(length=7), nullable=True),
+    sa.Column('fecha_inicio', sa.Date(), nullable=True),
+    sa.Column('fecha_fin', sa.Date(), nullable=True),
+    sa.Column('salario_base', sa.Numeric(precision=15, scale=2), nullable=True),
+    sa.Column('descuentos', sa.Numeric(precision=15, scale=2), nullable=True),
+    sa.Column('salario_neto', sa.Numeric(precision=15, scale=2), nullable=True),
+    sa.Column('pagado', sa.Boolean(), nullable=True),
+    sa.Column('fecha_pago', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['funcionario_id'], ['funcionarios.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_ciclos_salario_id'), 'ciclos_salario', ['id'], unique=False)
+
+    op.create_table('deudas_proveedores',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('proveedor_id', sa.Integer(), nullable=False),
+    sa.Column('monto', sa.Numeric(precision=15, scale=2), nullable=False),
+    sa.Column('descripcion', sa.Text(), nullable=True),
+    sa.Column('fecha_emision', sa.Date(), nullable=True),
+    sa.Column('fecha_limite', sa.Date(), nullable=True),
+    sa.Column('fecha_pago', sa.Date(), nullable=True),
+    sa.Column('pagado', sa.Boolean(), nullable=True),
+    sa.Column('creado_en', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['proveedor_id'], ['proveedores.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_deudas_proveedores_id'), 'deudas_proveedores', ['id'], unique=False)
+
+    op.create_table('preferencias_usuario',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('usuario_id', sa.Integer(), nullable=False),
+    sa.Column('tema', sa.String(length=50), nullable=True),
+    sa.Column('color_primario', sa.String(length=50), nullable=True),
+    sa.ForeignKeyConstraint(['usuario_id'], ['usuarios.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('usuario_id')
+    )
+    op.create_index(op.f('ix_preferencias_usuario_id'), 'preferencias_usuario', ['id'], unique=False)
+
+    op.create_table('productos',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('empresa_id', sa.Integer(), nullable=False),
+    sa.Column('categoria_id', sa.Integer(), nullable=True),
+    sa.Column('marca_id', sa.Integer(), nullable=True),
+    sa.Column('nombre', sa.String(length=255), nullable=False),
+    sa.Column('descripcion', sa.Text(), nullable=True),
+    sa.Column('codigo_barra', sa.String(length=100), nullable=True),
+    sa.Column('precio_venta', sa.Numeric(precision=15, scale=2), nullable=False),
+    sa.Column('fecha_vencimiento', sa.Date(), nullable=True),
+    sa.Column('activo', sa.Boolean(), nullable=True),
+    sa.Column('imagen_url', sa.String(length=500), nullable=True),
+    sa.ForeignKeyConstraint(['categoria_id'], ['categorias.id'], ),
+    sa.ForeignKeyConstraint(['empresa_id'], ['empresas.id'], ),
+    sa.ForeignKeyConstraint(['marca_id'], ['marcas.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('codigo_barra')
+    )
+    op.create_index(op.f('ix_productos_id'), 'productos', ['id'], unique=False)
+
+    op.create_table('rol_permisos',
+    sa.Column('rol_id', sa.Integer(), nullable=False),
+    sa.Column('permiso_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['permiso_id'], ['permisos.id'], ),
+    sa.ForeignKeyConstraint(['rol_id'], ['roles.id'], ),
+    sa.PrimaryKeyConstraint('rol_id', 'permiso_id')
+    )
+    op.create_table('usuario_roles',
+    sa.Column('usuario_id', sa.Integer(), nullable=False),
+    sa.Column('rol_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['rol_id'], ['roles.id'], ),
+    sa.ForeignKeyConstraint(['usuario_id'], ['usuarios.id'], ),
+    sa.PrimaryKeyConstraint('usuario_id', 'rol_id')
+    )
+    op.create_table('ventas',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('empresa_id', sa.Integer(), nullable=False),
+    sa.Column('cliente_id', sa.Integer(), nullable=False),
+    sa.Column('usuario_id', sa.Integer(), nullable=False),
+    sa.Column('representante_cliente_id', sa.Integer(), nullable=True),
+    sa.Column('total', sa.Numeric(precision=15, scale=2), nullable=True),
+    sa.Column('iva', sa.Numeric(precision=15, scale=2), nullable=True),
+    sa.Column('descuento', sa.Numeric(precision=15, scale=2), nullable=True),
+    sa.Column('tipo_pago', sa.Enum('EFECTIVO', 'TARJETA', 'TRANSFERENCIA', 'CHEQUE', 'CREDITO', name='tipopago'), nullable=True),
+    sa.Column('es_delivery', sa.Boolean(), nullable=True),
+    sa.Column('estado', sa.Enum('BORRADOR', 'CONFIRMADA', 'ANULADA', name='estadoventa'), nullable=True),
+    sa.Column('creado_en', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['cliente_id'], ['clientes.id'], ),
+    sa.ForeignKeyConstraint(['empresa_id'], ['empresas.id'], ),
+    sa.ForeignKeyConstraint(['representante_cliente_id'], ['clientes.id'], ),
+    sa.ForeignKeyConstraint(['usuario_id'], ['usuarios.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_ventas_id'), 'ventas', ['id'], unique=False)
+
+    op.create_table('creditos_clientes',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('cliente_id', sa.Integer(), nullable=False),
+    sa.Column('venta_id', sa.Integer(), nullable=True),
+    sa.Column('monto_original', sa.Numeric(precision=15, scale=2), nullable=False),
+    sa.Column('monto_pendiente', sa.Numeric(precision=15, scale=2), nullable=False),
+    sa.Column('descripcion', sa.Text(), nullable=True),
+    sa.Column('fecha_venta', sa.Date(), nullable=True),
+    sa.Column('pagado', sa.Boolean(), nullable=True),
+    sa.Column('creado_en', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['cliente_id'], ['clientes.id'], ),
+    sa.ForeignKeyConstraint(['venta_id'], ['ventas.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_creditos_clientes_id'), 'creditos_clientes', ['id'], unique=False)
+
+    op.create_table('entregas',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('venta_id', sa.Integer(), nullable=False),
+    sa.Column('vehiculo_id', sa.Integer(), nullable=False),
+    sa.Column('responsable_usuario_id', sa.Integer(), nullable=False),
+    sa.Column('fecha_entrega', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('estado', sa.Enum('PENDIENTE', 'EN_CAMINO', 'ENTREGADO', 'CANCELADO', name='estadoentrega'), nullable=True),
+    sa.ForeignKeyConstraint(['responsable_usuario_id'], ['usuarios.id'], ),
+    sa.ForeignKeyConstraint(['vehiculo_id'], ['vehiculos.id'], ),
+    sa.ForeignKeyConstraint(['venta_id'], ['ventas.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_entregas_id'), 'entregas', ['id'], unique=False)
+
+    op.create_table('facturas',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('venta_id', sa.Integer(), nullable=False),
+    sa.Column('numero', sa.String(length=50), nullable=False),
+    sa.Column('total', sa.Numeric(precision=15, scale=2), nullable=False),
+    sa.Column('iva', sa.Numeric(precision=15, scale=2), nullable=False),
+    sa.Column('estado', sa.String(length=50), nullable=True),
+    sa.Column('creado_en', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['venta_id'], ['ventas.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('venta_id')
+    )
+    op.create_index(op.f('ix_facturas_id'), 'facturas', ['id'], unique=False)
+
+    op.create_table('movimientos_stock',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('producto_id', sa.Integer(), nullable=False),
+    sa.Column('almacen_id', sa.Integer(), nullable=False),
+    sa.Column('tipo', sa.Enum('ENTRADA', 'SALIDA', 'AJUSTE', 'TRASPASO', name='tipomovimientostock'), nullable=False),
+    sa.Column('cantidad', sa.Integer(), nullable=False),
+    sa.Column('referencia_tipo', sa.String(length=50), nullable=True),
+    sa.Column('referencia_id', sa.Integer(), nullable=True),
+    sa.Column('creado_en', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['almacen_id'], ['almacenes.id'], ),
+    sa.ForeignKeyConstraint(['producto_id'], ['productos.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_movimientos_stock_id'), 'movimientos_stock', ['id'], unique=False)
+
+    op.create_table('proveedor_productos',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('proveedor_id', sa.Integer(), nullable=False),
+    sa.Column('producto_id', sa.Integer(), nullable=False),
+    sa.Column('costo', sa.Numeric(precision=15, scale=2), nullable=False),
+    sa.ForeignKeyConstraint(['producto_id'], ['productos.id'], ),
+    sa.ForeignKeyConstraint(['proveedor_id'], ['proveedores.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_proveedor_productos_id'), 'proveedor_productos', ['id'], unique=False)
+
+    op.create_table('stock_actual',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('producto_id', sa.Integer(), nullable=False),
+    sa.Column('almacen_id', sa.Integer(), nullable=False),
+    sa.Column('cantidad', sa.Integer(), nullable=True),
+    sa.Column('alerta_minima', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['almacen_id'], ['almacenes.id'], ),
+    sa.ForeignKeyConstraint(['producto_id'], ['productos.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_stock_actual_id'), 'stock_actual', ['id'], unique=False)
+
+    op.create_table('venta_items',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('venta_id', sa.Integer(), nullable=False),
+    sa.Column('producto_id', sa.Integer(), nullable=True),
+    sa.Column('materia_laboratorio_id', sa.Integer(), nullable=True),
+    sa.Column('cantidad', sa.Integer(), nullable=False),
+    sa.Column('precio_unitario', sa.Numeric(precision=15, scale=2), nullable=False),
+    sa.Column('total', sa.Numeric(precision=15, scale=2), nullable=False),
+    sa.Column('observaciones', sa.Text(), nullable=True),
+    sa.ForeignKeyConstraint(['materia_laboratorio_id'], ['materias_laboratorio.id'], ),
+    sa.ForeignKeyConstraint(['producto_id'], ['productos.id'], ),
+    sa.ForeignKeyConstraint(['venta_id'], ['ventas.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_venta_items_id'), 'venta_items', ['id'], unique=False)
+
+    op.create_table('documentos_electronicos',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('factura_id', sa.Integer(), nullable=False),
+    sa.Column('ruta_xml', sa.String(length=500), nullable=True),
+    sa.Column('cdc', sa.String(length=100), nullable=True),
+    sa.Column('estado_sifen', sa.Enum('PENDIENTE', 'APROBADO', 'RECHAZADO', name='estadodocumentoelectronico'), nullable=True),
+    sa.Column('mensaje_respuesta', sa.Text(), nullable=True),
+    sa.Column('creado_en', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['factura_id'], ['facturas.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('factura_id')
+    )
+    op.create_index(op.f('ix_documentos_electronicos_id'), 'documentos_electronicos', ['id'], unique=False)
+
+    op.create_table('pagos_creditos',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('credito_id', sa.Integer(), nullable=False),
+    sa.Column('monto', sa.Numeric(precision=15, scale=2), nullable=False),
+    sa.Column('fecha_pago', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('observacion', sa.Text(), nullable=True),
+    sa.ForeignKeyConstraint(['credito_id'], ['creditos_clientes.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_pagos_creditos_id'), 'pagos_creditos', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_pagos_creditos_id'), table_name='pagos_creditos')
+    op.drop_table('pagos_creditos')
+    op.drop_index(op.f('ix_documentos_electronicos_id'), table_name='documentos_electronicos')
+    op.drop_table('documentos_electronicos')
+    op.drop_index(op.f('ix_venta_items_id'), table_name='venta_items')
+    op.drop_table('venta_items')
+    op.drop_index(op.f('ix_stock_actual_id'), table_name='stock_actual')
+    op.drop_table('stock_actual')
+    op.drop_index(op.f('ix_proveedor_productos_id'), table_name='proveedor_productos')
+    op.drop_table('proveedor_productos')
+    op.drop_index(op.f('ix_movimientos_stock_id'), table_name='movimientos_stock')
+    op.drop_table('movimientos_stock')
+    op.drop_index(op.f('ix_facturas_id'), table_name='facturas')
+    op.drop_table('facturas')
+    op.drop_index(op.f('ix_entregas_id'), table_name='entregas')
+    op.drop_table('entregas')
+    op.drop_index(op.f('ix_creditos_clientes_id'), table_name='creditos_clientes')
+    op.drop_table('creditos_clientes')
+    op.drop_index(op.f('ix_ventas_id'), table_name='ventas')
+    op.drop_table('ventas')
+    op.drop_table('usuario_roles')
+    op.drop_table('rol_permisos')
+    op.drop_index(op.f('ix_productos_id'), table_name='productos')
+    op.drop_table('productos')
+    op.drop_index(op.f('ix_preferencias_usuario_id'), table_name='preferencias_usuario')
+    op.drop_table('preferencias_usuario')
+    op.drop_index(op.f('ix_deudas_proveedores_id'), table_name='deudas_proveedores')
+    op.drop_table('deudas_proveedores')
+    op.drop_index(op.f('ix_ciclos_salario_id'), table_name='ciclos_salario')
+    op.drop_table('ciclos_salario')
+    op.drop_index(op.f('ix_adelantos_salario_id'), table_name='adelantos_salario')
+    op.drop_table('adelantos_salario')
+    op.drop_index(op.f('ix_vehiculos_id'), table_name='vehiculos')
+    op.drop_table('vehiculos')
+    op.drop_index(op.f('ix_usuarios_id'), table_name='usuarios')
+    op.drop_table('usuarios')
+    op.drop_index(op.f('ix_roles_id'), table_name='roles')
+    op.drop_table('roles')
+    op.drop_index(op.f('ix_proveedores_id'), table_name='proveedores')
+    op.drop_table('proveedores')
+    op.drop_index(op.f('ix_materias_laboratorio_id'), table_name='materias_laboratorio')
+    op.drop_table('materias_laboratorio')
+    op.drop_index(op.f('ix_marcas_id'), table_name='marcas')
+    op.drop_table('marcas')
+    op.drop_index(op.f('ix_funcionarios_id'), table_name='funcionarios')
+    op.drop_table('funcionarios')
+    op.drop_index(op.f('ix_clientes_id'), table_name='clientes')
+    op.drop_table('clientes')
+    op.drop_index(op.f('ix_categorias_id'), table_name='categorias')
+    op.drop_table('categorias')
+    op.drop_index(op.f('ix_almacenes_id'), table_name='almacenes')
+    op.drop_table('almacenes')
+    op.drop_index(op.f('ix_permisos_id'), table_name='permisos')
+    op.drop_table('permisos')
+    op.drop_index(op.f('ix_empresas_id'), table_name='empresas')
+    op.drop_table('empresas')
+
+    # PostgreSQL: los tipos ENUM sobreviven al DROP TABLE
+    for nombre in ('estadomateria', 'tipovehiculo', 'tipopago', 'estadoventa', 'estadoentrega',
+                   'tipomovimientostock', 'estadodocumentoelectronico'):
+        sa.Enum(name=nombre).drop(op.get_bind(), checkfirst=True)
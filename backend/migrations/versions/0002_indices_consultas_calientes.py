@@ -0,0 +1,95 @@
+"""indices para filtros y joins calientes de server.py
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+from migrations.indices_online import (
+    crear_indice, eliminar_indice, crear_unique_constraint, eliminar_unique_constraint
+)
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, Sequence[str], None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDICES = [
+    ('ix_usuarios_empresa_activo', 'usuarios', ['empresa_id', 'activo']),
+    ('ix_roles_empresa_nombre', 'roles', ['empresa_id', 'nombre']),
+    ('ix_rol_permisos_permiso_id', 'rol_permisos', ['permiso_id']),
+    ('ix_usuario_roles_rol_id', 'usuario_roles', ['rol_id']),
+    ('ix_clientes_empresa_estado', 'clientes', ['empresa_id', 'estado']),
+    ('ix_creditos_clientes_cliente_pagado', 'creditos_clientes', ['cliente_id', 'pagado']),
+    ('ix_creditos_clientes_cliente_fecha', 'creditos_clientes', ['cliente_id', 'fecha_venta']),
+    ('ix_creditos_clientes_venta_id', 'creditos_clientes', ['venta_id']),
+    ('ix_pagos_creditos_credito_fecha', 'pagos_creditos', ['credito_id', 'fecha_pago']),
+    ('ix_proveedores_empresa_estado', 'proveedores', ['empresa_id', 'estado']),
+    ('ix_proveedor_productos_proveedor_id', 'proveedor_productos', ['proveedor_id']),
+    ('ix_proveedor_productos_producto_id', 'proveedor_productos', ['producto_id']),
+    ('ix_deudas_proveedores_proveedor_creado', 'deudas_proveedores', ['proveedor_id', 'creado_en']),
+    ('ix_deudas_proveedores_pagado_limite', 'deudas_proveedores', ['pagado', 'fecha_limite']),
+    ('ix_categorias_empresa_id', 'categorias', ['empresa_id']),
+    ('ix_marcas_empresa_id', 'marcas', ['empresa_id']),
+    ('ix_productos_empresa_activo', 'productos', ['empresa_id', 'activo']),
+    ('ix_productos_empresa_vencimiento', 'productos', ['empresa_id', 'fecha_vencimiento']),
+    ('ix_productos_categoria_id', 'productos', ['categoria_id']),
+    ('ix_productos_marca_id', 'productos', ['marca_id']),
+    ('ix_materias_laboratorio_empresa_estado', 'materias_laboratorio', ['empresa_id', 'estado']),
+    ('ix_almacenes_empresa_id', 'almacenes', ['empresa_id']),
+    ('ix_stock_actual_almacen_id', 'stock_actual', ['almacen_id']),
+    ('ix_movimientos_stock_producto_creado', 'movimientos_stock', ['producto_id', 'creado_en']),
+    ('ix_movimientos_stock_almacen_creado', 'movimientos_stock', ['almacen_id', 'creado_en']),
+    ('ix_movimientos_stock_referencia', 'movimientos_stock', ['referencia_tipo', 'referencia_id']),
+    ('ix_ventas_empresa_creado', 'ventas', ['empresa_id', 'creado_en']),
+    ('ix_ventas_empresa_estado_creado', 'ventas', ['empresa_id', 'estado', 'creado_en']),
+    ('ix_ventas_cliente_id', 'ventas', ['cliente_id']),
+    ('ix_ventas_usuario_id', 'ventas', ['usuario_id']),
+    ('ix_venta_items_venta_id', 'venta_items', ['venta_id']),
+    ('ix_venta_items_producto_id', 'venta_items', ['producto_id']),
+    ('ix_venta_items_materia_laboratorio_id', 'venta_items', ['materia_laboratorio_id']),
+    ('ix_funcionarios_empresa_activo', 'funcionarios', ['empresa_id', 'activo']),
+    ('ix_adelantos_salario_funcionario_creado', 'adelantos_salario', ['funcionario_id', 'creado_en']),
+    ('ix_ciclos_salario_funcionario_periodo', 'ciclos_salario', ['funcionario_id', 'periodo']),
+    ('ix_ciclos_salario_periodo', 'ciclos_salario', ['periodo']),
+    ('ix_vehiculos_empresa_id', 'vehiculos', ['empresa_id']),
+    ('ix_entregas_estado', 'entregas', ['estado']),
+    ('ix_entregas_venta_id', 'entregas', ['venta_id']),
+    ('ix_entregas_fecha_entrega', 'entregas', ['fecha_entrega']),
+    ('ix_entregas_vehiculo_id', 'entregas', ['vehiculo_id']),
+    ('ix_entregas_responsable_usuario_id', 'entregas', ['responsable_usuario_id']),
+]
+
+
+def upgrade() -> None:
+    for nombre, tabla, columnas in INDICES:
+        crear_indice(nombre, tabla, columnas)
+
+    # Unificar filas duplicadas de stock antes del constraint (sumando cantidades en la más antigua)
+    op.execute("""
+        UPDATE stock_actual SET cantidad = (
+            SELECT SUM(s2.cantidad) FROM stock_actual s2
+            WHERE s2.producto_id = stock_actual.producto_id AND s2.almacen_id = stock_actual.almacen_id
+        )
+        WHERE id IN (
+            SELECT MIN(id) FROM stock_actual GROUP BY producto_id, almacen_id HAVING COUNT(*) > 1
+        )
+    """)
+    op.execute("""
+        DELETE FROM stock_actual WHERE id NOT IN (
+            SELECT MIN(id) FROM stock_actual GROUP BY producto_id, almacen_id
+        )
+    """)
+    crear_unique_constraint('uq_stock_actual_producto_almacen', 'stock_actual', ['producto_id', 'almacen_id'])
+
+
+def downgrade() -> None:
+    eliminar_unique_constraint('uq_stock_actual_producto_almacen', 'stock_actual')
+    for nombre, tabla, _ in reversed(INDICES):
+        eliminar_indice(nombre, tabla)
@@ -0,0 +1,45 @@
+"""ciclos de salario únicos por funcionario y periodo
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+from migrations.indices_online import (
+    crear_indice, eliminar_indice, crear_unique_constraint, eliminar_unique_constraint
+)
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, Sequence[str], None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Duplicados de generaciones repetidas: se conserva el ciclo pagado o, si no hay, el más antiguo
+    op.execute("""
+        DELETE FROM ciclos_salario WHERE NOT pagado AND EXISTS (
+            SELECT 1 FROM ciclos_salario c2
+            WHERE c2.funcionario_id = ciclos_salario.funcionario_id
+              AND c2.periodo = ciclos_salario.periodo
+              AND (c2.pagado OR c2.id < ciclos_salario.id)
+        )
+    """)
+    op.execute("""
+        DELETE FROM ciclos_salario WHERE id NOT IN (
+            SELECT MIN(id) FROM ciclos_salario GROUP BY funcionario_id, periodo
+        )
+    """)
+    crear_unique_constraint('uq_ciclos_salario_funcionario_periodo', 'ciclos_salario', ['funcionario_id', 'periodo'])
+    eliminar_indice('ix_ciclos_salario_funcionario_periodo', 'ciclos_salario')
+
+
+def downgrade() -> None:
+    crear_indice('ix_ciclos_salario_funcionario_periodo', 'ciclos_salario', ['funcionario_id', 'periodo'])
+    eliminar_unique_constraint('uq_ciclos_salario_funcionario_periodo', 'ciclos_salario')
@@ -0,0 +1,36 @@
+"""saldo de crédito mantenido por cliente
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, Sequence[str], None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'clientes',
+        sa.Column('credito_usado', sa.Numeric(15, 2), nullable=False, server_default='0')
+    )
+    op.execute("""
+        UPDATE clientes SET credito_usado = COALESCE((
+            SELECT SUM(monto_pendiente) FROM creditos_clientes
+            WHERE creditos_clientes.cliente_id = clientes.id AND NOT creditos_clientes.pagado
+        ), 0)
+    """)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('clientes') as batch_op:
+        batch_op.drop_column('credito_usado')
@@ -0,0 +1,107 @@
+"""movimientos_stock particionada por mes en PostgreSQL
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19 00:00:00
+
+En PostgreSQL la tabla se reconstruye como PARTITION BY RANGE (creado_en):
+la clave primaria pasa a ser (id, creado_en), que es lo que exige una tabla
+particionada; la secuencia de id se conserva. La copia bloquea la tabla
+mientras dura, correr en una ventana de mantenimiento.
+
+En SQLite la tabla queda común: solo se vuelve NOT NULL creado_en y se agrega
+el índice del kardex por producto.
+"""
+from datetime import date
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.indices_online import crear_indice, eliminar_indice, es_postgresql
+from particiones import sql_particiones, sumar_meses
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, Sequence[str], None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDICES = [
+    ('ix_movimientos_stock_id', ['id']),
+    ('ix_movimientos_stock_producto_creado', ['producto_id', 'creado_en']),
+    ('ix_movimientos_stock_almacen_creado', ['almacen_id', 'creado_en']),
+    ('ix_movimientos_stock_referencia', ['referencia_tipo', 'referencia_id']),
+]
+INDICE_KARDEX = ('ix_movimientos_stock_producto_id', ['producto_id', 'id'])
+
+
+def _reconstruir(particionada: bool):
+    """Copia movimientos_stock a una tabla nueva (particionada o común) y la reemplaza"""
+    op.execute("ALTER SEQUENCE movimientos_stock_id_seq OWNED BY NONE")
+    op.execute("""
+        CREATE TABLE movimientos_stock_nueva (
+            LIKE movimientos_stock INCLUDING DEFAULTS,
+            FOREIGN KEY (producto_id) REFERENCES productos (id),
+            FOREIGN KEY (almacen_id) REFERENCES almacenes (id),
+            PRIMARY KEY ({pk})
+        ) {particion}
+    """.format(
+        pk='id, creado_en' if particionada else 'id',
+        particion='PARTITION BY RANGE (creado_en)' if particionada else ''
+    ))
+    if particionada:
+        primero = op.get_bind().execute(sa.text("SELECT MIN(creado_en) FROM movimientos_stock")).scalar()
+        hoy = date.today()
+        desde = primero.date() if primero else hoy
+        for sentencia in sql_particiones('movimientos_stock_nueva', desde, sumar_meses(hoy, 3)):
+            op.execute(sentencia)
+        op.execute("CREATE TABLE movimientos_stock_nueva_default PARTITION OF movimientos_stock_nueva DEFAULT")
+    op.execute("INSERT INTO movimientos_stock_nueva SELECT * FROM movimientos_stock")
+    op.execute("DROP TABLE movimientos_stock")
+    op.execute("ALTER TABLE movimientos_stock_nueva RENAME TO movimientos_stock")
+    op.execute("ALTER SEQUENCE movimientos_stock_id_seq OWNED BY movimientos_stock.id")
+    for sufijo in ('pkey', 'producto_id_fkey', 'almacen_id_fkey'):
+        op.execute(f"ALTER TABLE movimientos_stock RENAME CONSTRAINT movimientos_stock_nueva_{sufijo} TO movimientos_stock_{sufijo}")
+    if particionada:
+        # Las particiones conservan el nombre con que se crearon: se normalizan al nombre final
+        op.execute("""
+            DO $$
+            DECLARE particion record;
+            BEGIN
+                FOR particion IN
+                    SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+                    WHERE i.inhparent = 'movimientos_stock'::regclass
+                LOOP
+                    EXECUTE format('ALTER TABLE %I RENAME TO %I', particion.relname,
+                                   replace(particion.relname, 'movimientos_stock_nueva', 'movimientos_stock'));
+                END LOOP;
+            END $$
+        """)
+    # Sobre una tabla particionada no existe CREATE INDEX CONCURRENTLY
+    for nombre, columnas in INDICES + ([INDICE_KARDEX] if particionada else []):
+        op.create_index(nombre, 'movimientos_stock', columnas)
+
+
+def upgrade() -> None:
+    op.execute("UPDATE movimientos_stock SET creado_en = CURRENT_TIMESTAMP WHERE creado_en IS NULL")
+    if es_postgresql():
+        _reconstruir(particionada=True)
+        op.execute("ALTER TABLE movimientos_stock ALTER COLUMN creado_en SET NOT NULL")
+    else:
+        with op.batch_alter_table('movimientos_stock') as batch_op:
+            batch_op.alter_column('creado_en', existing_type=sa.DateTime(timezone=True), nullable=False,
+                                  existing_server_default=sa.func.now())
+        crear_indice(INDICE_KARDEX[0], 'movimientos_stock', INDICE_KARDEX[1])
+
+
+def downgrade() -> None:
+    if es_postgresql():
+        _reconstruir(particionada=False)
+        op.execute("ALTER TABLE movimientos_stock ALTER COLUMN creado_en DROP NOT NULL")
+    else:
+        eliminar_indice(INDICE_KARDEX[0], 'movimientos_stock')
+        with op.batch_alter_table('movimientos_stock') as batch_op:
+            batch_op.alter_column('creado_en', existing_type=sa.DateTime(timezone=True), nullable=True,
+                                  existing_server_default=sa.func.now())
@@ -0,0 +1,41 @@
+"""snapshots de stock por fecha
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, Sequence[str], None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('stock_snapshots',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('fecha', sa.Date(), nullable=False),
+    sa.Column('producto_id', sa.Integer(), nullable=False),
+    sa.Column('almacen_id', sa.Integer(), nullable=False),
+    sa.Column('cantidad', sa.Integer(), nullable=False),
+    sa.Column('creado_en', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['almacen_id'], ['almacenes.id'], ),
+    sa.ForeignKeyConstraint(['producto_id'], ['productos.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('fecha', 'producto_id', 'almacen_id', name='uq_stock_snapshots_fecha_producto_almacen')
+    )
+    op.create_index(op.f('ix_stock_snapshots_id'), 'stock_snapshots', ['id'], unique=False)
+    op.create_index('ix_stock_snapshots_producto_fecha', 'stock_snapshots', ['producto_id', 'fecha'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_stock_snapshots_producto_fecha', table_name='stock_snapshots')
+    op.drop_index(op.f('ix_stock_snapshots_id'), table_name='stock_snapshots')
+    op.drop_table('stock_snapshots')
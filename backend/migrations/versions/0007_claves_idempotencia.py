@@ -0,0 +1,41 @@
+"""claves de idempotencia
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, Sequence[str], None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('claves_idempotencia',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('clave', sa.String(length=255), nullable=False),
+    sa.Column('metodo', sa.String(length=10), nullable=False),
+    sa.Column('ruta', sa.String(length=500), nullable=False),
+    sa.Column('huella', sa.String(length=64), nullable=False),
+    sa.Column('estado_http', sa.Integer(), nullable=True),
+    sa.Column('content_type', sa.String(length=255), nullable=True),
+    sa.Column('cuerpo', sa.LargeBinary(), nullable=True),
+    sa.Column('creado_en', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('expira_en', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('clave', 'metodo', 'ruta', name='uq_claves_idempotencia_clave_metodo_ruta')
+    )
+    op.create_index(op.f('ix_claves_idempotencia_expira_en'), 'claves_idempotencia', ['expira_en'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_claves_idempotencia_expira_en'), table_name='claves_idempotencia')
+    op.drop_table('claves_idempotencia')
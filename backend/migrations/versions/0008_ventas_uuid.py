@@ -0,0 +1,31 @@
+"""uuid de ventas generado por el POS
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.indices_online import crear_unique_constraint, eliminar_unique_constraint
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, Sequence[str], None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('ventas', sa.Column('uuid', sa.String(length=36), nullable=True))
+    crear_unique_constraint('ventas_uuid_key', 'ventas', ['uuid'])
+
+
+def downgrade() -> None:
+    eliminar_unique_constraint('ventas_uuid_key', 'ventas')
+    with op.batch_alter_table('ventas') as batch_op:
+        batch_op.drop_column('uuid')
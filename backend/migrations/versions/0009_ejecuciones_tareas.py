@@ -0,0 +1,38 @@
+"""historial y elección de ejecuciones de tareas programadas
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0009'
+down_revision: Union[str, Sequence[str], None] = '0008'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('ejecuciones_tareas',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('nombre', sa.String(length=100), nullable=False),
+    sa.Column('programada_para', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('worker', sa.String(length=255), nullable=True),
+    sa.Column('estado', sa.String(length=20), nullable=False),
+    sa.Column('inicio', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('fin', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('duracion_ms', sa.Integer(), nullable=True),
+    sa.Column('detalle', sa.Text(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('nombre', 'programada_para', name='uq_ejecuciones_tareas_nombre_programada')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('ejecuciones_tareas')
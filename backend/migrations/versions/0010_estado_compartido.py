@@ -0,0 +1,32 @@
+"""estado compartido entre workers
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0010'
+down_revision: Union[str, Sequence[str], None] = '0009'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('estado_compartido',
+    sa.Column('clave', sa.String(length=100), nullable=False),
+    sa.Column('valor', sa.Text(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('actualizado_en', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('clave')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('estado_compartido')
@@ -0,0 +1,30 @@
+"""anulación de créditos: flag en el crédito y tipo de pago
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0011'
+down_revision: Union[str, Sequence[str], None] = '0010'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('creditos_clientes', sa.Column('anulado', sa.Boolean(), server_default=sa.false(), nullable=False))
+    op.add_column('pagos_creditos', sa.Column('tipo', sa.String(length=20), server_default='PAGO', nullable=False))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('pagos_creditos') as batch_op:
+        batch_op.drop_column('tipo')
+    with op.batch_alter_table('creditos_clientes') as batch_op:
+        batch_op.drop_column('anulado')
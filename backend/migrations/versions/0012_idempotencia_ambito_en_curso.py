@@ -0,0 +1,38 @@
+"""claves de idempotencia por ámbito y con reserva en curso que vence
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.indices_online import crear_unique_constraint, eliminar_unique_constraint
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0012'
+down_revision: Union[str, Sequence[str], None] = '0011'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('claves_idempotencia', sa.Column('ambito', sa.String(length=100), server_default='', nullable=False))
+    op.add_column('claves_idempotencia', sa.Column('en_curso_hasta', sa.DateTime(timezone=True), nullable=True))
+    eliminar_unique_constraint('uq_claves_idempotencia_clave_metodo_ruta', 'claves_idempotencia')
+    crear_unique_constraint('uq_claves_idempotencia_ambito_clave', 'claves_idempotencia',
+                            ['ambito', 'clave', 'metodo', 'ruta'])
+
+
+def downgrade() -> None:
+    eliminar_unique_constraint('uq_claves_idempotencia_ambito_clave', 'claves_idempotencia')
+    op.execute("DELETE FROM claves_idempotencia WHERE ambito <> ''")
+    crear_unique_constraint('uq_claves_idempotencia_clave_metodo_ruta', 'claves_idempotencia',
+                            ['clave', 'metodo', 'ruta'])
+    with op.batch_alter_table('claves_idempotencia') as batch_op:
+        batch_op.drop_column('en_curso_hasta')
+        batch_op.drop_column('ambito')
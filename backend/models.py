@@ -1,8 +1,9 @@
 from sqlalchemy import (
-    Column, Integer, String, Boolean, DateTime, Numeric, Text, ForeignKey, Enum, Date
+    Column, Integer, String, Boolean, DateTime, Numeric, Text, ForeignKey, Enum, Date,
+    Index, UniqueConstraint, LargeBinary
 )
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, false
 from database import Base
 import enum
 
@@ -80,6 +81,9 @@ class Empresa(Base):
 
 class Usuario(Base):
     __tablename__ = "usuarios"
+    __table_args__ = (
+        Index('ix_usuarios_empresa_activo', 'empresa_id', 'activo'),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     empresa_id = Column(Integer, ForeignKey("empresas.id"), nullable=False)
@@ -100,6 +104,9 @@ class Usuario(Base):
 
 class Rol(Base):
     __tablename__ = "roles"
+    __table_args__ = (
+        Index('ix_roles_empresa_nombre', 'empresa_id', 'nombre'),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     empresa_id = Column(Integer, ForeignKey("empresas.id"), nullable=False)
@@ -121,6 +128,9 @@ class Permiso(Base):
 
 class RolPermiso(Base):
     __tablename__ = "rol_permisos"
+    __table_args__ = (
+        Index('ix_rol_permisos_permiso_id', 'permiso_id'),
+    )
     
     rol_id = Column(Integer, ForeignKey("roles.id"), primary_key=True)
     permiso_id = Column(Integer, ForeignKey("permisos.id"), primary_key=True)
@@ -130,6 +140,9 @@ class RolPermiso(Base):
 
 class UsuarioRol(Base):
     __tablename__ = "usuario_roles"
+    __table_args__ = (
+        Index('ix_usuario_roles_rol_id', 'rol_id'),
+    )
     
     usuario_id = Column(Integer, ForeignKey("usuarios.id"), primary_key=True)
     rol_id = Column(Integer, ForeignKey("roles.id"), primary_key=True)
@@ -139,6 +152,9 @@ class UsuarioRol(Base):
 
 class Cliente(Base):
     __tablename__ = "clientes"
+    __table_args__ = (
+        Index('ix_clientes_empresa_estado', 'empresa_id', 'estado'),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     empresa_id = Column(Integer, ForeignKey("empresas.id"), nullable=False)
@@ -152,6 +168,7 @@ class Cliente(Base):
     acepta_cheque = Column(Boolean, default=False)
     descuento_porcentaje = Column(Numeric(5, 2), default=0)
     limite_credito = Column(Numeric(15, 2), default=0)  # Límite máximo de crédito
+    credito_usado = Column(Numeric(15, 2), nullable=False, default=0, server_default='0')  # Mantenido por saldo_credito.py
     estado = Column(Boolean, default=True)
     creado_en = Column(DateTime(timezone=True), server_default=func.now())
     
@@ -162,6 +179,11 @@ class Cliente(Base):
 class CreditoCliente(Base):
     """Cada transacción a crédito de un cliente"""
     __tablename__ = "creditos_clientes"
+    __table_args__ = (
+        Index('ix_creditos_clientes_cliente_pagado', 'cliente_id', 'pagado'),
+        Index('ix_creditos_clientes_cliente_fecha', 'cliente_id', 'fecha_venta'),
+        Index('ix_creditos_clientes_venta_id', 'venta_id'),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     cliente_id = Column(Integer, ForeignKey("clientes.id"), nullable=False)
@@ -171,6 +193,7 @@ class CreditoCliente(Base):
     descripcion = Column(Text)
     fecha_venta = Column(Date, default=func.current_date())
     pagado = Column(Boolean, default=False)
+    anulado = Column(Boolean, nullable=False, default=False, server_default=false())  # Cerrado por anulación de la venta
     creado_en = Column(DateTime(timezone=True), server_default=func.now())
     
     cliente = relationship("Cliente", back_populates="creditos")
@@ -179,10 +202,15 @@ class CreditoCliente(Base):
 class PagoCredito(Base):
     """Pagos parciales o totales a un crédito"""
     __tablename__ = "pagos_creditos"
+    __table_args__ = (
+        Index('ix_pagos_creditos_credito_fecha', 'credito_id', 'fecha_pago'),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     credito_id = Column(Integer, ForeignKey("creditos_clientes.id"), nullable=False)
     monto = Column(Numeric(15, 2), nullable=False)
+    # 'PAGO' cobro al cliente; 'DEVOLUCION' (negativo) cobro devuelto y 'ANULACION' deuda cancelada al anular la venta
+    tipo = Column(String(20), nullable=False, default='PAGO', server_default='PAGO')
     fecha_pago = Column(DateTime(timezone=True), server_default=func.now())
     observacion = Column(Text)
     
@@ -190,6 +218,9 @@ class PagoCredito(Base):
 
 class Proveedor(Base):
     __tablename__ = "proveedores"
+    __table_args__ = (
+        Index('ix_proveedores_empresa_estado', 'empresa_id', 'estado'),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     empresa_id = Column(Integer, ForeignKey("empresas.id"), nullable=False)
@@ -207,6 +238,10 @@ class Proveedor(Base):
 
 class ProveedorProducto(Base):
     __tablename__ = "proveedor_productos"
+    __table_args__ = (
+        Index('ix_proveedor_productos_proveedor_id', 'proveedor_id'),
+        Index('ix_proveedor_productos_producto_id', 'producto_id'),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     proveedor_id = Column(Integer, ForeignKey("proveedores.id"), nullable=False)
@@ -218,6 +253,10 @@ class ProveedorProducto(Base):
 
 class DeudaProveedor(Base):
     __tablename__ = "deudas_proveedores"
+    __table_args__ = (
+        Index('ix_deudas_proveedores_proveedor_creado', 'proveedor_id', 'creado_en'),
+        Index('ix_deudas_proveedores_pagado_limite', 'pagado', 'fecha_limite'),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     proveedor_id = Column(Integer, ForeignKey("proveedores.id"), nullable=False)
@@ -233,6 +272,9 @@ class DeudaProveedor(Base):
 
 class Categoria(Base):
     __tablename__ = "categorias"
+    __table_args__ = (
+        Index('ix_categorias_empresa_id', 'empresa_id'),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     empresa_id = Column(Integer, ForeignKey("empresas.id"), nullable=False)
@@ -243,6 +285,9 @@ class Categoria(Base):
 
 class Marca(Base):
     __tablename__ = "marcas"
+    __table_args__ = (
+        Index('ix_marcas_empresa_id', 'empresa_id'),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     empresa_id = Column(Integer, ForeignKey("empresas.id"), nullable=False)
@@ -253,6 +298,12 @@ class Marca(Base):
 
 class Producto(Base):
     __tablename__ = "productos"
+    __table_args__ = (
+        Index('ix_productos_empresa_activo', 'empresa_id', 'activo'),
+        Index('ix_productos_empresa_vencimiento', 'empresa_id', 'fecha_vencimiento'),
+        Index('ix_productos_categoria_id', 'categoria_id'),
+        Index('ix_productos_marca_id', 'marca_id'),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     empresa_id = Column(Integer, ForeignKey("empresas.id"), nullable=False)
@@ -276,6 +327,9 @@ class Producto(Base):
 
 class MateriaLaboratorio(Base):
     __tablename__ = "materias_laboratorio"
+    __table_args__ = (
+        Index('ix_materias_laboratorio_empresa_estado', 'empresa_id', 'estado'),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     empresa_id = Column(Integer, ForeignKey("empresas.id"), nullable=False)
@@ -291,6 +345,9 @@ class MateriaLaboratorio(Base):
 
 class Almacen(Base):
     __tablename__ = "almacenes"
+    __table_args__ = (
+        Index('ix_almacenes_empresa_id', 'empresa_id'),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     empresa_id = Column(Integer, ForeignKey("empresas.id"), nullable=False)
@@ -303,6 +360,10 @@ class Almacen(Base):
 
 class StockActual(Base):
     __tablename__ = "stock_actual"
+    __table_args__ = (
+        UniqueConstraint('producto_id', 'almacen_id', name='uq_stock_actual_producto_almacen'),
+        Index('ix_stock_actual_almacen_id', 'almacen_id'),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     producto_id = Column(Integer, ForeignKey("productos.id"), nullable=False)
@@ -315,6 +376,14 @@ class StockActual(Base):
 
 class MovimientoStock(Base):
     __tablename__ = "movimientos_stock"
+    __table_args__ = (
+        Index('ix_movimientos_stock_producto_creado', 'producto_id', 'creado_en'),
+        Index('ix_movimientos_stock_almacen_creado', 'almacen_id', 'creado_en'),
+        Index('ix_movimientos_stock_referencia', 'referencia_tipo', 'referencia_id'),
+        Index('ix_movimientos_stock_producto_id', 'producto_id', 'id'),
+    )
+    # En PostgreSQL la tabla está particionada por mes sobre creado_en (migración 0005,
+    # particiones.py) y su PK real es (id, creado_en)
     
     id = Column(Integer, primary_key=True, index=True)
     producto_id = Column(Integer, ForeignKey("productos.id"), nullable=False)
@@ -323,13 +392,34 @@ class MovimientoStock(Base):
     cantidad = Column(Integer, nullable=False)
     referencia_tipo = Column(String(50))
     referencia_id = Column(Integer)
-    creado_en = Column(DateTime(timezone=True), server_default=func.now())
+    creado_en = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
     
     producto = relationship("Producto", back_populates="movimientos")
     almacen = relationship("Almacen", back_populates="movimientos")
 
+class StockSnapshot(Base):
+    """Stock por (producto, almacén) al cierre de `fecha` según el ledger de movimientos"""
+    __tablename__ = "stock_snapshots"
+    __table_args__ = (
+        UniqueConstraint('fecha', 'producto_id', 'almacen_id', name='uq_stock_snapshots_fecha_producto_almacen'),
+        Index('ix_stock_snapshots_producto_fecha', 'producto_id', 'fecha'),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    fecha = Column(Date, nullable=False)
+    producto_id = Column(Integer, ForeignKey("productos.id"), nullable=False)
+    almacen_id = Column(Integer, ForeignKey("almacenes.id"), nullable=False)
+    cantidad = Column(Integer, nullable=False)
+    creado_en = Column(DateTime(timezone=True), server_default=func.now())
+
 class Venta(Base):
     __tablename__ = "ventas"
+    __table_args__ = (
+        Index('ix_ventas_empresa_creado', 'empresa_id', 'creado_en'),
+        Index('ix_ventas_empresa_estado_creado', 'empresa_id', 'estado', 'creado_en'),
+        Index('ix_ventas_cliente_id', 'cliente_id'),
+        Index('ix_ventas_usuario_id', 'usuario_id'),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     empresa_id = Column(Integer, ForeignKey("empresas.id"), nullable=False)
@@ -342,6 +432,7 @@ class Venta(Base):
     tipo_pago = Column(Enum(TipoPago), default=TipoPago.EFECTIVO)
     es_delivery = Column(Boolean, default=False)
     estado = Column(Enum(EstadoVenta), default=EstadoVenta.BORRADOR)
+    uuid = Column(String(36), unique=True)  # generado por el POS en ventas offline (/ventas/sync)
     creado_en = Column(DateTime(timezone=True), server_default=func.now())
     
     empresa = relationship("Empresa", back_populates="ventas")
@@ -354,6 +445,11 @@ class Venta(Base):
 
 class VentaItem(Base):
     __tablename__ = "venta_items"
+    __table_args__ = (
+        Index('ix_venta_items_venta_id', 'venta_id'),
+        Index('ix_venta_items_producto_id', 'producto_id'),
+        Index('ix_venta_items_materia_laboratorio_id', 'materia_laboratorio_id'),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     venta_id = Column(Integer, ForeignKey("ventas.id"), nullable=False)
@@ -370,6 +466,9 @@ class VentaItem(Base):
 
 class Funcionario(Base):
     __tablename__ = "funcionarios"
+    __table_args__ = (
+        Index('ix_funcionarios_empresa_activo', 'empresa_id', 'activo'),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     empresa_id = Column(Integer, ForeignKey("empresas.id"), nullable=False)
@@ -388,6 +487,9 @@ class Funcionario(Base):
 
 class AdelantoSalario(Base):
     __tablename__ = "adelantos_salario"
+    __table_args__ = (
+        Index('ix_adelantos_salario_funcionario_creado', 'funcionario_id', 'creado_en'),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     funcionario_id = Column(Integer, ForeignKey("funcionarios.id"), nullable=False)
@@ -398,6 +500,10 @@ class AdelantoSalario(Base):
 
 class CicloSalario(Base):
     __tablename__ = "ciclos_salario"
+    __table_args__ = (
+        UniqueConstraint('funcionario_id', 'periodo', name='uq_ciclos_salario_funcionario_periodo'),
+        Index('ix_ciclos_salario_periodo', 'periodo'),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     funcionario_id = Column(Integer, ForeignKey("funcionarios.id"), nullable=False)
@@ -414,6 +520,9 @@ class CicloSalario(Base):
 
 class Vehiculo(Base):
     __tablename__ = "vehiculos"
+    __table_args__ = (
+        Index('ix_vehiculos_empresa_id', 'empresa_id'),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     empresa_id = Column(Integer, ForeignKey("empresas.id"), nullable=False)
@@ -427,6 +536,13 @@ class Vehiculo(Base):
 
 class Entrega(Base):
     __tablename__ = "entregas"
+    __table_args__ = (
+        Index('ix_entregas_estado', 'estado'),
+        Index('ix_entregas_venta_id', 'venta_id'),
+        Index('ix_entregas_fecha_entrega', 'fecha_entrega'),
+        Index('ix_entregas_vehiculo_id', 'vehiculo_id'),
+        Index('ix_entregas_responsable_usuario_id', 'responsable_usuario_id'),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     venta_id = Column(Integer, ForeignKey("ventas.id"), nullable=False)
@@ -475,3 +591,50 @@ class PreferenciaUsuario(Base):
     color_primario = Column(String(50), default="#0044CC")
     
     usuario = relationship("Usuario", back_populates="preferencias")
+
+class ClaveIdempotencia(Base):
+    """Respuesta guardada por Idempotency-Key; estado_http NULL mientras la petición está en curso"""
+    __tablename__ = "claves_idempotencia"
+    __table_args__ = (
+        UniqueConstraint('ambito', 'clave', 'metodo', 'ruta', name='uq_claves_idempotencia_ambito_clave'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    ambito = Column(String(100), nullable=False, server_default='')  # usuario:<id>, empresa:<id> o ''
+    clave = Column(String(255), nullable=False)
+    metodo = Column(String(10), nullable=False)
+    ruta = Column(String(500), nullable=False)
+    huella = Column(String(64), nullable=False)
+    estado_http = Column(Integer)
+    content_type = Column(String(255))
+    cuerpo = Column(LargeBinary)
+    en_curso_hasta = Column(DateTime(timezone=True))  # Vence la reserva de un request en curso
+    creado_en = Column(DateTime(timezone=True), server_default=func.now())
+    expira_en = Column(DateTime(timezone=True), nullable=False, index=True)
+
+class EjecucionTarea(Base):
+    """Una corrida de una tarea programada; la fila única por (nombre, programada_para) elige al worker"""
+    __tablename__ = "ejecuciones_tareas"
+    __table_args__ = (
+        UniqueConstraint('nombre', 'programada_para', name='uq_ejecuciones_tareas_nombre_programada'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    nombre = Column(String(100), nullable=False)
+    programada_para = Column(DateTime(timezone=True), nullable=False)
+    worker = Column(String(255))
+    estado = Column(String(20), nullable=False)
+    inicio = Column(DateTime(timezone=True))
+    fin = Column(DateTime(timezone=True))
+    duracion_ms = Column(Integer)
+    detalle = Column(Text)
+
+
+class EstadoCompartido(Base):
+    """Valor JSON compartido entre workers; version sube en cada escritura para invalidar caches"""
+    __tablename__ = "estado_compartido"
+    
+    clave = Column(String(100), primary_key=True)
+    valor = Column(Text, nullable=False)
+    version = Column(Integer, nullable=False, default=1)
+    actualizado_en = Column(DateTime(timezone=True), nullable=False)
@@ -0,0 +1,119 @@
+"""
+Particiones mensuales por rango de creado_en (solo PostgreSQL).
+
+movimientos_stock queda particionada por mes desde la migración 0005: las
+consultas con rango de fechas solo leen los meses involucrados (partition
+pruning) y los meses viejos se pueden archivar con DETACH PARTITION. Una
+partición DEFAULT recibe lo que caiga fuera de los meses creados (fechas
+futuras, relojes corridos). Como PostgreSQL no deja crear la partición de un
+mes si la DEFAULT ya tiene filas de ese mes, al crearla esas filas se mueven a
+la tabla nueva antes de adjuntarla. Cada mes va en su propio savepoint: un mes
+que falla queda en el log y no frena a los demás.
+
+En SQLite la tabla es común y todo esto es un no-op.
+"""
+import logging
+from datetime import date, datetime, timezone
+
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+logger = logging.getLogger(__name__)
+
+TABLAS_PARTICIONADAS = ('movimientos_stock',)
+
+
+def sumar_meses(fecha: date, meses: int) -> date:
+    total = fecha.year * 12 + fecha.month - 1 + meses
+    return date(total // 12, total % 12 + 1, 1)
+
+
+def nombre_particion(tabla: str, mes: date) -> str:
+    return f"{tabla}_p{mes.year:04d}_{mes.month:02d}"
+
+
+def limites_mes(mes: date) -> str:
+    inicio = date(mes.year, mes.month, 1)
+    fin = sumar_meses(inicio, 1)
+    return f"FOR VALUES FROM ('{inicio.isoformat()} 00:00:00+00') TO ('{fin.isoformat()} 00:00:00+00')"
+
+
+def sql_particion_mensual(tabla: str, mes: date) -> str:
+    return f"CREATE TABLE IF NOT EXISTS {nombre_particion(tabla, mes)} PARTITION OF {tabla} {limites_mes(mes)}"
+
+
+def sql_particiones(tabla: str, desde: date, hasta: date):
+    """Una sentencia por mes en [desde, hasta], ambos meses incluidos"""
+    mes = date(desde.year, desde.month, 1)
+    sentencias = []
+    while mes <= hasta:
+        sentencias.append(sql_particion_mensual(tabla, mes))
+        mes = sumar_meses(mes, 1)
+    return sentencias
+
+
+async def particion_default(conn, tabla: str):
+    """Nombre de la partición DEFAULT de `tabla`, o None"""
+    return (await conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass(:tabla) AND pg_get_expr(c.relpartbound, c.oid) = 'DEFAULT'"
+    ), {'tabla': tabla})).scalar()
+
+
+async def crear_particion(conn, tabla: str, mes: date, default: str = None) -> bool:
+    """Crea la partición del mes; si la DEFAULT tiene filas de ese mes las pasa a la nueva. False si ya existía"""
+    nombre = nombre_particion(tabla, mes)
+    if (await conn.execute(text("SELECT to_regclass(:nombre)"), {'nombre': nombre})).scalar():
+        return False
+    fin = sumar_meses(mes, 1)
+    rango = {
+        'inicio': datetime(mes.year, mes.month, 1, tzinfo=timezone.utc),
+        'fin': datetime(fin.year, fin.month, 1, tzinfo=timezone.utc),
+    }
+    filtro = "creado_en >= :inicio AND creado_en < :fin"
+    en_default = default and (await conn.execute(
+        text(f"SELECT EXISTS (SELECT 1 FROM {default} WHERE {filtro})"), rango
+    )).scalar()
+    if not en_default:
+        await conn.execute(text(sql_particion_mensual(tabla, mes)))
+        return True
+    # Tabla suelta con las filas del mes sacadas de la DEFAULT; al adjuntarla
+    # PostgreSQL crea los índices y la clave primaria de la tabla madre
+    await conn.execute(text(f"CREATE TABLE {nombre} (LIKE {tabla} INCLUDING DEFAULTS)"))
+    await conn.execute(text(
+        f"WITH movidas AS (DELETE FROM {default} WHERE {filtro} RETURNING *) "
+        f"INSERT INTO {nombre} SELECT * FROM movidas"
+    ), rango)
+    await conn.execute(text(f"ALTER TABLE {tabla} ATTACH PARTITION {nombre} {limites_mes(mes)}"))
+    logger.info(f"{nombre}: filas movidas desde {default}")
+    return True
+
+
+async def asegurar_particiones(conn, meses_adelante: int = 3, hoy: date = None):
+    """Crea las particiones del mes actual y los próximos; devuelve las tablas particionadas tocadas
+
+    `conn` tiene que estar en una transacción (cada mes usa un savepoint).
+    """
+    if conn.dialect.name != 'postgresql':
+        return []
+    hoy = hoy or date.today()
+    # Dos workers arrancando a la vez no compiten por el mismo mes
+    await conn.execute(text("SELECT pg_advisory_xact_lock(hashtext('asegurar_particiones'))"))
+    tocadas = []
+    for tabla in TABLAS_PARTICIONADAS:
+        particionada = (await conn.execute(
+            text("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:tabla)"), {'tabla': tabla}
+        )).scalar()
+        if not particionada:
+            continue
+        default = await particion_default(conn, tabla)
+        mes = date(hoy.year, hoy.month, 1)
+        while mes <= sumar_meses(hoy, meses_adelante):
+            try:
+                async with conn.begin_nested():
+                    await crear_particion(conn, tabla, mes, default)
+            except SQLAlchemyError:
+                logger.exception(f"No se pudo crear {nombre_particion(tabla, mes)}")
+            mes = sumar_meses(mes, 1)
+        tocadas.append(tabla)
+    return tocadas
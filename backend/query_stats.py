@@ -0,0 +1,64 @@
+"""
+Conteo y tiempo de consultas SQL por request.
+
+Los eventos before/after_cursor_execute de SQLAlchemy acumulan en un
+contextvar las consultas del request en curso; el middleware de server.py
+lo inicia por request y publica el resultado en X-Query-Count y Server-Timing.
+"""
+import contextvars
+import time
+from dataclasses import dataclass
+
+from sqlalchemy import event
+
+
+@dataclass
+class EstadisticasSQL:
+    consultas: int = 0
+    tiempo_db: float = 0.0  # segundos
+
+
+_estadisticas: contextvars.ContextVar = contextvars.ContextVar('estadisticas_sql', default=None)
+
+
+def iniciar():
+    """Empieza a contar en el contexto actual; devuelve (estadísticas, token para terminar)"""
+    estadisticas = EstadisticasSQL()
+    return estadisticas, _estadisticas.set(estadisticas)
+
+
+def terminar(token):
+    _estadisticas.reset(token)
+
+
+def actuales():
+    return _estadisticas.get()
+
+
+def _antes_de_ejecutar(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('inicio_consultas', []).append(time.perf_counter())
+
+
+def _despues_de_ejecutar(conn, cursor, statement, parameters, context, executemany):
+    inicio = conn.info['inicio_consultas'].pop()
+    estadisticas = _estadisticas.get()
+    if estadisticas is not None:
+        estadisticas.consultas += 1
+        estadisticas.tiempo_db += time.perf_counter() - inicio
+
+
+def _al_fallar(exception_context):
+    # La consulta fallida no llega a after_cursor_execute: se descarta su inicio
+    conn = exception_context.connection
+    if conn is not None and conn.info.get('inicio_consultas'):
+        conn.info['inicio_consultas'].pop()
+
+
+def instrumentar_engine(async_engine):
+    """Registra los listeners en el engine síncrono subyacente (una vez por engine)"""
+    sync_engine = async_engine.sync_engine
+    if event.contains(sync_engine, 'before_cursor_execute', _antes_de_ejecutar):
+        return
+    event.listen(sync_engine, 'before_cursor_execute', _antes_de_ejecutar)
+    event.listen(sync_engine, 'after_cursor_execute', _despues_de_ejecutar)
+    event.listen(sync_engine, 'handle_error', _al_fallar)
@@ -0,0 +1,56 @@
+"""
+Saldo de crédito mantenido por cliente (Cliente.credito_usado).
+
+Cada alta de crédito reserva el monto con un UPDATE condicional que aplica
+limite_credito en la misma sentencia (límite 0 = sin límite): el lock de fila
+del UPDATE serializa a los requests concurrentes del mismo cliente, así que
+dos ventas a crédito no pueden pasar juntas el límite. Los pagos lo liberan.
+`recalcular_credito_usado` reconstruye el saldo desde creditos_clientes.
+"""
+from decimal import Decimal
+
+from sqlalchemy import select, update, func, or_
+
+from models import Cliente, CreditoCliente
+
+clientes = Cliente.__table__
+
+
+async def reservar_credito(db, cliente_id: int, monto: Decimal) -> bool:
+    """Suma `monto` al crédito usado si entra en el límite; False si lo excede"""
+    result = await db.execute(
+        update(clientes)
+        .where(
+            clientes.c.id == cliente_id,
+            or_(
+                func.coalesce(clientes.c.limite_credito, 0) <= 0,
+                clientes.c.credito_usado + monto <= clientes.c.limite_credito
+            )
+        )
+        .values(credito_usado=clientes.c.credito_usado + monto)
+    )
+    return result.rowcount == 1
+
+
+async def liberar_credito(db, cliente_id: int, monto: Decimal):
+    """Resta `monto` del crédito usado (pagos, anulaciones)"""
+    await db.execute(
+        update(clientes)
+        .where(clientes.c.id == cliente_id)
+        .values(credito_usado=clientes.c.credito_usado - monto)
+    )
+
+
+async def recalcular_credito_usado(db, empresa_id: int = None):
+    """Reconstruye credito_usado desde los créditos pendientes; devuelve los ids corregidos"""
+    pendiente = func.coalesce(
+        select(func.sum(CreditoCliente.monto_pendiente))
+        .where(CreditoCliente.cliente_id == clientes.c.id, CreditoCliente.pagado == False)
+        .scalar_subquery(),
+        0
+    )
+    stmt = update(clientes).where(clientes.c.credito_usado != pendiente).values(credito_usado=pendiente)
+    if empresa_id is not None:
+        stmt = stmt.where(clientes.c.empresa_id == empresa_id)
+    result = await db.execute(stmt.returning(clientes.c.id))
+    return sorted(result.scalars().all())
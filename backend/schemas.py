@@ -1,9 +1,12 @@
-from pydantic import BaseModel, Field, ConfigDict
+from pydantic import BaseModel, Field, ConfigDict, computed_field
 from typing import Optional, List
 from datetime import datetime, date
 from decimal import Decimal
+from uuid import UUID
 from enum import Enum
 
+from variantes_imagen import url_variante
+
 # Enums
 class RolSistema(str, Enum):
     ADMIN = "ADMIN"
@@ -215,6 +218,11 @@ class DeudaProveedorResponse(DeudaProveedorBase):
     fecha_pago: Optional[date] = None
     creado_en: Optional[datetime] = None
 
+class DeudasPagarRequest(BaseModel):
+    empresa_id: int
+    ids: Optional[List[int]] = None
+    proveedor_id: Optional[int] = None
+
 # Categoria
 class CategoriaBase(BaseModel):
     nombre: str
@@ -259,6 +267,17 @@ class ProductoResponse(ProductoBase):
     empresa_id: int
     activo: bool
 
+    # Derivados de la imagen subida (variantes_imagen.py): mini para grillas, media para fichas
+    @computed_field
+    @property
+    def imagen_media_url(self) -> Optional[str]:
+        return url_variante(self.imagen_url, 'media')
+
+    @computed_field
+    @property
+    def imagen_mini_url(self) -> Optional[str]:
+        return url_variante(self.imagen_url, 'mini')
+
 class ProductoConStock(ProductoResponse):
     stock_total: int = 0
     categoria_nombre: Optional[str] = None
@@ -352,6 +371,7 @@ class VentaItemResponse(VentaItemBase):
     id: int
     venta_id: int
     total: Decimal
+    descripcion: Optional[str] = None
 
 class VentaBase(BaseModel):
     cliente_id: int
@@ -364,6 +384,17 @@ class VentaCreate(VentaBase):
     usuario_id: int
     items: List[VentaItemCreate]
 
+class VentaSync(VentaBase):
+    """Venta hecha offline en el POS; `uuid` la identifica entre reintentos"""
+    uuid: UUID
+    creado_en: Optional[datetime] = None
+    items: List[VentaItemCreate]
+
+class VentasSyncRequest(BaseModel):
+    empresa_id: int
+    usuario_id: int
+    ventas: List[VentaSync]
+
 class VentaResponse(VentaBase):
     model_config = ConfigDict(from_attributes=True)
     id: int
@@ -427,6 +458,11 @@ class CicloSalarioResponse(CicloSalarioBase):
     id: int
     funcionario_id: int
 
+class CiclosSalarioPagarRequest(BaseModel):
+    empresa_id: int
+    ids: Optional[List[int]] = None
+    periodo: Optional[str] = Field(None, pattern=r'^\d{4}-\d{2}$')
+
 # Vehiculo
 class VehiculoBase(BaseModel):
     tipo: TipoVehiculo
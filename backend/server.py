@@ -1,9 +1,8 @@
-from fastapi import FastAPI, APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, Query, status, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import Response
+from fastapi.responses import Response, PlainTextResponse, StreamingResponse, JSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func as func_sql, and_, or_, update
+from sqlalchemy import select, insert, func as func_sql, and_, or_, update, case, literal, String, Date, Boolean
 from sqlalchemy.orm import selectinload
 from dotenv import load_dotenv
 from pathlib import Path
@@ -16,8 +15,11 @@ import httpx
 import bcrypt
 import jwt
 import uuid
-import shutil
 import io
+import csv
+import json
+import time
+import asyncio
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
@@ -26,7 +28,22 @@ from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph,
 from reportlab.lib.enums import TA_CENTER, TA_RIGHT, TA_LEFT
 
 # Local imports
-from database import get_db, init_db, engine, Base
+from database import (
+    get_db, get_read_db, init_db, dispose_engines, engine, read_engine, Base, MIGRATE_ON_STARTUP,
+    async_session_maker, async_read_session_maker, reiniciar_esquema, insert_dialecto
+)
+import query_stats
+import metrics
+import saldo_credito
+import particiones
+import stock_snapshots
+import conciliacion_stock
+import confirmaciones
+import idempotencia
+import sync_ventas
+import tareas
+import estado_compartido
+import imagenes
 from models import (
     Empresa, Usuario, Rol, Permiso, RolPermiso, UsuarioRol,
     Cliente, CreditoCliente, PagoCredito, Proveedor, ProveedorProducto, DeudaProveedor,
@@ -35,23 +52,23 @@ from models import (
     Venta, VentaItem, EstadoVenta, TipoPago,
     Funcionario, AdelantoSalario, CicloSalario,
     Vehiculo, TipoVehiculo, Entrega, EstadoEntrega,
-    Factura, DocumentoElectronico, PreferenciaUsuario
+    Factura, DocumentoElectronico, PreferenciaUsuario, EjecucionTarea
 )
 from schemas import (
     EmpresaCreate, EmpresaResponse,
     UsuarioCreate, UsuarioResponse, UsuarioLogin, TokenResponse,
     RolCreate, RolResponse, PermisoResponse,
     ClienteCreate, ClienteResponse, CreditoClienteCreate, CreditoClienteResponse,
-    ProveedorCreate, ProveedorResponse, DeudaProveedorCreate, DeudaProveedorResponse,
+    ProveedorCreate, ProveedorResponse, DeudaProveedorCreate, DeudaProveedorResponse, DeudasPagarRequest,
     CategoriaCreate, CategoriaResponse, MarcaCreate, MarcaResponse,
     ProductoCreate, ProductoResponse, ProductoConStock,
     MateriaLaboratorioCreate, MateriaLaboratorioResponse,
     AlmacenCreate, AlmacenResponse, StockActualCreate, StockActualResponse, StockConDetalles,
     MovimientoStockCreate, MovimientoStockResponse, TraspasoStockCreate,
-    VentaCreate, VentaResponse, VentaConDetalles, VentaItemResponse,
+    VentaCreate, VentaResponse, VentaConDetalles, VentaItemResponse, VentasSyncRequest,
     FuncionarioCreate, FuncionarioResponse,
     AdelantoSalarioCreate, AdelantoSalarioResponse,
-    CicloSalarioCreate, CicloSalarioResponse,
+    CicloSalarioCreate, CicloSalarioResponse, CiclosSalarioPagarRequest,
     VehiculoCreate, VehiculoResponse,
     EntregaCreate, EntregaResponse, EntregaConDetalles,
     FacturaCreate, FacturaResponse,
@@ -75,17 +92,79 @@ JWT_EXPIRATION_HOURS = 24
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Manual currency rates storage
-MANUAL_CURRENCY_RATES = {
-    'usd_pyg': None,
-    'brl_pyg': None,
-    'manual': False,
-    'updated_at': None
-}
+# Request profiling thresholds (log endpoints above either limit)
+SLOW_REQUEST_MS = float(os.environ.get('SLOW_REQUEST_MS', '500'))
+SLOW_REQUEST_QUERIES = int(os.environ.get('SLOW_REQUEST_QUERIES', '20'))
+
+# Estado compartido entre workers (cotización manual, etc.)
+compartido = estado_compartido.crear(async_session_maker, engine)
+COTIZACION_MANUAL = 'cotizacion_manual'
 
 # Create FastAPI app
 app = FastAPI(title="Luz Brill ERP API", version="1.0.0")
 
+# Idempotency-Key en requests que modifican datos (idempotencia.py). Se registra
+# antes que CORS para que las respuestas repetidas también lleven sus headers.
+def _ambito_idempotencia(request, cuerpo: bytes) -> str:
+    """Usuario del Bearer token si es válido; si no, empresa_id del query o del cuerpo JSON"""
+    usuario_id = empresa_id = None
+    autorizacion = request.headers.get('authorization', '')
+    if autorizacion.lower().startswith('bearer '):
+        try:
+            usuario_id = jwt.decode(autorizacion[7:], JWT_SECRET, algorithms=[JWT_ALGORITHM]).get('sub')
+        except jwt.PyJWTError:
+            pass
+    if usuario_id is None:
+        empresa_id = request.query_params.get('empresa_id')
+        if empresa_id is None and cuerpo:
+            try:
+                datos = json.loads(cuerpo)
+            except ValueError:
+                datos = None
+            if isinstance(datos, dict):
+                empresa_id = datos.get('empresa_id')
+    return idempotencia.ambito(usuario_id, empresa_id)
+
+@app.middleware("http")
+async def aplicar_idempotencia(request, call_next):
+    clave = request.headers.get(idempotencia.HEADER)
+    if not clave or request.method not in idempotencia.METODOS or not request.url.path.startswith('/api/'):
+        return await call_next(request)
+    if len(clave) > idempotencia.LARGO_MAXIMO_CLAVE:
+        return JSONResponse(status_code=400, content={"detail": "Idempotency-Key demasiado larga"})
+
+    metodo, ruta = request.method, request.url.path
+    cuerpo_request = await request.body()
+    huella = idempotencia.huella(metodo, ruta, request.url.query, cuerpo_request)
+    ambito = _ambito_idempotencia(request, cuerpo_request)
+    async with async_session_maker() as db:
+        existente = await idempotencia.reservar(db, ambito, clave, metodo, ruta, huella)
+    if existente is not None:
+        if existente.huella != huella:
+            return JSONResponse(status_code=422, content={"detail": "Idempotency-Key ya usada con otro request"})
+        if existente.estado_http is None:
+            return JSONResponse(status_code=409, content={"detail": "Request con esta Idempotency-Key en curso"})
+        return Response(
+            content=existente.cuerpo, status_code=existente.estado_http, media_type=existente.content_type,
+            headers={'Idempotent-Replayed': 'true'}
+        )
+
+    try:
+        response = await call_next(request)
+        cuerpo = b''.join([parte async for parte in response.body_iterator])
+    except BaseException:
+        async with async_session_maker() as db:
+            await idempotencia.liberar(db, ambito, clave, metodo, ruta)
+        raise
+    async with async_session_maker() as db:
+        if response.status_code >= 500 or len(cuerpo) > idempotencia.CUERPO_MAXIMO:
+            await idempotencia.liberar(db, ambito, clave, metodo, ruta)
+        else:
+            await idempotencia.guardar(
+                db, ambito, clave, metodo, ruta, response.status_code, response.headers.get('content-type'), cuerpo
+            )
+    return Response(content=cuerpo, status_code=response.status_code, headers=dict(response.headers))
+
 # CORS Configuration
 cors_origins = os.environ.get('CORS_ORIGINS', '*')
 if cors_origins == '*':
@@ -101,10 +180,63 @@ app.add_middleware(
     allow_origins=allowed_origins,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Query-Count", "Server-Timing", "Idempotent-Replayed"],
 )
 
+# SQL query count and DB time per request
+query_stats.instrumentar_engine(engine)
+query_stats.instrumentar_engine(read_engine)
+
+@app.middleware("http")
+async def medir_consultas_sql(request, call_next):
+    estadisticas, token = query_stats.iniciar()
+    inicio = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        query_stats.terminar(token)
+    total_ms = (time.perf_counter() - inicio) * 1000
+    db_ms = estadisticas.tiempo_db * 1000
+    
+    response.headers['X-Query-Count'] = str(estadisticas.consultas)
+    response.headers['Server-Timing'] = (
+        f'db;dur={db_ms:.1f};desc="{estadisticas.consultas} queries", app;dur={total_ms:.1f}'
+    )
+    
+    if total_ms > SLOW_REQUEST_MS or estadisticas.consultas > SLOW_REQUEST_QUERIES:
+        route = request.scope.get('route')
+        logger.warning(
+            f"Slow request {request.method} {route.path if route else request.url.path}: "
+            f"{total_ms:.0f} ms, {estadisticas.consultas} queries, {db_ms:.0f} ms DB"
+        )
+    return response
+
+# Prometheus metrics (per process) for latency, in-flight requests and DB pools
+metrics.registrar_pools({'primary': engine} if read_engine is engine else {'primary': engine, 'replica': read_engine})
+
+@app.middleware("http")
+async def medir_metricas_http(request, call_next):
+    metrics.HTTP_EN_CURSO.inc()
+    inicio = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        metrics.HTTP_EN_CURSO.dec()
+        # Unmatched paths share one label so 404 scans can't blow up cardinality
+        route = request.scope.get('route')
+        ruta = route.path if route else 'sin_ruta'
+        metrics.HTTP_LATENCIA.observe(time.perf_counter() - inicio, method=request.method, route=ruta)
+        metrics.HTTP_REQUESTS.inc(method=request.method, route=ruta, status=status_code)
+
+@app.get("/metrics", include_in_schema=False)
+async def exponer_metricas():
+    return PlainTextResponse(metrics.REGISTRO.exponer(), media_type=metrics.CONTENT_TYPE)
+
 # Mount static files for uploads
-app.mount("/uploads", StaticFiles(directory=str(ROOT_DIR / 'uploads')), name="uploads")
+app.mount("/uploads", imagenes.ArchivosEstaticos(directory=str(ROOT_DIR / 'uploads')), name="uploads")
 
 # API Router
 api_router = APIRouter(prefix="/api")
@@ -440,13 +572,7 @@ async def obtener_credito_disponible(cliente_id: int, db: AsyncSession = Depends
     if not cliente:
         raise HTTPException(status_code=404, detail="Cliente no encontrado")
     
-    # Calcular crédito usado (suma de monto_pendiente de créditos no pagados)
-    creditos_result = await db.execute(
-        select(func_sql.coalesce(func_sql.sum(CreditoCliente.monto_pendiente), 0))
-        .where(CreditoCliente.cliente_id == cliente_id, CreditoCliente.pagado == False)
-    )
-    credito_usado = creditos_result.scalar() or Decimal('0')
-    
+    credito_usado = cliente.credito_usado or Decimal('0')
     limite = cliente.limite_credito or Decimal('0')
     disponible = max(Decimal('0'), limite - credito_usado)
     
@@ -468,18 +594,13 @@ async def crear_credito_cliente(cliente_id: int, data: dict, db: AsyncSession =
     if not cliente:
         raise HTTPException(status_code=404, detail="Cliente no encontrado")
     
-    # Calcular crédito actual
-    creditos_result = await db.execute(
-        select(func_sql.coalesce(func_sql.sum(CreditoCliente.monto_pendiente), 0))
-        .where(CreditoCliente.cliente_id == cliente_id, CreditoCliente.pagado == False)
-    )
-    credito_usado = creditos_result.scalar() or Decimal('0')
-    
-    limite = cliente.limite_credito or Decimal('0')
-    if limite > 0 and (credito_usado + monto) > limite:
+    # Reserva atómica contra el límite (UPDATE condicional sobre credito_usado)
+    if not await saldo_credito.reservar_credito(db, cliente_id, monto):
+        await db.refresh(cliente)
+        limite = cliente.limite_credito or Decimal('0')
         raise HTTPException(
             status_code=400, 
-            detail=f"Crédito excede el límite. Disponible: {float(limite - credito_usado):,.0f} Gs"
+            detail=f"Crédito excede el límite. Disponible: {float(max(Decimal('0'), limite - cliente.credito_usado)):,.0f} Gs"
         )
     
     credito = CreditoCliente(
@@ -496,24 +617,48 @@ async def crear_credito_cliente(cliente_id: int, data: dict, db: AsyncSession =
     return credito
 
 @api_router.get("/clientes/{cliente_id}/creditos")
-async def listar_creditos_cliente(cliente_id: int, solo_pendientes: bool = False, db: AsyncSession = Depends(get_db)):
-    """Lista todos los créditos de un cliente con sus pagos"""
-    query = select(CreditoCliente).where(CreditoCliente.cliente_id == cliente_id).order_by(CreditoCliente.fecha_venta.desc())
+async def listar_creditos_cliente(
+    cliente_id: int,
+    solo_pendientes: bool = False,
+    desde: Optional[date] = None,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    db: AsyncSession = Depends(get_db)
+):
+    """Lista los créditos de un cliente con sus pagos (dos consultas, paginable)"""
+    filtros = [CreditoCliente.cliente_id == cliente_id]
     if solo_pendientes:
-        query = query.where(CreditoCliente.pagado == False)
-    
-    result = await db.execute(query)
-    creditos = result.scalars().all()
-    
-    response = []
-    for credito in creditos:
-        # Get pagos for this credito
-        pagos_result = await db.execute(
-            select(PagoCredito).where(PagoCredito.credito_id == credito.id).order_by(PagoCredito.fecha_pago.desc())
-        )
-        pagos = pagos_result.scalars().all()
-        
-        response.append({
+        filtros.append(CreditoCliente.pagado == False)
+    if desde:
+        filtros.append(CreditoCliente.fecha_venta >= desde)
+
+    pagina = (
+        select(CreditoCliente.id)
+        .where(*filtros)
+        .order_by(CreditoCliente.fecha_venta.desc(), CreditoCliente.id.desc())
+        .offset(offset)
+    )
+    if limit is not None:
+        pagina = pagina.limit(limit)
+
+    creditos = (await db.execute(
+        select(CreditoCliente)
+        .where(CreditoCliente.id.in_(pagina))
+        .order_by(CreditoCliente.fecha_venta.desc(), CreditoCliente.id.desc())
+    )).scalars().all()
+
+    # Pagos de todos los créditos de la página en una sola consulta
+    pagos_por_credito = {}
+    pagos_result = await db.execute(
+        select(PagoCredito)
+        .where(PagoCredito.credito_id.in_(pagina))
+        .order_by(PagoCredito.fecha_pago.desc(), PagoCredito.id.desc())
+    )
+    for pago in pagos_result.scalars():
+        pagos_por_credito.setdefault(pago.credito_id, []).append(pago)
+
+    return [
+        {
             "id": credito.id,
             "cliente_id": credito.cliente_id,
             "venta_id": credito.venta_id,
@@ -522,19 +667,21 @@ async def listar_creditos_cliente(cliente_id: int, solo_pendientes: bool = False
             "descripcion": credito.descripcion,
             "fecha_venta": credito.fecha_venta.isoformat() if credito.fecha_venta else None,
             "pagado": credito.pagado,
+            "anulado": credito.anulado,
             "creado_en": credito.creado_en.isoformat() if credito.creado_en else None,
             "pagos": [
                 {
                     "id": p.id,
                     "monto": float(p.monto),
+                    "tipo": p.tipo,
                     "fecha_pago": p.fecha_pago.isoformat() if p.fecha_pago else None,
                     "observacion": p.observacion
                 }
-                for p in pagos
+                for p in pagos_por_credito.get(credito.id, [])
             ]
-        })
-    
-    return response
+        }
+        for credito in creditos
+    ]
 
 @api_router.post("/creditos/{credito_id}/pagar")
 async def pagar_credito(credito_id: int, data: dict, db: AsyncSession = Depends(get_db)):
@@ -554,19 +701,29 @@ async def pagar_credito(credito_id: int, data: dict, db: AsyncSession = Depends(
     if monto_pago > credito.monto_pendiente:
         raise HTTPException(status_code=400, detail=f"El monto excede la deuda pendiente de {float(credito.monto_pendiente):,.0f} Gs")
     
-    # Create payment record
-    pago = PagoCredito(
+    # Descuento condicional: un pago concurrente no puede dejar el saldo negativo
+    result = await db.execute(
+        update(CreditoCliente)
+        .where(
+            CreditoCliente.id == credito_id,
+            CreditoCliente.pagado == False,
+            CreditoCliente.monto_pendiente >= monto_pago
+        )
+        .values(
+            monto_pendiente=CreditoCliente.monto_pendiente - monto_pago,
+            pagado=CreditoCliente.monto_pendiente - monto_pago <= 0
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        raise HTTPException(status_code=409, detail="El crédito cambió mientras se registraba el pago, reintentar")
+    
+    db.add(PagoCredito(
         credito_id=credito_id,
         monto=monto_pago,
         observacion=data.get('observacion')
-    )
-    db.add(pago)
-    
-    # Update credito
-    credito.monto_pendiente = credito.monto_pendiente - monto_pago
-    if credito.monto_pendiente <= 0:
-        credito.pagado = True
-        credito.monto_pendiente = Decimal('0')
+    ))
+    await saldo_credito.liberar_credito(db, credito.cliente_id, monto_pago)
     
     await db.commit()
     await db.refresh(credito)
@@ -579,6 +736,82 @@ async def pagar_credito(credito_id: int, data: dict, db: AsyncSession = Depends(
         "pagado": credito.pagado
     }
 
+@api_router.post("/clientes/{cliente_id}/pagos")
+async def pagar_creditos_cliente(cliente_id: int, data: dict, db: AsyncSession = Depends(get_db)):
+    """Reparte un pago entre los créditos abiertos del cliente, del más antiguo al más nuevo (FIFO)"""
+    monto_pago = Decimal(str(data.get('monto', 0)))
+    if monto_pago <= 0:
+        raise HTTPException(status_code=400, detail="El monto debe ser mayor a 0")
+
+    cliente = (await db.execute(select(Cliente.id).where(Cliente.id == cliente_id))).scalar_one_or_none()
+    if not cliente:
+        raise HTTPException(status_code=404, detail="Cliente no encontrado")
+
+    # FOR UPDATE: otro pago del mismo cliente espera a que este termine (en SQLite se omite)
+    abiertos = (await db.execute(
+        select(CreditoCliente)
+        .where(
+            CreditoCliente.cliente_id == cliente_id,
+            CreditoCliente.pagado == False,
+            CreditoCliente.monto_pendiente > 0
+        )
+        .order_by(CreditoCliente.fecha_venta, CreditoCliente.id)
+        .with_for_update()
+    )).scalars().all()
+    if not abiertos:
+        raise HTTPException(status_code=400, detail="El cliente no tiene créditos pendientes")
+
+    deuda_total = sum((credito.monto_pendiente for credito in abiertos), Decimal('0'))
+    if monto_pago > deuda_total:
+        raise HTTPException(status_code=400, detail=f"El monto excede la deuda pendiente de {float(deuda_total):,.0f} Gs")
+
+    restante = monto_pago
+    asignaciones = []
+    for credito in abiertos:
+        if restante <= 0:
+            break
+        aplicado = min(restante, credito.monto_pendiente)
+        restante -= aplicado
+        asignaciones.append((credito, aplicado, credito.monto_pendiente - aplicado))
+
+    await db.execute(update(CreditoCliente), [
+        {"id": credito.id, "monto_pendiente": pendiente, "pagado": pendiente <= 0}
+        for credito, _, pendiente in asignaciones
+    ])
+    await db.execute(insert(PagoCredito), [
+        {"credito_id": credito.id, "monto": aplicado, "observacion": data.get('observacion')}
+        for credito, aplicado, _ in asignaciones
+    ])
+    await saldo_credito.liberar_credito(db, cliente_id, monto_pago)
+    await db.commit()
+
+    return {
+        "message": "Pago registrado exitosamente",
+        "cliente_id": cliente_id,
+        "monto_pagado": float(monto_pago),
+        "deuda_restante": float(deuda_total - monto_pago),
+        "asignaciones": [
+            {
+                "credito_id": credito.id,
+                "venta_id": credito.venta_id,
+                "fecha_venta": credito.fecha_venta.isoformat() if credito.fecha_venta else None,
+                "monto_aplicado": float(aplicado),
+                "monto_pendiente": float(pendiente),
+                "pagado": pendiente <= 0
+            }
+            for credito, aplicado, pendiente in asignaciones
+        ]
+    }
+
+@api_router.post("/creditos/recalcular-saldos")
+async def recalcular_saldos_credito(empresa_id: Optional[int] = None, db: AsyncSession = Depends(get_db)):
+    """Reconstruye Cliente.credito_usado desde los créditos pendientes (corrige desvíos)"""
+    corregidos = await saldo_credito.recalcular_credito_usado(db, empresa_id)
+    await db.commit()
+    if corregidos:
+        logger.warning(f"credito_usado corregido para {len(corregidos)} clientes: {corregidos[:20]}")
+    return {"clientes_corregidos": len(corregidos), "cliente_ids": corregidos}
+
 # ==================== PROVEEDORES ====================
 @api_router.post("/proveedores", response_model=ProveedorResponse)
 async def crear_proveedor(data: ProveedorCreate, db: AsyncSession = Depends(get_db)):
@@ -662,6 +895,45 @@ async def listar_deudas_proveedor(proveedor_id: int, db: AsyncSession = Depends(
     )
     return result.scalars().all()
 
+@api_router.put("/deudas/pagar")
+async def pagar_deudas(data: DeudasPagarRequest, db: AsyncSession = Depends(get_db)):
+    """Marca como pagadas varias deudas en un solo UPDATE: por ids y/o por proveedor
+
+    Las deudas ya pagadas se ignoran; devuelve las filas que efectivamente cambiaron.
+    """
+    ids, proveedor_id = data.ids, data.proveedor_id
+    if ids is None and proveedor_id is None:
+        raise HTTPException(status_code=400, detail="Indicar ids o proveedor_id")
+
+    condiciones = [
+        DeudaProveedor.pagado == False,
+        DeudaProveedor.proveedor_id.in_(select(Proveedor.id).where(Proveedor.empresa_id == data.empresa_id))
+    ]
+    if ids is not None:
+        condiciones.append(DeudaProveedor.id.in_(ids))
+    if proveedor_id is not None:
+        condiciones.append(DeudaProveedor.proveedor_id == proveedor_id)
+
+    result = await db.execute(
+        update(DeudaProveedor)
+        .where(*condiciones)
+        .values(pagado=True, fecha_pago=date.today())
+        .returning(DeudaProveedor.id, DeudaProveedor.proveedor_id, DeudaProveedor.monto, DeudaProveedor.descripcion)
+        .execution_options(synchronize_session=False)
+    )
+    deudas = result.all()
+    await db.commit()
+
+    return {
+        "message": f"{len(deudas)} deudas marcadas como pagadas",
+        "pagadas": len(deudas),
+        "total": float(sum((d.monto for d in deudas), Decimal('0'))),
+        "deudas": [
+            {"id": d.id, "proveedor_id": d.proveedor_id, "monto": float(d.monto), "descripcion": d.descripcion}
+            for d in sorted(deudas, key=lambda d: d.id)
+        ]
+    }
+
 @api_router.put("/deudas/{deuda_id}/pagar")
 async def pagar_deuda(deuda_id: int, db: AsyncSession = Depends(get_db)):
     result = await db.execute(select(DeudaProveedor).where(DeudaProveedor.id == deuda_id))
@@ -745,23 +1017,23 @@ async def crear_producto(data: ProductoCreate, db: AsyncSession = Depends(get_db
 
 @api_router.get("/productos", response_model=List[ProductoConStock])
 async def listar_productos(empresa_id: int, db: AsyncSession = Depends(get_db)):
+    stock_total = (
+        select(func_sql.coalesce(func_sql.sum(StockActual.cantidad), 0))
+        .where(StockActual.producto_id == Producto.id)
+        .scalar_subquery()
+    )
     result = await db.execute(
-        select(Producto, Categoria, Marca)
+        select(Producto, Categoria, Marca, stock_total)
         .outerjoin(Categoria, Producto.categoria_id == Categoria.id)
         .outerjoin(Marca, Producto.marca_id == Marca.id)
         .where(Producto.empresa_id == empresa_id, Producto.activo == True)
     )
     productos = []
     for row in result.all():
-        producto, categoria, marca = row
-        stock_result = await db.execute(
-            select(func_sql.coalesce(func_sql.sum(StockActual.cantidad), 0))
-            .where(StockActual.producto_id == producto.id)
-        )
-        stock_total = stock_result.scalar() or 0
+        producto, categoria, marca, stock = row
         
         prod_dict = ProductoResponse.model_validate(producto).model_dump()
-        prod_dict['stock_total'] = stock_total
+        prod_dict['stock_total'] = stock or 0
         prod_dict['categoria_nombre'] = categoria.nombre if categoria else None
         prod_dict['marca_nombre'] = marca.nombre if marca else None
         productos.append(ProductoConStock(**prod_dict))
@@ -852,21 +1124,20 @@ async def subir_imagen_producto(producto_id: int, file: UploadFile = File(...),
     if not producto:
         raise HTTPException(status_code=404, detail="Producto no encontrado")
     
-    # Generate unique filename
-    ext = file.filename.split('.')[-1] if '.' in file.filename else 'jpg'
-    filename = f"{uuid.uuid4()}.{ext}"
-    filepath = UPLOADS_DIR / filename
-    
-    # Save file
-    with open(filepath, 'wb') as f:
-        shutil.copyfileobj(file.file, f)
+    # Valida, genera derivados y guarda con nombre por contenido (fuera del event loop)
+    try:
+        nombres = await imagenes.guardar(file, UPLOADS_DIR)
+    except imagenes.ImagenInvalida as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detalle)
     
     # Update product
-    producto.imagen_url = f"/uploads/productos/{filename}"
+    producto.imagen_url = f"/uploads/productos/{nombres['principal']}"
     await db.commit()
-    await db.refresh(producto)
     
-    return {"imagen_url": producto.imagen_url}
+    return {
+        "imagen_url": producto.imagen_url,
+        "variantes": {v: imagenes.url_variante(producto.imagen_url, v) for v in imagenes.VARIANTES}
+    }
 
 # ==================== MATERIAS LABORATORIO ====================
 @api_router.post("/materias-laboratorio", response_model=MateriaLaboratorioResponse)
@@ -944,7 +1215,7 @@ async def crear_actualizar_stock(data: StockActualCreate, db: AsyncSession = Dep
     return stock
 
 @api_router.get("/stock", response_model=List[StockConDetalles])
-async def listar_stock(empresa_id: int, almacen_id: Optional[int] = None, db: AsyncSession = Depends(get_db)):
+async def listar_stock(empresa_id: int, almacen_id: Optional[int] = None, db: AsyncSession = Depends(get_read_db)):
     query = (
         select(StockActual, Producto, Almacen)
         .join(Producto, StockActual.producto_id == Producto.id)
@@ -965,6 +1236,148 @@ async def listar_stock(empresa_id: int, almacen_id: Optional[int] = None, db: As
     
     return stocks
 
+@api_router.get("/stock/movimientos")
+async def listar_movimientos_stock(
+    empresa_id: int,
+    producto_id: Optional[int] = None,
+    almacen_id: Optional[int] = None,
+    tipo: Optional[TipoMovimientoStock] = None,
+    fecha_desde: Optional[datetime] = None,
+    fecha_hasta: Optional[datetime] = None,
+    antes_de: Optional[int] = None,
+    limit: int = 100,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Kardex: movimientos del más nuevo al más viejo con paginación por keyset
+
+    `antes_de` es el `siguiente` de la página anterior (un id): la consulta
+    sigue el índice sin OFFSET. Con rango de fechas PostgreSQL solo lee las
+    particiones mensuales involucradas.
+    """
+    limit = max(1, min(limit, 1000))
+    filtros = [Producto.empresa_id == empresa_id]
+    if producto_id:
+        filtros.append(MovimientoStock.producto_id == producto_id)
+    if almacen_id:
+        filtros.append(MovimientoStock.almacen_id == almacen_id)
+    if tipo:
+        filtros.append(MovimientoStock.tipo == tipo)
+    if fecha_desde:
+        filtros.append(MovimientoStock.creado_en >= fecha_desde)
+    if fecha_hasta:
+        filtros.append(MovimientoStock.creado_en <= fecha_hasta)
+    if antes_de:
+        filtros.append(MovimientoStock.id < antes_de)
+
+    result = await db.execute(
+        select(MovimientoStock, Producto.nombre, Almacen.nombre)
+        .join(Producto, MovimientoStock.producto_id == Producto.id)
+        .join(Almacen, MovimientoStock.almacen_id == Almacen.id)
+        .where(*filtros)
+        .order_by(MovimientoStock.id.desc())
+        .limit(limit + 1)
+    )
+    filas = result.all()
+    pagina = filas[:limit]
+
+    return {
+        "movimientos": [
+            {
+                "id": mov.id,
+                "producto_id": mov.producto_id,
+                "producto_nombre": producto_nombre,
+                "almacen_id": mov.almacen_id,
+                "almacen_nombre": almacen_nombre,
+                "tipo": mov.tipo.value,
+                "cantidad": mov.cantidad,
+                "referencia_tipo": mov.referencia_tipo,
+                "referencia_id": mov.referencia_id,
+                "creado_en": mov.creado_en.isoformat() if mov.creado_en else None
+            }
+            for mov, producto_nombre, almacen_nombre in pagina
+        ],
+        "siguiente": pagina[-1][0].id if len(filas) > limit else None
+    }
+
+@api_router.get("/stock/al-dia")
+async def stock_al_dia(
+    empresa_id: int,
+    fecha: date,
+    producto_id: Optional[int] = None,
+    almacen_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Stock al cierre de `fecha`: snapshot anterior más cercano + movimientos desde entonces"""
+    fecha_corte = fecha
+    base = await stock_snapshots.snapshot_base(db, empresa_id, fecha_corte)
+    saldos = stock_snapshots.saldos_al_dia(empresa_id, fecha_corte, base, producto_id, almacen_id).subquery()
+    result = await db.execute(
+        select(saldos.c.producto_id, saldos.c.almacen_id, saldos.c.cantidad, Producto.nombre, Almacen.nombre)
+        .join(Producto, saldos.c.producto_id == Producto.id)
+        .join(Almacen, saldos.c.almacen_id == Almacen.id)
+        .order_by(Producto.nombre, saldos.c.almacen_id)
+    )
+    return {
+        "fecha": fecha_corte.isoformat(),
+        "snapshot_base": base.isoformat() if base else None,
+        "stock": [
+            {
+                "producto_id": prod_id,
+                "producto_nombre": producto_nombre,
+                "almacen_id": alm_id,
+                "almacen_nombre": almacen_nombre,
+                "cantidad": int(cantidad)
+            }
+            for prod_id, alm_id, cantidad, producto_nombre, almacen_nombre in result.all()
+        ]
+    }
+
+@api_router.post("/stock/snapshots")
+async def generar_snapshot_stock(
+    empresa_id: Optional[int] = None,
+    fecha: Optional[date] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """Genera el snapshot de stock al cierre de `fecha` (por defecto, fin del mes anterior)"""
+    fecha_corte = fecha or stock_snapshots.cierre_mes_anterior()
+    filas = await stock_snapshots.generar_snapshot(db, fecha_corte, empresa_id)
+    return {"fecha": fecha_corte.isoformat(), "filas": sum(filas.values()), "empresas": len(filas)}
+
+def respuesta_conciliacion(empresa_id: int, almacen_id: Optional[int], corregir: bool, formato: str):
+    """Diferencias ledger vs StockActual en streaming: array JSON o CSV"""
+    if formato not in ('json', 'csv'):
+        raise HTTPException(status_code=400, detail="Formato inválido: json o csv")
+
+    async def generar():
+        # Sesión propia sobre el primario: la del Depends se cierra antes de terminar el streaming
+        async with async_session_maker() as session:
+            diferencias = conciliacion_stock.conciliar(session, empresa_id, almacen_id, corregir)
+            if formato == 'csv':
+                yield "producto_id,almacen_id,ledger,actual,diferencia\n"
+                async for d in diferencias:
+                    yield ",".join(str(valor) for valor in d.values()) + "\n"
+            else:
+                separador = "["
+                async for d in diferencias:
+                    yield separador + json.dumps(d)
+                    separador = ","
+                yield "[]" if separador == "[" else "]"
+
+    return StreamingResponse(
+        generar(),
+        media_type="text/csv; charset=utf-8" if formato == 'csv' else "application/json"
+    )
+
+@api_router.get("/stock/conciliacion")
+async def conciliacion_stock_reporte(empresa_id: int, almacen_id: Optional[int] = None, formato: str = 'json'):
+    """Diferencias entre StockActual y la suma de movimientos por (producto, almacén)"""
+    return respuesta_conciliacion(empresa_id, almacen_id, False, formato)
+
+@api_router.post("/stock/conciliacion")
+async def conciliacion_stock_corregir(empresa_id: int, almacen_id: Optional[int] = None, formato: str = 'json'):
+    """Igual que el GET, e inserta un movimiento AJUSTE por diferencia para llevar el ledger a StockActual"""
+    return respuesta_conciliacion(empresa_id, almacen_id, True, formato)
+
 @api_router.post("/stock/entrada", response_model=MovimientoStockResponse)
 async def entrada_stock(data: MovimientoStockCreate, db: AsyncSession = Depends(get_db)):
     result = await db.execute(
@@ -1151,12 +1564,8 @@ async def crear_venta(data: VentaCreate, db: AsyncSession = Depends(get_db)):
     
     # Validar crédito si es venta a crédito
     if data.tipo_pago == TipoPago.CREDITO:
-        # Calcular crédito usado del cliente que tiene los privilegios
-        creditos_result = await db.execute(
-            select(func_sql.coalesce(func_sql.sum(CreditoCliente.monto_pendiente), 0))
-            .where(CreditoCliente.cliente_id == cliente_privilegios.id, CreditoCliente.pagado == False)
-        )
-        credito_usado = creditos_result.scalar() or Decimal('0')
+        # Chequeo previo; la reserva atómica se hace al confirmar
+        credito_usado = cliente_privilegios.credito_usado or Decimal('0')
         limite = cliente_privilegios.limite_credito or Decimal('0')
         
         if limite > 0 and (credito_usado + total) > limite:
@@ -1189,8 +1598,8 @@ async def crear_venta(data: VentaCreate, db: AsyncSession = Depends(get_db)):
     await db.refresh(venta)
     return venta
 
-@api_router.post("/ventas/{venta_id}/confirmar", response_model=VentaResponse)
-async def confirmar_venta(venta_id: int, db: AsyncSession = Depends(get_db)):
+async def aplicar_confirmacion(db: AsyncSession, venta_id: int) -> Venta:
+    """Descuenta stock, marca materias y crea el crédito de la venta, sin commit (lo hace quien llama)"""
     result = await db.execute(
         select(Venta).options(selectinload(Venta.items)).where(Venta.id == venta_id)
     )
@@ -1201,6 +1610,19 @@ async def confirmar_venta(venta_id: int, db: AsyncSession = Depends(get_db)):
     if venta.estado != EstadoVenta.BORRADOR:
         raise HTTPException(status_code=400, detail="La venta ya fue procesada")
     
+    # Crédito: reservar antes de tocar stock (el cliente con privilegios es el representante si hay)
+    cliente_credito_id = venta.representante_cliente_id or venta.cliente_id
+    if venta.tipo_pago == TipoPago.CREDITO:
+        if not await saldo_credito.reservar_credito(db, cliente_credito_id, venta.total):
+            cliente = (await db.execute(select(Cliente).where(Cliente.id == cliente_credito_id))).scalar_one()
+            limite = cliente.limite_credito or Decimal('0')
+            disponible = max(Decimal('0'), limite - cliente.credito_usado)
+            raise HTTPException(
+                status_code=400,
+                detail=f"Crédito insuficiente. Límite: {float(limite):,.0f}, Usado: {float(cliente.credito_usado):,.0f}, Disponible: {float(disponible):,.0f} Gs"
+            )
+    
+    items_sin_stock = 0
     for item in venta.items:
         if item.producto_id:
             stock_result = await db.execute(
@@ -1228,6 +1650,13 @@ async def confirmar_venta(venta_id: int, db: AsyncSession = Depends(get_db)):
                     referencia_id=venta.id
                 )
                 db.add(mov)
+            
+            if cantidad_restante > 0:
+                items_sin_stock += 1
+                logger.warning(
+                    f"Venta {venta.id}: stock insuficiente para producto {item.producto_id} "
+                    f"(faltan {cantidad_restante})"
+                )
         
         elif item.materia_laboratorio_id:
             materia_result = await db.execute(
@@ -1241,9 +1670,6 @@ async def confirmar_venta(venta_id: int, db: AsyncSession = Depends(get_db)):
     
     # Si es venta a crédito, crear registro de crédito
     if venta.tipo_pago == TipoPago.CREDITO:
-        # Determinar el cliente que tiene los privilegios de crédito
-        cliente_credito_id = venta.representante_cliente_id or venta.cliente_id
-        
         credito = CreditoCliente(
             cliente_id=cliente_credito_id,
             venta_id=venta.id,
@@ -1254,10 +1680,55 @@ async def confirmar_venta(venta_id: int, db: AsyncSession = Depends(get_db)):
         )
         db.add(credito)
     
+    # Se cuenta en registrar_venta_confirmada, después del commit: si el savepoint se deshace no hubo conflicto
+    venta.items_sin_stock = items_sin_stock
+    return venta
+
+def registrar_venta_confirmada(venta: Venta):
+    if getattr(venta, 'items_sin_stock', 0):
+        metrics.STOCK_CONFLICTOS.inc(venta.items_sin_stock)
+    metrics.VENTAS_CONFIRMADAS.inc(tipo_pago=venta.tipo_pago.value)
+    metrics.VENTAS_CONFIRMADAS_MONTO.inc(float(venta.total or 0), tipo_pago=venta.tipo_pago.value)
+
+# Modo en lote: las confirmaciones pasan por un worker por empresa (confirmaciones.py)
+CONFIRMACION_EN_LOTE = os.environ.get('CONFIRMACION_EN_LOTE', 'false').lower() == 'true'
+confirmador = confirmaciones.ConfirmadorVentas(
+    async_session_maker, aplicar_confirmacion, registrar_venta_confirmada
+)
+
+@api_router.post("/ventas/{venta_id}/confirmar", response_model=VentaResponse)
+async def confirmar_venta(venta_id: int, db: AsyncSession = Depends(get_db)):
+    if CONFIRMACION_EN_LOTE:
+        empresa_id = (await db.execute(select(Venta.empresa_id).where(Venta.id == venta_id))).scalar_one_or_none()
+        if empresa_id is None:
+            raise HTTPException(status_code=404, detail="Venta no encontrada")
+        # No dejar una transacción abierta mientras el worker confirma
+        await db.rollback()
+        await confirmador.confirmar(empresa_id, venta_id)
+        return (await db.execute(select(Venta).where(Venta.id == venta_id))).scalar_one()
+
+    venta = await aplicar_confirmacion(db, venta_id)
     await db.commit()
+    registrar_venta_confirmada(venta)
     await db.refresh(venta)
     return venta
 
+@api_router.post("/ventas/sync")
+async def sincronizar_ventas(data: VentasSyncRequest, db: AsyncSession = Depends(get_db)):
+    """Crea y confirma ventas hechas offline; reporta conflictos por venta (sync_ventas.py)"""
+    if len(data.ventas) > sync_ventas.MAXIMO_VENTAS:
+        raise HTTPException(status_code=400, detail=f"Máximo {sync_ventas.MAXIMO_VENTAS} ventas por sincronización")
+    usuario = await db.execute(
+        select(Usuario.id).where(Usuario.id == data.usuario_id, Usuario.empresa_id == data.empresa_id)
+    )
+    if usuario.first() is None:
+        raise HTTPException(status_code=404, detail="Usuario no encontrado")
+    resultado = await sync_ventas.sincronizar(db, data.empresa_id, data.usuario_id, data.ventas)
+    return {
+        "message": f"{len(resultado['sincronizadas'])} ventas sincronizadas, {len(resultado['conflictos'])} con conflicto",
+        **resultado
+    }
+
 @api_router.get("/ventas", response_model=List[VentaConDetalles])
 async def listar_ventas(
     empresa_id: int,
@@ -1267,60 +1738,51 @@ async def listar_ventas(
     usuario_id: Optional[int] = None,
     monto_min: Optional[float] = None,
     monto_max: Optional[float] = None,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
-    query = (
-        select(Venta, Cliente)
-        .join(Cliente, Venta.cliente_id == Cliente.id)
-        .where(Venta.empresa_id == empresa_id)
-        .order_by(Venta.creado_en.desc())
-    )
-    
+    filtros = [Venta.empresa_id == empresa_id]
     if fecha_desde:
-        query = query.where(Venta.creado_en >= datetime.fromisoformat(fecha_desde))
+        filtros.append(Venta.creado_en >= datetime.fromisoformat(fecha_desde))
     if fecha_hasta:
-        query = query.where(Venta.creado_en <= datetime.fromisoformat(fecha_hasta))
+        filtros.append(Venta.creado_en <= datetime.fromisoformat(fecha_hasta))
     if cliente_id:
-        query = query.where(Venta.cliente_id == cliente_id)
+        filtros.append(Venta.cliente_id == cliente_id)
     if usuario_id:
-        query = query.where(Venta.usuario_id == usuario_id)
+        filtros.append(Venta.usuario_id == usuario_id)
     if monto_min:
-        query = query.where(Venta.total >= monto_min)
+        filtros.append(Venta.total >= monto_min)
     if monto_max:
-        query = query.where(Venta.total <= monto_max)
+        filtros.append(Venta.total <= monto_max)
+    
+    result = await db.execute(
+        select(Venta, Cliente)
+        .join(Cliente, Venta.cliente_id == Cliente.id)
+        .where(*filtros)
+        .order_by(Venta.creado_en.desc())
+    )
+    filas = result.all()
+    
+    # Items of every listed sale in one query, with product/materia names
+    items_result = await db.execute(
+        select(VentaItem, Producto.nombre, MateriaLaboratorio.nombre, MateriaLaboratorio.descripcion)
+        .outerjoin(Producto, VentaItem.producto_id == Producto.id)
+        .outerjoin(MateriaLaboratorio, VentaItem.materia_laboratorio_id == MateriaLaboratorio.id)
+        .where(VentaItem.venta_id.in_(select(Venta.id).where(*filtros)))
+        .order_by(VentaItem.id)
+    )
+    items_por_venta = {}
+    for item, producto_nombre, materia_nombre, materia_descripcion in items_result.all():
+        item_dict = VentaItemResponse.model_validate(item).model_dump()
+        if item.producto_id:
+            item_dict['descripcion'] = producto_nombre
+        elif item.materia_laboratorio_id and materia_nombre is not None:
+            item_dict['descripcion'] = f"{materia_nombre} - {materia_descripcion or ''}"
+        items_por_venta.setdefault(item.venta_id, []).append(item_dict)
     
-    result = await db.execute(query)
     ventas = []
-    for row in result.all():
-        venta, cliente = row
-        items_result = await db.execute(
-            select(VentaItem).where(VentaItem.venta_id == venta.id)
-        )
-        raw_items = items_result.scalars().all()
-        
-        # Enrich items with product/materia names
-        items = []
-        for item in raw_items:
-            item_dict = VentaItemResponse.model_validate(item).model_dump()
-            
-            # Get product name
-            if item.producto_id:
-                prod_result = await db.execute(select(Producto).where(Producto.id == item.producto_id))
-                producto = prod_result.scalar_one_or_none()
-                if producto:
-                    item_dict['descripcion'] = producto.nombre
-            
-            # Get materia name
-            elif item.materia_laboratorio_id:
-                mat_result = await db.execute(select(MateriaLaboratorio).where(MateriaLaboratorio.id == item.materia_laboratorio_id))
-                materia = mat_result.scalar_one_or_none()
-                if materia:
-                    item_dict['descripcion'] = f"{materia.nombre} - {materia.descripcion or ''}"
-            
-            items.append(item_dict)
-        
+    for venta, cliente in filas:
         venta_dict = VentaResponse.model_validate(venta).model_dump()
-        venta_dict['items'] = items
+        venta_dict['items'] = items_por_venta.get(venta.id, [])
         venta_dict['cliente_nombre'] = f"{cliente.nombre} {cliente.apellido or ''}"
         venta_dict['cliente_ruc'] = cliente.ruc
         ventas.append(VentaConDetalles(**venta_dict))
@@ -1352,10 +1814,80 @@ async def obtener_venta(venta_id: int, db: AsyncSession = Depends(get_db)):
 
 @api_router.post("/ventas/{venta_id}/anular", response_model=VentaResponse)
 async def anular_venta(venta_id: int, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(Venta).where(Venta.id == venta_id))
+    """Anula la venta; si estaba confirmada devuelve el stock, anula su crédito (devolviendo lo cobrado) y libera las materias"""
+    result = await db.execute(select(Venta).where(Venta.id == venta_id).with_for_update())
     venta = result.scalar_one_or_none()
     if not venta:
         raise HTTPException(status_code=404, detail="Venta no encontrada")
+    if venta.estado == EstadoVenta.ANULADA:
+        return venta
+    
+    if venta.estado == EstadoVenta.CONFIRMADA:
+        # Movimientos inversos de los de la venta, en un solo INSERT ... SELECT
+        movimientos_venta = [MovimientoStock.referencia_tipo == 'venta', MovimientoStock.referencia_id == venta_id]
+        await db.execute(
+            insert(MovimientoStock).from_select(
+                ['producto_id', 'almacen_id', 'tipo', 'cantidad', 'referencia_tipo', 'referencia_id'],
+                select(
+                    MovimientoStock.producto_id, MovimientoStock.almacen_id,
+                    literal(TipoMovimientoStock.ENTRADA, MovimientoStock.tipo.type), -MovimientoStock.cantidad,
+                    literal('anulacion'), MovimientoStock.referencia_id
+                ).where(*movimientos_venta)
+            )
+        )
+        devuelto = (
+            select(-func_sql.sum(MovimientoStock.cantidad))
+            .where(
+                *movimientos_venta,
+                MovimientoStock.producto_id == StockActual.producto_id,
+                MovimientoStock.almacen_id == StockActual.almacen_id
+            )
+        )
+        await db.execute(
+            update(StockActual)
+            .where(devuelto.exists())
+            .values(cantidad=StockActual.cantidad + devuelto.scalar_subquery())
+            .execution_options(synchronize_session=False)
+        )
+        
+        # Créditos de la venta: la deuda se cancela con un pago ANULACION por el monto original y
+        # lo que el cliente ya había pagado se le devuelve (DEVOLUCION, negativo). Así pendiente =
+        # original - pagos sigue valiendo y los reportes distinguen una anulación de un cobro.
+        creditos = (await db.execute(
+            select(CreditoCliente.id, CreditoCliente.cliente_id,
+                   CreditoCliente.monto_original, CreditoCliente.monto_pendiente)
+            .where(CreditoCliente.venta_id == venta_id, CreditoCliente.anulado == False)
+            .with_for_update()
+        )).all()
+        if creditos:
+            pagos = []
+            for credito in creditos:
+                cobrado = credito.monto_original - credito.monto_pendiente
+                if cobrado > 0:
+                    pagos.append({"credito_id": credito.id, "monto": -cobrado, "tipo": 'DEVOLUCION',
+                                  "observacion": f"Devolución por anulación de la venta #{venta_id}"})
+                pagos.append({"credito_id": credito.id, "monto": credito.monto_original, "tipo": 'ANULACION',
+                              "observacion": f"Anulación de la venta #{venta_id}"})
+            await db.execute(insert(PagoCredito), pagos)
+            await db.execute(
+                update(CreditoCliente)
+                .where(CreditoCliente.id.in_([c.id for c in creditos]))
+                .values(pagado=True, anulado=True, monto_pendiente=0)
+                .execution_options(synchronize_session=False)
+            )
+            for credito in creditos:
+                if credito.monto_pendiente > 0:
+                    await saldo_credito.liberar_credito(db, credito.cliente_id, credito.monto_pendiente)
+        
+        await db.execute(
+            update(MateriaLaboratorio)
+            .where(MateriaLaboratorio.id.in_(
+                select(VentaItem.materia_laboratorio_id)
+                .where(VentaItem.venta_id == venta_id, VentaItem.materia_laboratorio_id.isnot(None))
+            ))
+            .values(estado=EstadoMateria.DISPONIBLE)
+            .execution_options(synchronize_session=False)
+        )
     
     venta.estado = EstadoVenta.ANULADA
     await db.commit()
@@ -1517,6 +2049,12 @@ async def generar_factura(venta_id: int, db: AsyncSession = Depends(get_db)):
     }
 
 # ==================== FUNCIONARIOS ====================
+def rango_mes(anio: int, mes: int):
+    """Rango semiabierto [inicio, fin) del mes en UTC: comparado contra creado_en usa los índices"""
+    inicio = datetime(anio, mes, 1, tzinfo=timezone.utc)
+    fin = datetime(anio + 1, 1, 1, tzinfo=timezone.utc) if mes == 12 else datetime(anio, mes + 1, 1, tzinfo=timezone.utc)
+    return inicio, fin
+
 @api_router.post("/funcionarios", response_model=FuncionarioResponse)
 async def crear_funcionario(data: FuncionarioCreate, db: AsyncSession = Depends(get_db)):
     funcionario = Funcionario(**data.model_dump())
@@ -1527,30 +2065,28 @@ async def crear_funcionario(data: FuncionarioCreate, db: AsyncSession = Depends(
 
 @api_router.get("/funcionarios")
 async def listar_funcionarios(empresa_id: int, db: AsyncSession = Depends(get_db)):
+    # Adelantos del mes en curso, sumados en la misma consulta
+    inicio_mes, fin_mes = rango_mes(date.today().year, date.today().month)
+    total_adelantos = func_sql.coalesce(func_sql.sum(AdelantoSalario.monto), 0)
     result = await db.execute(
-        select(Funcionario).where(Funcionario.empresa_id == empresa_id, Funcionario.activo == True)
+        select(Funcionario, total_adelantos)
+        .outerjoin(AdelantoSalario, and_(
+            AdelantoSalario.funcionario_id == Funcionario.id,
+            AdelantoSalario.creado_en >= inicio_mes,
+            AdelantoSalario.creado_en < fin_mes
+        ))
+        .where(Funcionario.empresa_id == empresa_id, Funcionario.activo == True)
+        .group_by(Funcionario.id)
         .order_by(Funcionario.nombre)
     )
-    funcionarios = result.scalars().all()
     
-    # Get current month adelantos for each funcionario
     response = []
-    
-    for funcionario in funcionarios:
-        # Calculate total adelantos this month
-        adelantos_result = await db.execute(
-            select(func_sql.coalesce(func_sql.sum(AdelantoSalario.monto), 0))
-            .where(
-                AdelantoSalario.funcionario_id == funcionario.id,
-                func_sql.extract('year', AdelantoSalario.creado_en) == date.today().year,
-                func_sql.extract('month', AdelantoSalario.creado_en) == date.today().month
-            )
-        )
-        total_adelantos = adelantos_result.scalar() or Decimal('0')
-        salario_restante = (funcionario.salario_base or Decimal('0')) - total_adelantos
+    for funcionario, adelantos in result.all():
+        adelantos = Decimal(str(adelantos or 0))
+        salario_restante = (funcionario.salario_base or Decimal('0')) - adelantos
         
         func_dict = FuncionarioResponse.model_validate(funcionario).model_dump()
-        func_dict['total_adelantos_mes'] = float(total_adelantos)
+        func_dict['total_adelantos_mes'] = float(adelantos)
         func_dict['salario_restante'] = float(salario_restante)
         response.append(func_dict)
     
@@ -1618,11 +2154,7 @@ async def listar_adelantos(funcionario_id: int, periodo: Optional[str] = None, d
     
     if periodo:
         year, month = map(int, periodo.split('-'))
-        start_date = datetime(year, month, 1, tzinfo=timezone.utc)
-        if month == 12:
-            end_date = datetime(year + 1, 1, 1, tzinfo=timezone.utc)
-        else:
-            end_date = datetime(year, month + 1, 1, tzinfo=timezone.utc)
+        start_date, end_date = rango_mes(year, month)
         query = query.where(
             AdelantoSalario.creado_en >= start_date,
             AdelantoSalario.creado_en < end_date
@@ -1688,7 +2220,7 @@ async def listar_entregas(
     vehiculo_id: Optional[int] = None,
     responsable_id: Optional[int] = None,
     estado: Optional[str] = None,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     query = (
         select(Entrega, Venta, Cliente, Vehiculo, Usuario)
@@ -1787,20 +2319,25 @@ async def obtener_preferencias(usuario_id: int, db: AsyncSession = Depends(get_d
     return pref
 
 # ==================== COTIZACION DIVISAS ====================
+def _cotizacion_manual(manuales: dict) -> CotizacionDivisa:
+    return CotizacionDivisa(
+        usd_pyg=Decimal(str(manuales['usd_pyg'])),
+        brl_pyg=Decimal(str(manuales['brl_pyg'])),
+        manual=True,
+        fecha_actualizacion=manuales.get('updated_at') or datetime.now(timezone.utc)
+    )
+
 @api_router.get("/cotizacion", response_model=CotizacionDivisa)
 async def obtener_cotizacion():
     """Get USD/PYG and BRL/PYG exchange rates"""
-    global MANUAL_CURRENCY_RATES
+    manuales = await compartido.obtener(COTIZACION_MANUAL, {})
     
     # If manual mode is set, return manual rates
-    if MANUAL_CURRENCY_RATES['manual'] and MANUAL_CURRENCY_RATES['usd_pyg']:
-        return CotizacionDivisa(
-            usd_pyg=Decimal(str(MANUAL_CURRENCY_RATES['usd_pyg'])),
-            brl_pyg=Decimal(str(MANUAL_CURRENCY_RATES['brl_pyg'])),
-            manual=True,
-            fecha_actualizacion=MANUAL_CURRENCY_RATES['updated_at'] or datetime.now(timezone.utc)
-        )
+    if manuales.get('manual') and manuales.get('usd_pyg'):
+        return _cotizacion_manual(manuales)
     
+    inicio = time.perf_counter()
+    medido = False
     try:
         async with httpx.AsyncClient() as client:
             response = await client.get(
@@ -1808,6 +2345,8 @@ async def obtener_cotizacion():
                 timeout=10.0
             )
             data = response.json()
+            metrics.COTIZACION_FETCH.observe(time.perf_counter() - inicio, resultado='ok')
+            medido = True
             
             usd_pyg = Decimal(str(data['rates'].get('PYG', 7500)))
             brl_rate = Decimal(str(data['rates'].get('BRL', 5.0)))
@@ -1820,15 +2359,12 @@ async def obtener_cotizacion():
                 fecha_actualizacion=datetime.now(timezone.utc)
             )
     except Exception as e:
+        if not medido:
+            metrics.COTIZACION_FETCH.observe(time.perf_counter() - inicio, resultado='error')
         logger.error(f"Error fetching exchange rates: {e}")
         # Return default or cached values
-        if MANUAL_CURRENCY_RATES['usd_pyg']:
-            return CotizacionDivisa(
-                usd_pyg=Decimal(str(MANUAL_CURRENCY_RATES['usd_pyg'])),
-                brl_pyg=Decimal(str(MANUAL_CURRENCY_RATES['brl_pyg'])),
-                manual=True,
-                fecha_actualizacion=MANUAL_CURRENCY_RATES['updated_at'] or datetime.now(timezone.utc)
-            )
+        if manuales.get('usd_pyg'):
+            return _cotizacion_manual(manuales)
         return CotizacionDivisa(
             usd_pyg=Decimal('7500'),
             brl_pyg=Decimal('1500'),
@@ -1839,25 +2375,25 @@ async def obtener_cotizacion():
 @api_router.post("/cotizacion/manual")
 async def establecer_cotizacion_manual(data: dict):
     """Set manual exchange rates"""
-    global MANUAL_CURRENCY_RATES
-    
-    MANUAL_CURRENCY_RATES['usd_pyg'] = data.get('usd_pyg')
-    MANUAL_CURRENCY_RATES['brl_pyg'] = data.get('brl_pyg')
-    MANUAL_CURRENCY_RATES['manual'] = data.get('manual', True)
-    MANUAL_CURRENCY_RATES['updated_at'] = datetime.now(timezone.utc)
+    manuales = {
+        'usd_pyg': data.get('usd_pyg'),
+        'brl_pyg': data.get('brl_pyg'),
+        'manual': data.get('manual', True),
+        'updated_at': datetime.now(timezone.utc).isoformat()
+    }
+    await compartido.guardar(COTIZACION_MANUAL, manuales)
     
-    return {"message": "Cotización manual establecida", "data": MANUAL_CURRENCY_RATES}
+    return {"message": "Cotización manual establecida", "data": manuales}
 
 @api_router.post("/cotizacion/auto")
 async def activar_cotizacion_automatica():
     """Switch back to automatic exchange rates"""
-    global MANUAL_CURRENCY_RATES
-    MANUAL_CURRENCY_RATES['manual'] = False
+    await compartido.actualizar(COTIZACION_MANUAL, manual=False)
     return {"message": "Cotización automática activada"}
 
 # ==================== DASHBOARD ====================
 @api_router.get("/dashboard/stats", response_model=DashboardStats)
-async def obtener_estadisticas_dashboard(empresa_id: int, db: AsyncSession = Depends(get_db)):
+async def obtener_estadisticas_dashboard(empresa_id: int, db: AsyncSession = Depends(get_read_db)):
     today = datetime.now(timezone.utc).date()
     today_start = datetime.combine(today, datetime.min.time()).replace(tzinfo=timezone.utc)
     today_end = datetime.combine(today, datetime.max.time()).replace(tzinfo=timezone.utc)
@@ -2039,6 +2575,7 @@ async def obtener_alertas(empresa_id: int, db: AsyncSession = Depends(get_db)):
 # ==================== REPORTES PDF ====================
 def crear_pdf_reporte(titulo, subtitulo, columnas, datos, totales=None):
     """Genera un PDF con tabla de datos"""
+    inicio = time.perf_counter()
     buffer = io.BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=30, leftMargin=30, topMargin=30, bottomMargin=30)
     elements = []
@@ -2090,6 +2627,7 @@ def crear_pdf_reporte(titulo, subtitulo, columnas, datos, totales=None):
     elements.append(Paragraph(f"Generado el {datetime.now().strftime('%d/%m/%Y %H:%M')} - Luz Brill ERP", footer_style))
     
     doc.build(elements)
+    metrics.PDF_RENDER.observe(time.perf_counter() - inicio, reporte=titulo)
     buffer.seek(0)
     return buffer.getvalue()
 
@@ -2098,7 +2636,7 @@ async def reporte_ventas(
     empresa_id: int,
     fecha_desde: str,
     fecha_hasta: str,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Genera reporte PDF de ventas por rango de fechas"""
     fecha_ini = datetime.fromisoformat(fecha_desde)
@@ -2148,7 +2686,7 @@ async def reporte_ventas(
     )
 
 @api_router.get("/reportes/stock")
-async def reporte_stock(empresa_id: int, db: AsyncSession = Depends(get_db)):
+async def reporte_stock(empresa_id: int, db: AsyncSession = Depends(get_read_db)):
     """Genera reporte PDF de stock actual"""
     result = await db.execute(
         select(Producto, func_sql.coalesce(func_sql.sum(StockActual.cantidad), 0).label('stock_total'))
@@ -2186,7 +2724,7 @@ async def reporte_stock(empresa_id: int, db: AsyncSession = Depends(get_db)):
     )
 
 @api_router.get("/reportes/deudas-proveedores")
-async def reporte_deudas_proveedores(empresa_id: int, db: AsyncSession = Depends(get_db)):
+async def reporte_deudas_proveedores(empresa_id: int, db: AsyncSession = Depends(get_read_db)):
     """Genera reporte PDF de deudas a proveedores"""
     result = await db.execute(
         select(DeudaProveedor, Proveedor)
@@ -2228,7 +2766,7 @@ async def reporte_deudas_proveedores(empresa_id: int, db: AsyncSession = Depends
     )
 
 @api_router.get("/reportes/creditos-clientes")
-async def reporte_creditos_clientes(empresa_id: int, db: AsyncSession = Depends(get_db)):
+async def reporte_creditos_clientes(empresa_id: int, db: AsyncSession = Depends(get_read_db)):
     """Genera reporte PDF de créditos de clientes pendientes"""
     result = await db.execute(
         select(CreditoCliente, Cliente)
@@ -2268,73 +2806,262 @@ async def reporte_creditos_clientes(empresa_id: int, db: AsyncSession = Depends(
         headers={"Content-Disposition": f"attachment; filename=reporte_creditos_clientes_{date.today().isoformat()}.pdf"}
     )
 
+# ==================== AGING (ANTIGÜEDAD DE SALDOS) ====================
+ETIQUETAS_TRAMOS = {'por_vencer': 'Por vencer', '0_30': '0-30', '31_60': '31-60', '61_90': '61-90', '90_mas': '+90'}
+
+def tramos_aging(fecha, corte: date, por_vencer: bool = False):
+    """(nombre, condición) por tramo de días entre `fecha` y `corte`; comparando fechas usa los índices"""
+    limite_30, limite_60, limite_90 = (corte - timedelta(days=dias) for dias in (30, 60, 90))
+    tramos = []
+    if por_vencer:
+        tramos.append(('por_vencer', fecha > corte))
+        tramos.append(('0_30', and_(fecha <= corte, fecha >= limite_30)))
+    else:
+        tramos.append(('0_30', fecha >= limite_30))
+    tramos += [
+        ('31_60', and_(fecha < limite_30, fecha >= limite_60)),
+        ('61_90', and_(fecha < limite_60, fecha >= limite_90)),
+        ('90_mas', fecha < limite_90),
+    ]
+    return tramos
+
+def columnas_aging(tramos, monto):
+    """Un SUM(CASE ...) por tramo: todos los tramos salen del mismo GROUP BY"""
+    return [
+        func_sql.coalesce(func_sql.sum(case((condicion, monto), else_=0)), 0).label(nombre)
+        for nombre, condicion in tramos
+    ] + [func_sql.coalesce(func_sql.sum(monto), 0).label('total')]
+
+async def responder_aging(db, stmt, tramos, entidad: str, titulo: str, archivo: str, corte: date, formato: str):
+    """Salida del reporte de aging en JSON, CSV (streaming) o PDF"""
+    nombres = [nombre for nombre, _ in tramos] + ['total']
+
+    def fila_dict(fila):
+        return {
+            f"{entidad}_id": fila.id,
+            entidad: f"{fila.nombre} {fila.apellido or ''}".strip(),
+            **{nombre: float(getattr(fila, nombre)) for nombre in nombres}
+        }
+
+    if formato == 'csv':
+        async def generar_csv():
+            # Sesión propia: la del Depends se cierra antes de que termine el streaming
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow([f"{entidad}_id", entidad] + nombres)
+            async with async_read_session_maker() as session:
+                async for fila in await session.stream(stmt):
+                    datos = fila_dict(fila)
+                    writer.writerow(list(datos.values()))
+                    if buffer.tell() > 64 * 1024:
+                        yield buffer.getvalue()
+                        buffer.seek(0)
+                        buffer.truncate()
+            yield buffer.getvalue()
+
+        return StreamingResponse(
+            generar_csv(),
+            media_type="text/csv; charset=utf-8",
+            headers={"Content-Disposition": f"attachment; filename={archivo}_{corte.isoformat()}.csv"}
+        )
+
+    filas = [fila_dict(fila) for fila in await db.execute(stmt)]
+    totales = {nombre: sum(fila[nombre] for fila in filas) for nombre in nombres}
+
+    if formato == 'pdf':
+        columnas = [entidad.capitalize()] + [ETIQUETAS_TRAMOS.get(nombre, 'Total') for nombre in nombres]
+        datos = [[fila[entidad][:25]] + [f"{fila[nombre]:,.0f}" for nombre in nombres] for fila in filas]
+        pdf_bytes = crear_pdf_reporte(
+            titulo,
+            f"Fecha de corte: {corte.strftime('%d/%m/%Y')} | {entidad.capitalize()}s con saldo: {len(filas)}",
+            columnas,
+            datos,
+            ['TOTAL:'] + [f"{totales[nombre]:,.0f}" for nombre in nombres]
+        )
+        return Response(
+            content=pdf_bytes,
+            media_type="application/pdf",
+            headers={"Content-Disposition": f"attachment; filename={archivo}_{corte.isoformat()}.pdf"}
+        )
+
+    return {"fecha_corte": corte.isoformat(), "tramos": nombres[:-1], "filas": filas, "totales": totales}
+
+def fin_del_dia(dia: date) -> datetime:
+    """Primer instante (UTC) del día siguiente, para comparar timestamps contra una fecha"""
+    return datetime(dia.year, dia.month, dia.day, tzinfo=timezone.utc) + timedelta(days=1)
+
+def validar_formato_aging(formato: str, fecha: Optional[date]):
+    if formato not in ('json', 'csv', 'pdf'):
+        raise HTTPException(status_code=400, detail="Formato inválido: json, csv o pdf")
+    return fecha or date.today()
+
+@api_router.get("/reportes/aging-creditos")
+async def reporte_aging_creditos(
+    empresa_id: int,
+    fecha: Optional[date] = None,
+    formato: str = 'json',
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Antigüedad de los créditos pendientes por cliente (días desde fecha_venta), en una consulta agrupada
+
+    Con `fecha` pasada los saldos son los de ese día: cuenta lo cobrado hasta el corte.
+    """
+    corte = validar_formato_aging(formato, fecha)
+    fecha_venta = func_sql.coalesce(CreditoCliente.fecha_venta, corte)
+    if corte >= date.today():
+        saldo, filtros = CreditoCliente.monto_pendiente, [CreditoCliente.pagado == False]
+    else:
+        # Corte pasado: saldo de ese día (lo original menos lo cobrado hasta el corte,
+        # incluidas devoluciones y anulaciones), no el pendiente de hoy
+        cobrado = (
+            select(func_sql.coalesce(func_sql.sum(PagoCredito.monto), 0))
+            .where(PagoCredito.credito_id == CreditoCliente.id, PagoCredito.fecha_pago < fin_del_dia(corte))
+            .scalar_subquery()
+        )
+        saldo, filtros = CreditoCliente.monto_original - cobrado, []
+    creditos = (
+        select(CreditoCliente.cliente_id, fecha_venta.label('fecha_venta'), saldo.label('saldo'))
+        .join(Cliente, CreditoCliente.cliente_id == Cliente.id)
+        # Con una fecha de corte pasada, los créditos posteriores todavía no existían
+        .where(Cliente.empresa_id == empresa_id, fecha_venta <= corte, *filtros)
+        .subquery()
+    )
+    tramos = tramos_aging(creditos.c.fecha_venta, corte)
+    stmt = (
+        select(Cliente.id, Cliente.nombre, Cliente.apellido, *columnas_aging(tramos, creditos.c.saldo))
+        .join(Cliente, creditos.c.cliente_id == Cliente.id)
+        .where(creditos.c.saldo > 0)
+        .group_by(Cliente.id, Cliente.nombre, Cliente.apellido)
+        .order_by(func_sql.sum(creditos.c.saldo).desc(), Cliente.id)
+    )
+    return await responder_aging(
+        db, stmt, tramos, 'cliente', "Antigüedad de Créditos de Clientes", "aging_creditos", corte, formato
+    )
+
+@api_router.get("/reportes/aging-deudas")
+async def reporte_aging_deudas(
+    empresa_id: int,
+    fecha: Optional[date] = None,
+    formato: str = 'json',
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Antigüedad de las deudas pendientes por proveedor (días de vencidas según fecha_limite)
+
+    Con `fecha` pasada cuenta las deudas emitidas hasta ese día y que seguían impagas.
+    """
+    corte = validar_formato_aging(formato, fecha)
+    # Sin fecha límite la deuda vence al emitirse
+    vencimiento = func_sql.coalesce(DeudaProveedor.fecha_limite, DeudaProveedor.fecha_emision, corte)
+    tramos = tramos_aging(vencimiento, corte, por_vencer=True)
+    # Emitida hasta el corte (sin fecha de emisión se incluye) y todavía impaga ese día
+    filtros = [func_sql.coalesce(DeudaProveedor.fecha_emision, corte) <= corte]
+    if corte >= date.today():
+        filtros.append(DeudaProveedor.pagado == False)
+    else:
+        filtros.append(or_(DeudaProveedor.pagado == False, DeudaProveedor.fecha_pago > corte))
+    stmt = (
+        select(
+            Proveedor.id, Proveedor.nombre, literal(None, String).label('apellido'),
+            *columnas_aging(tramos, DeudaProveedor.monto)
+        )
+        .join(Proveedor, DeudaProveedor.proveedor_id == Proveedor.id)
+        .where(Proveedor.empresa_id == empresa_id, *filtros)
+        .group_by(Proveedor.id, Proveedor.nombre)
+        .order_by(func_sql.sum(DeudaProveedor.monto).desc(), Proveedor.id)
+    )
+    return await responder_aging(
+        db, stmt, tramos, 'proveedor', "Antigüedad de Deudas a Proveedores", "aging_deudas", corte, formato
+    )
+
 # ==================== CICLOS DE SALARIO ====================
 @api_router.post("/ciclos-salario/generar")
 async def generar_ciclo_salario(empresa_id: int, mes: str, db: AsyncSession = Depends(get_db)):
-    """Genera ciclos de salario para todos los funcionarios activos del mes especificado (formato: YYYY-MM)"""
-    # Check if cycles already exist for this month
-    existing = await db.execute(
-        select(CicloSalario).where(CicloSalario.periodo == mes)
+    """Genera ciclos de salario para todos los funcionarios activos del mes especificado (formato: YYYY-MM)
+
+    Un único INSERT ... SELECT con los adelantos del mes anterior agrupados; la
+    restricción única (funcionario_id, periodo) hace que repetirlo no duplique ciclos.
+    """
+    try:
+        año, mes_num = (int(parte) for parte in mes.split('-'))
+        fecha_inicio = date(año, mes_num, 1)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Mes inválido, usar formato YYYY-MM")
+    mes = f"{año:04d}-{mes_num:02d}"
+    if mes_num == 12:
+        fecha_fin = date(año + 1, 1, 1) - timedelta(days=1)
+    else:
+        fecha_fin = date(año, mes_num + 1, 1) - timedelta(days=1)
+
+    # Adelantos del mes anterior se descuentan del salario actual
+    mes_anterior = fecha_inicio - timedelta(days=1)
+    inicio_anterior, fin_anterior = rango_mes(mes_anterior.year, mes_anterior.month)
+    adelantos = (
+        select(AdelantoSalario.funcionario_id, func_sql.sum(AdelantoSalario.monto).label('total'))
+        .join(Funcionario, AdelantoSalario.funcionario_id == Funcionario.id)
+        .where(
+            Funcionario.empresa_id == empresa_id,
+            AdelantoSalario.creado_en >= inicio_anterior,
+            AdelantoSalario.creado_en < fin_anterior
+        )
+        .group_by(AdelantoSalario.funcionario_id)
+        .subquery()
     )
-    if existing.scalar_one_or_none():
-        raise HTTPException(status_code=400, detail=f"Ya existen ciclos de salario para {mes}")
-    
-    # Get all active funcionarios
-    func_result = await db.execute(
-        select(Funcionario).where(Funcionario.empresa_id == empresa_id, Funcionario.activo == True)
+    salario_base = func_sql.coalesce(Funcionario.salario_base, 0)
+    descuentos = func_sql.coalesce(adelantos.c.total, 0)
+    origen = (
+        select(
+            Funcionario.id,
+            literal(mes, String),
+            literal(fecha_inicio, Date),
+            literal(fecha_fin, Date),
+            salario_base,
+            descuentos,
+            salario_base - descuentos,
+            literal(False, Boolean)
+        )
+        .outerjoin(adelantos, adelantos.c.funcionario_id == Funcionario.id)
+        .where(Funcionario.empresa_id == empresa_id, Funcionario.activo == True)
     )
-    funcionarios = func_result.scalars().all()
-    
-    if not funcionarios:
-        raise HTTPException(status_code=404, detail="No hay funcionarios activos")
-    
-    # Parse month
-    año, mes_num = mes.split('-')
-    fecha_inicio = date(int(año), int(mes_num), 1)
-    if int(mes_num) == 12:
-        fecha_fin = date(int(año) + 1, 1, 1) - timedelta(days=1)
-    else:
-        fecha_fin = date(int(año), int(mes_num) + 1, 1) - timedelta(days=1)
-    
-    ciclos_creados = []
-    for funcionario in funcionarios:
-        # Calculate adelantos for this funcionario in previous month
-        # (Adelantos del mes anterior se descuentan del salario actual)
-        mes_anterior = fecha_inicio - timedelta(days=1)
-        periodo_anterior = mes_anterior.strftime('%Y-%m')
-        
-        adelantos_result = await db.execute(
-            select(func_sql.coalesce(func_sql.sum(AdelantoSalario.monto), 0))
-            .where(
-                AdelantoSalario.funcionario_id == funcionario.id,
-                func_sql.extract('year', AdelantoSalario.creado_en) == mes_anterior.year,
-                func_sql.extract('month', AdelantoSalario.creado_en) == mes_anterior.month
-            )
+
+    stmt = (
+        insert_dialecto(CicloSalario, db.bind)
+        .from_select(
+            ['funcionario_id', 'periodo', 'fecha_inicio', 'fecha_fin',
+             'salario_base', 'descuentos', 'salario_neto', 'pagado'],
+            origen
         )
-        total_adelantos = adelantos_result.scalar() or Decimal('0')
-        
-        salario_neto = (funcionario.salario_base or Decimal('0')) - total_adelantos
-        
-        ciclo = CicloSalario(
-            funcionario_id=funcionario.id,
-            periodo=mes,
-            fecha_inicio=fecha_inicio,
-            fecha_fin=fecha_fin,
-            salario_base=funcionario.salario_base or Decimal('0'),
-            descuentos=total_adelantos,
-            salario_neto=salario_neto,
-            pagado=False
+        .on_conflict_do_nothing(index_elements=['funcionario_id', 'periodo'])
+        .returning(
+            CicloSalario.funcionario_id, CicloSalario.salario_base,
+            CicloSalario.descuentos, CicloSalario.salario_neto
         )
-        db.add(ciclo)
-        ciclos_creados.append({
-            "funcionario": f"{funcionario.nombre} {funcionario.apellido or ''}",
-            "salario_base": float(funcionario.salario_base or 0),
-            "adelantos": float(total_adelantos),
-            "salario_neto": float(salario_neto)
-        })
-    
+    )
+    creados = (await db.execute(stmt)).all()
+
+    nombres = {
+        fila.id: f"{fila.nombre} {fila.apellido or ''}"
+        for fila in await db.execute(
+            select(Funcionario.id, Funcionario.nombre, Funcionario.apellido)
+            .where(Funcionario.empresa_id == empresa_id, Funcionario.activo == True)
+        )
+    }
+    if not nombres:
+        raise HTTPException(status_code=404, detail="No hay funcionarios activos")
+
     await db.commit()
-    
+
+    ciclos_creados = sorted(
+        (
+            {
+                "funcionario": nombres.get(ciclo.funcionario_id, ''),
+                "salario_base": float(ciclo.salario_base or 0),
+                "adelantos": float(ciclo.descuentos or 0),
+                "salario_neto": float(ciclo.salario_neto or 0)
+            }
+            for ciclo in creados
+        ),
+        key=lambda detalle: detalle["funcionario"]
+    )
     return {
         "message": f"Ciclos de salario generados para {mes}",
         "ciclos_creados": len(ciclos_creados),
@@ -2374,6 +3101,45 @@ async def listar_ciclos_salario(empresa_id: int, periodo: Optional[str] = None,
         for ciclo, func in ciclos
     ]
 
+@api_router.post("/ciclos-salario/pagar")
+async def pagar_ciclos_salario(data: CiclosSalarioPagarRequest, db: AsyncSession = Depends(get_db)):
+    """Marca como pagados varios ciclos en un solo UPDATE: por ids y/o por periodo (YYYY-MM)
+
+    Los ciclos ya pagados se ignoran; devuelve las filas que efectivamente cambiaron.
+    """
+    ids, periodo = data.ids, data.periodo
+    if ids is None and periodo is None:
+        raise HTTPException(status_code=400, detail="Indicar ids o periodo")
+
+    condiciones = [
+        CicloSalario.pagado == False,
+        CicloSalario.funcionario_id.in_(select(Funcionario.id).where(Funcionario.empresa_id == data.empresa_id))
+    ]
+    if ids is not None:
+        condiciones.append(CicloSalario.id.in_(ids))
+    if periodo is not None:
+        condiciones.append(CicloSalario.periodo == periodo)
+
+    result = await db.execute(
+        update(CicloSalario)
+        .where(*condiciones)
+        .values(pagado=True, fecha_pago=datetime.now(timezone.utc))
+        .returning(CicloSalario.id, CicloSalario.funcionario_id, CicloSalario.periodo, CicloSalario.salario_neto)
+        .execution_options(synchronize_session=False)
+    )
+    ciclos = result.all()
+    await db.commit()
+
+    return {
+        "message": f"{len(ciclos)} salarios marcados como pagados",
+        "pagados": len(ciclos),
+        "total": float(sum((c.salario_neto or Decimal('0') for c in ciclos), Decimal('0'))),
+        "ciclos": [
+            {"id": c.id, "funcionario_id": c.funcionario_id, "periodo": c.periodo, "salario_neto": float(c.salario_neto or 0)}
+            for c in sorted(ciclos, key=lambda c: c.id)
+        ]
+    }
+
 @api_router.post("/ciclos-salario/{ciclo_id}/pagar")
 async def pagar_ciclo_salario(ciclo_id: int, db: AsyncSession = Depends(get_db)):
     """Marca un ciclo de salario como pagado"""
@@ -2424,6 +3190,98 @@ async def alertas_salarios_pendientes(empresa_id: int, db: AsyncSession = Depend
     
     return alertas
 
+# ==================== TAREAS PROGRAMADAS ====================
+async def tarea_snapshot_stock(session_maker, programada_para):
+    async with session_maker() as db:
+        return await stock_snapshots.generar_snapshot(db, stock_snapshots.cierre_mes_anterior(programada_para.date()))
+
+async def tarea_particiones(session_maker, programada_para):
+    async with engine.begin() as conn:
+        return await particiones.asegurar_particiones(conn)
+
+async def tarea_saldos_credito(session_maker, programada_para):
+    async with session_maker() as db:
+        corregidos = await saldo_credito.recalcular_credito_usado(db)
+        await db.commit()
+    if corregidos:
+        logger.warning(f"credito_usado corregido para {len(corregidos)} clientes: {corregidos[:20]}")
+    return f"{len(corregidos)} clientes corregidos"
+
+async def tarea_purgar_idempotencia(session_maker, programada_para):
+    async with session_maker() as db:
+        return f"{await idempotencia.purgar_vencidas(db)} claves borradas"
+
+async def tarea_ciclos_salario(session_maker, programada_para):
+    """Ciclos del mes de la hora programada para cada empresa con funcionarios activos (idempotente)"""
+    mes = programada_para.strftime('%Y-%m')
+    async with session_maker() as db:
+        empresa_ids = (await db.execute(
+            select(Funcionario.empresa_id).where(Funcionario.activo == True).distinct()
+        )).scalars().all()
+        creados = 0
+        for empresa_id in empresa_ids:
+            creados += (await generar_ciclo_salario(empresa_id, mes, db))["ciclos_creados"]
+    return f"{creados} ciclos creados para {mes} en {len(empresa_ids)} empresas"
+
+planificador = tareas.Planificador(async_session_maker)
+planificador.registrar('snapshot_stock', '15 3 1 * *', tarea_snapshot_stock, 'Snapshot de stock al cierre del mes anterior',
+                       recuperar_todas=True, duracion_maxima=timedelta(hours=2))
+planificador.registrar('ciclos_salario', '0 4 1 * *', tarea_ciclos_salario, 'Generar los ciclos de salario del mes',
+                       recuperar_todas=True)
+planificador.registrar('particiones', '0 3 * * *', tarea_particiones, 'Particiones mensuales de los próximos meses')
+planificador.registrar('saldos_credito', '30 3 * * *', tarea_saldos_credito, 'Recalcular credito_usado desde los créditos')
+planificador.registrar('purgar_idempotencia', '*/30 * * * *', tarea_purgar_idempotencia, 'Borrar claves de idempotencia vencidas',
+                       duracion_maxima=timedelta(minutes=15))
+
+def ejecucion_a_dict(ejecucion: EjecucionTarea):
+    return {
+        "id": ejecucion.id,
+        "nombre": ejecucion.nombre,
+        "programada_para": ejecucion.programada_para,
+        "worker": ejecucion.worker,
+        "estado": ejecucion.estado,
+        "inicio": ejecucion.inicio,
+        "fin": ejecucion.fin,
+        "duracion_ms": ejecucion.duracion_ms,
+        "detalle": ejecucion.detalle,
+    }
+
+@api_router.get("/tareas")
+async def listar_tareas():
+    ahora = datetime.now(timezone.utc)
+    return {
+        "habilitadas": tareas.HABILITADAS,
+        "tareas": [
+            {
+                "nombre": t.nombre,
+                "cron": t.cron.expresion,
+                "descripcion": t.descripcion,
+                "proxima": t.proxima or t.cron.siguiente(ahora),
+            }
+            for t in planificador.tareas.values()
+        ]
+    }
+
+@api_router.get("/tareas/ejecuciones")
+async def listar_ejecuciones_tareas(nombre: Optional[str] = None, limit: int = 50, db: AsyncSession = Depends(get_read_db)):
+    """Historial de ejecuciones con estado y duración, más recientes primero"""
+    query = select(EjecucionTarea).order_by(EjecucionTarea.id.desc()).limit(min(max(limit, 1), 500))
+    if nombre:
+        query = query.where(EjecucionTarea.nombre == nombre)
+    result = await db.execute(query)
+    return [ejecucion_a_dict(e) for e in result.scalars().all()]
+
+@api_router.post("/tareas/{nombre}/ejecutar")
+async def ejecutar_tarea(nombre: str, db: AsyncSession = Depends(get_db)):
+    """Corre la tarea ahora, fuera de su horario"""
+    if nombre not in planificador.tareas:
+        raise HTTPException(status_code=404, detail="Tarea no encontrada")
+    ejecucion_id = await planificador.ejecutar(nombre)
+    if ejecucion_id is None:
+        raise HTTPException(status_code=409, detail="La tarea ya se está ejecutando para este horario")
+    result = await db.execute(select(EjecucionTarea).where(EjecucionTarea.id == ejecucion_id))
+    return ejecucion_a_dict(result.scalar_one())
+
 # ==================== SEED DATA ====================
 @api_router.post("/seed")
 async def seed_data(db: AsyncSession = Depends(get_db)):
@@ -2623,10 +3481,11 @@ async def reset_database(db: AsyncSession = Depends(get_db)):
     Solo usar en desarrollo o primera configuración
     """
     try:
-        # Drop all tables
-        async with engine.begin() as conn:
-            await conn.run_sync(Base.metadata.drop_all)
-            await conn.run_sync(Base.metadata.create_all)
+        # Drop all tables: por Alembic, para que alembic_version y el esquema
+        # (particiones de movimientos_stock en PostgreSQL) queden al día
+        await asyncio.to_thread(reiniciar_esquema)
+        # Las conexiones del pool pueden tener sentencias cacheadas de las tablas borradas
+        await engine.dispose()
         
         logger.info("Database reset completed")
         
@@ -2751,10 +3610,20 @@ app.include_router(api_router)
 # Startup event
 @app.on_event("startup")
 async def startup():
-    await init_db()
-    logger.info("Database initialized")
+    if MIGRATE_ON_STARTUP:
+        await init_db()
+        logger.info("Database migrated")
+    async with engine.begin() as conn:
+        if await particiones.asegurar_particiones(conn):
+            logger.info("Particiones mensuales al día")
+    await compartido.iniciar()
+    if tareas.HABILITADAS:
+        planificador.iniciar()
 
 @app.on_event("shutdown")
 async def shutdown():
-    await engine.dispose()
+    await planificador.detener()
+    await confirmador.detener()
+    await compartido.detener()
+    await dispose_engines()
     logger.info("Database connection closed")
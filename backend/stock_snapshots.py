@@ -0,0 +1,146 @@
+"""
+Snapshots de stock a fin de mes y reconstrucción del stock a una fecha pasada.
+
+Un snapshot guarda, para el cierre de `fecha` (UTC), la suma del ledger de
+movimientos por (producto, almacén); las filas en cero no se guardan. El
+stock a cualquier fecha es el snapshot anterior más cercano más los
+movimientos desde entonces: el trabajo queda acotado a un mes de movimientos
+en vez de recorrer todo el ledger (y en PostgreSQL solo toca esas particiones).
+
+Cada snapshot se arma desde el anterior, así que generarlos mes a mes es
+incremental. Para correrlo a mano o desde cron:
+
+    python stock_snapshots.py                # cierre del mes anterior
+    python stock_snapshots.py --fecha 2026-09-30
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+from sqlalchemy import select, delete, insert, func, literal, union_all, Date
+
+ROOT_DIR = Path(__file__).parent
+logger = logging.getLogger(__name__)
+
+
+def fin_del_dia(fecha: date) -> datetime:
+    """Primer instante del día siguiente en UTC (límite exclusivo)"""
+    siguiente = fecha + timedelta(days=1)
+    return datetime(siguiente.year, siguiente.month, siguiente.day, tzinfo=timezone.utc)
+
+
+def cierre_mes_anterior(hoy: date = None) -> date:
+    hoy = hoy or date.today()
+    return date(hoy.year, hoy.month, 1) - timedelta(days=1)
+
+
+async def snapshot_base(db, empresa_id: int, fecha: date):
+    """Fecha del snapshot más reciente en o antes de `fecha` para la empresa (o None)"""
+    from models import StockSnapshot, Producto
+
+    return (await db.execute(
+        select(func.max(StockSnapshot.fecha))
+        .join(Producto, StockSnapshot.producto_id == Producto.id)
+        .where(Producto.empresa_id == empresa_id, StockSnapshot.fecha <= fecha)
+    )).scalar()
+
+
+def saldos_al_dia(empresa_id: int, fecha: date, base: date = None, producto_id: int = None, almacen_id: int = None):
+    """SELECT (producto_id, almacen_id, cantidad): snapshot `base` + movimientos hasta el cierre de `fecha`"""
+    from models import MovimientoStock, StockSnapshot, Producto
+
+    filtros_mov = [Producto.empresa_id == empresa_id, MovimientoStock.creado_en < fin_del_dia(fecha)]
+    if base is not None:
+        filtros_mov.append(MovimientoStock.creado_en >= fin_del_dia(base))
+    if producto_id:
+        filtros_mov.append(MovimientoStock.producto_id == producto_id)
+    if almacen_id:
+        filtros_mov.append(MovimientoStock.almacen_id == almacen_id)
+    partes = [
+        select(MovimientoStock.producto_id, MovimientoStock.almacen_id, MovimientoStock.cantidad)
+        .join(Producto, MovimientoStock.producto_id == Producto.id)
+        .where(*filtros_mov)
+    ]
+
+    if base is not None:
+        filtros_snap = [Producto.empresa_id == empresa_id, StockSnapshot.fecha == base]
+        if producto_id:
+            filtros_snap.append(StockSnapshot.producto_id == producto_id)
+        if almacen_id:
+            filtros_snap.append(StockSnapshot.almacen_id == almacen_id)
+        partes.append(
+            select(StockSnapshot.producto_id, StockSnapshot.almacen_id, StockSnapshot.cantidad)
+            .join(Producto, StockSnapshot.producto_id == Producto.id)
+            .where(*filtros_snap)
+        )
+
+    filas = (union_all(*partes) if len(partes) > 1 else partes[0]).subquery()
+    cantidad = func.sum(filas.c.cantidad)
+    return (
+        select(filas.c.producto_id, filas.c.almacen_id, cantidad.label('cantidad'))
+        .group_by(filas.c.producto_id, filas.c.almacen_id)
+        .having(cantidad != 0)
+    )
+
+
+async def generar_snapshot(db, fecha: date, empresa_id: int = None):
+    """Escribe (o reescribe) el snapshot al cierre de `fecha`; devuelve filas por empresa"""
+    from models import Empresa, StockSnapshot, Producto
+
+    if empresa_id is None:
+        empresa_ids = (await db.execute(select(Empresa.id).order_by(Empresa.id))).scalars().all()
+    else:
+        empresa_ids = [empresa_id]
+
+    filas = {}
+    for eid in empresa_ids:
+        base = await snapshot_base(db, eid, fecha - timedelta(days=1))
+        await db.execute(
+            delete(StockSnapshot)
+            .where(
+                StockSnapshot.fecha == fecha,
+                StockSnapshot.producto_id.in_(select(Producto.id).where(Producto.empresa_id == eid))
+            )
+        )
+        saldos = saldos_al_dia(eid, fecha, base).subquery()
+        result = await db.execute(
+            insert(StockSnapshot).from_select(
+                ['fecha', 'producto_id', 'almacen_id', 'cantidad'],
+                select(literal(fecha, Date), saldos.c.producto_id, saldos.c.almacen_id, saldos.c.cantidad)
+            )
+        )
+        filas[eid] = result.rowcount
+        logger.info(f"Snapshot de stock {fecha} empresa {eid}: {result.rowcount} filas (base {base})")
+    await db.commit()
+    return filas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Snapshot de stock al cierre de una fecha')
+    parser.add_argument('--fecha', type=date.fromisoformat, help='Por defecto, el último día del mes anterior')
+    parser.add_argument('--empresa-id', type=int)
+    parser.add_argument('--database-url', help='Base destino (por defecto DATABASE_URL o .env)')
+    args = parser.parse_args(argv)
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    sys.path.insert(0, str(ROOT_DIR))
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+
+    from database import async_session_maker, dispose_engines
+
+    async def _principal():
+        try:
+            async with async_session_maker() as session:
+                return await generar_snapshot(session, args.fecha or cierre_mes_anterior(), args.empresa_id)
+        finally:
+            await dispose_engines()
+
+    asyncio.run(_principal())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,262 @@
+"""
+Sincronización de ventas hechas offline en el POS (POST /api/ventas/sync).
+
+El POS genera un UUID por venta y sube la cola cuando vuelve la conexión.
+Las ventas se procesan por tramos de TAMANO_TRAMO, cada tramo en su propia
+transacción: se cargan de una vez los clientes, el stock (con FOR UPDATE) y
+las materias del tramo, cada venta se valida y asigna en memoria en el orden
+recibido, y luego Venta, VentaItem, MovimientoStock y CreditoCliente se
+insertan en bloque. Una venta sin stock o sin crédito queda como conflicto y
+no toca nada; las demás del tramo siguen.
+
+Subir de nuevo un UUID ya sincronizado no crea otra venta: se informa en
+`ya_sincronizadas` con su id.
+"""
+from collections import defaultdict
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+from sqlalchemy import select, insert, update
+from sqlalchemy.exc import IntegrityError
+
+import metrics
+import saldo_credito
+from models import (
+    Cliente, CreditoCliente, Venta, VentaItem, StockActual, MovimientoStock, MateriaLaboratorio,
+    EstadoVenta, EstadoMateria, TipoPago, TipoMovimientoStock
+)
+
+TAMANO_TRAMO = 100
+MAXIMO_VENTAS = 1000
+# Nombre del UNIQUE de ventas.uuid (migración 0008); SQLite informa la columna
+CONSTRAINT_UUID = 'ventas_uuid_key'
+
+
+class Conflicto(Exception):
+    pass
+
+
+def uuid_repetido(error: IntegrityError) -> bool:
+    """True si el IntegrityError es por el uuid único de ventas y no por otra restricción"""
+    causa = getattr(error.orig, '__cause__', None)
+    if getattr(causa, 'constraint_name', None):
+        return causa.constraint_name == CONSTRAINT_UUID
+    mensaje = str(error.orig)
+    return CONSTRAINT_UUID in mensaje or 'ventas.uuid' in mensaje
+
+
+def calcular_totales(items, descuento_porcentaje):
+    """(subtotal, descuento, iva, total) con las mismas reglas que crear_venta"""
+    subtotal = sum((Decimal(str(item.cantidad)) * item.precio_unitario for item in items), Decimal('0'))
+    descuento = subtotal * descuento_porcentaje / Decimal('100')
+    total = subtotal - descuento
+    iva = total * Decimal('10') / Decimal('110')
+    return subtotal, descuento, iva, total
+
+
+def asignar_stock(stock_producto, cantidad):
+    """[(fila, a_descontar)] tomando primero de los almacenes con más stock, o Conflicto"""
+    if sum(fila['cantidad'] for fila in stock_producto) < cantidad:
+        raise Conflicto(f"Stock insuficiente. Disponible: {sum(fila['cantidad'] for fila in stock_producto)}")
+    asignaciones = []
+    restante = cantidad
+    for fila in sorted(stock_producto, key=lambda f: f['cantidad'], reverse=True):
+        if restante <= 0:
+            break
+        a_descontar = min(fila['cantidad'], restante)
+        if a_descontar > 0:
+            asignaciones.append((fila, a_descontar))
+            restante -= a_descontar
+    return asignaciones
+
+
+async def sincronizar(db, empresa_id: int, usuario_id: int, ventas, tamano_tramo: int = None):
+    tamano_tramo = tamano_tramo or TAMANO_TRAMO
+    resultado = {'sincronizadas': [], 'ya_sincronizadas': [], 'conflictos': []}
+    vistos = set()
+    unicas = []
+    for venta in ventas:
+        uuid_venta = str(venta.uuid)
+        if uuid_venta in vistos:
+            resultado['conflictos'].append({'uuid': uuid_venta, 'motivo': 'UUID repetido en el lote'})
+        else:
+            vistos.add(uuid_venta)
+            unicas.append(venta)
+
+    for inicio in range(0, len(unicas), tamano_tramo):
+        tramo = unicas[inicio:inicio + tamano_tramo]
+        try:
+            parcial = await _sincronizar_tramo(db, empresa_id, usuario_id, tramo)
+        except IntegrityError as e:
+            await db.rollback()
+            if not uuid_repetido(e):
+                raise
+            # Otro request subió las mismas ventas a la vez: el POS reintenta y las verá sincronizadas
+            parcial = {'sincronizadas': [], 'ya_sincronizadas': [], 'conflictos': [
+                {'uuid': str(v.uuid), 'motivo': 'Sincronización concurrente, reintentar'} for v in tramo
+            ]}
+        for clave, filas in parcial.items():
+            resultado[clave].extend(filas)
+    return resultado
+
+
+async def _sincronizar_tramo(db, empresa_id, usuario_id, tramo):
+    resultado = {'sincronizadas': [], 'ya_sincronizadas': [], 'conflictos': []}
+    existentes = dict((await db.execute(
+        select(Venta.uuid, Venta.id).where(Venta.uuid.in_([str(v.uuid) for v in tramo]))
+    )).all())
+    pendientes = []
+    for venta in tramo:
+        if str(venta.uuid) in existentes:
+            resultado['ya_sincronizadas'].append({'uuid': str(venta.uuid), 'venta_id': existentes[str(venta.uuid)]})
+        else:
+            pendientes.append(venta)
+    if not pendientes:
+        return resultado
+
+    cliente_ids = {v.cliente_id for v in pendientes} | {v.representante_cliente_id for v in pendientes if v.representante_cliente_id}
+    clientes = {
+        c.id: c for c in (await db.execute(
+            select(Cliente).where(Cliente.id.in_(cliente_ids), Cliente.empresa_id == empresa_id)
+        )).scalars()
+    }
+    producto_ids = {i.producto_id for v in pendientes for i in v.items if i.producto_id}
+    stock = defaultdict(list)
+    if producto_ids:
+        for fila in (await db.execute(
+            select(StockActual.id, StockActual.producto_id, StockActual.almacen_id, StockActual.cantidad)
+            .where(StockActual.producto_id.in_(producto_ids), StockActual.cantidad > 0)
+            .order_by(StockActual.id)
+            .with_for_update()
+        )).mappings():
+            stock[fila['producto_id']].append(dict(fila))
+    materia_ids = {i.materia_laboratorio_id for v in pendientes for i in v.items if i.materia_laboratorio_id}
+    materias = {}
+    if materia_ids:
+        materias = dict((await db.execute(
+            select(MateriaLaboratorio.id, MateriaLaboratorio.estado)
+            .where(MateriaLaboratorio.id.in_(materia_ids), MateriaLaboratorio.empresa_id == empresa_id)
+            .with_for_update()
+        )).all())
+
+    aceptadas = []
+    stock_tocado = {}
+    vendidas = set()
+    for venta in pendientes:
+        try:
+            aceptadas.append(await _validar_venta(db, venta, clientes, stock, materias, stock_tocado, vendidas))
+        except Conflicto as e:
+            resultado['conflictos'].append({'uuid': str(venta.uuid), 'motivo': str(e)})
+    if not aceptadas:
+        await db.commit()
+        return resultado
+
+    ahora = datetime.now(timezone.utc)
+    filas_venta = await db.execute(
+        insert(Venta).returning(Venta.uuid, Venta.id),
+        [
+            {
+                'uuid': str(venta.uuid), 'empresa_id': empresa_id, 'cliente_id': venta.cliente_id,
+                'usuario_id': usuario_id, 'representante_cliente_id': venta.representante_cliente_id,
+                'total': totales['total'], 'iva': totales['iva'], 'descuento': totales['descuento'],
+                'tipo_pago': venta.tipo_pago, 'es_delivery': venta.es_delivery,
+                'estado': EstadoVenta.CONFIRMADA,
+                'creado_en': venta.creado_en or ahora,
+            }
+            for venta, totales, _, _ in aceptadas
+        ]
+    )
+    # RETURNING en bloque no garantiza el orden: se empareja por uuid
+    ids_por_uuid = dict(filas_venta.all())
+    venta_ids = [ids_por_uuid[str(venta.uuid)] for venta, _, _, _ in aceptadas]
+
+    items, movimientos, creditos = [], [], []
+    for venta_id, (venta, totales, asignaciones, cliente_credito_id) in zip(venta_ids, aceptadas):
+        for item in venta.items:
+            items.append({
+                'venta_id': venta_id, 'producto_id': item.producto_id,
+                'materia_laboratorio_id': item.materia_laboratorio_id, 'cantidad': item.cantidad,
+                'precio_unitario': item.precio_unitario, 'observaciones': item.observaciones,
+                'total': Decimal(str(item.cantidad)) * item.precio_unitario,
+            })
+        for fila, cantidad in asignaciones:
+            movimientos.append({
+                'producto_id': fila['producto_id'], 'almacen_id': fila['almacen_id'],
+                'tipo': TipoMovimientoStock.SALIDA, 'cantidad': -cantidad,
+                'referencia_tipo': 'venta', 'referencia_id': venta_id,
+            })
+        if venta.tipo_pago == TipoPago.CREDITO:
+            creditos.append({
+                'cliente_id': cliente_credito_id, 'venta_id': venta_id,
+                'monto_original': totales['total'], 'monto_pendiente': totales['total'],
+                'descripcion': f"Venta #{venta_id}",
+                'fecha_venta': venta.creado_en.date() if venta.creado_en else date.today(),
+            })
+        resultado['sincronizadas'].append({'uuid': str(venta.uuid), 'venta_id': venta_id})
+
+    await db.execute(insert(VentaItem), items)
+    if movimientos:
+        await db.execute(insert(MovimientoStock), movimientos)
+    if creditos:
+        await db.execute(insert(CreditoCliente), creditos)
+    if stock_tocado:
+        await db.execute(update(StockActual), [
+            {'id': fila['id'], 'cantidad': fila['cantidad']} for fila in stock_tocado.values()
+        ])
+    if vendidas:
+        await db.execute(
+            update(MateriaLaboratorio).where(MateriaLaboratorio.id.in_(vendidas))
+            .values(estado=EstadoMateria.VENDIDO).execution_options(synchronize_session=False)
+        )
+    await db.commit()
+
+    for venta, totales, _, _ in aceptadas:
+        metrics.VENTAS_CONFIRMADAS.inc(tipo_pago=venta.tipo_pago.value)
+        metrics.VENTAS_CONFIRMADAS_MONTO.inc(float(totales['total']), tipo_pago=venta.tipo_pago.value)
+    return resultado
+
+
+async def _validar_venta(db, venta, clientes, stock, materias, stock_tocado, vendidas):
+    """Valida y asigna una venta sobre el estado en memoria del tramo; Conflicto si no entra"""
+    cliente = clientes.get(venta.cliente_id)
+    if cliente is None:
+        raise Conflicto("Cliente no encontrado")
+    if venta.representante_cliente_id and venta.representante_cliente_id not in clientes:
+        raise Conflicto("Representante no encontrado")
+    privilegios = clientes.get(venta.representante_cliente_id) or cliente
+    if venta.tipo_pago == TipoPago.CHEQUE and not privilegios.acepta_cheque:
+        raise Conflicto("Este cliente no tiene habilitado el pago con cheque")
+    if not venta.items:
+        raise Conflicto("Venta sin ítems")
+
+    _, descuento, iva, total = calcular_totales(venta.items, privilegios.descuento_porcentaje or Decimal('0'))
+
+    # Stock: se calcula la asignación y solo se aplica si la venta entra completa
+    asignaciones = []
+    pedidos = defaultdict(int)
+    for item in venta.items:
+        if item.producto_id:
+            pedidos[item.producto_id] += item.cantidad
+    for producto_id, cantidad in pedidos.items():
+        asignaciones += asignar_stock(stock[producto_id], cantidad)
+    materias_venta = [i.materia_laboratorio_id for i in venta.items if i.materia_laboratorio_id]
+    for materia_id in materias_venta:
+        if materia_id not in materias:
+            raise Conflicto("Materia no encontrada")
+        if materias[materia_id] == EstadoMateria.VENDIDO:
+            raise Conflicto("Materia ya vendida")
+    if len(set(materias_venta)) != len(materias_venta):
+        raise Conflicto("Materia repetida en la venta")
+
+    # Crédito: reserva atómica al final, así una venta rechazada no deja nada aplicado
+    if venta.tipo_pago == TipoPago.CREDITO:
+        if not await saldo_credito.reservar_credito(db, privilegios.id, total):
+            raise Conflicto("Crédito insuficiente")
+
+    for fila, a_descontar in asignaciones:
+        fila['cantidad'] -= a_descontar
+        stock_tocado[fila['id']] = fila
+    for materia_id in materias_venta:
+        materias[materia_id] = EstadoMateria.VENDIDO
+        vendidas.add(materia_id)
+    return venta, {'descuento': descuento, 'iva': iva, 'total': total}, asignaciones, privilegios.id
@@ -0,0 +1,280 @@
+"""
+Tareas periódicas en proceso (snapshots de stock, particiones, saldos, limpieza).
+
+Cada tarea tiene una expresión cron de 5 campos (minuto hora día mes
+día-de-semana, en UTC). El planificador corre como una tarea asyncio que se
+arranca en startup(). Con varios workers o instancias todos calculan la misma
+hora programada, y la elección se hace en la base: antes de correr, cada uno
+intenta insertar la fila (nombre, programada_para) en ejecuciones_tareas, y
+la restricción única deja pasar a uno solo. Esa misma fila queda como
+historial con estado y duración (GET /api/tareas/ejecuciones).
+
+Al arrancar se recuperan los horarios perdidos mientras el proceso estuvo
+caído o dormido (Render free duerme la instancia): desde la última
+programada_para registrada de cada tarea hasta ahora. Las tareas con
+`recuperar_todas` (un período por corrida, como el snapshot mensual) corren
+cada horario perdido, hasta MAXIMO_RECUPERADAS; las demás solo el último.
+La función de la tarea recibe la hora programada para calcular su período.
+
+Si un worker muere a mitad de una corrida (redeploy, caída) la fila queda
+EN_CURSO. Pasada la `duracion_maxima` de la tarea, el próximo intento de esa
+tarea (o el arranque) la marca ERROR como abandonada y la vuelve a correr: el
+mismo horario si es el que se pide, y los anteriores solo con `recuperar_todas`.
+
+TAREAS_PROGRAMADAS=false lo desactiva (tests, o si se prefiere cron externo).
+"""
+import asyncio
+import logging
+import os
+import socket
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+from collections import deque
+
+from sqlalchemy import update, select, and_
+
+from database import insert_dialecto
+from models import EjecucionTarea
+
+logger = logging.getLogger(__name__)
+
+HABILITADAS = os.environ.get('TAREAS_PROGRAMADAS', 'true').lower() in ('1', 'true', 'yes')
+ESPERA_MAXIMA = 60
+MAXIMO_RECUPERADAS = 12
+DURACION_MAXIMA = timedelta(hours=1)
+ABANDONADA = 'Abandonada: el worker no terminó la corrida, se reintenta'
+WORKER = f"{socket.gethostname()}:{os.getpid()}"
+
+RANGOS_CRON = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+
+def _campo_cron(texto: str, minimo: int, maximo: int) -> frozenset:
+    valores = set()
+    for parte in texto.split(','):
+        rango, _, paso = parte.partition('/')
+        paso = int(paso) if paso else 1
+        if rango == '*':
+            inicio, fin = minimo, maximo
+        elif '-' in rango:
+            inicio, fin = (int(v) for v in rango.split('-'))
+        else:
+            inicio = int(rango)
+            fin = maximo if paso > 1 else inicio
+        if inicio < minimo or fin > maximo or inicio > fin or paso < 1:
+            raise ValueError(f"Campo cron fuera de rango: {parte}")
+        valores.update(range(inicio, fin + 1, paso))
+    return frozenset(valores)
+
+
+class Cron:
+    """Expresión cron de 5 campos; domingo es 0 (o 7)"""
+
+    def __init__(self, expresion: str):
+        campos = expresion.split()
+        if len(campos) != 5:
+            raise ValueError(f"Se esperan 5 campos cron: {expresion!r}")
+        self.expresion = expresion
+        self.minutos, self.horas, self.dias, self.meses, dias_semana = (
+            _campo_cron(texto, *rango) for texto, rango in zip(campos, RANGOS_CRON)
+        )
+        self.dias_semana = frozenset(d % 7 for d in dias_semana)
+        # Como en cron: si se restringen día del mes y día de semana, alcanza con uno
+        self.dia_o_semana = campos[2] != '*' and campos[4] != '*'
+
+    def _dia_valido(self, momento: datetime) -> bool:
+        dia = momento.day in self.dias
+        semana = (momento.isoweekday() % 7) in self.dias_semana
+        return (dia or semana) if self.dia_o_semana else (dia and semana)
+
+    def cumple(self, momento: datetime) -> bool:
+        return (momento.second == 0 and momento.microsecond == 0 and momento.month in self.meses
+                and self._dia_valido(momento) and momento.hour in self.horas and momento.minute in self.minutos)
+
+    def siguiente(self, desde: datetime) -> datetime:
+        """Primer instante que cumple la expresión, estrictamente después de `desde`"""
+        momento = desde.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limite = momento + timedelta(days=366 * 5)
+        while momento < limite:
+            if momento.month not in self.meses:
+                momento = (momento.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self._dia_valido(momento):
+                momento = momento.replace(hour=0, minute=0) + timedelta(days=1)
+            elif momento.hour not in self.horas:
+                momento = momento.replace(minute=0) + timedelta(hours=1)
+            elif momento.minute not in self.minutos:
+                momento += timedelta(minutes=1)
+            else:
+                return momento
+        raise ValueError(f"La expresión cron no se cumple nunca: {self.expresion!r}")
+
+
+@dataclass
+class Tarea:
+    nombre: str
+    cron: Cron
+    funcion: object  # async (session_maker, programada_para) -> resultado serializable a texto
+    descripcion: str = ''
+    recuperar_todas: bool = False
+    # Pasado este tiempo una corrida EN_CURSO se da por abandonada
+    duracion_maxima: timedelta = DURACION_MAXIMA
+    proxima: datetime = None
+
+
+def _utc(momento: datetime) -> datetime:
+    return momento if momento.tzinfo else momento.replace(tzinfo=timezone.utc)
+
+
+class Planificador:
+    def __init__(self, session_maker):
+        self.session_maker = session_maker
+        self.tareas = {}
+        self._bucle = None
+        self._ejecuciones = set()
+
+    def registrar(self, nombre: str, cron: str, funcion, descripcion: str = '', recuperar_todas: bool = False,
+                  duracion_maxima: timedelta = DURACION_MAXIMA):
+        self.tareas[nombre] = Tarea(nombre, Cron(cron), funcion, descripcion, recuperar_todas, duracion_maxima)
+
+    def iniciar(self):
+        if self._bucle is None or self._bucle.done():
+            self._bucle = asyncio.create_task(self._correr())
+            logger.info(f"Planificador iniciado con {len(self.tareas)} tareas ({WORKER})")
+
+    async def detener(self):
+        pendientes = list(self._ejecuciones) + ([self._bucle] if self._bucle else [])
+        for tarea in pendientes:
+            tarea.cancel()
+        await asyncio.gather(*pendientes, return_exceptions=True)
+        self._bucle = None
+
+    async def _correr(self):
+        ahora = datetime.now(timezone.utc)
+        for tarea in self.tareas.values():
+            tarea.proxima = tarea.cron.siguiente(ahora)
+        try:
+            perdidas = await self.perdidas(ahora)
+        except Exception:
+            logger.exception("No se pudieron calcular las ejecuciones perdidas")
+            perdidas = []
+        if perdidas:
+            self._seguir(asyncio.create_task(self._recuperar(perdidas)))
+        while True:
+            ahora = datetime.now(timezone.utc)
+            for tarea in self.tareas.values():
+                if tarea.proxima <= ahora:
+                    self._lanzar(tarea, tarea.proxima)
+                    tarea.proxima = tarea.cron.siguiente(ahora)
+            proxima = min((t.proxima for t in self.tareas.values()), default=ahora + timedelta(seconds=ESPERA_MAXIMA))
+            await asyncio.sleep(min(ESPERA_MAXIMA, max(1.0, (proxima - datetime.now(timezone.utc)).total_seconds())))
+
+    def _lanzar(self, tarea: Tarea, programada_para: datetime):
+        self._seguir(asyncio.create_task(self.ejecutar(tarea.nombre, programada_para)))
+
+    def _seguir(self, ejecucion):
+        self._ejecuciones.add(ejecucion)
+        ejecucion.add_done_callback(self._ejecuciones.discard)
+
+    async def reclamar(self, nombre: str, ahora: datetime):
+        """Marca ERROR las corridas EN_CURSO de la tarea que pasaron su duración máxima; devuelve sus horarios"""
+        tarea = self.tareas[nombre]
+        async with self.session_maker() as db:
+            horarios = (await db.execute(
+                update(EjecucionTarea)
+                .where(EjecucionTarea.nombre == nombre, EjecucionTarea.estado == 'EN_CURSO',
+                       EjecucionTarea.inicio < ahora - tarea.duracion_maxima)
+                .values(estado='ERROR', detalle=ABANDONADA, fin=ahora)
+                .returning(EjecucionTarea.programada_para)
+                .execution_options(synchronize_session=False)
+            )).scalars().all()
+            await db.commit()
+        for horario in horarios:
+            logger.warning(f"Tarea {nombre} programada para {horario} abandonada por su worker")
+        return sorted(_utc(horario) for horario in horarios)
+
+    async def perdidas(self, ahora: datetime):
+        """[(nombre, programada_para)] de los horarios entre la última ejecución registrada y `ahora`,
+        más los que quedaron abandonados por un worker caído"""
+        abandonadas = {nombre: await self.reclamar(nombre, ahora) for nombre in self.tareas}
+        perdidas = []
+        async with self.session_maker() as db:
+            for nombre, tarea in self.tareas.items():
+                # Última corrida en horario; las manuales (POST /tareas/{nombre}/ejecutar) no cuentan
+                recientes = (await db.execute(
+                    select(EjecucionTarea.programada_para)
+                    .where(EjecucionTarea.nombre == nombre)
+                    .order_by(EjecucionTarea.programada_para.desc())
+                    .limit(50)
+                )).scalars().all()
+                recientes = [_utc(r) for r in recientes]
+                ultima = next((r for r in recientes if tarea.cron.cumple(r)), None)
+                if ultima is None:
+                    continue  # Sin historial (tarea nueva o base nueva): no hay nada que recuperar
+                horarios = deque(maxlen=MAXIMO_RECUPERADAS if tarea.recuperar_todas else 1)
+                # Abandonadas en horario: todas con recuperar_todas; si no, solo si es la última
+                horarios.extend(
+                    h for h in abandonadas[nombre]
+                    if tarea.cron.cumple(h) and (tarea.recuperar_todas or h == ultima)
+                )
+                momento = tarea.cron.siguiente(ultima)
+                while momento <= ahora:
+                    horarios.append(momento)
+                    momento = tarea.cron.siguiente(momento)
+                perdidas += [(nombre, horario) for horario in horarios]
+        return perdidas
+
+    async def _recuperar(self, perdidas):
+        # En orden y de a una: cada horario de una tarea mensual es un período distinto
+        for nombre, programada_para in perdidas:
+            logger.info(f"Recuperando {nombre} programada para {programada_para}")
+            await self.ejecutar(nombre, programada_para)
+
+    async def ejecutar(self, nombre: str, programada_para: datetime = None):
+        """Corre la tarea si este worker gana la fila de la ejecución; devuelve su id o None"""
+        tarea = self.tareas[nombre]
+        ahora = datetime.now(timezone.utc)
+        programada_para = programada_para or ahora
+        anteriores = [h for h in await self.reclamar(nombre, ahora) if h != programada_para]
+        if anteriores and tarea.recuperar_todas:
+            self._seguir(asyncio.create_task(self._recuperar([(nombre, h) for h in anteriores])))
+        async with self.session_maker() as db:
+            stmt = insert_dialecto(EjecucionTarea, db.bind).values(
+                nombre=nombre, programada_para=programada_para, worker=WORKER, inicio=ahora, estado='EN_CURSO'
+            )
+            ejecucion_id = (await db.execute(
+                # La fila de un horario abandonado se vuelve a tomar; cualquier otra gana el primero
+                stmt.on_conflict_do_update(
+                    index_elements=['nombre', 'programada_para'],
+                    set_={'worker': WORKER, 'inicio': ahora, 'estado': 'EN_CURSO',
+                          'detalle': None, 'fin': None, 'duracion_ms': None},
+                    where=and_(EjecucionTarea.estado == 'ERROR', EjecucionTarea.detalle == ABANDONADA)
+                )
+                .returning(EjecucionTarea.id)
+            )).scalar()
+            await db.commit()
+        if ejecucion_id is None:
+            logger.debug(f"Tarea {nombre} {programada_para} tomada por otro worker")
+            return None
+
+        inicio = time.perf_counter()
+        estado, detalle = 'OK', None
+        try:
+            resultado = await tarea.funcion(self.session_maker, programada_para)
+            detalle = None if resultado is None else str(resultado)[:2000]
+        except asyncio.CancelledError:
+            estado, detalle = 'ERROR', 'Cancelada'
+            raise
+        except Exception as e:
+            logger.exception(f"Tarea {nombre} falló")
+            estado, detalle = 'ERROR', f"{type(e).__name__}: {e}"[:2000]
+        finally:
+            duracion_ms = int((time.perf_counter() - inicio) * 1000)
+            async with self.session_maker() as db:
+                await db.execute(
+                    update(EjecucionTarea).where(EjecucionTarea.id == ejecucion_id)
+                    .values(estado=estado, detalle=detalle, fin=datetime.now(timezone.utc), duracion_ms=duracion_ms)
+                )
+                await db.commit()
+            logger.info(f"Tarea {nombre}: {estado} en {duracion_ms} ms")
+        return ejecucion_id
@@ -0,0 +1,94 @@
+"""
+Fixtures para los tests locales (in-process) del backend.
+
+Los tests existentes apuntan a REACT_APP_BACKEND_URL con `requests`; los
+tests locales levantan la app FastAPI en el mismo proceso contra una base
+SQLite temporal (o TEST_DATABASE_URL si se quiere usar PostgreSQL local).
+Los tests de particiones que bajan y suben migraciones en PostgreSQL usan
+aparte TEST_POSTGRES_URL, una base descartable; sin ella se saltean.
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+TMP_DIR = Path(tempfile.mkdtemp(prefix='luzbrill-tests-'))
+
+# Nunca usar la DATABASE_URL del entorno: podría ser la de producción
+os.environ['DATABASE_URL'] = os.environ.get('TEST_DATABASE_URL', f"sqlite+aiosqlite:///{TMP_DIR / 'primary.db'}")
+os.environ.pop('READ_DATABASE_URL', None)
+os.environ['MIGRATE_ON_STARTUP'] = 'true'
+# Las tareas programadas se prueban llamándolas; el planificador no arranca
+os.environ['TAREAS_PROGRAMADAS'] = 'false'
+
+
+@pytest.fixture(scope="session")
+def client():
+    """TestClient con el ciclo de vida de la app (startup/shutdown)"""
+    from fastapi.testclient import TestClient
+    import server
+
+    with TestClient(server.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture(scope="session")
+def run(client):
+    """Ejecuta una corrutina en el event loop de la app"""
+    def _run(async_fn, *args):
+        return client.portal.call(async_fn, *args)
+    return _run
+
+
+@pytest.fixture
+def empresa(client):
+    """Empresa nueva y aislada con un almacén, un usuario y un cliente"""
+    import uuid as uuid_lib
+
+    sufijo = uuid_lib.uuid4().hex[:10]
+    empresa = client.post("/api/empresas", json={"nombre": f"TEST_{sufijo}", "ruc": f"TEST-{sufijo}"}).json()
+    almacen = client.post("/api/almacenes", json={"empresa_id": empresa["id"], "nombre": "Principal"}).json()
+    usuario = client.post("/api/auth/register", json={
+        "empresa_id": empresa["id"],
+        "email": f"test_{sufijo}@luzbrill.com",
+        "password": "test123",
+        "nombre": "Test"
+    }).json()["usuario"]
+    cliente = client.post("/api/clientes", json={"empresa_id": empresa["id"], "nombre": "Cliente", "apellido": "Test"}).json()
+    return {
+        "id": empresa["id"],
+        "almacen_id": almacen["id"],
+        "usuario_id": usuario["id"],
+        "cliente_id": cliente["id"],
+    }
+
+
+@pytest.fixture
+def contar_consultas(client):
+    """Hace un request y devuelve (response, cantidad de sentencias SQL que ejecutó)"""
+    from sqlalchemy import event
+    import database
+
+    contador = {'consultas': 0}
+
+    def _contar(*args):
+        contador['consultas'] += 1
+
+    engines = {database.engine.sync_engine, database.read_engine.sync_engine}
+    for sync_engine in engines:
+        event.listen(sync_engine, 'before_cursor_execute', _contar)
+
+    def _request(method, url, **kwargs):
+        contador['consultas'] = 0
+        response = client.request(method, url, **kwargs)
+        return response, contador['consultas']
+
+    yield _request
+    for sync_engine in engines:
+        event.remove(sync_engine, 'before_cursor_execute', _contar)
@@ -0,0 +1,141 @@
+"""
+Test suite for Luz Brill ERP - Anulación de ventas (local, in-process)
+Tests:
+1. Anular una venta confirmada devuelve el stock a cada almacén con movimientos inversos
+2. El crédito de la venta queda anulado (no pagado): lo cobrado se devuelve y se libera el saldo
+3. Las materias vuelven a estar disponibles
+4. Borradores y ventas ya anuladas no generan movimientos
+"""
+
+import uuid
+
+
+def _producto(client, empresa, stock_por_almacen):
+    producto = client.post("/api/productos", json={
+        "empresa_id": empresa["id"], "nombre": "Producto", "codigo_barra": uuid.uuid4().hex[:12], "precio_venta": 1000
+    }).json()
+    for almacen_id, cantidad in stock_por_almacen.items():
+        client.post("/api/stock", json={"producto_id": producto["id"], "almacen_id": almacen_id, "cantidad": cantidad})
+    return producto
+
+
+def _venta(client, empresa, items, tipo_pago="EFECTIVO", cliente_id=None, confirmar=True):
+    venta = client.post("/api/ventas", json={
+        "empresa_id": empresa["id"], "cliente_id": cliente_id or empresa["cliente_id"],
+        "usuario_id": empresa["usuario_id"], "tipo_pago": tipo_pago, "items": items
+    }).json()
+    if confirmar:
+        assert client.post(f"/api/ventas/{venta['id']}/confirmar").status_code == 200
+    return venta
+
+
+def _stock(client, empresa, producto):
+    stock = client.get("/api/stock", params={"empresa_id": empresa["id"]}).json()
+    return {s["almacen_id"]: s["cantidad"] for s in stock if s["producto_id"] == producto["id"]}
+
+
+def _movimientos(client, empresa, producto):
+    return client.get("/api/stock/movimientos", params={
+        "empresa_id": empresa["id"], "producto_id": producto["id"]
+    }).json()["movimientos"]
+
+
+class TestAnularConfirmada:
+    """POST /ventas/{id}/anular sobre ventas confirmadas"""
+
+    def test_devuelve_stock(self, client, empresa):
+        deposito = client.post("/api/almacenes", json={"empresa_id": empresa["id"], "nombre": "Depósito"}).json()
+        producto = _producto(client, empresa, {empresa["almacen_id"]: 5, deposito["id"]: 3})
+        venta = _venta(client, empresa, [{"producto_id": producto["id"], "cantidad": 7, "precio_unitario": 1000}])
+        assert _stock(client, empresa, producto) == {empresa["almacen_id"]: 0, deposito["id"]: 1}
+
+        response = client.post(f"/api/ventas/{venta['id']}/anular")
+        assert response.status_code == 200, response.text
+        assert response.json()["estado"] == "ANULADA"
+        assert _stock(client, empresa, producto) == {empresa["almacen_id"]: 5, deposito["id"]: 3}
+
+        inversos = [m for m in _movimientos(client, empresa, producto) if m["referencia_tipo"] == "anulacion"]
+        assert sorted((m["almacen_id"], m["cantidad"], m["tipo"]) for m in inversos) == sorted([
+            (empresa["almacen_id"], 5, "ENTRADA"), (deposito["id"], 2, "ENTRADA")
+        ])
+        assert {m["referencia_id"] for m in inversos} == {venta["id"]}
+        assert sum(m["cantidad"] for m in _movimientos(client, empresa, producto)) == 0
+
+    def _venta_credito(self, client, empresa, monto):
+        producto = _producto(client, empresa, {empresa["almacen_id"]: 5})
+        cliente = client.post("/api/clientes", json={
+            "empresa_id": empresa["id"], "nombre": "Cliente", "limite_credito": 100000
+        }).json()
+        venta = _venta(client, empresa, [{"producto_id": producto["id"], "cantidad": 2, "precio_unitario": monto // 2}],
+                       tipo_pago="CREDITO", cliente_id=cliente["id"])
+        [credito] = client.get(f"/api/clientes/{cliente['id']}/creditos").json()
+        return cliente, venta, credito
+
+    def test_anula_credito_y_devuelve_lo_cobrado(self, client, empresa):
+        cliente, venta, credito = self._venta_credito(client, empresa, 20000)
+        client.post(f"/api/creditos/{credito['id']}/pagar", json={"monto": 5000})
+        assert client.get(f"/api/clientes/{cliente['id']}/credito-disponible").json()["credito_usado"] == 15000
+
+        client.post(f"/api/ventas/{venta['id']}/anular")
+        assert client.get(f"/api/clientes/{cliente['id']}/credito-disponible").json()["credito_usado"] == 0
+        [credito] = client.get(f"/api/clientes/{cliente['id']}/creditos").json()
+        assert credito["anulado"] is True
+        assert credito["pagado"] is True
+        assert float(credito["monto_pendiente"]) == 0
+        # El cobro de 5000 se devuelve y la deuda se cancela como anulación, no como pago
+        assert sorted((p["tipo"], p["monto"]) for p in credito["pagos"]) == [
+            ("ANULACION", 20000), ("DEVOLUCION", -5000), ("PAGO", 5000)
+        ]
+        assert sum(p["monto"] for p in credito["pagos"]) == credito["monto_original"]
+        assert client.post("/api/creditos/recalcular-saldos", params={"empresa_id": empresa["id"]}).json()[
+            "clientes_corregidos"] == 0
+
+    def test_credito_ya_pagado(self, client, empresa):
+        cliente, venta, credito = self._venta_credito(client, empresa, 8000)
+        client.post(f"/api/creditos/{credito['id']}/pagar", json={"monto": 8000})
+
+        client.post(f"/api/ventas/{venta['id']}/anular")
+        [credito] = client.get(f"/api/clientes/{cliente['id']}/creditos").json()
+        assert credito["anulado"] is True
+        assert sorted((p["tipo"], p["monto"]) for p in credito["pagos"]) == [
+            ("ANULACION", 8000), ("DEVOLUCION", -8000), ("PAGO", 8000)
+        ]
+        assert client.get(f"/api/clientes/{cliente['id']}/credito-disponible").json()["credito_usado"] == 0
+
+    def test_libera_materias(self, client, empresa):
+        materia = client.post("/api/materias-laboratorio", json={
+            "empresa_id": empresa["id"], "nombre": "Materia", "codigo_barra": uuid.uuid4().hex[:12], "precio": 5000
+        }).json()
+        venta = _venta(client, empresa, [{"materia_laboratorio_id": materia["id"], "cantidad": 1, "precio_unitario": 5000}])
+
+        def disponibles():
+            return [m["id"] for m in client.get(
+                "/api/materias-laboratorio/disponibles", params={"empresa_id": empresa["id"]}
+            ).json()]
+        assert materia["id"] not in disponibles()
+        client.post(f"/api/ventas/{venta['id']}/anular")
+        assert materia["id"] in disponibles()
+
+
+class TestAnularSinEfectos:
+    """Borradores y anulaciones repetidas"""
+
+    def test_borrador(self, client, empresa):
+        producto = _producto(client, empresa, {empresa["almacen_id"]: 5})
+        venta = _venta(client, empresa, [{"producto_id": producto["id"], "cantidad": 2, "precio_unitario": 1000}],
+                       confirmar=False)
+        assert client.post(f"/api/ventas/{venta['id']}/anular").json()["estado"] == "ANULADA"
+        assert _stock(client, empresa, producto) == {empresa["almacen_id"]: 5}
+        assert client.post(f"/api/ventas/{venta['id']}/confirmar").status_code == 400
+
+    def test_anular_dos_veces(self, client, empresa):
+        producto = _producto(client, empresa, {empresa["almacen_id"]: 5})
+        venta = _venta(client, empresa, [{"producto_id": producto["id"], "cantidad": 2, "precio_unitario": 1000}])
+        client.post(f"/api/ventas/{venta['id']}/anular")
+        response = client.post(f"/api/ventas/{venta['id']}/anular")
+        assert response.status_code == 200
+        assert _stock(client, empresa, producto) == {empresa["almacen_id"]: 5}
+        assert len(_movimientos(client, empresa, producto)) == 2
+
+    def test_no_existe(self, client):
+        assert client.post("/api/ventas/999999999/anular").status_code == 404
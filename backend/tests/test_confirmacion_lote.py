@@ -0,0 +1,182 @@
+"""
+Test suite for Luz Brill ERP - Confirmación de ventas en lote (local, in-process)
+Tests:
+1. Con CONFIRMACION_EN_LOTE el endpoint confirma igual que el camino directo
+2. Ventas concurrentes de una empresa se agrupan en un lote (una sesión, un commit)
+3. Una venta que falla no arrastra a las demás del lote y el orden de llegada se respeta
+4. Si falla después de escribir stock y movimientos, solo se deshace su savepoint (y no cuenta conflictos)
+"""
+
+import asyncio
+import uuid
+
+import httpx
+import pytest
+
+import confirmaciones
+import database
+import metrics
+import server
+
+
+@pytest.fixture
+def en_lote(monkeypatch):
+    monkeypatch.setattr(server, "CONFIRMACION_EN_LOTE", True)
+
+
+def _producto_con_stock(client, empresa, cantidad):
+    producto = client.post("/api/productos", json={
+        "empresa_id": empresa["id"], "nombre": "Producto", "codigo_barra": uuid.uuid4().hex[:12], "precio_venta": 1000
+    }).json()
+    client.post("/api/stock", json={"producto_id": producto["id"], "almacen_id": empresa["almacen_id"], "cantidad": cantidad})
+    return producto
+
+
+def _borrador(client, empresa, producto, cantidad, tipo_pago="EFECTIVO", cliente_id=None):
+    response = client.post("/api/ventas", json={
+        "empresa_id": empresa["id"], "cliente_id": cliente_id or empresa["cliente_id"],
+        "usuario_id": empresa["usuario_id"], "tipo_pago": tipo_pago,
+        "items": [{"producto_id": producto["id"], "cantidad": cantidad, "precio_unitario": 1000}]
+    })
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def _stock(client, empresa, producto):
+    stock = client.get("/api/stock", params={"empresa_id": empresa["id"]}).json()
+    return [s["cantidad"] for s in stock if s["producto_id"] == producto["id"]]
+
+
+def _confirmar_concurrente(run, venta_ids):
+    async def confirmar():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as cliente:
+            return await asyncio.gather(*(cliente.post(f"/api/ventas/{i}/confirmar") for i in venta_ids))
+    return run(confirmar)
+
+
+class TestEndpointEnLote:
+    """POST /ventas/{id}/confirmar con CONFIRMACION_EN_LOTE"""
+
+    def test_confirma_y_descuenta(self, client, empresa, en_lote):
+        producto = _producto_con_stock(client, empresa, 10)
+        venta = _borrador(client, empresa, producto, 3)
+        response = client.post(f"/api/ventas/{venta['id']}/confirmar")
+        assert response.status_code == 200, response.text
+        assert response.json()["estado"] == "CONFIRMADA"
+        assert _stock(client, empresa, producto) == [7]
+
+    def test_errores(self, client, empresa, en_lote):
+        producto = _producto_con_stock(client, empresa, 10)
+        venta = _borrador(client, empresa, producto, 1)
+        client.post(f"/api/ventas/{venta['id']}/confirmar")
+        response = client.post(f"/api/ventas/{venta['id']}/confirmar")
+        assert response.status_code == 400
+        assert response.json()["detail"] == "La venta ya fue procesada"
+        assert client.post("/api/ventas/999999999/confirmar").status_code == 404
+
+    def test_concurrentes_aisladas(self, client, empresa, run, en_lote):
+        producto = _producto_con_stock(client, empresa, 10)
+        cliente = client.post("/api/clientes", json={
+            "empresa_id": empresa["id"], "nombre": "Cliente", "limite_credito": 1000
+        }).json()
+        contado = [_borrador(client, empresa, producto, 2)["id"] for _ in range(4)]
+        sin_credito = _borrador(client, empresa, producto, 1, "CREDITO", cliente["id"])["id"]
+        client.post(f"/api/clientes/{cliente['id']}/creditos", json={"monto_original": 500})
+
+        respuestas = _confirmar_concurrente(run, contado[:2] + [sin_credito] + contado[2:])
+        assert [r.status_code for r in respuestas] == [200, 200, 400, 200, 200]
+        assert "Crédito insuficiente" in respuestas[2].json()["detail"]
+        assert _stock(client, empresa, producto) == [2]
+        assert client.get(f"/api/ventas/{sin_credito}").json()["estado"] == "BORRADOR"
+
+
+class TestConfirmador:
+    """confirmaciones.ConfirmadorVentas"""
+
+    def _confirmador(self, aplicar=server.aplicar_confirmacion):
+        sesiones = []
+
+        def session_maker():
+            sesiones.append(1)
+            return database.async_session_maker()
+
+        return confirmaciones.ConfirmadorVentas(
+            session_maker, aplicar, server.registrar_venta_confirmada
+        ), sesiones
+
+    def test_agrupa_en_un_lote(self, client, empresa, run):
+        producto = _producto_con_stock(client, empresa, 10)
+        venta_ids = [_borrador(client, empresa, producto, 1)["id"] for _ in range(5)]
+        confirmador, sesiones = self._confirmador()
+
+        async def confirmar():
+            try:
+                return await asyncio.gather(*(confirmador.confirmar(empresa["id"], i) for i in venta_ids))
+            finally:
+                await confirmador.detener()
+
+        assert [v.id for v in run(confirmar)] == venta_ids
+        assert len(sesiones) == 1
+        assert _stock(client, empresa, producto) == [5]
+
+    def test_orden_de_llegada(self, client, empresa, run):
+        producto = _producto_con_stock(client, empresa, 10)
+        cliente = client.post("/api/clientes", json={
+            "empresa_id": empresa["id"], "nombre": "Cliente", "limite_credito": 1500
+        }).json()
+        primera, segunda = (_borrador(client, empresa, producto, 1, "CREDITO", cliente["id"])["id"] for _ in range(2))
+        confirmador, _ = self._confirmador()
+
+        async def confirmar():
+            try:
+                return await asyncio.gather(
+                    confirmador.confirmar(empresa["id"], primera), confirmador.confirmar(empresa["id"], segunda),
+                    return_exceptions=True
+                )
+            finally:
+                await confirmador.detener()
+
+        venta, error = run(confirmar)
+        assert venta.id == primera
+        assert error.status_code == 400
+        assert client.get(f"/api/clientes/{cliente['id']}/credito-disponible").json()["credito_usado"] == 1000
+
+    def test_falla_despues_del_stock(self, client, empresa, run):
+        producto = _producto_con_stock(client, empresa, 5)
+        # La del medio no alcanza (conflicto de stock) y además falla ya con stock y movimientos escritos
+        primera, fallida, ultima = (_borrador(client, empresa, producto, cantidad)["id"] for cantidad in (4, 4, 1))
+
+        async def aplicar(session, venta_id):
+            venta = await server.aplicar_confirmacion(session, venta_id)
+            await session.flush()
+            if venta_id == fallida:
+                raise RuntimeError("falla después de descontar stock")
+            return venta
+
+        confirmador, sesiones = self._confirmador(aplicar)
+
+        def conflictos():
+            return sum(valor for _, _, valor in metrics.STOCK_CONFLICTOS.muestras())
+        antes = conflictos()
+
+        async def confirmar():
+            try:
+                return await asyncio.gather(
+                    *(confirmador.confirmar(empresa["id"], i) for i in (primera, fallida, ultima)),
+                    return_exceptions=True
+                )
+            finally:
+                await confirmador.detener()
+
+        resultados = run(confirmar)
+        assert [getattr(r, "id", None) for r in resultados] == [primera, None, ultima]
+        assert isinstance(resultados[1], RuntimeError)
+        assert len(sesiones) == 1
+        assert _stock(client, empresa, producto) == [0]
+        assert client.get(f"/api/ventas/{fallida}").json()["estado"] == "BORRADOR"
+        movimientos = client.get("/api/stock/movimientos", params={
+            "empresa_id": empresa["id"], "producto_id": producto["id"]
+        }).json()["movimientos"]
+        assert sorted(m["referencia_id"] for m in movimientos if m["referencia_tipo"] == "venta") == [primera, ultima]
+        assert conflictos() == antes
@@ -0,0 +1,201 @@
+"""
+Test suite for Luz Brill ERP - Consultas SQL por listado (local, in-process)
+Tests:
+Cada endpoint de listado ejecuta una cantidad de consultas constante, sin
+importar cuántas filas devuelve. Se mide con N filas y con 3N filas: si alguien
+reintroduce una consulta por fila, el conteo crece y el test falla.
+1. listar_productos
+2. listar_ventas
+3. listar_funcionarios
+4. listar_creditos_cliente
+5. listar_stock
+6. listar_entregas
+7. listar_ciclos_salario
+8. Paginación y filtro desde en listar_creditos_cliente
+"""
+
+import uuid
+from datetime import date
+from decimal import Decimal
+
+import database
+from models import Funcionario, CicloSalario, CreditoCliente, PagoCredito
+
+
+def _codigo():
+    return uuid.uuid4().hex[:12]
+
+
+def _producto(client, empresa, stock=100):
+    producto = client.post("/api/productos", json={
+        "empresa_id": empresa["id"], "nombre": f"Producto {_codigo()}",
+        "codigo_barra": _codigo(), "precio_venta": 1000
+    }).json()
+    client.post("/api/stock", json={
+        "producto_id": producto["id"], "almacen_id": empresa["almacen_id"], "cantidad": stock
+    })
+    return producto
+
+
+def _venta(client, empresa, **extra):
+    """Venta en borrador con un producto y una materia de laboratorio"""
+    producto = _producto(client, empresa)
+    materia = client.post("/api/materias-laboratorio", json={
+        "empresa_id": empresa["id"], "nombre": "Materia", "codigo_barra": _codigo(), "precio": 500
+    }).json()
+    response = client.post("/api/ventas", json={
+        "empresa_id": empresa["id"],
+        "cliente_id": empresa["cliente_id"],
+        "usuario_id": empresa["usuario_id"],
+        "items": [
+            {"producto_id": producto["id"], "cantidad": 1, "precio_unitario": 1000},
+            {"materia_laboratorio_id": materia["id"], "cantidad": 1, "precio_unitario": 500},
+        ],
+        **extra
+    })
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def _assert_consultas_constantes(contar_consultas, url, params, agregar, n=2):
+    agregar(n)
+    response, antes = contar_consultas("GET", url, params=params)
+    assert response.status_code == 200, response.text
+    filas = len(response.json())
+
+    agregar(2 * n)
+    response, despues = contar_consultas("GET", url, params=params)
+    assert response.status_code == 200, response.text
+    assert len(response.json()) > filas
+    assert despues == antes, (
+        f"{url}: {antes} consultas con {filas} filas, {despues} con {len(response.json())}"
+    )
+
+
+class TestConsultasPorListado:
+    """Conteo de consultas O(1) en el tamaño del resultado"""
+
+    def test_listar_productos(self, client, empresa, contar_consultas):
+        def agregar(n):
+            for _ in range(n):
+                _producto(client, empresa)
+        _assert_consultas_constantes(contar_consultas, "/api/productos", {"empresa_id": empresa["id"]}, agregar)
+
+    def test_listar_ventas(self, client, empresa, contar_consultas):
+        def agregar(n):
+            for _ in range(n):
+                _venta(client, empresa)
+        _assert_consultas_constantes(contar_consultas, "/api/ventas", {"empresa_id": empresa["id"]}, agregar)
+
+    def test_listar_ventas_descripcion_de_items(self, client, empresa):
+        venta = _venta(client, empresa)
+        ventas = client.get("/api/ventas", params={"empresa_id": empresa["id"]}).json()
+        [listada] = [v for v in ventas if v["id"] == venta["id"]]
+        descripciones = [item["descripcion"] for item in listada["items"]]
+        assert descripciones[0].startswith("Producto ")
+        assert descripciones[1] == "Materia - "
+
+    def test_listar_funcionarios(self, client, empresa, contar_consultas):
+        def agregar(n):
+            for _ in range(n):
+                funcionario = client.post("/api/funcionarios", json={
+                    "empresa_id": empresa["id"], "nombre": "Func", "salario_base": 3000000
+                }).json()
+                client.post(f"/api/funcionarios/{funcionario['id']}/adelantos", json={"monto": 100000})
+        _assert_consultas_constantes(contar_consultas, "/api/funcionarios", {"empresa_id": empresa["id"]}, agregar)
+
+    def test_listar_creditos_cliente(self, client, empresa, contar_consultas):
+        def agregar(n):
+            for _ in range(n):
+                credito = client.post(f"/api/clientes/{empresa['cliente_id']}/creditos", json={
+                    "monto_original": 100000, "descripcion": "Crédito"
+                }).json()
+                client.post(f"/api/creditos/{credito['id']}/pagar", json={"monto": 10000})
+        url = f"/api/clientes/{empresa['cliente_id']}/creditos"
+        _assert_consultas_constantes(contar_consultas, url, {}, agregar)
+
+    def test_listar_stock(self, client, empresa, contar_consultas):
+        def agregar(n):
+            for _ in range(n):
+                _producto(client, empresa)
+        _assert_consultas_constantes(contar_consultas, "/api/stock", {"empresa_id": empresa["id"]}, agregar)
+
+    def test_listar_entregas(self, client, empresa, contar_consultas):
+        vehiculo = client.post("/api/vehiculos", json={
+            "empresa_id": empresa["id"], "tipo": "MOTO", "chapa": "ABC 123"
+        }).json()
+
+        def agregar(n):
+            for _ in range(n):
+                venta = _venta(client, empresa, es_delivery=True)
+                client.post("/api/entregas", json={
+                    "venta_id": venta["id"], "vehiculo_id": vehiculo["id"],
+                    "responsable_usuario_id": empresa["usuario_id"]
+                })
+        _assert_consultas_constantes(contar_consultas, "/api/entregas", {"empresa_id": empresa["id"]}, agregar)
+
+    def test_listar_ciclos_salario(self, empresa, run, contar_consultas):
+        async def insertar(n):
+            async with database.async_session_maker() as session:
+                for _ in range(n):
+                    funcionario = Funcionario(empresa_id=empresa["id"], nombre="Func", salario_base=Decimal("3000000"))
+                    session.add(funcionario)
+                    await session.flush()
+                    session.add(CicloSalario(
+                        funcionario_id=funcionario.id, periodo="2026-01",
+                        fecha_inicio=date(2026, 1, 1), fecha_fin=date(2026, 1, 31),
+                        salario_base=Decimal("3000000"), descuentos=Decimal("0"), salario_neto=Decimal("3000000")
+                    ))
+                await session.commit()
+
+        _assert_consultas_constantes(
+            contar_consultas, "/api/ciclos-salario", {"empresa_id": empresa["id"]}, lambda n: run(insertar, n)
+        )
+
+
+class TestPaginacionCreditos:
+    """limit/offset y desde en GET /clientes/{id}/creditos"""
+
+    def _creditos(self, run, cliente_id, fechas):
+        async def insertar():
+            async with database.async_session_maker() as session:
+                creditos = [
+                    CreditoCliente(
+                        cliente_id=cliente_id, monto_original=Decimal("1000"), monto_pendiente=Decimal("900"),
+                        fecha_venta=fecha
+                    )
+                    for fecha in fechas
+                ]
+                session.add_all(creditos)
+                await session.flush()
+                for credito in creditos:
+                    session.add(PagoCredito(credito_id=credito.id, monto=Decimal("100")))
+                await session.commit()
+                return [credito.id for credito in creditos]
+        return run(insertar)
+
+    def test_paginas_en_orden_con_sus_pagos(self, client, empresa, run):
+        fechas = [date(2026, 1, dia) for dia in range(1, 6)]
+        ids = self._creditos(run, empresa["cliente_id"], fechas)
+        url = f"/api/clientes/{empresa['cliente_id']}/creditos"
+
+        primera = client.get(url, params={"limit": 2}).json()
+        segunda = client.get(url, params={"limit": 2, "offset": 2}).json()
+        resto = client.get(url, params={"offset": 4}).json()
+        assert [c["id"] for c in primera + segunda + resto] == ids[::-1]
+        assert all(len(c["pagos"]) == 1 for c in primera + segunda + resto)
+
+    def test_limit_offset_fuera_de_rango(self, client, empresa):
+        url = f"/api/clientes/{empresa['cliente_id']}/creditos"
+        for params in ({"limit": 0}, {"limit": -1}, {"limit": 1001}, {"offset": -1}):
+            assert client.get(url, params=params).status_code == 422, params
+
+    def test_desde(self, client, empresa, run):
+        self._creditos(run, empresa["cliente_id"], [date(2025, 12, 31), date(2026, 1, 1), date(2026, 2, 1)])
+        creditos = client.get(
+            f"/api/clientes/{empresa['cliente_id']}/creditos", params={"desde": "2026-01-01"}
+        ).json()
+        assert [c["fecha_venta"] for c in creditos] == ["2026-02-01", "2026-01-01"]
+        assert client.get(
+            f"/api/clientes/{empresa['cliente_id']}/creditos", params={"desde": "01/01/2026"}
+        ).status_code == 422
@@ -0,0 +1,193 @@
+"""
+Test suite for Luz Brill ERP - Saldo de crédito por cliente (local, in-process)
+Tests:
+1. credito_usado se mantiene en altas, ventas a crédito y pagos
+2. El límite se aplica en el UPDATE (también con requests concurrentes)
+3. Recalcular saldos corrige desvíos
+4. Pago FIFO repartido entre los créditos abiertos
+"""
+
+import asyncio
+import uuid
+from datetime import date
+from decimal import Decimal
+
+from sqlalchemy import update
+
+import database
+import saldo_credito
+from models import Cliente, CreditoCliente
+
+
+def _cliente(client, empresa, limite):
+    return client.post("/api/clientes", json={
+        "empresa_id": empresa["id"], "nombre": "Cliente", "limite_credito": limite
+    }).json()
+
+
+def _credito_usado(client, cliente):
+    return client.get(f"/api/clientes/{cliente['id']}/credito-disponible").json()["credito_usado"]
+
+
+def _venta_credito(client, empresa, cliente, precio):
+    producto = client.post("/api/productos", json={
+        "empresa_id": empresa["id"], "nombre": "Producto", "codigo_barra": uuid.uuid4().hex[:12], "precio_venta": precio
+    }).json()
+    client.post("/api/stock", json={"producto_id": producto["id"], "almacen_id": empresa["almacen_id"], "cantidad": 5})
+    response = client.post("/api/ventas", json={
+        "empresa_id": empresa["id"], "cliente_id": cliente["id"], "usuario_id": empresa["usuario_id"],
+        "tipo_pago": "CREDITO",
+        "items": [{"producto_id": producto["id"], "cantidad": 1, "precio_unitario": precio}]
+    })
+    assert response.status_code == 200, response.text
+    return response.json(), producto
+
+
+class TestSaldoMantenido:
+    """Cliente.credito_usado sigue a los créditos pendientes"""
+
+    def test_alta_y_pago(self, client, empresa):
+        cliente = _cliente(client, empresa, 100000)
+        credito = client.post(f"/api/clientes/{cliente['id']}/creditos", json={"monto_original": 60000}).json()
+        assert _credito_usado(client, cliente) == 60000
+
+        client.post(f"/api/creditos/{credito['id']}/pagar", json={"monto": 20000})
+        disponible = client.get(f"/api/clientes/{cliente['id']}/credito-disponible").json()
+        assert disponible["credito_usado"] == 40000
+        assert disponible["credito_disponible"] == 60000
+
+        response = client.post(f"/api/creditos/{credito['id']}/pagar", json={"monto": 40000})
+        assert response.json()["pagado"] is True
+        assert _credito_usado(client, cliente) == 0
+
+    def test_limite_excedido(self, client, empresa):
+        cliente = _cliente(client, empresa, 100000)
+        client.post(f"/api/clientes/{cliente['id']}/creditos", json={"monto_original": 80000})
+        response = client.post(f"/api/clientes/{cliente['id']}/creditos", json={"monto_original": 30000})
+        assert response.status_code == 400
+        assert "Disponible: 20,000" in response.json()["detail"]
+        assert _credito_usado(client, cliente) == 80000
+
+    def test_limite_cero_sin_limite(self, client, empresa):
+        cliente = _cliente(client, empresa, 0)
+        response = client.post(f"/api/clientes/{cliente['id']}/creditos", json={"monto_original": 10 ** 9})
+        assert response.status_code == 200, response.text
+        assert _credito_usado(client, cliente) == 10 ** 9
+
+    def test_confirmar_venta_reserva(self, client, empresa):
+        cliente = _cliente(client, empresa, 100000)
+        venta, _ = _venta_credito(client, empresa, cliente, 70000)
+        assert client.post(f"/api/ventas/{venta['id']}/confirmar").status_code == 200
+        assert _credito_usado(client, cliente) == 70000
+
+    def test_confirmar_venta_sin_credito_no_toca_stock(self, client, empresa):
+        cliente = _cliente(client, empresa, 100000)
+        venta, producto = _venta_credito(client, empresa, cliente, 70000)
+        client.post(f"/api/clientes/{cliente['id']}/creditos", json={"monto_original": 50000})
+
+        response = client.post(f"/api/ventas/{venta['id']}/confirmar")
+        assert response.status_code == 400
+        assert "Crédito insuficiente" in response.json()["detail"]
+        assert _credito_usado(client, cliente) == 50000
+        stock = client.get("/api/stock", params={"empresa_id": empresa["id"]}).json()
+        assert [s["cantidad"] for s in stock if s["producto_id"] == producto["id"]] == [5]
+
+
+class TestReservaConcurrente:
+    """El UPDATE condicional no deja pasar dos reservas que juntas exceden el límite"""
+
+    def test_dos_reservas_simultaneas(self, client, empresa, run):
+        cliente = _cliente(client, empresa, 100000)
+
+        async def reservar():
+            async with database.async_session_maker() as session:
+                ok = await saldo_credito.reservar_credito(session, cliente["id"], Decimal("60000"))
+                await asyncio.sleep(0.05)
+                await session.commit()
+                return ok
+
+        async def ambas():
+            return await asyncio.gather(reservar(), reservar())
+
+        assert sorted(run(ambas)) == [False, True]
+        assert _credito_usado(client, cliente) == 60000
+
+
+class TestRecalcularSaldos:
+    """POST /creditos/recalcular-saldos"""
+
+    def test_corrige_desvio(self, client, empresa, run):
+        cliente = _cliente(client, empresa, 0)
+        client.post(f"/api/clientes/{cliente['id']}/creditos", json={"monto_original": 30000})
+
+        async def desviar():
+            async with database.async_session_maker() as session:
+                await session.execute(update(Cliente).where(Cliente.id == cliente["id"]).values(credito_usado=999))
+                await session.commit()
+        run(desviar)
+
+        body = client.post("/api/creditos/recalcular-saldos", params={"empresa_id": empresa["id"]}).json()
+        assert body["cliente_ids"] == [cliente["id"]]
+        assert _credito_usado(client, cliente) == 30000
+        assert client.post("/api/creditos/recalcular-saldos", params={"empresa_id": empresa["id"]}).json()[
+            "clientes_corregidos"] == 0
+
+
+class TestPagoFifo:
+    """POST /clientes/{id}/pagos reparte del crédito más antiguo al más nuevo"""
+
+    def _creditos(self, client, run, cliente, fechas_y_montos):
+        async def insertar():
+            async with database.async_session_maker() as session:
+                creditos = [
+                    CreditoCliente(cliente_id=cliente["id"], monto_original=Decimal(monto),
+                                   monto_pendiente=Decimal(monto), fecha_venta=fecha)
+                    for fecha, monto in fechas_y_montos
+                ]
+                session.add_all(creditos)
+                await session.commit()
+                return [credito.id for credito in creditos]
+        ids = run(insertar)
+        client.post("/api/creditos/recalcular-saldos", params={"empresa_id": cliente["empresa_id"]})
+        return ids
+
+    def test_reparte_del_mas_antiguo(self, client, empresa, run):
+        cliente = _cliente(client, empresa, 0)
+        nuevo, viejo, medio = self._creditos(client, run, cliente, [
+            (date(2026, 3, 1), 300), (date(2026, 1, 1), 100), (date(2026, 2, 1), 200)
+        ])
+
+        response = client.post(f"/api/clientes/{cliente['id']}/pagos", json={"monto": 250, "observacion": "Efectivo"})
+        assert response.status_code == 200, response.text
+        body = response.json()
+        assert [(a["credito_id"], a["monto_aplicado"], a["monto_pendiente"], a["pagado"]) for a in body["asignaciones"]] == [
+            (viejo, 100, 0, True), (medio, 150, 50, False)
+        ]
+        assert body["deuda_restante"] == 350
+        assert _credito_usado(client, cliente) == 350
+
+        creditos = {c["id"]: c for c in client.get(f"/api/clientes/{cliente['id']}/creditos").json()}
+        assert creditos[viejo]["pagado"] and creditos[viejo]["pagos"][0]["observacion"] == "Efectivo"
+        assert creditos[medio]["monto_pendiente"] == 50
+        assert creditos[nuevo]["monto_pendiente"] == 300 and creditos[nuevo]["pagos"] == []
+
+    def test_consultas_constantes(self, client, empresa, run, contar_consultas):
+        conteos = []
+        for n in (2, 6):
+            cliente = _cliente(client, empresa, 0)
+            self._creditos(client, run, cliente, [(date(2026, 1, 1), 100)] * n)
+            response, consultas = contar_consultas("POST", f"/api/clientes/{cliente['id']}/pagos", json={"monto": 100 * n})
+            assert len(response.json()["asignaciones"]) == n
+            conteos.append(consultas)
+        assert conteos[0] == conteos[1]
+
+    def test_monto_mayor_a_la_deuda(self, client, empresa, run):
+        cliente = _cliente(client, empresa, 0)
+        self._creditos(client, run, cliente, [(date(2026, 1, 1), 100)])
+        response = client.post(f"/api/clientes/{cliente['id']}/pagos", json={"monto": 101})
+        assert response.status_code == 400
+        assert _credito_usado(client, cliente) == 100
+
+    def test_sin_creditos(self, client, empresa):
+        cliente = _cliente(client, empresa, 0)
+        assert client.post(f"/api/clientes/{cliente['id']}/pagos", json={"monto": 1}).status_code == 400
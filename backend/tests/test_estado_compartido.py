@@ -0,0 +1,92 @@
+"""
+Test suite for Luz Brill ERP - Estado compartido entre workers (local, in-process)
+Tests:
+1. Misma interfaz en memoria y en base: obtener, guardar, actualizar y copias
+2. Dos workers sobre la misma base: el cache se invalida por versión
+3. La cotización manual se ve desde otro worker
+"""
+
+import pytest
+
+import database
+import estado_compartido
+
+
+def _en_base(intervalo_sondeo=0):
+    return estado_compartido.EstadoEnBase(database.async_session_maker, intervalo_sondeo=intervalo_sondeo)
+
+
+@pytest.fixture(params=["memoria", "base"])
+def estado(request):
+    if request.param == "memoria":
+        return estado_compartido.EstadoEnMemoria()
+    return _en_base()
+
+
+class TestImplementaciones:
+    """EstadoEnMemoria y EstadoEnBase"""
+
+    def test_guardar_y_actualizar(self, run, estado, request):
+        clave = f"prueba-{request.node.callspec.id}"
+        assert run(estado.obtener, clave) is None
+        assert run(estado.obtener, clave, {}) == {}
+
+        run(estado.guardar, clave, {"a": 1, "b": [1, 2]})
+        assert run(estado.obtener, clave) == {"a": 1, "b": [1, 2]}
+        assert run(lambda: estado.actualizar(clave, b=None, c="x")) == {"a": 1, "b": None, "c": "x"}
+        assert run(estado.obtener, clave) == {"a": 1, "b": None, "c": "x"}
+
+    def test_lecturas_son_copias(self, run, estado, request):
+        clave = f"copias-{request.node.callspec.id}"
+        run(estado.guardar, clave, {"lista": [1]})
+        run(estado.obtener, clave)["lista"].append(2)
+        assert run(estado.obtener, clave) == {"lista": [1]}
+
+
+class TestEntreWorkers:
+    """Dos EstadoEnBase simulan dos procesos"""
+
+    def test_invalidacion_por_version(self, run):
+        uno, otro = _en_base(), _en_base()
+        run(uno.guardar, "workers", {"valor": 1})
+        assert run(otro.obtener, "workers") == {"valor": 1}
+        run(uno.guardar, "workers", {"valor": 2})
+        assert run(otro.obtener, "workers") == {"valor": 2}
+        run(lambda: otro.actualizar("workers", extra=True))
+        assert run(uno.obtener, "workers") == {"valor": 2, "extra": True}
+
+    def test_cache_entre_sondeos(self, run):
+        uno, otro = _en_base(), _en_base(intervalo_sondeo=3600)
+        run(uno.guardar, "cache", {"valor": 1})
+        assert run(otro.obtener, "cache") == {"valor": 1}
+        run(uno.guardar, "cache", {"valor": 2})
+        # Hasta el próximo sondeo se sirve la copia local
+        assert run(otro.obtener, "cache") == {"valor": 1}
+        otro._ultimo_sondeo = 0
+        assert run(otro.obtener, "cache") == {"valor": 2}
+
+    def test_clave_creada_por_otro_worker(self, run):
+        uno, otro = _en_base(), _en_base()
+        assert run(otro.obtener, "nueva") is None
+        run(uno.guardar, "nueva", {"valor": 1})
+        assert run(otro.obtener, "nueva") == {"valor": 1}
+
+
+class TestCotizacion:
+    """/cotizacion/manual y /cotizacion/auto"""
+
+    def test_visible_desde_otro_worker(self, client, run):
+        response = client.post("/api/cotizacion/manual", json={"usd_pyg": 7300, "brl_pyg": 1450})
+        assert response.status_code == 200
+        assert response.json()["data"]["manual"] is True
+
+        otro = _en_base()
+        assert run(otro.obtener, "cotizacion_manual")["usd_pyg"] == 7300
+        cotizacion = client.get("/api/cotizacion").json()
+        assert cotizacion["manual"] is True
+        assert float(cotizacion["usd_pyg"]) == 7300
+        assert float(cotizacion["brl_pyg"]) == 1450
+
+        client.post("/api/cotizacion/auto")
+        assert run(otro.obtener, "cotizacion_manual")["manual"] is False
+        assert run(otro.obtener, "cotizacion_manual")["usd_pyg"] == 7300
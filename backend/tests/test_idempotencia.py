@@ -0,0 +1,193 @@
+"""
+Test suite for Luz Brill ERP - Idempotency-Key (local, in-process)
+Tests:
+1. Un reintento de POST /ventas con la misma clave devuelve la misma venta sin crear otra
+2. Confirmar con la misma clave no repite la confirmación (ni el 400 de "ya procesada")
+3. Clave reutilizada con otro cuerpo: 422; clave en curso: 409, salvo que la reserva haya vencido
+4. Las claves vencidas se reutilizan y se purgan
+5. Las claves se separan por usuario o empresa
+"""
+
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select, update
+
+import database
+import idempotencia
+import server
+from models import ClaveIdempotencia
+
+
+def _producto(client, empresa):
+    producto = client.post("/api/productos", json={
+        "empresa_id": empresa["id"], "nombre": "Producto", "codigo_barra": uuid.uuid4().hex[:12], "precio_venta": 1000
+    }).json()
+    client.post("/api/stock", json={"producto_id": producto["id"], "almacen_id": empresa["almacen_id"], "cantidad": 10})
+    return producto
+
+
+def _venta(empresa, producto, cantidad=1):
+    return {
+        "empresa_id": empresa["id"], "cliente_id": empresa["cliente_id"], "usuario_id": empresa["usuario_id"],
+        "tipo_pago": "EFECTIVO",
+        "items": [{"producto_id": producto["id"], "cantidad": cantidad, "precio_unitario": 1000}]
+    }
+
+
+def _ventas(client, empresa):
+    return client.get("/api/ventas", params={"empresa_id": empresa["id"]}).json()
+
+
+class TestReintentos:
+    """Misma clave, misma respuesta"""
+
+    def test_crear_venta(self, client, empresa):
+        producto = _producto(client, empresa)
+        headers = {"Idempotency-Key": uuid.uuid4().hex}
+        primera = client.post("/api/ventas", json=_venta(empresa, producto), headers=headers)
+        segunda = client.post("/api/ventas", json=_venta(empresa, producto), headers=headers)
+        assert primera.status_code == segunda.status_code == 200
+        assert segunda.json() == primera.json()
+        assert "Idempotent-Replayed" not in primera.headers
+        assert segunda.headers["Idempotent-Replayed"] == "true"
+        assert len(_ventas(client, empresa)) == 1
+
+    def test_sin_clave_no_cambia_nada(self, client, empresa):
+        producto = _producto(client, empresa)
+        client.post("/api/ventas", json=_venta(empresa, producto))
+        client.post("/api/ventas", json=_venta(empresa, producto))
+        assert len(_ventas(client, empresa)) == 2
+
+    def test_confirmar(self, client, empresa):
+        producto = _producto(client, empresa)
+        venta = client.post("/api/ventas", json=_venta(empresa, producto, 3)).json()
+        headers = {"Idempotency-Key": uuid.uuid4().hex}
+        for _ in range(3):
+            response = client.post(f"/api/ventas/{venta['id']}/confirmar", headers=headers)
+            assert response.status_code == 200, response.text
+            assert response.json()["estado"] == "CONFIRMADA"
+        stock = client.get("/api/stock", params={"empresa_id": empresa["id"]}).json()
+        assert [s["cantidad"] for s in stock if s["producto_id"] == producto["id"]] == [7]
+
+    def test_errores_4xx_se_repiten(self, client, empresa):
+        headers = {"Idempotency-Key": uuid.uuid4().hex}
+        assert client.post("/api/ventas/999999999/confirmar", headers=headers).status_code == 404
+        replay = client.post("/api/ventas/999999999/confirmar", headers=headers)
+        assert replay.status_code == 404
+        assert replay.headers["Idempotent-Replayed"] == "true"
+
+
+class TestConflictos:
+    """Clave reutilizada o en curso"""
+
+    def test_otro_cuerpo(self, client, empresa):
+        producto = _producto(client, empresa)
+        headers = {"Idempotency-Key": uuid.uuid4().hex}
+        client.post("/api/ventas", json=_venta(empresa, producto, 1), headers=headers)
+        response = client.post("/api/ventas", json=_venta(empresa, producto, 2), headers=headers)
+        assert response.status_code == 422
+        assert len(_ventas(client, empresa)) == 1
+
+    def _reservar(self, run, empresa, clave, cuerpo):
+        async def reservar():
+            async with database.async_session_maker() as db:
+                return await idempotencia.reservar(
+                    db, idempotencia.ambito(empresa_id=empresa["id"]), clave, "POST", "/api/ventas",
+                    idempotencia.huella("POST", "/api/ventas", "", cuerpo)
+                )
+        assert run(reservar) is None
+
+    def test_en_curso(self, client, empresa, run):
+        producto = _producto(client, empresa)
+        clave = uuid.uuid4().hex
+        cuerpo = client.build_request("POST", "/api/ventas", json=_venta(empresa, producto)).content
+        self._reservar(run, empresa, clave, cuerpo)
+
+        response = client.post("/api/ventas", content=cuerpo, headers={
+            "Idempotency-Key": clave, "Content-Type": "application/json"
+        })
+        assert response.status_code == 409
+        assert _ventas(client, empresa) == []
+
+    def test_reserva_abandonada(self, client, empresa, run):
+        """Worker caído a mitad del request: pasado el plazo de la reserva, el reintento la toma"""
+        producto = _producto(client, empresa)
+        clave = uuid.uuid4().hex
+        cuerpo = client.build_request("POST", "/api/ventas", json=_venta(empresa, producto)).content
+        self._reservar(run, empresa, clave, cuerpo)
+
+        async def vencer_reserva():
+            async with database.async_session_maker() as db:
+                await db.execute(
+                    update(ClaveIdempotencia).where(ClaveIdempotencia.clave == clave)
+                    .values(en_curso_hasta=datetime.now(timezone.utc) - timedelta(seconds=1))
+                )
+                await db.commit()
+        run(vencer_reserva)
+
+        headers = {"Idempotency-Key": clave, "Content-Type": "application/json"}
+        response = client.post("/api/ventas", content=cuerpo, headers=headers)
+        assert response.status_code == 200, response.text
+        replay = client.post("/api/ventas", content=cuerpo, headers=headers)
+        assert replay.headers["Idempotent-Replayed"] == "true"
+        assert len(_ventas(client, empresa)) == 1
+
+
+class TestAmbito:
+    """Misma clave en distintos usuarios o empresas"""
+
+    def test_por_usuario(self, client, empresa):
+        producto = _producto(client, empresa)
+        clave = uuid.uuid4().hex
+        for usuario_id in (1, 2):
+            response = client.post("/api/ventas", json=_venta(empresa, producto), headers={
+                "Idempotency-Key": clave, "Authorization": f"Bearer {server.create_token(usuario_id)}"
+            })
+            assert "Idempotent-Replayed" not in response.headers
+        assert len(_ventas(client, empresa)) == 2
+
+    def test_ambito(self):
+        assert idempotencia.ambito(usuario_id="7", empresa_id=3) == "usuario:7"
+        assert idempotencia.ambito(empresa_id=3) == "empresa:3"
+        assert idempotencia.ambito() == ""
+
+
+class TestVencimiento:
+    """TTL de las claves"""
+
+    def _vencer(self, run, clave):
+        async def vencer():
+            async with database.async_session_maker() as db:
+                await db.execute(
+                    update(ClaveIdempotencia).where(ClaveIdempotencia.clave == clave)
+                    .values(expira_en=datetime.now(timezone.utc) - timedelta(minutes=1))
+                )
+                await db.commit()
+        run(vencer)
+
+    def test_clave_vencida_se_ejecuta_de_nuevo(self, client, empresa, run):
+        producto = _producto(client, empresa)
+        clave = uuid.uuid4().hex
+        client.post("/api/ventas", json=_venta(empresa, producto), headers={"Idempotency-Key": clave})
+        self._vencer(run, clave)
+        response = client.post("/api/ventas", json=_venta(empresa, producto), headers={"Idempotency-Key": clave})
+        assert "Idempotent-Replayed" not in response.headers
+        assert len(_ventas(client, empresa)) == 2
+
+    def test_purga(self, client, empresa, run):
+        producto = _producto(client, empresa)
+        clave = uuid.uuid4().hex
+        client.post("/api/ventas", json=_venta(empresa, producto), headers={"Idempotency-Key": clave})
+        self._vencer(run, clave)
+
+        async def purgar():
+            async with database.async_session_maker() as db:
+                borradas = await idempotencia.purgar_vencidas(db)
+                quedan = (await db.execute(
+                    select(ClaveIdempotencia.id).where(ClaveIdempotencia.clave == clave)
+                )).all()
+                return borradas, quedan
+        borradas, quedan = run(purgar)
+        assert borradas >= 1
+        assert quedan == []
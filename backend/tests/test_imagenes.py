@@ -0,0 +1,143 @@
+"""
+Test suite for Luz Brill ERP - Imágenes de productos (local, in-process)
+Tests:
+1. El upload guarda principal, media y mini con nombre por hash de contenido
+2. Tamaño y formato se validan (413 / 415) sin tocar el producto
+3. /uploads sirve los archivos con hash con Cache-Control inmutable
+4. Los productos exponen las URLs de media y mini para las grillas
+"""
+
+import io
+import subprocess
+import sys
+import uuid
+
+import pytest
+from PIL import Image
+
+import imagenes
+import server
+from conftest import BACKEND_DIR
+
+
+def _png(ancho, alto, color=(200, 30, 30)):
+    salida = io.BytesIO()
+    Image.new("RGB", (ancho, alto), color).save(salida, "PNG")
+    return salida.getvalue()
+
+
+@pytest.fixture
+def producto(client, empresa):
+    return client.post("/api/productos", json={
+        "empresa_id": empresa["id"], "nombre": "Con imagen", "codigo_barra": uuid.uuid4().hex[:12],
+        "precio_venta": 1000
+    }).json()
+
+
+@pytest.fixture
+def subir(client):
+    creados = set()
+
+    def _subir(producto_id, contenido, nombre="foto.jpg", content_type="image/jpeg"):
+        antes = set(server.UPLOADS_DIR.iterdir())
+        response = client.post(f"/api/productos/{producto_id}/imagen",
+                               files={"file": (nombre, contenido, content_type)})
+        creados.update(set(server.UPLOADS_DIR.iterdir()) - antes)
+        return response
+
+    yield _subir
+    for archivo in creados:
+        archivo.unlink(missing_ok=True)
+
+
+class TestSubida:
+    """POST /productos/{id}/imagen"""
+
+    def test_principal_y_derivados(self, client, producto, subir):
+        contenido = _png(2400, 1200, (10, 20, 30))
+        response = subir(producto["id"], contenido, nombre="foto.jpg")
+        assert response.status_code == 200, response.text
+        body = response.json()
+        # El formato sale del contenido, no de la extensión que mandó el cliente
+        assert body["imagen_url"].endswith(".png")
+        assert set(body["variantes"]) == {"media", "mini"}
+
+        tamanos = {}
+        for url in [body["imagen_url"], *body["variantes"].values()]:
+            with Image.open(server.UPLOADS_DIR / url.rsplit("/", 1)[1]) as imagen:
+                tamanos[url] = imagen.size
+        assert tamanos[body["imagen_url"]] == (1600, 800)
+        assert tamanos[body["variantes"]["media"]] == (600, 300)
+        assert tamanos[body["variantes"]["mini"]] == (160, 80)
+        assert client.get(f"/api/productos/{producto['id']}").json()["imagen_url"] == body["imagen_url"]
+
+    def test_mismo_contenido_mismo_nombre(self, producto, subir):
+        contenido = _png(50, 50, (1, 2, 3))
+        primera = subir(producto["id"], contenido).json()
+        segunda = subir(producto["id"], contenido, nombre="otra.png").json()
+        assert primera == segunda
+        assert subir(producto["id"], _png(50, 50, (3, 2, 1))).json()["imagen_url"] != primera["imagen_url"]
+
+    def test_validaciones(self, client, producto, subir, monkeypatch):
+        assert subir(producto["id"], b"no es una imagen").status_code == 415
+        gif = io.BytesIO()
+        Image.new("RGB", (10, 10)).save(gif, "GIF")
+        assert subir(producto["id"], gif.getvalue(), nombre="a.gif", content_type="image/gif").status_code == 415
+
+        monkeypatch.setattr(imagenes, "TAMANO_MAXIMO", 1024)
+        response = subir(producto["id"], b"\0" * 4096)
+        assert response.status_code == 413
+        assert client.get(f"/api/productos/{producto['id']}").json()["imagen_url"] is None
+        assert subir(999999999, _png(10, 10)).status_code == 404
+
+
+class TestVariantesEnProducto:
+    """imagen_media_url / imagen_mini_url en las respuestas de productos"""
+
+    def test_listado_y_detalle(self, client, empresa, producto, subir):
+        body = subir(producto["id"], _png(300, 300, (7, 7, 7))).json()
+        detalle = client.get(f"/api/productos/{producto['id']}").json()
+        assert detalle["imagen_mini_url"] == body["variantes"]["mini"]
+        assert detalle["imagen_media_url"] == body["variantes"]["media"]
+        [listado] = [p for p in client.get("/api/productos", params={"empresa_id": empresa["id"]}).json()
+                     if p["id"] == producto["id"]]
+        assert listado["imagen_mini_url"] == body["variantes"]["mini"]
+        assert client.get(listado["imagen_mini_url"]).status_code == 200
+
+    def test_urls_sin_derivados(self):
+        assert imagenes.url_variante(None, "mini") is None
+        assert imagenes.url_variante("https://cdn.example.com/foto.jpg", "mini") == "https://cdn.example.com/foto.jpg"
+        viejo = f"/uploads/productos/{uuid.uuid4()}.jpg"
+        assert imagenes.url_variante(viejo, "mini") == viejo
+        assert imagenes.url_variante("/uploads/productos/" + "a" * 32 + ".png", "mini") == \
+            "/uploads/productos/" + "a" * 32 + "-mini.png"
+
+    def test_schemas_no_carga_pillow(self):
+        """Las URLs de derivados no arrastran Pillow ni el pool de imagenes.py a la capa de schemas"""
+        resultado = subprocess.run(
+            [sys.executable, "-c", "import sys, schemas; print('PIL' in sys.modules, 'imagenes' in sys.modules)"],
+            cwd=BACKEND_DIR, capture_output=True, text=True
+        )
+        assert resultado.returncode == 0, resultado.stderr
+        assert resultado.stdout.split() == ["False", "False"]
+
+
+class TestCache:
+    """/uploads con nombres por contenido"""
+
+    def test_cache_control(self, client, producto, subir):
+        body = subir(producto["id"], _png(20, 20, (9, 9, 9))).json()
+        for url in [body["imagen_url"], *body["variantes"].values()]:
+            response = client.get(url)
+            assert response.status_code == 200
+            assert response.headers["cache-control"] == imagenes.CACHE_INMUTABLE
+
+    def test_nombres_viejos_sin_inmutable(self, client):
+        viejo = server.UPLOADS_DIR / f"{uuid.uuid4()}.jpg"
+        viejo.write_bytes(_png(5, 5))
+        try:
+            response = client.get(f"/uploads/productos/{viejo.name}")
+            assert response.status_code == 200
+            assert "cache-control" not in response.headers
+        finally:
+            viejo.unlink()
@@ -0,0 +1,347 @@
+"""
+Test suite for Luz Brill ERP - Kardex de movimientos de stock (local, in-process)
+Tests:
+1. GET /stock/movimientos: filtros y paginación por keyset
+2. Particiones mensuales: SQL generado para PostgreSQL, no-op en SQLite; con
+   TEST_POSTGRES_URL, migración 0005 y asegurar_particiones sobre PostgreSQL real
+3. Stock a una fecha: snapshot de fin de mes + movimientos posteriores
+4. Conciliación de StockActual contra el ledger
+"""
+
+import asyncio
+import os
+import uuid
+from datetime import date, datetime, timezone
+
+import pytest
+from sqlalchemy import select, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+import database
+import particiones
+import conciliacion_stock
+from models import MovimientoStock, StockSnapshot, TipoMovimientoStock
+
+
+def _producto(client, empresa):
+    return client.post("/api/productos", json={
+        "empresa_id": empresa["id"], "nombre": f"Producto {uuid.uuid4().hex[:6]}",
+        "codigo_barra": uuid.uuid4().hex[:12], "precio_venta": 1000
+    }).json()
+
+
+def _entradas(client, empresa, producto, n, almacen_id=None):
+    for _ in range(n):
+        response = client.post("/api/stock/entrada", json={
+            "producto_id": producto["id"], "almacen_id": almacen_id or empresa["almacen_id"], "tipo": "ENTRADA", "cantidad": 1
+        })
+        assert response.status_code == 200, response.text
+
+
+def _movimientos(client, empresa, **params):
+    response = client.get("/api/stock/movimientos", params={"empresa_id": empresa["id"], **params})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+class TestKardex:
+    """Filtros y keyset sobre movimientos_stock"""
+
+    def test_paginacion_keyset(self, client, empresa):
+        producto = _producto(client, empresa)
+        _entradas(client, empresa, producto, 7)
+
+        vistos, siguiente = [], None
+        while True:
+            params = {"producto_id": producto["id"], "limit": 3}
+            if siguiente:
+                params["antes_de"] = siguiente
+            pagina = _movimientos(client, empresa, **params)
+            vistos += [m["id"] for m in pagina["movimientos"]]
+            siguiente = pagina["siguiente"]
+            if not siguiente:
+                break
+        assert len(vistos) == 7
+        assert vistos == sorted(vistos, reverse=True)
+
+    def test_filtros(self, client, empresa):
+        producto = _producto(client, empresa)
+        otro_almacen = client.post("/api/almacenes", json={"empresa_id": empresa["id"], "nombre": "Depósito"}).json()
+        _entradas(client, empresa, producto, 2)
+        _entradas(client, empresa, producto, 1, almacen_id=otro_almacen["id"])
+        client.post("/api/stock/traspaso", json={
+            "producto_id": producto["id"], "almacen_origen_id": empresa["almacen_id"],
+            "almacen_destino_id": otro_almacen["id"], "cantidad": 1
+        })
+
+        todos = _movimientos(client, empresa, producto_id=producto["id"])["movimientos"]
+        assert len(todos) == 5
+        assert todos[0]["producto_nombre"] == producto["nombre"]
+        assert len(_movimientos(client, empresa, producto_id=producto["id"], almacen_id=otro_almacen["id"])["movimientos"]) == 2
+        assert len(_movimientos(client, empresa, producto_id=producto["id"], tipo="TRASPASO")["movimientos"]) == 2
+        assert _movimientos(client, empresa, producto_id=producto["id"], fecha_desde="2999-01-01")["movimientos"] == []
+
+    def test_fechas_invalidas(self, client, empresa):
+        for params in ({"fecha_desde": "ayer"}, {"fecha_hasta": "2026-02-30"}):
+            response = client.get("/api/stock/movimientos", params={"empresa_id": empresa["id"], **params})
+            assert response.status_code == 422, params
+        assert client.get("/api/stock/al-dia", params={"empresa_id": empresa["id"], "fecha": "31/01/2026"}).status_code == 422
+        assert client.get("/api/stock/al-dia", params={"empresa_id": empresa["id"]}).status_code == 422
+        assert client.post("/api/stock/snapshots", params={"fecha": "2026-13-01"}).status_code == 422
+
+    def test_no_mezcla_empresas(self, client, empresa):
+        producto = _producto(client, empresa)
+        _entradas(client, empresa, producto, 1)
+        assert _movimientos(client, {"id": empresa["id"] + 100000}, producto_id=producto["id"])["movimientos"] == []
+
+    def test_una_consulta(self, client, empresa, contar_consultas):
+        producto = _producto(client, empresa)
+        _entradas(client, empresa, producto, 5)
+        response, consultas = contar_consultas(
+            "GET", "/api/stock/movimientos", params={"empresa_id": empresa["id"], "producto_id": producto["id"]}
+        )
+        assert len(response.json()["movimientos"]) == 5
+        assert consultas == 1
+
+
+class TestParticiones:
+    """particiones.py"""
+
+    def test_sql_mensual(self):
+        sentencias = particiones.sql_particiones('movimientos_stock', date(2026, 11, 15), date(2027, 1, 3))
+        assert len(sentencias) == 3
+        assert "movimientos_stock_p2026_12 PARTITION OF movimientos_stock" in sentencias[1]
+        assert "FROM ('2026-12-01 00:00:00+00') TO ('2027-01-01 00:00:00+00')" in sentencias[1]
+
+    def test_sqlite_no_op(self, run):
+        async def asegurar():
+            async with database.engine.begin() as conn:
+                return await particiones.asegurar_particiones(conn)
+        assert run(asegurar) == []
+
+
+# Base PostgreSQL descartable: estos tests bajan y suben todas las migraciones
+TEST_POSTGRES_URL = os.environ.get('TEST_POSTGRES_URL')
+
+
+@pytest.mark.skipif(not TEST_POSTGRES_URL, reason="Sin TEST_POSTGRES_URL (base PostgreSQL descartable)")
+class TestParticionesPostgreSQL:
+    """Migración 0005 y asegurar_particiones contra PostgreSQL"""
+
+    HOY = date.today()
+    PASADO = particiones.sumar_meses(HOY, -2)
+    FUTURO = particiones.sumar_meses(HOY, 8)
+
+    def _conectado(self, consulta):
+        async def correr():
+            engine = create_async_engine(database.normalizar_url(TEST_POSTGRES_URL), poolclass=NullPool)
+            try:
+                async with engine.begin() as conn:
+                    return await consulta(conn)
+            finally:
+                await engine.dispose()
+        return asyncio.run(correr())
+
+    def _ubicacion(self):
+        """{id: partición donde está la fila}"""
+        async def consulta(conn):
+            return dict((await conn.execute(text("SELECT id, tableoid::regclass::text FROM movimientos_stock"))).all())
+        return self._conectado(consulta)
+
+    @pytest.fixture
+    def movimientos(self):
+        """Base en 0004 con un movimiento de hace dos meses, uno de dentro de ocho y uno sin fecha"""
+        from alembic import command
+
+        url = database.normalizar_url(TEST_POSTGRES_URL)
+        config = database.configuracion_alembic(url)
+        command.downgrade(config, 'base')
+        database.migrar_esquema('0004', url=url)
+
+        async def sembrar(conn):
+            empresa = (await conn.execute(text("INSERT INTO empresas (nombre, ruc) VALUES ('PG', 'PG-1') RETURNING id"))).scalar()
+            producto = (await conn.execute(text(
+                "INSERT INTO productos (empresa_id, nombre, precio_venta) VALUES (:e, 'P', 1000) RETURNING id"
+            ), {'e': empresa})).scalar()
+            almacen = (await conn.execute(text(
+                "INSERT INTO almacenes (empresa_id, nombre) VALUES (:e, 'A') RETURNING id"
+            ), {'e': empresa})).scalar()
+            ids = {}
+            for nombre, creado_en in (
+                ('pasado', datetime(self.PASADO.year, self.PASADO.month, 15, 12, tzinfo=timezone.utc)),
+                ('futuro', datetime(self.FUTURO.year, self.FUTURO.month, 15, 12, tzinfo=timezone.utc)),
+                ('sin_fecha', None),
+            ):
+                ids[nombre] = (await conn.execute(text(
+                    "INSERT INTO movimientos_stock (producto_id, almacen_id, tipo, cantidad, creado_en) "
+                    "VALUES (:p, :a, 'ENTRADA', 1, :creado_en) RETURNING id"
+                ), {'p': producto, 'a': almacen, 'creado_en': creado_en})).scalar()
+            return ids
+
+        ids = self._conectado(sembrar)
+        database.migrar_esquema('0005', url=url)
+        yield ids
+        command.downgrade(config, 'base')
+
+    def test_0005_reparte_las_filas(self, movimientos):
+        ubicacion = self._ubicacion()
+        assert ubicacion == {
+            movimientos['pasado']: particiones.nombre_particion('movimientos_stock', self.PASADO),
+            movimientos['futuro']: 'movimientos_stock_default',
+            movimientos['sin_fecha']: particiones.nombre_particion('movimientos_stock', self.HOY),
+        }
+
+        async def insertar(conn):
+            return (await conn.execute(text(
+                "INSERT INTO movimientos_stock (producto_id, almacen_id, tipo, cantidad) "
+                "SELECT producto_id, almacen_id, tipo, 1 FROM movimientos_stock LIMIT 1 RETURNING id"
+            ))).scalar()
+        # La secuencia de id se conservó
+        assert self._conectado(insertar) > max(movimientos.values())
+
+    def test_0005_downgrade_conserva_las_filas(self, movimientos):
+        from alembic import command
+
+        command.downgrade(database.configuracion_alembic(database.normalizar_url(TEST_POSTGRES_URL)), '0004')
+        assert set(self._ubicacion()) == set(movimientos.values())
+        assert set(self._ubicacion().values()) == {'movimientos_stock'}
+
+    def test_mueve_filas_de_la_default(self, movimientos):
+        async def asegurar(conn):
+            return await particiones.asegurar_particiones(conn, meses_adelante=9, hoy=self.HOY)
+        assert self._conectado(asegurar) == ['movimientos_stock']
+        assert self._ubicacion()[movimientos['futuro']] == particiones.nombre_particion('movimientos_stock', self.FUTURO)
+        # Repetirlo no cambia nada
+        assert self._conectado(asegurar) == ['movimientos_stock']
+
+    def test_un_mes_que_falla_no_frena_a_los_demas(self, movimientos, monkeypatch):
+        original = particiones.crear_particion
+        roto = particiones.sumar_meses(self.HOY, 5)
+
+        async def crear_particion(conn, tabla, mes, default=None):
+            creada = await original(conn, tabla, mes, default)
+            if mes == roto:
+                raise SQLAlchemyError("falla simulada")
+            return creada
+        monkeypatch.setattr(particiones, 'crear_particion', crear_particion)
+
+        async def asegurar(conn):
+            await particiones.asegurar_particiones(conn, meses_adelante=9, hoy=self.HOY)
+            return {
+                mes: (await conn.execute(
+                    text("SELECT to_regclass(:nombre)"), {'nombre': particiones.nombre_particion('movimientos_stock', mes)}
+                )).scalar() is not None
+                for mes in (particiones.sumar_meses(self.HOY, 4), roto, particiones.sumar_meses(self.HOY, 6), self.FUTURO)
+            }
+        existe = self._conectado(asegurar)
+        assert existe[roto] is False
+        assert [existe[mes] for mes in existe if mes != roto] == [True, True, True]
+        assert self._ubicacion()[movimientos['futuro']] == particiones.nombre_particion('movimientos_stock', self.FUTURO)
+
+
+class TestStockAlDia:
+    """GET /stock/al-dia y POST /stock/snapshots"""
+
+    def _ledger(self, client, empresa, run):
+        producto = _producto(client, empresa)
+
+        async def insertar():
+            async with database.async_session_maker() as session:
+                for momento, cantidad in (
+                    (datetime(2026, 1, 10, 12, tzinfo=timezone.utc), 10),
+                    (datetime(2026, 1, 31, 23, tzinfo=timezone.utc), -3),
+                    (datetime(2026, 2, 5, 9, tzinfo=timezone.utc), 4),
+                    (datetime(2026, 3, 1, 8, tzinfo=timezone.utc), -11),
+                ):
+                    session.add(MovimientoStock(
+                        producto_id=producto["id"], almacen_id=empresa["almacen_id"],
+                        tipo=TipoMovimientoStock.ENTRADA if cantidad > 0 else TipoMovimientoStock.SALIDA,
+                        cantidad=cantidad, creado_en=momento
+                    ))
+                await session.commit()
+        run(insertar)
+        return producto
+
+    def _al_dia(self, client, empresa, producto, fecha):
+        response = client.get("/api/stock/al-dia", params={
+            "empresa_id": empresa["id"], "fecha": fecha, "producto_id": producto["id"]
+        })
+        assert response.status_code == 200, response.text
+        body = response.json()
+        return body["snapshot_base"], [s["cantidad"] for s in body["stock"]]
+
+    def test_sin_snapshot_recorre_el_ledger(self, client, empresa, run):
+        producto = self._ledger(client, empresa, run)
+        assert self._al_dia(client, empresa, producto, "2026-01-09") == (None, [])
+        assert self._al_dia(client, empresa, producto, "2026-01-31") == (None, [7])
+        assert self._al_dia(client, empresa, producto, "2026-02-28") == (None, [11])
+        # En cero no se lista
+        assert self._al_dia(client, empresa, producto, "2026-03-01") == (None, [])
+
+    def test_con_snapshots_incrementales(self, client, empresa, run):
+        producto = self._ledger(client, empresa, run)
+        for fecha in ("2026-01-31", "2026-02-28", "2026-02-28"):
+            response = client.post("/api/stock/snapshots", params={"empresa_id": empresa["id"], "fecha": fecha})
+            assert response.status_code == 200, response.text
+
+        async def snapshots():
+            async with database.async_session_maker() as session:
+                return (await session.execute(
+                    select(StockSnapshot.fecha, StockSnapshot.cantidad)
+                    .where(StockSnapshot.producto_id == producto["id"]).order_by(StockSnapshot.fecha)
+                )).all()
+        assert [(f.isoformat(), c) for f, c in run(snapshots)] == [("2026-01-31", 7), ("2026-02-28", 11)]
+
+        assert self._al_dia(client, empresa, producto, "2026-02-15") == ("2026-01-31", [11])
+        assert self._al_dia(client, empresa, producto, "2026-02-28") == ("2026-02-28", [11])
+        assert self._al_dia(client, empresa, producto, "2026-03-31") == ("2026-02-28", [])
+        assert self._al_dia(client, empresa, producto, "2026-01-20") == (None, [10])
+
+
+class TestConciliacion:
+    """GET/POST /stock/conciliacion"""
+
+    def _con_desvios(self, client, empresa):
+        """Un producto con entrada y luego stock sobrescrito, otro solo con stock sobrescrito"""
+        desviado = _producto(client, empresa)
+        _entradas(client, empresa, desviado, 5)
+        client.post("/api/stock", json={"producto_id": desviado["id"], "almacen_id": empresa["almacen_id"], "cantidad": 8})
+        sin_ledger = _producto(client, empresa)
+        client.post("/api/stock", json={"producto_id": sin_ledger["id"], "almacen_id": empresa["almacen_id"], "cantidad": 4})
+        cuadrado = _producto(client, empresa)
+        _entradas(client, empresa, cuadrado, 2)
+        return desviado, sin_ledger
+
+    def test_reporte_y_correccion(self, client, empresa):
+        desviado, sin_ledger = self._con_desvios(client, empresa)
+        params = {"empresa_id": empresa["id"]}
+
+        diferencias = client.get("/api/stock/conciliacion", params=params).json()
+        assert [(d["producto_id"], d["ledger"], d["actual"], d["diferencia"]) for d in diferencias] == [
+            (desviado["id"], 5, 8, 3), (sin_ledger["id"], 0, 4, 4)
+        ]
+        # El reporte no corrige
+        assert len(client.get("/api/stock/conciliacion", params=params).json()) == 2
+
+        assert len(client.post("/api/stock/conciliacion", params=params).json()) == 2
+        assert client.get("/api/stock/conciliacion", params=params).json() == []
+        [ajuste] = _movimientos(client, empresa, producto_id=sin_ledger["id"], tipo="AJUSTE")["movimientos"]
+        assert ajuste["cantidad"] == 4 and ajuste["referencia_tipo"] == "conciliacion"
+
+    def test_csv(self, client, empresa):
+        desviado, _ = self._con_desvios(client, empresa)
+        response = client.get("/api/stock/conciliacion", params={"empresa_id": empresa["id"], "formato": "csv"})
+        lineas = response.text.strip().split("\n")
+        assert lineas[0] == "producto_id,almacen_id,ledger,actual,diferencia"
+        assert lineas[1] == f"{desviado['id']},{empresa['almacen_id']},5,8,3"
+
+    def test_lotes(self, client, empresa, run):
+        self._con_desvios(client, empresa)
+
+        async def corregir():
+            async with database.async_session_maker() as session:
+                return [d async for d in conciliacion_stock.conciliar(session, empresa["id"], corregir=True, tamano_lote=1)]
+        assert len(run(corregir)) == 2
+        assert client.get("/api/stock/conciliacion", params={"empresa_id": empresa["id"]}).json() == []
@@ -0,0 +1,133 @@
+"""
+Test suite for Luz Brill ERP - Observabilidad (local, in-process)
+Tests:
+1. Cada respuesta trae X-Query-Count y Server-Timing con el tiempo de DB
+2. El conteo es por request: un endpoint sin DB reporta 0 consultas
+3. Requests sobre el umbral de consultas se loguean con la ruta del endpoint
+4. /metrics expone latencia por ruta, pools de DB, PDFs y ventas confirmadas
+"""
+
+import logging
+
+import metrics
+import server
+
+
+class TestContadorConsultas:
+    """Middleware de conteo y tiempo de consultas SQL por request"""
+
+    def test_headers_en_endpoint_con_db(self, client, empresa):
+        response = client.get("/api/clientes", params={"empresa_id": empresa["id"]})
+        assert response.status_code == 200
+        assert int(response.headers["X-Query-Count"]) >= 1
+        timing = response.headers["Server-Timing"]
+        assert timing.startswith("db;dur=")
+        assert "app;dur=" in timing
+
+    def test_endpoint_sin_db_cuenta_cero(self, client):
+        response = client.get("/api/health")
+        assert response.headers["X-Query-Count"] == "0"
+
+    def test_conteo_no_crece_con_las_filas(self, client, empresa):
+        """listar_productos trae el stock en la misma consulta: el header lo hace visible"""
+        url = "/api/productos"
+        antes = int(client.get(url, params={"empresa_id": empresa["id"]}).headers["X-Query-Count"])
+        for i in range(3):
+            client.post("/api/productos", json={"empresa_id": empresa["id"], "nombre": f"P{i}", "precio_venta": 1000})
+        despues = int(client.get(url, params={"empresa_id": empresa["id"]}).headers["X-Query-Count"])
+        assert despues == antes
+
+    def test_log_de_request_sobre_umbral(self, client, empresa, caplog, monkeypatch):
+        monkeypatch.setattr(server, "SLOW_REQUEST_QUERIES", 0)
+        with caplog.at_level(logging.WARNING, logger=server.logger.name):
+            client.get("/api/clientes", params={"empresa_id": empresa["id"]})
+        mensajes = [r.getMessage() for r in caplog.records if r.getMessage().startswith("Slow request")]
+        assert any("GET /api/clientes" in m for m in mensajes), mensajes
+
+
+def _valor(texto, muestra):
+    """Valor de una muestra exacta (nombre + labels) en la exposición de Prometheus"""
+    for linea in texto.splitlines():
+        if linea.startswith(muestra + " "):
+            return float(linea.rsplit(" ", 1)[1])
+    return 0.0
+
+
+class TestMetricasPrometheus:
+    """Endpoint /metrics y métricas de negocio"""
+
+    def test_formato_de_exposicion(self, client):
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+        assert "# TYPE http_request_duration_seconds histogram" in response.text
+        assert 'db_pool_connections{engine="primary",estado="checked_out"}' in response.text
+
+    def test_latencia_por_ruta_de_la_plantilla(self, client, empresa):
+        client.get(f"/api/clientes/{empresa['cliente_id']}")
+        texto = client.get("/metrics").text
+        muestra = 'http_request_duration_seconds_count{method="GET",route="/api/clientes/{cliente_id}"}'
+        assert _valor(texto, muestra) >= 1
+        assert f"/api/clientes/{empresa['cliente_id']}\"" not in texto
+
+    def test_rutas_inexistentes_comparten_label(self, client):
+        client.get("/no-existe/123")
+        texto = client.get("/metrics").text
+        assert _valor(texto, 'http_requests_total{method="GET",route="sin_ruta",status="404"}') >= 1
+
+    def test_venta_confirmada_y_conflicto_de_stock(self, client, empresa):
+        producto = client.post("/api/productos", json={
+            "empresa_id": empresa["id"], "nombre": "Metricas", "precio_venta": 1000
+        }).json()
+        client.post("/api/stock", json={
+            "producto_id": producto["id"], "almacen_id": empresa["almacen_id"], "cantidad": 2
+        })
+        venta = client.post("/api/ventas", json={
+            "empresa_id": empresa["id"],
+            "cliente_id": empresa["cliente_id"],
+            "usuario_id": empresa["usuario_id"],
+            "tipo_pago": "TARJETA",
+            "items": [{"producto_id": producto["id"], "cantidad": 2, "precio_unitario": 1000}]
+        }).json()
+        # El stock cambia entre la creación y la confirmación de la venta
+        client.post("/api/stock", json={
+            "producto_id": producto["id"], "almacen_id": empresa["almacen_id"], "cantidad": 1
+        })
+        antes = client.get("/metrics").text
+
+        response = client.post(f"/api/ventas/{venta['id']}/confirmar")
+        assert response.status_code == 200
+        despues = client.get("/metrics").text
+
+        muestra = 'ventas_confirmadas_total{tipo_pago="TARJETA"}'
+        assert _valor(despues, muestra) == _valor(antes, muestra) + 1
+        # Solo queda 1 de las 2 unidades: la asignación queda incompleta
+        conflictos = "stock_allocation_conflicts_total"
+        assert _valor(despues, conflictos) == _valor(antes, conflictos) + 1
+
+    def test_duracion_de_pdf(self, client, empresa):
+        response = client.get("/api/reportes/stock", params={"empresa_id": empresa["id"]})
+        assert response.status_code == 200
+        texto = client.get("/metrics").text
+        assert _valor(texto, 'pdf_render_duration_seconds_count{reporte="Reporte de Stock Actual"}') >= 1
+
+
+class TestRegistroMetricas:
+    """Registro en proceso: buckets acumulados y escape de labels"""
+
+    def test_histograma_acumulado(self):
+        registro = metrics.Registro()
+        histograma = registro.histogram("prueba_seconds", "Prueba", ("ruta",), buckets=(0.1, 1.0))
+        histograma.observe(0.05, ruta="a")
+        histograma.observe(0.5, ruta="a")
+        histograma.observe(5, ruta="a")
+        texto = registro.exponer()
+        assert 'prueba_seconds_bucket{ruta="a",le="0.1"} 1' in texto
+        assert 'prueba_seconds_bucket{ruta="a",le="1"} 2' in texto
+        assert 'prueba_seconds_bucket{ruta="a",le="+Inf"} 3' in texto
+        assert 'prueba_seconds_count{ruta="a"} 3' in texto
+
+    def test_escape_de_labels(self):
+        registro = metrics.Registro()
+        registro.counter("prueba_total", "Prueba", ("valor",)).inc(valor='a"b\\c')
+        assert 'prueba_total{valor="a\\"b\\\\c"} 1' in registro.exponer()
@@ -0,0 +1,131 @@
+"""
+Test suite for Luz Brill ERP - Pagos masivos (local, in-process)
+Tests:
+1. Ciclos de salario: pago por ids o por periodo en un solo UPDATE
+2. Deudas a proveedores: pago por ids o por proveedor en un solo UPDATE
+"""
+
+import uuid
+
+
+def _generar_ciclos(client, empresa, cantidad, mes):
+    for i in range(cantidad):
+        client.post("/api/funcionarios", json={
+            "empresa_id": empresa["id"], "nombre": f"Func {i}", "salario_base": 1000000
+        })
+    response = client.post("/api/ciclos-salario/generar", params={"empresa_id": empresa["id"], "mes": mes})
+    assert response.status_code == 200, response.text
+    return client.get("/api/ciclos-salario", params={"empresa_id": empresa["id"], "periodo": mes}).json()
+
+
+def _proveedor(client, empresa):
+    return client.post("/api/proveedores", json={
+        "empresa_id": empresa["id"], "nombre": f"Proveedor {uuid.uuid4().hex[:6]}"
+    }).json()
+
+
+def _deudas(client, proveedor, montos):
+    return [
+        client.post(f"/api/proveedores/{proveedor['id']}/deudas", json={"monto": monto}).json()
+        for monto in montos
+    ]
+
+
+class TestPagarCiclosSalario:
+    """POST /ciclos-salario/pagar"""
+
+    def test_por_periodo(self, client, empresa):
+        ciclos = _generar_ciclos(client, empresa, 3, "2099-01")
+        response = client.post("/api/ciclos-salario/pagar", json={"empresa_id": empresa["id"], "periodo": "2099-01"})
+        assert response.status_code == 200, response.text
+        body = response.json()
+        assert body["pagados"] == 3
+        assert body["total"] == 3000000
+        assert sorted(c["id"] for c in body["ciclos"]) == sorted(c["id"] for c in ciclos)
+
+        listado = client.get("/api/ciclos-salario", params={"empresa_id": empresa["id"], "periodo": "2099-01"}).json()
+        assert all(c["pagado"] and c["fecha_pago"] for c in listado)
+
+    def test_por_ids_ignora_pagados(self, client, empresa):
+        ciclos = _generar_ciclos(client, empresa, 3, "2099-02")
+        primero, segundo = ciclos[0]["id"], ciclos[1]["id"]
+        client.post(f"/api/ciclos-salario/{primero}/pagar")
+
+        body = client.post("/api/ciclos-salario/pagar", json={
+            "empresa_id": empresa["id"], "ids": [primero, segundo]
+        }).json()
+        assert [c["id"] for c in body["ciclos"]] == [segundo]
+
+    def test_no_toca_otra_empresa(self, client, empresa):
+        ciclos = _generar_ciclos(client, empresa, 1, "2099-03")
+        body = client.post("/api/ciclos-salario/pagar", json={
+            "empresa_id": empresa["id"] + 100000, "ids": [ciclos[0]["id"]]
+        }).json()
+        assert body["pagados"] == 0
+
+    def test_requiere_filtro(self, client, empresa):
+        response = client.post("/api/ciclos-salario/pagar", json={"empresa_id": empresa["id"]})
+        assert response.status_code == 400
+
+    def test_body_invalido(self, client, empresa):
+        for body in (
+            {"empresa_id": empresa["id"], "ids": "1,2"},
+            {"empresa_id": "uno", "periodo": "2099-01"},
+            {"periodo": "2099-01"},
+            {"empresa_id": empresa["id"], "periodo": "enero"},
+        ):
+            assert client.post("/api/ciclos-salario/pagar", json=body).status_code == 422, body
+
+    def test_consultas_constantes(self, client, empresa, contar_consultas):
+        conteos = []
+        for mes, cantidad in (("2099-04", 2), ("2099-05", 6)):
+            _generar_ciclos(client, empresa, cantidad, mes)
+            response, consultas = contar_consultas(
+                "POST", "/api/ciclos-salario/pagar", json={"empresa_id": empresa["id"], "periodo": mes}
+            )
+            assert response.json()["pagados"] >= cantidad
+            conteos.append(consultas)
+        assert conteos[0] == conteos[1]
+
+
+class TestPagarDeudas:
+    """PUT /deudas/pagar"""
+
+    def test_por_proveedor(self, client, empresa):
+        proveedor = _proveedor(client, empresa)
+        otro = _proveedor(client, empresa)
+        _deudas(client, proveedor, [1000, 2500])
+        [ajena] = _deudas(client, otro, [700])
+
+        body = client.put("/api/deudas/pagar", json={
+            "empresa_id": empresa["id"], "proveedor_id": proveedor["id"]
+        }).json()
+        assert body["pagadas"] == 2
+        assert body["total"] == 3500
+
+        [pendiente] = client.get(f"/api/proveedores/{otro['id']}/deudas").json()
+        assert pendiente["id"] == ajena["id"] and not pendiente["pagado"]
+        assert all(d["pagado"] for d in client.get(f"/api/proveedores/{proveedor['id']}/deudas").json())
+
+    def test_por_ids(self, client, empresa):
+        proveedor = _proveedor(client, empresa)
+        una, otra, tercera = _deudas(client, proveedor, [100, 200, 300])
+        client.put(f"/api/deudas/{una['id']}/pagar")
+
+        body = client.put("/api/deudas/pagar", json={
+            "empresa_id": empresa["id"], "ids": [una["id"], otra["id"]]
+        }).json()
+        assert [d["id"] for d in body["deudas"]] == [otra["id"]]
+        pagadas = {d["id"]: d["pagado"] for d in client.get(f"/api/proveedores/{proveedor['id']}/deudas").json()}
+        assert pagadas == {una["id"]: True, otra["id"]: True, tercera["id"]: False}
+
+    def test_requiere_filtro(self, client, empresa):
+        assert client.put("/api/deudas/pagar", json={"empresa_id": empresa["id"]}).status_code == 400
+
+    def test_body_invalido(self, client, empresa):
+        for body in (
+            {"empresa_id": "uno", "proveedor_id": 1},
+            {"empresa_id": empresa["id"], "proveedor_id": "uno"},
+            {"empresa_id": empresa["id"], "ids": [1, "dos"]},
+        ):
+            assert client.put("/api/deudas/pagar", json=body).status_code == 422, body
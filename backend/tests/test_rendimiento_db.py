@@ -0,0 +1,307 @@
+"""
+Test suite for Luz Brill ERP - Rendimiento de base de datos (local, in-process)
+Tests:
+1. Réplica de lectura: sin READ_DATABASE_URL las lecturas usan el primario
+2. Réplica de lectura: con dos archivos SQLite, listados y reportes leen de la réplica
+3. Índices: EXPLAIN de las consultas calientes de server.py usa los índices declarados
+4. Migraciones: `alembic upgrade head` produce exactamente el esquema de models.py
+5. Benchmark: el harness siembra, corre todos los escenarios y reporta percentiles
+6. Datagen: datos consistentes (libro de stock y saldos de créditos) y login del admin
+"""
+
+import os
+import subprocess
+import sys
+import textwrap
+from datetime import datetime, timezone
+
+import pytest
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from sqlalchemy import create_engine, select, func
+
+import benchmark
+import database
+import datagen
+from conftest import BACKEND_DIR, TMP_DIR
+from models import (
+    StockActual, VentaItem, MovimientoStock, CreditoCliente, PagoCredito, AdelantoSalario,
+    Entrega, EstadoEntrega, Venta, EstadoVenta, Producto, Cliente
+)
+
+
+class TestReplicaLectura:
+    """Routing de endpoints de lectura a la réplica"""
+
+    def test_sin_replica_usa_primario(self):
+        """Sin réplica configurada, get_read_db usa el mismo engine"""
+        assert database.READ_DATABASE_URL is None
+        assert database.read_engine is database.engine
+        assert database.async_read_session_maker is database.async_session_maker
+
+    def test_dos_sqlite_lecturas_van_a_replica(self):
+        """Los listados leen de la réplica y las escrituras van al primario"""
+        primario = TMP_DIR / 'replica_primario.db'
+        replica = TMP_DIR / 'replica_lectura.db'
+        script = textwrap.dedent("""
+            import asyncio, sqlite3, sys
+            from fastapi.testclient import TestClient
+            import database
+            import server
+
+            async def crear_esquema():
+                async with database.read_engine.begin() as conn:
+                    await conn.run_sync(database.Base.metadata.create_all)
+
+            with TestClient(server.app) as client:
+                client.portal.call(crear_esquema)
+                con = sqlite3.connect(sys.argv[1])
+                con.execute("INSERT INTO empresas (id, nombre, ruc, estado) VALUES (1, 'Replica', 'R-1', 1)")
+                con.execute("INSERT INTO clientes (id, empresa_id, nombre, estado) VALUES (1, 1, 'Solo replica', 1)")
+                con.execute("INSERT INTO ventas (id, empresa_id, cliente_id, usuario_id, total, iva, descuento, tipo_pago, es_delivery, estado, creado_en) "
+                            "VALUES (1, 1, 1, 1, 100, 9, 0, 'EFECTIVO', 0, 'CONFIRMADA', '2026-01-01 10:00:00')")
+                con.commit()
+                con.close()
+
+                # Escritura: va al primario
+                assert client.post("/api/empresas", json={"nombre": "Primario", "ruc": "P-1"}).status_code == 200
+                assert [e["nombre"] for e in client.get("/api/empresas").json()] == ["Primario"]
+
+                # Lecturas pesadas: van a la réplica
+                ventas = client.get("/api/ventas", params={"empresa_id": 1}).json()
+                assert [v["cliente_nombre"].strip() for v in ventas] == ["Solo replica"], ventas
+                assert client.get("/api/stock", params={"empresa_id": 1}).status_code == 200
+                assert client.get("/api/dashboard/stats", params={"empresa_id": 1}).status_code == 200
+                reporte = client.get("/api/reportes/ventas", params={"empresa_id": 1, "fecha_desde": "2026-01-01", "fecha_hasta": "2026-01-31"})
+                assert reporte.status_code == 200
+            print("OK")
+        """)
+        env = dict(os.environ)
+        env['DATABASE_URL'] = f"sqlite+aiosqlite:///{primario}"
+        env['READ_DATABASE_URL'] = f"sqlite+aiosqlite:///{replica}"
+        result = subprocess.run(
+            [sys.executable, '-c', script, str(replica)],
+            cwd=BACKEND_DIR, env=env, capture_output=True, text=True, timeout=120
+        )
+        assert result.returncode == 0, result.stderr
+        assert "OK" in result.stdout
+
+
+def _explicar(run, stmt):
+    """Devuelve el plan de ejecución (texto) de una consulta en el primario"""
+    async def _plan():
+        async with database.engine.connect() as conn:
+            sql = str(stmt.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True}))
+            if conn.dialect.name == 'sqlite':
+                result = await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")
+                return "\n".join(str(row[-1]) for row in result.all())
+            # En tablas pequeñas PostgreSQL prefiere seq scan; se fuerza a mostrar el índice elegible.
+            # SET LOCAL dentro de la transacción: se descarta con el rollback y no queda en el pool
+            async with conn.begin() as transaccion:
+                await conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+                result = await conn.exec_driver_sql(f"EXPLAIN {sql}")
+                plan = "\n".join(str(row[0]) for row in result.all())
+                await transaccion.rollback()
+            return plan
+    return run(_plan)
+
+
+INICIO_MES = datetime(2026, 1, 1, tzinfo=timezone.utc)
+FIN_MES = datetime(2026, 2, 1, tzinfo=timezone.utc)
+
+CONSULTAS_CALIENTES = [
+    pytest.param(
+        select(func.coalesce(func.sum(StockActual.cantidad), 0)).where(StockActual.producto_id == 1),
+        ("uq_stock_actual_producto_almacen", "sqlite_autoindex_stock_actual_1"),
+        id="stock_total_por_producto"
+    ),
+    pytest.param(
+        select(VentaItem).where(VentaItem.venta_id == 1),
+        ("ix_venta_items_venta_id",),
+        id="items_de_venta"
+    ),
+    pytest.param(
+        select(MovimientoStock).where(MovimientoStock.producto_id == 1).order_by(MovimientoStock.creado_en.desc()),
+        ("ix_movimientos_stock_producto_creado",),
+        id="kardex_producto"
+    ),
+    pytest.param(
+        select(func.sum(CreditoCliente.monto_pendiente)).where(CreditoCliente.cliente_id == 1, CreditoCliente.pagado == False),
+        ("ix_creditos_clientes_cliente_pagado",),
+        id="credito_usado_cliente"
+    ),
+    pytest.param(
+        select(PagoCredito).where(PagoCredito.credito_id == 1).order_by(PagoCredito.fecha_pago.desc()),
+        ("ix_pagos_creditos_credito_fecha",),
+        id="pagos_de_credito"
+    ),
+    pytest.param(
+        select(func.sum(AdelantoSalario.monto)).where(
+            AdelantoSalario.funcionario_id == 1,
+            AdelantoSalario.creado_en >= INICIO_MES,
+            AdelantoSalario.creado_en < FIN_MES
+        ),
+        ("ix_adelantos_salario_funcionario_creado",),
+        id="adelantos_del_mes"
+    ),
+    pytest.param(
+        select(func.count(Entrega.id)).where(Entrega.estado == EstadoEntrega.PENDIENTE),
+        ("ix_entregas_estado",),
+        id="entregas_pendientes"
+    ),
+    pytest.param(
+        select(func.sum(Venta.total)).where(
+            Venta.empresa_id == 1,
+            Venta.estado == EstadoVenta.CONFIRMADA,
+            Venta.creado_en >= INICIO_MES,
+            Venta.creado_en < FIN_MES
+        ),
+        ("ix_ventas_empresa_estado_creado",),
+        id="ventas_confirmadas_del_dia"
+    ),
+    pytest.param(
+        select(Producto).where(Producto.empresa_id == 1, Producto.activo == True),
+        ("ix_productos_empresa_activo",),
+        id="productos_activos"
+    ),
+]
+
+
+class TestIndicesConsultasCalientes:
+    """Las consultas de server.py deben resolverse con índices, no con scans completos"""
+
+    @pytest.mark.parametrize("stmt,indices", CONSULTAS_CALIENTES)
+    def test_consulta_usa_indice(self, run, stmt, indices):
+        plan = _explicar(run, stmt)
+        assert any(indice in plan for indice in indices), f"Se esperaba uno de {indices}, plan:\n{plan}"
+
+
+class TestMigraciones:
+    """El esquema lo gestiona Alembic; no debe divergir de models.py"""
+
+    def test_upgrade_head_coincide_con_modelos(self):
+        ruta = TMP_DIR / 'migraciones.db'
+        database.migrar_esquema(url=f"sqlite+aiosqlite:///{ruta}")
+
+        sync_engine = create_engine(f"sqlite:///{ruta}")
+        with sync_engine.connect() as conn:
+            diferencias = compare_metadata(MigrationContext.configure(conn), database.Base.metadata)
+        sync_engine.dispose()
+        assert diferencias == [], diferencias
+
+    def test_downgrade_y_upgrade_completo(self):
+        from alembic import command
+
+        url = f"sqlite+aiosqlite:///{TMP_DIR / 'migraciones_ida_vuelta.db'}"
+        database.migrar_esquema(url=url)
+        command.downgrade(database.configuracion_alembic(url), 'base')
+        database.migrar_esquema(url=url)
+
+    def test_reiniciar_esquema_pasa_por_alembic(self):
+        """reset-database borra los datos y deja el esquema y alembic_version en head"""
+        from alembic.script import ScriptDirectory
+
+        ruta = TMP_DIR / 'migraciones_reinicio.db'
+        url = f"sqlite+aiosqlite:///{ruta}"
+        database.migrar_esquema(url=url)
+        sync_engine = create_engine(f"sqlite:///{ruta}")
+        with sync_engine.begin() as conn:
+            conn.exec_driver_sql("INSERT INTO empresas (nombre, ruc, estado) VALUES ('Vieja', 'V-1', 1)")
+
+        database.reiniciar_esquema(url=url)
+
+        head = ScriptDirectory.from_config(database.configuracion_alembic(url)).get_current_head()
+        with sync_engine.connect() as conn:
+            assert conn.exec_driver_sql("SELECT COUNT(*) FROM empresas").scalar() == 0
+            assert conn.exec_driver_sql("SELECT version_num FROM alembic_version").scalar() == head
+            diferencias = compare_metadata(MigrationContext.configure(conn), database.Base.metadata)
+        sync_engine.dispose()
+        assert diferencias == [], diferencias
+
+
+class TestBenchmark:
+    """Harness de benchmark (benchmark.py) con volúmenes mínimos"""
+
+    def test_percentil_rango_mas_cercano(self):
+        valores = list(range(1, 101))
+        assert benchmark.percentil(valores, 50) == 50
+        assert benchmark.percentil(valores, 99) == 99
+        assert benchmark.percentil([7], 95) == 7
+        assert benchmark.percentil([], 50) is None
+
+    def test_corrida_minima(self, run):
+        args = benchmark.construir_parser().parse_args([
+            "--productos", "5", "--clientes", "3", "--ventas", "10",
+            "--requests", "3", "--concurrencia", "2", "--calentamiento", "1"
+        ])
+        resultado = run(benchmark.ejecutar, args)
+        assert set(resultado["escenarios"]) == set(args.escenarios)
+        for nombre, metricas in resultado["escenarios"].items():
+            assert metricas["requests"] == 3, nombre
+            assert metricas["errores"] == 0, nombre
+            assert metricas["p50_ms"] <= metricas["p95_ms"] <= metricas["p99_ms"]
+
+
+class TestDatagen:
+    """Generador masivo de datos sintéticos (datagen.py)"""
+
+    def test_repartir(self):
+        assert datagen.repartir(10, 3) == [4, 3, 3]
+        assert sum(datagen.repartir(1000001, 7)) == 1000001
+
+    def test_datos_consistentes(self, client, run):
+        volumenes = datagen.Volumenes(
+            empresas=2, productos=40, clientes=20, ventas=400, borradores=3,
+            proveedores=3, funcionarios=3, meses=3
+        )
+        resultado = run(datagen.generar, database.engine, volumenes, 7)
+        empresas = resultado["empresas"]
+        assert len(empresas) == 2
+        assert resultado["filas"]["ventas"] == 403
+        assert sum(len(e["borradores"]) for e in empresas) == 3
+        almacenes = [a for e in empresas for a in e["almacenes"]]
+
+        # StockActual coincide con la suma del libro de movimientos
+        libro = (
+            select(MovimientoStock.producto_id, MovimientoStock.almacen_id, func.sum(MovimientoStock.cantidad))
+            .where(MovimientoStock.almacen_id.in_(almacenes))
+            .group_by(MovimientoStock.producto_id, MovimientoStock.almacen_id)
+        )
+        stock = select(StockActual.producto_id, StockActual.almacen_id, StockActual.cantidad).where(
+            StockActual.almacen_id.in_(almacenes)
+        )
+
+        async def leer():
+            async with database.engine.connect() as conn:
+                return (
+                    {(p, a): c for p, a, c in (await conn.execute(libro)).all()},
+                    {(p, a): c for p, a, c in (await conn.execute(stock)).all()},
+                )
+
+        totales, actuales = run(leer)
+        assert actuales and totales == actuales
+        assert min(actuales.values()) >= 0
+
+        # Saldo pendiente = original - pagos (solo las empresas generadas acá)
+        empresa_ids = [e["id"] for e in empresas]
+        pagado = (
+            select(func.coalesce(func.sum(PagoCredito.monto), 0))
+            .where(PagoCredito.credito_id == CreditoCliente.id)
+            .scalar_subquery()
+        )
+
+        async def inconsistentes():
+            async with database.engine.connect() as conn:
+                return (await conn.execute(
+                    select(func.count()).select_from(CreditoCliente)
+                    .join(Cliente, Cliente.id == CreditoCliente.cliente_id)
+                    .where(Cliente.empresa_id.in_(empresa_ids),
+                           CreditoCliente.monto_pendiente != CreditoCliente.monto_original - pagado)
+                )).scalar()
+
+        assert run(inconsistentes) == 0
+
+        login = client.post("/api/auth/login", json={
+            "email": empresas[0]["admin_email"], "password": datagen.PASSWORD_ADMIN
+        })
+        assert login.status_code == 200, login.text
@@ -0,0 +1,172 @@
+"""
+Test suite for Luz Brill ERP - Reportes de antigüedad de saldos (local, in-process)
+Tests:
+1. aging-creditos: tramos 0-30/31-60/61-90/+90 por cliente en una consulta; con corte pasado, saldos de ese día
+2. aging-deudas: tramos por vencimiento de la deuda, con "por vencer"; con corte pasado, deudas de ese día
+3. Salidas CSV (streaming) y PDF
+"""
+
+import csv
+import io
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+
+from sqlalchemy import null
+
+import database
+from models import CreditoCliente, DeudaProveedor, PagoCredito
+
+CORTE = date(2026, 6, 30)
+
+
+def _en(dia):
+    return datetime(dia.year, dia.month, dia.day, 12, tzinfo=timezone.utc)
+
+
+def _creditos(run, cliente_id, dias_y_montos, pagado=False, pagos=()):
+    """Créditos a `dias` del corte; `pagos` son (dias, monto) aplicados a cada uno"""
+    async def insertar():
+        async with database.async_session_maker() as session:
+            for dias, monto in dias_y_montos:
+                fecha_venta = CORTE - timedelta(days=dias)
+                cobros = [(fecha_venta, Decimal(monto))] if pagado else [
+                    (CORTE - timedelta(days=dias_pago), Decimal(monto_pago)) for dias_pago, monto_pago in pagos
+                ]
+                pendiente = Decimal(monto) - sum((cobro for _, cobro in cobros), Decimal('0'))
+                credito = CreditoCliente(
+                    cliente_id=cliente_id, monto_original=Decimal(monto), monto_pendiente=pendiente,
+                    fecha_venta=fecha_venta, pagado=pendiente <= 0
+                )
+                session.add(credito)
+                await session.flush()
+                session.add_all([
+                    PagoCredito(credito_id=credito.id, monto=cobro, fecha_pago=_en(dia)) for dia, cobro in cobros
+                ])
+            await session.commit()
+    run(insertar)
+
+
+def _deudas(run, proveedor_id, deudas):
+    """Deudas (monto, dias_emision, dias_limite, dias_pago); None deja la fecha vacía / la deuda impaga"""
+    def _dia(dias):
+        # null() explícito: con None el ORM aplicaría el default de fecha_emision
+        return null() if dias is None else CORTE - timedelta(days=dias)
+
+    async def insertar():
+        async with database.async_session_maker() as session:
+            session.add_all([
+                DeudaProveedor(
+                    proveedor_id=proveedor_id, monto=Decimal(monto), fecha_emision=_dia(emision),
+                    fecha_limite=_dia(limite), fecha_pago=_dia(pago), pagado=pago is not None
+                )
+                for monto, emision, limite, pago in deudas
+            ])
+            await session.commit()
+    run(insertar)
+
+
+def _aging(client, url, empresa, **params):
+    return client.get(url, params={"empresa_id": empresa["id"], "fecha": CORTE.isoformat(), **params})
+
+
+class TestAgingCreditos:
+    """GET /reportes/aging-creditos"""
+
+    def test_tramos_por_cliente(self, client, empresa, run):
+        otro = client.post("/api/clientes", json={"empresa_id": empresa["id"], "nombre": "Otro"}).json()
+        _creditos(run, empresa["cliente_id"], [(0, 100), (30, 200), (31, 400), (60, 800), (61, 1600), (90, 3200), (91, 6400)])
+        _creditos(run, empresa["cliente_id"], [(5, 99999)], pagado=True)
+        _creditos(run, otro["id"], [(200, 50)])
+
+        body = _aging(client, "/api/reportes/aging-creditos", empresa).json()
+        assert body["tramos"] == ["0_30", "31_60", "61_90", "90_mas"]
+        [primero, segundo] = body["filas"]
+        assert primero["cliente_id"] == empresa["cliente_id"]
+        assert (primero["0_30"], primero["31_60"], primero["61_90"], primero["90_mas"]) == (300, 1200, 4800, 6400)
+        assert primero["total"] == 12700
+        assert segundo == {"cliente_id": otro["id"], "cliente": "Otro", "0_30": 0, "31_60": 0, "61_90": 0, "90_mas": 50, "total": 50}
+        assert body["totales"]["total"] == 12750
+
+    def test_una_consulta(self, client, empresa, run, contar_consultas):
+        for i in range(3):
+            cliente = client.post("/api/clientes", json={"empresa_id": empresa["id"], "nombre": f"C{i}"}).json()
+            _creditos(run, cliente["id"], [(10, 100), (100, 100)])
+        response, consultas = contar_consultas(
+            "GET", "/api/reportes/aging-creditos", params={"empresa_id": empresa["id"], "fecha": CORTE.isoformat()}
+        )
+        assert len(response.json()["filas"]) == 3
+        assert consultas == 1
+
+    def test_csv(self, client, empresa, run):
+        _creditos(run, empresa["cliente_id"], [(45, 1000)])
+        response = _aging(client, "/api/reportes/aging-creditos", empresa, formato="csv")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/csv")
+        filas = list(csv.reader(io.StringIO(response.text)))
+        assert filas[0] == ["cliente_id", "cliente", "0_30", "31_60", "61_90", "90_mas", "total"]
+        assert filas[1][0] == str(empresa["cliente_id"])
+        assert float(filas[1][3]) == 1000
+
+    def test_pdf(self, client, empresa, run):
+        _creditos(run, empresa["cliente_id"], [(45, 1000)])
+        response = _aging(client, "/api/reportes/aging-creditos", empresa, formato="pdf")
+        assert response.status_code == 200
+        assert response.content.startswith(b"%PDF")
+
+    def test_corte_pasado_excluye_creditos_posteriores(self, client, empresa, run):
+        _creditos(run, empresa["cliente_id"], [(10, 100), (-1, 5000), (-40, 7000)])
+        body = _aging(client, "/api/reportes/aging-creditos", empresa).json()
+        [fila] = body["filas"]
+        assert (fila["0_30"], fila["total"]) == (100, 100)
+
+    def test_corte_pasado_usa_saldo_de_ese_dia(self, client, empresa, run):
+        """Lo cobrado después del corte no achica el saldo; lo cobrado antes sí"""
+        _creditos(run, empresa["cliente_id"], [(10, 1000)], pagos=[(-5, 1000)])
+        _creditos(run, empresa["cliente_id"], [(40, 500)], pagos=[(2, 200), (-1, 300)])
+        _creditos(run, empresa["cliente_id"], [(70, 900)], pagos=[(0, 900)])
+
+        [fila] = _aging(client, "/api/reportes/aging-creditos", empresa).json()["filas"]
+        assert (fila["0_30"], fila["31_60"], fila["61_90"], fila["total"]) == (1000, 300, 0, 1300)
+
+    def test_corte_hoy_usa_pendiente(self, client, empresa, run):
+        _creditos(run, empresa["cliente_id"], [(10, 1000)], pagos=[(-5, 1000)])
+        _creditos(run, empresa["cliente_id"], [(40, 500)], pagos=[(2, 200)])
+        hoy = date.today().isoformat()
+        [fila] = _aging(client, "/api/reportes/aging-creditos", empresa, fecha=hoy).json()["filas"]
+        assert fila["total"] == 300
+
+    def test_formato_invalido(self, client, empresa):
+        assert _aging(client, "/api/reportes/aging-creditos", empresa, formato="xls").status_code == 400
+        assert _aging(client, "/api/reportes/aging-creditos", empresa, fecha="foo").status_code == 422
+        assert _aging(client, "/api/reportes/aging-deudas", empresa, fecha="2026-13-01").status_code == 422
+
+
+class TestAgingDeudas:
+    """GET /reportes/aging-deudas"""
+
+    def test_tramos_por_vencimiento(self, client, empresa, run):
+        proveedor = client.post("/api/proveedores", json={"empresa_id": empresa["id"], "nombre": "Proveedor"}).json()
+        _deudas(run, proveedor["id"], [
+            (monto, 150, dias, None) for dias, monto in ((-10, 1), (0, 2), (45, 4), (75, 8), (120, 16))
+        ])
+
+        body = _aging(client, "/api/reportes/aging-deudas", empresa).json()
+        assert body["tramos"] == ["por_vencer", "0_30", "31_60", "61_90", "90_mas"]
+        [fila] = body["filas"]
+        assert fila["proveedor"] == "Proveedor"
+        assert [fila[t] for t in body["tramos"]] == [1, 2, 4, 8, 16]
+        assert fila["total"] == 31
+
+    def test_corte_pasado(self, client, empresa, run):
+        """Solo deudas emitidas hasta el corte (o sin fecha) y todavía impagas ese día"""
+        proveedor = client.post("/api/proveedores", json={"empresa_id": empresa["id"], "nombre": "Proveedor"}).json()
+        _deudas(run, proveedor["id"], [
+            (1, 20, 10, None),
+            (2, None, 10, None),
+            (4, -3, 10, None),
+            (8, 20, 10, -5),
+            (16, 20, 10, 5),
+        ])
+
+        [fila] = _aging(client, "/api/reportes/aging-deudas", empresa).json()["filas"]
+        assert (fila["0_30"], fila["total"]) == (11, 11)
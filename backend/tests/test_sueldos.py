@@ -0,0 +1,173 @@
+"""
+Test suite for Luz Brill ERP - Sueldos (local, in-process)
+Tests:
+1. Adelantos del mes: rango semiabierto [inicio, fin) en listados y ciclos
+2. Generación de ciclos: INSERT ... SELECT idempotente y acotado por empresa
+"""
+
+import itertools
+import uuid
+from datetime import date, timedelta
+from decimal import Decimal
+
+import pytest
+
+import database
+import server
+from models import AdelantoSalario
+
+
+def _funcionario(client, empresa, salario=3000000, **extra):
+    response = client.post("/api/funcionarios", json={
+        "empresa_id": empresa["id"], "nombre": "Func", "salario_base": salario, **extra
+    })
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def _adelantos(run, funcionario_id, momentos_y_montos):
+    async def insertar():
+        async with database.async_session_maker() as session:
+            for creado_en, monto in momentos_y_montos:
+                session.add(AdelantoSalario(funcionario_id=funcionario_id, monto=Decimal(monto), creado_en=creado_en))
+            await session.commit()
+    run(insertar)
+
+
+class TestAdelantosDelMes:
+    """Filtro por mes con rango semiabierto sobre creado_en"""
+
+    def test_rango_mes(self):
+        inicio, fin = server.rango_mes(2026, 12)
+        assert (inicio.year, inicio.month, inicio.day) == (2026, 12, 1)
+        assert (fin.year, fin.month, fin.day) == (2027, 1, 1)
+
+    def test_listar_funcionarios_suma_solo_el_mes_actual(self, client, empresa, run):
+        hoy = date.today()
+        inicio, fin = server.rango_mes(hoy.year, hoy.month)
+        uno = _funcionario(client, empresa)
+        otro = _funcionario(client, empresa)
+        _adelantos(run, uno["id"], [
+            (inicio, 100000),
+            (fin - timedelta(seconds=1), 50000),
+            (inicio - timedelta(seconds=1), 700000),
+            (fin, 900000),
+        ])
+        _adelantos(run, otro["id"], [(inicio + timedelta(days=1), 250000)])
+
+        funcionarios = {
+            f["id"]: f for f in client.get("/api/funcionarios", params={"empresa_id": empresa["id"]}).json()
+        }
+        assert funcionarios[uno["id"]]["total_adelantos_mes"] == 150000
+        assert funcionarios[uno["id"]]["salario_restante"] == 2850000
+        assert funcionarios[otro["id"]]["total_adelantos_mes"] == 250000
+
+    def test_funcionario_sin_adelantos(self, client, empresa):
+        funcionario = _funcionario(client, empresa)
+        [listado] = [
+            f for f in client.get("/api/funcionarios", params={"empresa_id": empresa["id"]}).json()
+            if f["id"] == funcionario["id"]
+        ]
+        assert listado["total_adelantos_mes"] == 0
+        assert listado["salario_restante"] == 3000000
+
+    def test_listar_adelantos_por_periodo(self, client, empresa, run):
+        funcionario = _funcionario(client, empresa)
+        inicio, fin = server.rango_mes(2026, 3)
+        _adelantos(run, funcionario["id"], [
+            (inicio, 1000), (fin - timedelta(seconds=1), 2000), (fin, 4000)
+        ])
+        adelantos = client.get(
+            f"/api/funcionarios/{funcionario['id']}/adelantos", params={"periodo": "2026-03"}
+        ).json()
+        assert sorted(float(a["monto"]) for a in adelantos) == [1000, 2000]
+
+
+_meses = itertools.count(1)
+
+
+def _mes_libre():
+    """Periodo no usado por otros tests de la sesión (la base es compartida)"""
+    n = next(_meses)
+    return f"{2100 + n // 12:04d}-{n % 12 + 1:02d}"
+
+
+def _generar(client, empresa_id, mes):
+    return client.post("/api/ciclos-salario/generar", params={"empresa_id": empresa_id, "mes": mes})
+
+
+def _empresa(client):
+    sufijo = uuid.uuid4().hex[:10]
+    return client.post("/api/empresas", json={"nombre": f"TEST_{sufijo}", "ruc": f"TEST-{sufijo}"}).json()
+
+
+def _empresa_con_funcionarios(client, n, salario=1000000):
+    empresa = _empresa(client)
+    funcionarios = [
+        _funcionario(client, {"id": empresa["id"]}, salario=salario, nombre=f"Func {i:03d}") for i in range(n)
+    ]
+    return empresa, funcionarios
+
+
+class TestGenerarCiclos:
+    """INSERT ... SELECT con adelantos agrupados y restricción única (funcionario_id, periodo)"""
+
+    def test_descuenta_adelantos_del_mes_anterior(self, client, run):
+        empresa, [uno, otro] = _empresa_con_funcionarios(client, 2)
+        mes = _mes_libre()
+        año, mes_num = map(int, mes.split('-'))
+        anterior = date(año, mes_num, 1) - timedelta(days=1)
+        inicio, fin = server.rango_mes(anterior.year, anterior.month)
+        _adelantos(run, uno["id"], [(inicio, 100000), (fin - timedelta(seconds=1), 50000), (fin, 999999)])
+
+        response = _generar(client, empresa["id"], mes)
+        assert response.status_code == 200, response.text
+        assert response.json()["ciclos_creados"] == 2
+
+        ciclos = {
+            c["funcionario_id"]: c
+            for c in client.get("/api/ciclos-salario", params={"empresa_id": empresa["id"], "periodo": mes}).json()
+        }
+        assert float(ciclos[uno["id"]]["descuentos"]) == 150000
+        assert float(ciclos[uno["id"]]["salario_neto"]) == 850000
+        assert float(ciclos[otro["id"]]["salario_neto"]) == 1000000
+
+    def test_repetir_no_duplica(self, client):
+        empresa, _ = _empresa_con_funcionarios(client, 2)
+        mes = _mes_libre()
+        assert _generar(client, empresa["id"], mes).json()["ciclos_creados"] == 2
+
+        _funcionario(client, {"id": empresa["id"]}, nombre="Nuevo")
+        response = _generar(client, empresa["id"], mes)
+        assert response.status_code == 200, response.text
+        assert response.json()["ciclos_creados"] == 1
+        assert [d["funcionario"].strip() for d in response.json()["detalle"]] == ["Nuevo"]
+
+        ciclos = client.get("/api/ciclos-salario", params={"empresa_id": empresa["id"], "periodo": mes}).json()
+        assert len(ciclos) == 3
+
+    def test_empresas_con_el_mismo_periodo(self, client):
+        mes = _mes_libre()
+        una, _ = _empresa_con_funcionarios(client, 1)
+        otra, _ = _empresa_con_funcionarios(client, 2)
+        assert _generar(client, una["id"], mes).json()["ciclos_creados"] == 1
+        assert _generar(client, otra["id"], mes).json()["ciclos_creados"] == 2
+
+    def test_sin_funcionarios_activos(self, client):
+        empresa = _empresa(client)
+        assert _generar(client, empresa["id"], _mes_libre()).status_code == 404
+
+    @pytest.mark.parametrize("mes", ["2026", "2026-13", "abc-01"])
+    def test_mes_invalido(self, client, empresa, mes):
+        assert _generar(client, empresa["id"], mes).status_code == 400
+
+    def test_consultas_constantes(self, client, contar_consultas):
+        conteos = []
+        for n in (2, 6):
+            empresa, _ = _empresa_con_funcionarios(client, n)
+            response, consultas = contar_consultas(
+                "POST", "/api/ciclos-salario/generar", params={"empresa_id": empresa["id"], "mes": _mes_libre()}
+            )
+            assert response.json()["ciclos_creados"] == n
+            conteos.append(consultas)
+        assert conteos[0] == conteos[1]
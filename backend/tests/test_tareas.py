@@ -0,0 +1,289 @@
+"""
+Test suite for Luz Brill ERP - Tareas programadas (local, in-process)
+Tests:
+1. Expresiones cron: próximos horarios, rangos, pasos y día de semana
+2. Elección: con dos workers la misma hora programada corre una sola vez
+3. Historial con estado, duración y errores; endpoints /tareas
+4. Al arrancar se recuperan los horarios perdidos (todos o solo el último)
+5. Corridas abandonadas EN_CURSO: se marcan ERROR y se vuelven a correr
+6. Tarea mensual de ciclos de salario
+"""
+
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import database
+import server
+import tareas
+from sqlalchemy import select
+
+from models import EjecucionTarea
+
+
+def _utc(*args):
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+class TestCron:
+    """tareas.Cron"""
+
+    def test_siguiente(self):
+        assert tareas.Cron("*/30 * * * *").siguiente(_utc(2026, 10, 19, 10, 0, 5)) == _utc(2026, 10, 19, 10, 30)
+        assert tareas.Cron("0 3 * * *").siguiente(_utc(2026, 10, 19, 3, 0)) == _utc(2026, 10, 20, 3, 0)
+        assert tareas.Cron("15 3 1 * *").siguiente(_utc(2026, 12, 5)) == _utc(2027, 1, 1, 3, 15)
+        assert tareas.Cron("0 9 * * 1-5").siguiente(_utc(2026, 10, 17, 12)) == _utc(2026, 10, 19, 9, 0)
+        assert tareas.Cron("0 0 29 2 *").siguiente(_utc(2026, 3, 1)) == _utc(2028, 2, 29)
+
+    def test_domingo_y_dia_o_semana(self):
+        assert tareas.Cron("0 0 * * 7").siguiente(_utc(2026, 10, 19)) == _utc(2026, 10, 25)
+        # Con día del mes y día de semana restringidos alcanza con uno (como cron)
+        assert tareas.Cron("0 0 1 * 0").siguiente(_utc(2026, 10, 19)) == _utc(2026, 10, 25)
+
+    def test_cumple(self):
+        cron = tareas.Cron("15 3 1 * *")
+        assert cron.cumple(_utc(2026, 10, 1, 3, 15))
+        assert not cron.cumple(_utc(2026, 10, 1, 3, 15, 0, 12))
+        assert not cron.cumple(_utc(2026, 10, 2, 3, 15))
+
+    def test_invalidas(self):
+        for expresion in ("* * * *", "60 * * * *", "* * 0 * *", "5-1 * * * *"):
+            with pytest.raises(ValueError):
+                tareas.Cron(expresion)
+
+
+class TestPlanificador:
+    """Elección por fila única e historial"""
+
+    def _planificador(self, funcion):
+        planificador = tareas.Planificador(database.async_session_maker)
+        planificador.registrar("prueba", "* * * * *", funcion)
+        return planificador
+
+    def test_una_sola_corrida_por_horario(self, run):
+        corridas = []
+
+        async def funcion(session_maker, programada_para):
+            corridas.append(1)
+            await asyncio.sleep(0.01)
+            return "ok"
+
+        uno, otro = self._planificador(funcion), self._planificador(funcion)
+        programada = datetime.now(timezone.utc).replace(microsecond=0)
+
+        async def ambos():
+            return await asyncio.gather(uno.ejecutar("prueba", programada), otro.ejecutar("prueba", programada))
+
+        ids = run(ambos)
+        assert len(corridas) == 1
+        assert sum(i is not None for i in ids) == 1
+
+    def test_error_queda_en_historial(self, client, run):
+        async def funcion(session_maker, programada_para):
+            raise RuntimeError("sin conexión")
+
+        ejecucion_id = run(self._planificador(funcion).ejecutar, "prueba")
+        [ejecucion] = [e for e in client.get("/api/tareas/ejecuciones", params={"nombre": "prueba"}).json()
+                       if e["id"] == ejecucion_id]
+        assert ejecucion["estado"] == "ERROR"
+        assert ejecucion["detalle"] == "RuntimeError: sin conexión"
+        assert ejecucion["duracion_ms"] >= 0
+
+    def test_bucle_lanza_lo_vencido(self, run, monkeypatch):
+        corridas = []
+
+        async def funcion(session_maker, programada_para):
+            corridas.append(1)
+
+        planificador = self._planificador(funcion)
+        monkeypatch.setattr(tareas.Cron, "siguiente", lambda self, desde: desde)
+
+        async def sin_perdidas(ahora):
+            return []
+        monkeypatch.setattr(planificador, "perdidas", sin_perdidas)
+
+        async def un_tick():
+            planificador.iniciar()
+            await asyncio.sleep(0.2)
+            await planificador.detener()
+        run(un_tick)
+        assert len(corridas) >= 1
+
+
+class TestRecuperacion:
+    """Horarios perdidos mientras el proceso no corría"""
+
+    def _historial(self, run, nombre, *programadas):
+        async def insertar():
+            async with database.async_session_maker() as db:
+                for programada in programadas:
+                    db.add(EjecucionTarea(nombre=nombre, programada_para=programada, estado="OK"))
+                await db.commit()
+        run(insertar)
+
+    def _planificador(self, cron, recuperar_todas, corridas=None):
+        nombre = f"mensual-{uuid.uuid4().hex[:8]}"
+
+        async def funcion(session_maker, programada_para):
+            corridas.append(programada_para)
+
+        planificador = tareas.Planificador(database.async_session_maker)
+        planificador.registrar(nombre, cron, funcion, recuperar_todas=recuperar_todas)
+        return planificador, nombre
+
+    def test_todas_las_perdidas(self, run):
+        corridas = []
+        planificador, nombre = self._planificador("15 3 1 * *", True, corridas)
+        # La corrida manual posterior no cuenta como último horario
+        self._historial(run, nombre, _utc(2026, 7, 1, 3, 15), _utc(2026, 7, 20, 10, 0, 0, 5))
+        ahora = _utc(2026, 10, 19, 12)
+        perdidas = run(planificador.perdidas, ahora)
+        assert perdidas == [(nombre, _utc(2026, 8, 1, 3, 15)), (nombre, _utc(2026, 9, 1, 3, 15)),
+                            (nombre, _utc(2026, 10, 1, 3, 15))]
+
+        run(planificador._recuperar, perdidas)
+        assert corridas == [p for _, p in perdidas]
+        # Ya registradas: no queda nada por recuperar
+        assert run(planificador.perdidas, ahora) == []
+
+    def test_solo_la_ultima(self, run):
+        planificador, nombre = self._planificador("0 3 * * *", False)
+        self._historial(run, nombre, _utc(2026, 10, 10, 3))
+        assert run(planificador.perdidas, _utc(2026, 10, 19, 12)) == [(nombre, _utc(2026, 10, 19, 3))]
+
+    def test_sin_historial(self, run):
+        planificador, _ = self._planificador("15 3 1 * *", True)
+        assert run(planificador.perdidas, _utc(2026, 10, 19, 12)) == []
+
+
+class TestAbandonadas:
+    """Filas EN_CURSO de un worker que murió a mitad de la corrida"""
+
+    def _planificador(self, cron, recuperar_todas=False):
+        nombre = f"abandonada-{uuid.uuid4().hex[:8]}"
+        corridas = []
+
+        async def funcion(session_maker, programada_para):
+            corridas.append(programada_para)
+
+        planificador = tareas.Planificador(database.async_session_maker)
+        planificador.registrar(nombre, cron, funcion, recuperar_todas=recuperar_todas,
+                               duracion_maxima=timedelta(minutes=30))
+        return planificador, nombre, corridas
+
+    def _fila(self, run, nombre, programada_para, estado="EN_CURSO", inicio=None):
+        async def insertar():
+            async with database.async_session_maker() as db:
+                db.add(EjecucionTarea(nombre=nombre, programada_para=programada_para, estado=estado,
+                                      worker="caido:1", inicio=inicio or programada_para))
+                await db.commit()
+        run(insertar)
+
+    def _estados(self, run, nombre):
+        async def leer():
+            async with database.async_session_maker() as db:
+                filas = (await db.execute(
+                    select(EjecucionTarea.programada_para, EjecucionTarea.estado)
+                    .where(EjecucionTarea.nombre == nombre).order_by(EjecucionTarea.programada_para)
+                )).all()
+            return [estado for _, estado in filas]
+        return run(leer)
+
+    def test_mismo_horario_se_retoma(self, run):
+        planificador, nombre, corridas = self._planificador("* * * * *")
+        programada = datetime.now(timezone.utc).replace(second=0, microsecond=0) - timedelta(hours=1)
+        self._fila(run, nombre, programada)
+        assert run(planificador.ejecutar, nombre, programada) is not None
+        assert corridas == [programada]
+        assert self._estados(run, nombre) == ["OK"]
+
+    def test_en_curso_reciente_no_se_toca(self, run):
+        planificador, nombre, corridas = self._planificador("* * * * *")
+        programada = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+        self._fila(run, nombre, programada, inicio=programada - timedelta(minutes=5))
+        assert run(planificador.ejecutar, nombre, programada) is None
+        assert corridas == []
+        assert self._estados(run, nombre) == ["EN_CURSO"]
+
+    def test_proxima_corrida_recupera_las_anteriores(self, run):
+        planificador, nombre, corridas = self._planificador("15 3 1 * *", recuperar_todas=True)
+        abandonada = _utc(2026, 8, 1, 3, 15)
+        self._fila(run, nombre, abandonada)
+
+        async def ejecutar_y_esperar():
+            await planificador.ejecutar(nombre, _utc(2026, 9, 1, 3, 15))
+            await asyncio.gather(*planificador._ejecuciones)
+        run(ejecutar_y_esperar)
+        assert sorted(corridas) == [abandonada, _utc(2026, 9, 1, 3, 15)]
+        assert self._estados(run, nombre) == ["OK", "OK"]
+
+    def test_arranque_recupera_abandonadas(self, run):
+        planificador, nombre, corridas = self._planificador("15 3 1 * *", recuperar_todas=True)
+        self._fila(run, nombre, _utc(2026, 8, 1, 3, 15), estado="OK")
+        self._fila(run, nombre, _utc(2026, 9, 1, 3, 15))
+        ahora = _utc(2026, 10, 19, 12)
+        perdidas = run(planificador.perdidas, ahora)
+        assert perdidas == [(nombre, _utc(2026, 9, 1, 3, 15)), (nombre, _utc(2026, 10, 1, 3, 15))]
+        assert self._estados(run, nombre) == ["OK", "ERROR"]
+
+        run(planificador._recuperar, perdidas)
+        assert corridas == [p for _, p in perdidas]
+        assert self._estados(run, nombre) == ["OK", "OK", "OK"]
+
+    def test_arranque_sin_recuperar_todas(self, run):
+        planificador, nombre, _ = self._planificador("0 3 * * *")
+        # Abandonada la última: se vuelve a correr; con un horario posterior perdido, solo ese
+        self._fila(run, nombre, _utc(2026, 10, 19, 3))
+        assert run(planificador.perdidas, _utc(2026, 10, 19, 12)) == [(nombre, _utc(2026, 10, 19, 3))]
+
+        otro, otro_nombre, _ = self._planificador("0 3 * * *")
+        self._fila(run, otro_nombre, _utc(2026, 10, 17, 3))
+        assert run(otro.perdidas, _utc(2026, 10, 19, 12)) == [(otro_nombre, _utc(2026, 10, 19, 3))]
+
+
+class TestCiclosSalario:
+    """Tarea ciclos_salario"""
+
+    def test_genera_para_cada_empresa(self, client, empresa, run):
+        funcionario = client.post("/api/funcionarios", json={
+            "empresa_id": empresa["id"], "nombre": "Func", "salario_base": 1000000
+        }).json()
+        detalle = run(server.tarea_ciclos_salario, database.async_session_maker, _utc(2031, 7, 1, 4))
+        assert "2031-07" in detalle
+        ciclos = client.get("/api/ciclos-salario", params={"empresa_id": empresa["id"], "periodo": "2031-07"}).json()
+        assert [c["funcionario_id"] for c in ciclos] == [funcionario["id"]]
+        # Idempotente: repetir no duplica
+        assert run(server.tarea_ciclos_salario, database.async_session_maker, _utc(2031, 7, 1, 4)).startswith("0 ciclos")
+
+
+class TestEndpoints:
+    """GET /tareas, POST /tareas/{nombre}/ejecutar"""
+
+    def test_listado(self, client):
+        body = client.get("/api/tareas").json()
+        assert body["habilitadas"] is False
+        nombres = {t["nombre"]: t for t in body["tareas"]}
+        assert {"snapshot_stock", "ciclos_salario", "particiones", "saldos_credito", "purgar_idempotencia"} <= set(nombres)
+        assert nombres["particiones"]["cron"] == "0 3 * * *"
+        assert nombres["particiones"]["proxima"].endswith(("03:00:00Z", "03:00:00+00:00"))
+
+    def test_ejecutar(self, client):
+        response = client.post("/api/tareas/saldos_credito/ejecutar")
+        assert response.status_code == 200, response.text
+        ejecucion = response.json()
+        assert ejecucion["estado"] == "OK"
+        assert ejecucion["detalle"].endswith("clientes corregidos")
+        assert client.get("/api/tareas/ejecuciones", params={"nombre": "saldos_credito", "limit": 1}).json()[0][
+            "id"] == ejecucion["id"]
+        assert client.post("/api/tareas/no_existe/ejecutar").status_code == 404
+
+    def test_ejecutar_tomada_por_otro(self, client, monkeypatch):
+        async def tomada(nombre, programada_para=None):
+            return None
+        monkeypatch.setattr(server.planificador, "ejecutar", tomada)
+        assert client.post("/api/tareas/saldos_credito/ejecutar").status_code == 409
+
+    def test_planificador_no_arranca_en_tests(self):
+        assert server.planificador._bucle is None
@@ -0,0 +1,206 @@
+"""
+Test suite for Luz Brill ERP - Sincronización de ventas offline (local, in-process)
+Tests:
+1. POST /ventas/sync crea y confirma ventas: stock, movimientos, créditos y materias
+2. Conflictos por venta (stock, crédito, cliente, representante, UUID repetido) sin afectar al resto
+3. Reenviar el mismo lote no duplica ventas
+4. Tramos: varias transacciones con cantidad de consultas acotada
+"""
+
+import uuid
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+import sync_ventas
+
+
+def _producto(client, empresa, cantidad, precio=1000):
+    producto = client.post("/api/productos", json={
+        "empresa_id": empresa["id"], "nombre": "Producto", "codigo_barra": uuid.uuid4().hex[:12], "precio_venta": precio
+    }).json()
+    client.post("/api/stock", json={"producto_id": producto["id"], "almacen_id": empresa["almacen_id"], "cantidad": cantidad})
+    return producto
+
+
+def _venta(empresa, producto, cantidad=1, **extra):
+    return {
+        "uuid": str(uuid.uuid4()), "cliente_id": empresa["cliente_id"], "tipo_pago": "EFECTIVO",
+        "items": [{"producto_id": producto["id"], "cantidad": cantidad, "precio_unitario": 1000}],
+        **extra
+    }
+
+
+def _sync(client, empresa, ventas):
+    response = client.post("/api/ventas/sync", json={
+        "empresa_id": empresa["id"], "usuario_id": empresa["usuario_id"], "ventas": ventas
+    })
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def _stock(client, empresa, producto):
+    stock = client.get("/api/stock", params={"empresa_id": empresa["id"]}).json()
+    return sum(s["cantidad"] for s in stock if s["producto_id"] == producto["id"])
+
+
+class TestSincronizar:
+    """Alta y confirmación en bloque"""
+
+    def test_crea_y_confirma(self, client, empresa):
+        producto = _producto(client, empresa, 10)
+        otro_almacen = client.post("/api/almacenes", json={"empresa_id": empresa["id"], "nombre": "Depósito"}).json()
+        client.post("/api/stock", json={"producto_id": producto["id"], "almacen_id": otro_almacen["id"], "cantidad": 3})
+        cliente = client.post("/api/clientes", json={
+            "empresa_id": empresa["id"], "nombre": "Cliente", "limite_credito": 100000
+        }).json()
+        materia = client.post("/api/materias-laboratorio", json={
+            "empresa_id": empresa["id"], "nombre": "Materia", "codigo_barra": uuid.uuid4().hex[:12], "precio": 5000
+        }).json()
+
+        ventas = [
+            _venta(empresa, producto, 4, creado_en="2026-10-01T10:00:00+00:00"),
+            _venta(empresa, producto, 8, cliente_id=cliente["id"], tipo_pago="CREDITO"),
+            {
+                "uuid": str(uuid.uuid4()), "cliente_id": empresa["cliente_id"],
+                "items": [{"materia_laboratorio_id": materia["id"], "cantidad": 1, "precio_unitario": 5000}]
+            },
+        ]
+        body = _sync(client, empresa, ventas)
+        assert body["conflictos"] == []
+        assert [v["uuid"] for v in body["sincronizadas"]] == [v["uuid"] for v in ventas]
+
+        venta_ids = [v["venta_id"] for v in body["sincronizadas"]]
+        detalle = client.get(f"/api/ventas/{venta_ids[0]}").json()
+        assert detalle["estado"] == "CONFIRMADA"
+        assert detalle["creado_en"].startswith("2026-10-01")
+        assert len(detalle["items"]) == 1
+        assert float(detalle["total"]) == 4000
+
+        assert _stock(client, empresa, producto) == 1
+        movimientos = client.get("/api/stock/movimientos", params={
+            "empresa_id": empresa["id"], "producto_id": producto["id"], "tipo": "SALIDA"
+        }).json()["movimientos"]
+        assert sorted(m["cantidad"] for m in movimientos) == [-6, -4, -2]
+        assert {m["referencia_id"] for m in movimientos} == set(venta_ids[:2])
+
+        disponible = client.get(f"/api/clientes/{cliente['id']}/credito-disponible").json()
+        assert disponible["credito_usado"] == 8000
+        creditos = client.get(f"/api/clientes/{cliente['id']}/creditos").json()
+        assert [c["venta_id"] for c in creditos] == [venta_ids[1]]
+        disponibles = client.get("/api/materias-laboratorio/disponibles", params={"empresa_id": empresa["id"]}).json()
+        assert materia["id"] not in [m["id"] for m in disponibles]
+
+    def test_conflictos(self, client, empresa):
+        producto = _producto(client, empresa, 6)
+        cliente = client.post("/api/clientes", json={
+            "empresa_id": empresa["id"], "nombre": "Cliente", "limite_credito": 2500
+        }).json()
+        ventas = [
+            _venta(empresa, producto, 3),
+            _venta(empresa, producto, 4),
+            _venta(empresa, producto, 2, cliente_id=cliente["id"], tipo_pago="CREDITO"),
+            _venta(empresa, producto, 1, cliente_id=cliente["id"], tipo_pago="CREDITO"),
+            _venta(empresa, producto, 1, cliente_id=999999999),
+            _venta(empresa, producto, 1, representante_cliente_id=999999999),
+        ]
+        ventas.append(dict(ventas[0]))
+        body = _sync(client, empresa, ventas)
+
+        motivos = {c["uuid"]: c["motivo"] for c in body["conflictos"]}
+        assert motivos[ventas[1]["uuid"]].startswith("Stock insuficiente")
+        assert motivos[ventas[3]["uuid"]] == "Crédito insuficiente"
+        assert motivos[ventas[4]["uuid"]] == "Cliente no encontrado"
+        assert motivos[ventas[5]["uuid"]] == "Representante no encontrado"
+        assert motivos[ventas[0]["uuid"]] == "UUID repetido en el lote"
+        assert [v["uuid"] for v in body["sincronizadas"]] == [ventas[0]["uuid"], ventas[2]["uuid"]]
+        assert _stock(client, empresa, producto) == 1
+        assert client.get(f"/api/clientes/{cliente['id']}/credito-disponible").json()["credito_usado"] == 2000
+
+    def test_reenvio(self, client, empresa):
+        producto = _producto(client, empresa, 10)
+        ventas = [_venta(empresa, producto, 2), _venta(empresa, producto, 2)]
+        primero = _sync(client, empresa, ventas)
+        segundo = _sync(client, empresa, ventas)
+        assert segundo["sincronizadas"] == []
+        assert segundo["ya_sincronizadas"] == primero["sincronizadas"]
+        assert _stock(client, empresa, producto) == 6
+        assert len(client.get("/api/ventas", params={"empresa_id": empresa["id"]}).json()) == 2
+
+    def test_maximo(self, client, empresa, monkeypatch):
+        monkeypatch.setattr(sync_ventas, "MAXIMO_VENTAS", 2)
+        producto = _producto(client, empresa, 10)
+        response = client.post("/api/ventas/sync", json={
+            "empresa_id": empresa["id"], "usuario_id": empresa["usuario_id"],
+            "ventas": [_venta(empresa, producto) for _ in range(3)]
+        })
+        assert response.status_code == 400
+
+    def test_usuario_inexistente_o_ajeno(self, client, empresa):
+        producto = _producto(client, empresa, 10)
+        for empresa_id, usuario_id in ((empresa["id"], 999999999), (empresa["id"] + 100000, empresa["usuario_id"])):
+            response = client.post("/api/ventas/sync", json={
+                "empresa_id": empresa_id, "usuario_id": usuario_id, "ventas": [_venta(empresa, producto)]
+            })
+            assert response.status_code == 404, response.text
+        assert _stock(client, empresa, producto) == 10
+
+
+class TestIntegridad:
+    """Solo un uuid duplicado por otro request se informa como reintento"""
+
+    class _Causa(Exception):
+        def __init__(self, constraint_name):
+            super().__init__(constraint_name)
+            self.constraint_name = constraint_name
+
+    def _error(self, mensaje, constraint_name=None):
+        orig = Exception(mensaje)
+        if constraint_name:
+            orig.__cause__ = self._Causa(constraint_name)
+        return IntegrityError("INSERT INTO ventas ...", {}, orig)
+
+    def test_uuid_repetido(self):
+        assert sync_ventas.uuid_repetido(self._error("UNIQUE constraint failed: ventas.uuid"))
+        assert sync_ventas.uuid_repetido(self._error("duplicate key", constraint_name="ventas_uuid_key"))
+        assert not sync_ventas.uuid_repetido(self._error("FOREIGN KEY constraint failed"))
+        assert not sync_ventas.uuid_repetido(self._error("violates foreign key", constraint_name="ventas_usuario_id_fkey"))
+
+    def _sync_con_error(self, client, empresa, monkeypatch, error):
+        async def tramo(*args):
+            raise error
+        monkeypatch.setattr(sync_ventas, "_sincronizar_tramo", tramo)
+        producto = _producto(client, empresa, 10)
+        return client.post("/api/ventas/sync", json={
+            "empresa_id": empresa["id"], "usuario_id": empresa["usuario_id"], "ventas": [_venta(empresa, producto)]
+        })
+
+    def test_uuid_concurrente_pide_reintentar(self, client, empresa, monkeypatch):
+        response = self._sync_con_error(client, empresa, monkeypatch, self._error("UNIQUE constraint failed: ventas.uuid"))
+        assert [c["motivo"] for c in response.json()["conflictos"]] == ["Sincronización concurrente, reintentar"]
+
+    def test_otra_restriccion_no_se_oculta(self, client, empresa, monkeypatch):
+        with pytest.raises(IntegrityError):
+            self._sync_con_error(client, empresa, monkeypatch, self._error("FOREIGN KEY constraint failed"))
+
+
+class TestTramos:
+    """Transacción y consultas por tramo"""
+
+    def test_consultas_por_tramo(self, client, empresa, contar_consultas, monkeypatch):
+        monkeypatch.setattr(sync_ventas, "TAMANO_TRAMO", 10)
+        producto = _producto(client, empresa, 100)
+
+        def sync(n):
+            response, consultas = contar_consultas("POST", "/api/ventas/sync", json={
+                "empresa_id": empresa["id"], "usuario_id": empresa["usuario_id"],
+                "ventas": [_venta(empresa, producto) for _ in range(n)]
+            })
+            assert len(response.json()["sincronizadas"]) == n
+            return consultas
+
+        # Un tramo de 10 cuesta lo mismo que uno de 2; dos tramos, el doble (más la
+        # consulta del usuario, que se hace una vez)
+        assert sync(2) == sync(10)
+        assert sync(20) == 2 * sync(10) - 1
+        assert _stock(client, empresa, producto) == 58
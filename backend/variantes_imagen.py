@@ -0,0 +1,20 @@
+"""
+URLs de los derivados de una imagen de producto, sin dependencias.
+
+imagenes.py guarda {hash}.{ext} y al lado {hash}-media.{ext} y
+{hash}-mini.{ext}; acá solo se arman esas URLs, así schemas.py no carga
+Pillow ni el pool de hilos de imagenes.py.
+"""
+import re
+
+# Lado máximo en px de cada derivado
+VARIANTES = {'media': 600, 'mini': 160}
+PRINCIPAL_CON_HASH = re.compile(r'^(?P<base>.*/[0-9a-f]{32})(?P<ext>\.[a-z]+)$')
+
+
+def url_variante(imagen_url, variante: str):
+    """URL del derivado de una imagen principal subida acá; otras URLs (externas, nombres viejos) sin cambio"""
+    coincidencia = PRINCIPAL_CON_HASH.match(imagen_url or '')
+    if not coincidencia:
+        return imagen_url
+    return f"{coincidencia['base']}-{variante}{coincidencia['ext']}"
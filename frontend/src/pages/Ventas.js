@@ -520,8 +520,9 @@ const Ventas = () => {
                   >
                     {producto.imagen_url ? (
                       <img 
-                        src={producto.imagen_url} 
+                        src={producto.imagen_mini_url || producto.imagen_url} 
                         alt={producto.nombre}
+                        loading="lazy"
                         className="w-full h-20 object-cover rounded mb-2"
                       />
                     ) : (